@@ -7,12 +7,26 @@ device information, and application configuration.
 """
 
 import os
+import base64
 import sqlite3
 import json
 import logging
 import threading
+import time
+import heapq
+import urllib.parse
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple, Union
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple, Union
+
+from .ingest_writer import IngestWriter, DEFAULT_BATCH_SIZE, DEFAULT_MAX_LATENCY_MS
+from .workout_data_schema import (
+    SAMPLE_COLUMNS, SAMPLE_COLUMN_NAMES, SUMMARY_COLUMNS, SUMMARY_COLUMN_NAMES,
+    split_sample, merge_sample, summary_column_values
+)
+from .migrations import apply_migrations
+from .workout_archive import ARCHIVE_VERSION, encode_archive, decode_archive, split_blocks
+from .connection_profile import ConnectionProfile, get_connection_profile
+from .workout_rollups import RollupBuilder, ROLLUP_METRICS, ROLLUP_STATS, ROLLUP_COLUMN_NAMES, bucket_start
 
 # Configure logging
 logging.basicConfig(
@@ -21,27 +35,146 @@ logging.basicConfig(
 )
 logger = logging.getLogger('database')
 
+# Legacy JSON sample migration settings
+MIGRATION_CHUNK_SIZE = 1000
+MIGRATION_CHUNK_PAUSE_SECONDS = 0.05
+MIGRATION_CHECKPOINT_KEY = 'workout_data_migration_last_id'
+MIGRATION_COMPLETE_KEY = 'workout_data_migration_complete'
+
+# Set once workouts finished before archiving existed have been archived
+ARCHIVE_BACKFILL_COMPLETE_KEY = 'workout_archive_backfill_complete'
+
+# Set once version 1 archives (one blob per workout) have been split into blocks
+ARCHIVE_BLOCKS_COMPLETE_KEY = 'workout_archive_blocks_complete'
+
+# Database paths with a legacy data migration thread running in this process
+_active_migrations = set()
+_active_migrations_lock = threading.Lock()
+
+_SAMPLE_COLUMN_LIST = ', '.join(SAMPLE_COLUMN_NAMES)
+_SAMPLE_COLUMN_INDEX = {name: i for i, name in enumerate(SAMPLE_COLUMN_NAMES)}
+
+# Rows fetched per round trip when streaming workout data
+READ_CHUNK_SIZE = 500
+
+# Rollup builders of workouts that received no samples for this long (e.g.
+# Web BLE sessions that were never ended) have their open buckets written and
+# are dropped
+ROLLUP_BUILDER_IDLE_SECONDS = 30 * 60
+
+# Maximum time to wait for queued samples before archiving a workout, and
+# before reading a workout that is still being written
+ARCHIVE_FLUSH_TIMEOUT_SECONDS = 10.0
+READ_FLUSH_TIMEOUT_SECONDS = 2.0
+
+# Rollup upsert: a bucket written again (late samples, restarted builder)
+# is merged with the stored one
+_ROLLUP_METRIC_INDEXES = [_SAMPLE_COLUMN_INDEX[name] for name in ROLLUP_METRICS]
+_ROLLUP_MERGE = ', '.join(
+    f"{m}_min = CASE WHEN excluded.{m}_count = 0 THEN {m}_min WHEN {m}_count = 0 THEN excluded.{m}_min "
+    f"ELSE min({m}_min, excluded.{m}_min) END, "
+    f"{m}_max = CASE WHEN excluded.{m}_count = 0 THEN {m}_max WHEN {m}_count = 0 THEN excluded.{m}_max "
+    f"ELSE max({m}_max, excluded.{m}_max) END, "
+    f"{m}_mean = CASE WHEN excluded.{m}_count = 0 THEN {m}_mean WHEN {m}_count = 0 THEN excluded.{m}_mean "
+    f"ELSE ({m}_mean * {m}_count + excluded.{m}_mean * excluded.{m}_count) / ({m}_count + excluded.{m}_count) END, "
+    f"{m}_count = {m}_count + excluded.{m}_count"
+    for m in ROLLUP_METRICS
+)
+_ROLLUP_UPSERT = (
+    f"INSERT INTO workout_rollups (workout_id, resolution, bucket_start, sample_count, "
+    f"{', '.join(ROLLUP_COLUMN_NAMES)}) VALUES ({', '.join('?' * (len(ROLLUP_COLUMN_NAMES) + 4))}) "
+    f"ON CONFLICT (workout_id, resolution, bucket_start) DO UPDATE SET "
+    f"sample_count = sample_count + excluded.sample_count, {_ROLLUP_MERGE}"
+)
+
+# Workout columns the history list can be sorted by
+WORKOUT_SORT_COLUMNS = ['start_time', 'duration'] + SUMMARY_COLUMN_NAMES
+
+# Default and maximum page size of the workout search
+SEARCH_PAGE_SIZE = 50
+MAX_SEARCH_PAGE_SIZE = 1000
+
+# Columns of a FIT file catalog entry, path first
+FIT_FILE_COLUMNS = ['path', 'directory', 'filename', 'size', 'modified', 'workout_id',
+                    'sport', 'start_time', 'duration', 'total_distance', 'total_calories',
+                    'avg_power', 'avg_heart_rate', 'record_count', 'checksum']
+
+# Typed columns read for FIT conversion
+_FIT_FIELDS = ['power', 'cadence', 'speed', 'heart_rate', 'distance', 'stroke_rate']
+
 class ThreadLocalConnection:
     """A thread-local SQLite connection manager."""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, profile: Optional[ConnectionProfile] = None,
+                 read_only: bool = False):
+        """
+        Initialize the connection manager.
+        
+        Args:
+            db_path: Path to the SQLite database file
+            profile: PRAGMA settings applied to each new connection
+                (defaults to the default connection profile)
+            read_only: Open connections in read-only mode
+        """
         self.db_path = db_path
+        self.profile = profile or get_connection_profile()
+        self.read_only = read_only
         self.local = threading.local()
         self.connection_lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
     
     def get_connection(self):
         """Get a SQLite connection for the current thread."""
         with self.connection_lock:
             if not hasattr(self.local, 'connection') or self.local.connection is None:
                 try:
-                    self.local.connection = sqlite3.connect(self.db_path)
-                    self.local.connection.row_factory = sqlite3.Row
+                    timeout = self.profile.busy_timeout_ms / 1000
+                    if self.read_only:
+                        uri = f"file:{urllib.parse.quote(os.path.abspath(self.db_path))}?mode=ro"
+                        connection = sqlite3.connect(uri, timeout=timeout, uri=True)
+                    else:
+                        connection = sqlite3.connect(self.db_path, timeout=timeout)
+                    connection.row_factory = sqlite3.Row
+                    self.profile.apply(connection, read_only=self.read_only)
+                    self.local.connection = connection
                     logger.debug(f"Created new SQLite connection for thread {threading.current_thread().name}")
                 except Exception as e:
                     logger.error(f"Error creating database connection: {str(e)}")
                     raise
             return self.local.connection
     
+    def checkpoint_if_due(self) -> bool:
+        """
+        Run a passive WAL checkpoint if the profile's interval has elapsed.
+        
+        A passive checkpoint copies what it can from the WAL into the
+        database without waiting for readers or blocking writers, which keeps
+        the WAL from growing during long workouts.
+        
+        Returns:
+            True if a checkpoint was run, False otherwise
+        """
+        interval = self.profile.checkpoint_interval_seconds
+        if not self.profile.uses_wal or interval <= 0:
+            return False
+        
+        now = time.monotonic()
+        with self._checkpoint_lock:
+            if now - self._last_checkpoint < interval:
+                return False
+            self._last_checkpoint = now
+        
+        try:
+            busy, wal_pages, checkpointed = self.get_connection().execute(
+                "PRAGMA wal_checkpoint(PASSIVE)"
+            ).fetchone()
+            logger.debug(f"WAL checkpoint: {checkpointed} of {wal_pages} pages copied (busy={busy})")
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"WAL checkpoint failed: {str(e)}")
+            return False
+    
     def close_connection(self):
         """Close the SQLite connection for the current thread."""
         with self.connection_lock:
@@ -59,23 +192,60 @@ class Database:
     Database class for managing SQLite database operations.
     """
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, write_behind: bool = False,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_latency_ms: int = DEFAULT_MAX_LATENCY_MS,
+                 migrate_in_background: bool = True,
+                 profile: Optional[Union[str, ConnectionProfile]] = None,
+                 read_only: bool = False):
         """
         Initialize the database.
         
         Args:
             db_path: Path to the SQLite database file
+            write_behind: Queue workout samples and write them in batches
+                on a dedicated writer thread instead of committing each one
+            batch_size: Number of queued samples that triggers a commit
+            max_latency_ms: Maximum time a queued sample waits before commit
+            migrate_in_background: Convert legacy JSON samples to typed
+                columns and archive old finished workouts on a background
+                thread when needed
+            profile: Connection profile name ('ssd', 'sd_card', 'rollback')
+                or ConnectionProfile with the PRAGMA settings to use
+            read_only: Open an existing database for reading only (no
+                schema setup, migrations or background work)
         """
         self.db_path = db_path
+        self.connection_profile = get_connection_profile(profile)
+        self.read_only = read_only
+        
+        # Initialize thread-local connections
+        self.connections = ThreadLocalConnection(db_path, self.connection_profile, read_only=read_only)
+        
+        # Write-behind ingest writer (thread is started on first sample)
+        self.ingest_writer = None
+        if write_behind:
+            self.ingest_writer = IngestWriter(self, batch_size=batch_size, max_latency_ms=max_latency_ms)
+        
+        # Rollup builders of workouts receiving samples, and the monotonic
+        # time of their last sample, by workout ID
+        self._rollup_builders: Dict[int, RollupBuilder] = {}
+        self._rollup_last_sample: Dict[int, float] = {}
+        self._rollup_lock = threading.Lock()
+        
+        if read_only:
+            return
         
         # Create database directory if it doesn't exist
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
-        # Initialize thread-local connections
-        self.connections = ThreadLocalConnection(db_path)
-        
         # Initialize database
         self._create_tables()
+        
+        if migrate_in_background and not (self.get_config(MIGRATION_COMPLETE_KEY, False)
+                                          and self.get_config(ARCHIVE_BACKFILL_COMPLETE_KEY, False)
+                                          and self.get_config(ARCHIVE_BLOCKS_COMPLETE_KEY, False)):
+            self.start_legacy_data_migration()
     
     def _get_connection(self):
         """Get a connection for the current thread."""
@@ -103,8 +273,11 @@ class Database:
                 )
             ''')
             
-            # Workouts table
-            cursor.execute('''
+            # Workouts table; key summary metrics are copied into columns
+            summary_definitions = ' '.join(
+                f"{name} {column_type}," for name, column_type in SUMMARY_COLUMNS
+            )
+            cursor.execute(f'''
                 CREATE TABLE IF NOT EXISTS workouts (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     device_id INTEGER,
@@ -115,16 +288,30 @@ class Database:
                     summary TEXT,
                     fit_file_path TEXT,
                     uploaded_to_garmin INTEGER DEFAULT 0,
+                    {summary_definitions}
                     FOREIGN KEY (device_id) REFERENCES devices (id)
                 )
             ''')
             
-            # Workout data table
-            cursor.execute('''
+            # Workout data table: typed metric columns plus an extras blob.
+            # The data column only holds samples written before the typed
+            # columns existed and is emptied by the legacy data migration.
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'workout_data'"
+            )
+            workout_data_exists = cursor.fetchone() is not None
+            
+            column_definitions = ' '.join(
+                f"{name} {column_type}," for name, column_type, _ in SAMPLE_COLUMNS
+            )
+            cursor.execute(f'''
                 CREATE TABLE IF NOT EXISTS workout_data (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     workout_id INTEGER,
                     timestamp TEXT,
+                    {column_definitions}
+                    field_flags INTEGER DEFAULT 0,
+                    extras TEXT,
                     data TEXT,
                     FOREIGN KEY (workout_id) REFERENCES workouts (id)
                 )
@@ -154,12 +341,142 @@ class Database:
                 )
             ''')
             
+            if not workout_data_exists:
+                # A fresh table has no legacy samples to convert or archive
+                cursor.executemany(
+                    "INSERT OR REPLACE INTO configuration (key, value) VALUES (?, ?)",
+                    [(MIGRATION_COMPLETE_KEY, json.dumps(True)),
+                     (ARCHIVE_BACKFILL_COMPLETE_KEY, json.dumps(True)),
+                     (ARCHIVE_BLOCKS_COMPLETE_KEY, json.dumps(True))]
+                )
+            
             conn.commit()
             logger.info("Database tables created")
+            
+            # Bring older databases up to the current schema
+            apply_migrations(conn)
         except sqlite3.Error as e:
             logger.error(f"Error creating tables: {str(e)}")
             raise
     
+    def start_legacy_data_migration(self) -> bool:
+        """
+        Convert legacy JSON samples to typed columns on a background thread.
+        
+        Once the conversion is done, workouts that were finished before
+        archiving existed are archived as well, and version 1 archives are
+        split into blocks. Only one migration thread
+        runs per database file in this process.
+        
+        Returns:
+            True if a migration thread was started, False otherwise
+        """
+        key = os.path.abspath(self.db_path)
+        with _active_migrations_lock:
+            if key in _active_migrations:
+                return False
+            _active_migrations.add(key)
+        
+        def run():
+            try:
+                if not self.get_config(MIGRATION_COMPLETE_KEY, False):
+                    self.migrate_legacy_workout_data(pause=MIGRATION_CHUNK_PAUSE_SECONDS)
+                if (self.get_config(MIGRATION_COMPLETE_KEY, False)
+                        and not self.get_config(ARCHIVE_BACKFILL_COMPLETE_KEY, False)):
+                    self.archive_finished_workouts(pause=MIGRATION_CHUNK_PAUSE_SECONDS)
+                    self.set_config(ARCHIVE_BACKFILL_COMPLETE_KEY, True)
+                if not self.get_config(ARCHIVE_BLOCKS_COMPLETE_KEY, False):
+                    if self.convert_legacy_archives(pause=MIGRATION_CHUNK_PAUSE_SECONDS):
+                        self.set_config(ARCHIVE_BLOCKS_COMPLETE_KEY, True)
+            finally:
+                self.connections.close_connection()
+                with _active_migrations_lock:
+                    _active_migrations.discard(key)
+        
+        thread = threading.Thread(target=run, name='workout-data-migration', daemon=True)
+        thread.start()
+        logger.info("Started legacy workout data migration")
+        return True
+    
+    def migrate_legacy_workout_data(self, chunk_size: int = MIGRATION_CHUNK_SIZE,
+                                    max_chunks: Optional[int] = None,
+                                    pause: float = 0.0) -> int:
+        """
+        Convert samples stored as JSON blobs to typed columns.
+        
+        Rows are converted in id order, one transaction per chunk, and the last
+        converted id is checkpointed in the configuration table so an
+        interrupted migration resumes where it stopped.
+        
+        Args:
+            chunk_size: Number of rows converted per transaction
+            max_chunks: Stop after this many chunks (None converts everything)
+            pause: Seconds to sleep between chunks to leave room for live writes
+            
+        Returns:
+            Number of rows converted
+        """
+        converted = 0
+        chunks = 0
+        last_id = self.get_config(MIGRATION_CHECKPOINT_KEY, 0)
+        
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            while max_chunks is None or chunks < max_chunks:
+                cursor.execute(
+                    "SELECT id, data FROM workout_data WHERE id > ? AND data IS NOT NULL ORDER BY id LIMIT ?",
+                    (last_id, chunk_size)
+                )
+                rows = cursor.fetchall()
+                
+                if not rows:
+                    cursor.execute(
+                        "INSERT OR REPLACE INTO configuration (key, value) VALUES (?, ?)",
+                        (MIGRATION_COMPLETE_KEY, json.dumps(True))
+                    )
+                    conn.commit()
+                    logger.info("Legacy workout data migration complete")
+                    break
+                
+                updates = []
+                for row in rows:
+                    try:
+                        values, flags, extras_json = split_sample(json.loads(row['data']))
+                    except (TypeError, ValueError) as e:
+                        # Leave unreadable rows as they are
+                        logger.warning(f"Skipping workout_data row {row['id']} during migration: {e}")
+                        continue
+                    updates.append((*values, flags, extras_json, row['id']))
+                
+                assignments = ', '.join(f"{name} = ?" for name in SAMPLE_COLUMN_NAMES)
+                cursor.executemany(
+                    f"UPDATE workout_data SET {assignments}, field_flags = ?, extras = ?, data = NULL "
+                    f"WHERE id = ? AND data IS NOT NULL",
+                    updates
+                )
+                
+                last_id = rows[-1]['id']
+                cursor.execute(
+                    "INSERT OR REPLACE INTO configuration (key, value) VALUES (?, ?)",
+                    (MIGRATION_CHECKPOINT_KEY, json.dumps(last_id))
+                )
+                conn.commit()
+                
+                converted += len(updates)
+                chunks += 1
+                logger.debug(f"Migrated workout_data rows up to id {last_id}")
+                
+                if pause:
+                    time.sleep(pause)
+            
+            return converted
+        except sqlite3.Error as e:
+            logger.error(f"Error migrating legacy workout data: {str(e)}")
+            conn.rollback()
+            return converted
+    
     def add_device(self, address: str, name: str, device_type: str, metadata: Dict[str, Any] = None) -> int:
         """
         Add a device to the database.
@@ -318,6 +635,10 @@ class Database:
         """
         End a workout session.
         
+        The last rollup buckets are not written here: finalize_rollups() may
+        have to rebuild them from every sample, so callers run it in the
+        background.
+        
         Args:
             workout_id: Workout ID
             summary: Workout summary data
@@ -345,9 +666,13 @@ class Database:
             # Convert summary to JSON string
             summary_json = json.dumps(summary) if summary else '{}'
             
+            # Keep the indexed summary columns in sync with the JSON
+            assignments = ', '.join(f"{name} = ?" for name in SUMMARY_COLUMN_NAMES)
             cursor.execute(
-                "UPDATE workouts SET end_time = ?, duration = ?, summary = ?, fit_file_path = ? WHERE id = ?",
-                (end_time.isoformat(), duration, summary_json, fit_file_path, workout_id)
+                f"UPDATE workouts SET end_time = ?, duration = ?, summary = ?, fit_file_path = ?, {assignments} "
+                f"WHERE id = ?",
+                (end_time.isoformat(), duration, summary_json, fit_file_path,
+                 *summary_column_values(summary), workout_id)
             )
             
             conn.commit()
@@ -362,6 +687,9 @@ class Database:
         """
         Add data point to a workout session.
         
+        With write-behind enabled the sample is queued and committed later by
+        the ingest writer; otherwise it is written immediately.
+        
         Args:
             workout_id: Workout ID
             timestamp: Data timestamp (absolute datetime object)
@@ -370,32 +698,53 @@ class Database:
         Returns:
             True if successful, False otherwise
         """
+        if self.ingest_writer:
+            return self.ingest_writer.submit(workout_id, timestamp, data)
+        
+        return self.add_workout_data_batch([(workout_id, timestamp, data)])
+    
+    def add_workout_data_batch(self, rows: List[Tuple[int, datetime, Dict[str, Any]]]) -> bool:
+        """
+        Add several data points in a single transaction.
+        
+        Args:
+            rows: List of (workout_id, timestamp, data) tuples
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not rows:
+            return True
+        
+        # Split samples into typed columns and timestamps into ISO 8601 strings
+        params = []
+        samples = []
+        for workout_id, timestamp, data in rows:
+            values, flags, extras_json = split_sample(data)
+            params.append((workout_id, timestamp.isoformat(), *values, flags, extras_json))
+            samples.append((workout_id, timestamp, values))
+        
+        placeholders = ', '.join('?' * (len(SAMPLE_COLUMN_NAMES) + 4))
+        
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
             
-            # Convert data to JSON string
-            data_json = json.dumps(data)
+            # Rollups are updated in the same transaction as the samples
+            closed_buckets = self._roll_up_samples(cursor, samples)
             
-            # Convert timestamp to ISO 8601 string
-            timestamp_iso = timestamp.isoformat()
-            
-            # Log the data being saved for debugging
-            logger.info(f"Adding data point to workout {workout_id} at timestamp {timestamp_iso}")
-            
-            # Execute the insert with unique timestamp
-            cursor.execute(
-                "INSERT INTO workout_data (workout_id, timestamp, data) VALUES (?, ?, ?)",
-                (workout_id, timestamp_iso, data_json)
+            cursor.executemany(
+                f"INSERT INTO workout_data (workout_id, timestamp, {_SAMPLE_COLUMN_LIST}, field_flags, extras) "
+                f"VALUES ({placeholders})",
+                params
             )
+            cursor.executemany(_ROLLUP_UPSERT, closed_buckets)
             
-            # Make sure to commit the transaction
+            # One commit for the whole batch
             conn.commit()
+            self.connections.checkpoint_if_due()
             
-            # Get the row ID of the inserted data point to confirm success
-            inserted_id = cursor.lastrowid
-            logger.info(f"Successfully added data point with ID {inserted_id}")
-            
+            logger.debug(f"Added {len(params)} data points")
             return True
         except sqlite3.Error as e:
             logger.error(f"Error adding workout data: {str(e)}")
@@ -403,305 +752,1632 @@ class Database:
                 conn.rollback()
             except Exception as rollback_e:
                 logger.error(f"Error rolling back transaction: {str(rollback_e)}")
+            # The builders saw samples that were not stored; rebuild at the end
+            with self._rollup_lock:
+                for workout_id, _, _ in samples:
+                    builder = self._rollup_builders.get(workout_id)
+                    if builder is not None:
+                        builder.complete = False
             return False
-
-    def get_workout(self, workout_id: int) -> Optional[Dict[str, Any]]:
+    
+    def _roll_up_samples(self, cursor: sqlite3.Cursor,
+                         samples: List[Tuple[int, datetime, List[Any]]]) -> List[tuple]:
         """
-        Get workout information.
+        Feed samples to the live rollup builders.
+        
+        Args:
+            cursor: Cursor of the transaction storing the samples
+            samples: List of (workout_id, timestamp, typed column values)
+            
+        Returns:
+            workout_rollups rows of the buckets the samples closed
+        """
+        closed = []
+        now = time.monotonic()
+        with self._rollup_lock:
+            for workout_id, timestamp, values in samples:
+                builder = self._rollup_builders.get(workout_id)
+                if builder is None:
+                    # Samples stored before this builder existed (e.g. before
+                    # a restart) are only covered by a rebuild
+                    cursor.execute(
+                        "SELECT EXISTS (SELECT 1 FROM workout_data WHERE workout_id = ?) "
+                        "OR EXISTS (SELECT 1 FROM workout_archive WHERE workout_id = ?)",
+                        (workout_id, workout_id)
+                    )
+                    builder = RollupBuilder(complete=not cursor.fetchone()[0])
+                    self._rollup_builders[workout_id] = builder
+                metrics = [values[i] for i in _ROLLUP_METRIC_INDEXES]
+                closed += [(workout_id, *row) for row in builder.add(timestamp, metrics)]
+                self._rollup_last_sample[workout_id] = now
+            
+            # Workouts abandoned without end_workout would keep their builder
+            # forever; a workout that resumes later gets an incomplete builder
+            # and its rollups are rebuilt when it ends
+            idle = [workout_id for workout_id, last_sample in self._rollup_last_sample.items()
+                    if now - last_sample > ROLLUP_BUILDER_IDLE_SECONDS]
+            for workout_id in idle:
+                builder = self._pop_rollup_builder(workout_id)
+                closed += [(workout_id, *row) for row in builder.flush()]
+                logger.info(f"Dropped rollup builder of idle workout {workout_id}")
+        return closed
+    
+    def _pop_rollup_builder(self, workout_id: int) -> Optional[RollupBuilder]:
+        """Remove the rollup builder of a workout; the caller holds _rollup_lock."""
+        self._rollup_last_sample.pop(workout_id, None)
+        return self._rollup_builders.pop(workout_id, None)
+    
+    def finalize_rollups(self, workout_id: int) -> bool:
+        """
+        Write the open rollup buckets of a workout that has ended.
+        
+        The rollups are rebuilt from the stored samples instead when the live
+        builder missed some of them.
         
         Args:
             workout_id: Workout ID
             
         Returns:
-            Workout dictionary or None if not found
+            True if successful, False otherwise
         """
+        self._flush_workout(workout_id)
+        
+        with self._rollup_lock:
+            builder = self._pop_rollup_builder(workout_id)
+        if builder is None or not builder.complete:
+            return self.rebuild_rollups(workout_id)
+        
         try:
             conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM workouts WHERE id = ?", (workout_id,))
-            workout = cursor.fetchone()
-            
-            if workout:
-                workout_dict = dict(workout)
-                workout_dict['summary'] = json.loads(workout_dict['summary'])
-                return workout_dict
-            return None
+            conn.executemany(_ROLLUP_UPSERT, [(workout_id, *row) for row in builder.flush()])
+            conn.commit()
+            return True
         except sqlite3.Error as e:
-            logger.error(f"Error getting workout: {str(e)}")
-            return None
+            logger.error(f"Error finalizing rollups of workout {workout_id}: {str(e)}")
+            conn.rollback()
+            return False
     
-    def get_workout_data(self, workout_id: int) -> List[Dict[str, Any]]:
+    def rebuild_rollups(self, workout_id: int) -> bool:
         """
-        Get workout data points.
+        Recompute the rollups of a workout from its stored samples.
         
         Args:
             workout_id: Workout ID
             
         Returns:
-            List of workout data dictionaries
+            True if successful, False otherwise
         """
+        builder = RollupBuilder()
+        rows = []
+        for point in self.iter_workout_data(workout_id, fields=ROLLUP_METRICS):
+            rows += builder.add(point['timestamp'], [point[name] for name in ROLLUP_METRICS])
+        rows += builder.flush()
+        
         try:
             conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # Get the data with proper ordering by timestamp
-            cursor.execute("""
-                SELECT id, workout_id, timestamp, data 
-                FROM workout_data 
-                WHERE workout_id = ? 
-                ORDER BY timestamp ASC
-            """, (workout_id,))
-            data_points = []
-            
-            for row in cursor.fetchall():
-                try:
-                    data_point = dict(row)
-                    # Convert timestamp string back to datetime object
-                    data_point["timestamp"] = datetime.fromisoformat(data_point["timestamp"])
-                    
-                    # Parse JSON data with better error handling
-                    try:
-                        data_json = json.loads(data_point["data"])
-                    except json.JSONDecodeError as e:
-                        logger.error(f"JSON decode error for workout_data id {data_point['id']}: {e}")
-                        data_json = {}
-                        
-                    data_point["data"] = data_json
-                    
-                    # Log a sample of the data for debugging (only first few points)
-                    if len(data_points) < 2:
-                        logger.debug(f"Sample data point: {data_point}")
-                    
-                    data_points.append(data_point)
-                except Exception as row_e:
-                    logger.error(f"Error processing workout data row: {row_e}")
-                    # Continue processing other rows
-            
-            logger.info(f"Retrieved {len(data_points)} data points for workout {workout_id}")
-            return data_points
-        except sqlite3.Error as e:
-            logger.error(f"Error getting workout data: {str(e)}")
-            return []
+            conn.execute("DELETE FROM workout_rollups WHERE workout_id = ?", (workout_id,))
+            conn.executemany(_ROLLUP_UPSERT, [(workout_id, *row) for row in rows])
+            conn.commit()
+            logger.info(f"Rebuilt {len(rows)} rollup buckets for workout {workout_id}")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error rebuilding rollups of workout {workout_id}: {str(e)}")
+            conn.rollback()
+            return False
     
-    def get_workout_data_optimized(self, workout_id: int) -> List[Dict[str, Any]]:
+    def get_workout_rollups(self, workout_id: int, resolution: int,
+                            start: Optional[datetime] = None,
+                            end: Optional[datetime] = None) -> List[Dict[str, Any]]:
         """
-        Get workout data points optimized for FIT conversion.
+        Get the rollup buckets of a workout, oldest first.
         
-        This method uses a single efficient query that retrieves and formats
-        the data points with the exact fields needed for FIT conversion.
+        Rollups of a finished workout that has none yet (e.g. recorded before
+        rollups existed) are built on first use.
         
         Args:
             workout_id: Workout ID
+            resolution: Bucket size in seconds (one of ROLLUP_RESOLUTIONS)
+            start: Only buckets overlapping this time or later
+            end: Only buckets starting before this time
             
         Returns:
-            List of workout data dictionaries with optimized structure
+            List of buckets with 'timestamp' (bucket start), 'sample_count' and
+            a {'min', 'max', 'mean', 'count'} dictionary per metric
         """
+        conditions = ["workout_id = ?", "resolution = ?"]
+        params: List[Any] = [workout_id, resolution]
+        if start is not None:
+            conditions.append("bucket_start >= ?")
+            params.append(bucket_start(start, resolution).isoformat())
+        if end is not None:
+            conditions.append("bucket_start < ?")
+            params.append(end.isoformat())
+        query = (
+            f"SELECT bucket_start, sample_count, {', '.join(ROLLUP_COLUMN_NAMES)} FROM workout_rollups "
+            f"WHERE {' AND '.join(conditions)} ORDER BY bucket_start ASC"
+        )
+        
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # Use a single SQL query to extract all needed fields directly
-            query = """
-            SELECT 
-                timestamp,
-                json_extract(data, '$.instantaneous_power') as instantaneous_power,
-                json_extract(data, '$.heart_rate') as heart_rate,
-                json_extract(data, '$.total_distance') as total_distance,
-                json_extract(data, '$.instantaneous_cadence') as instantaneous_cadence,
-                json_extract(data, '$.instantaneous_speed') as instantaneous_speed,
-                json_extract(data, '$.stroke_rate') as stroke_rate,
-                json_extract(data, '$.average_power') as average_power,
-                json_extract(data, '$.average_cadence') as average_cadence,
-                json_extract(data, '$.average_speed') as average_speed,
-                json_extract(data, '$.instant_power') as instant_power,
-                json_extract(data, '$.instant_cadence') as instant_cadence,
-                json_extract(data, '$.instant_speed') as instant_speed
-            FROM workout_data
-            WHERE workout_id = ?
-            ORDER BY timestamp ASC
-            """
-            
-            cursor.execute(query, (workout_id,))
-            
-            data_points = []
-            for row in cursor.fetchall():
-                # Convert timestamp string to datetime object
-                timestamp = datetime.fromisoformat(row['timestamp'])
-                
-                # Find the power value from any available field
-                power = None
-                for field in ['instantaneous_power', 'instant_power']:
-                    if row[field] is not None:
-                        power = float(row[field])
-                        break
-                
-                # Find the cadence value from any available field
-                cadence = None
-                for field in ['instantaneous_cadence', 'instant_cadence']:
-                    if row[field] is not None:
-                        cadence = float(row[field])
-                        break
-                
-                # Find the speed value from any available field
-                speed = None
-                for field in ['instantaneous_speed', 'instant_speed']:
-                    if row[field] is not None:
-                        speed = float(row[field])
-                        break
-                
-                # Create data point with exact structure needed for FIT conversion
-                data_point = {
-                    'timestamp': timestamp,
-                    'instantaneous_power': int(power) if power is not None else 0,
-                    'heart_rate': int(row['heart_rate']) if row['heart_rate'] is not None else 0,
-                    'total_distance': float(row['total_distance']) if row['total_distance'] is not None else 0,
-                    'instantaneous_cadence': int(cadence) if cadence is not None else 0,
-                    'instantaneous_speed': float(speed) if speed is not None else 0,
-                    'stroke_rate': int(row['stroke_rate']) if row['stroke_rate'] is not None else 0,
-                    'average_power': int(float(row['average_power'])) if row['average_power'] is not None else None,
-                    'average_cadence': int(float(row['average_cadence'])) if row['average_cadence'] is not None else None,
-                    'average_speed': float(row['average_speed']) if row['average_speed'] is not None else None
-                }
-                
-                data_points.append(data_point)
-            
-            return data_points
+            cursor = self._get_cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            
+            if not rows and self._needs_rollup_backfill(cursor, workout_id):
+                if self.rebuild_rollups(workout_id):
+                    cursor = self._get_cursor()
+                    cursor.execute(query, params)
+                    rows = cursor.fetchall()
         except sqlite3.Error as e:
-            logger.error(f"Error getting optimized workout data: {str(e)}")
+            logger.error(f"Error getting rollups of workout {workout_id}: {str(e)}")
             return []
+        
+        buckets = []
+        for row in rows:
+            bucket = {'timestamp': datetime.fromisoformat(row['bucket_start']), 'sample_count': row['sample_count']}
+            for metric in ROLLUP_METRICS:
+                bucket[metric] = {stat: row[f"{metric}_{stat}"] for stat in ROLLUP_STATS}
+            buckets.append(bucket)
+        return buckets
+    
+    def _needs_rollup_backfill(self, cursor: sqlite3.Cursor, workout_id: int) -> bool:
+        """Whether a finished workout has samples but no rollups."""
+        with self._rollup_lock:
+            if workout_id in self._rollup_builders:
+                return False
+        cursor.execute(
+            "SELECT end_time IS NOT NULL "
+            "AND NOT EXISTS (SELECT 1 FROM workout_rollups WHERE workout_id = ?) "
+            "AND (EXISTS (SELECT 1 FROM workout_data WHERE workout_id = ?) "
+            "OR EXISTS (SELECT 1 FROM workout_archive WHERE workout_id = ?)) "
+            "FROM workouts WHERE id = ?",
+            (workout_id, workout_id, workout_id, workout_id)
+        )
+        row = cursor.fetchone()
+        return bool(row and row[0])
     
-    def get_workouts(self, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+    def flush_workout_data(self, timeout: Optional[float] = None) -> bool:
         """
-        Get recent workouts.
+        Commit all workout samples queued by the write-behind writer.
         
         Args:
-            limit: Maximum number of workouts to return
-            offset: Offset for pagination
+            timeout: Maximum time to wait in seconds (None waits indefinitely)
             
         Returns:
-            List of workout dictionaries
+            True if all queued samples were written, False otherwise
         """
-        try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # Use LEFT JOIN instead of INNER JOIN to include workouts with missing device data
-            cursor.execute(
-                """
-                SELECT w.*, d.name as device_name, d.device_type 
-                FROM workouts w
-                LEFT JOIN devices d ON w.device_id = d.id
-                ORDER BY w.start_time DESC
-                LIMIT ? OFFSET ?
-                """,
-                (limit, offset)
-            )
-            workouts = []
-            
-            for row in cursor.fetchall():
-                workout = dict(row)
-                # Make sure none of the key values are None to avoid JSON parsing errors
-                if workout['summary'] is not None:
-                    workout['summary'] = json.loads(workout['summary'])
-                else:
-                    workout['summary'] = {}
-                
-                # Add default device info if missing
-                if workout.get('device_name') is None:
-                    workout['device_name'] = 'Unknown Device'
-                if workout.get('device_type') is None:
-                    workout['device_type'] = 'unknown'
-                    
-                workouts.append(workout)
-            
-            # Log what we found
-            logger.info(f"Retrieved {len(workouts)} workouts from database")
-            
-            return workouts
-        except sqlite3.Error as e:
-            logger.error(f"Error getting workouts: {str(e)}")
-            return []
+        if not self.ingest_writer:
+            return True
+        return self.ingest_writer.flush(timeout)
     
-    def get_workouts_without_fit_files(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def _flush_workout(self, workout_id: int, timeout: Optional[float] = None) -> bool:
         """
-        Get workouts that don't have associated FIT files.
+        Commit queued samples before a workout is read, if any of them are its own.
+        
+        Reads of other workouts don't wait behind the workout being written.
         
         Args:
-            limit: Maximum number of workouts to return (None for all)
+            workout_id: Workout ID
+            timeout: Maximum time to wait in seconds (defaults to
+                READ_FLUSH_TIMEOUT_SECONDS)
             
         Returns:
-            List of workout dictionaries
+            True if none of the workout's samples are left unwritten, False otherwise
         """
-        try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            query = """
-            SELECT w.*, d.name as device_name, d.device_type 
-            FROM workouts w
-            LEFT JOIN devices d ON w.device_id = d.id
-            WHERE (w.fit_file_path IS NULL OR w.fit_file_path = '')
-            AND w.end_time IS NOT NULL
-            ORDER BY w.start_time DESC
-            """
-            
-            if limit is not None:
-                query += f" LIMIT {int(limit)}"
-            
-            cursor.execute(query)
-            
-            workouts = []
-            for row in cursor.fetchall():
-                workout = dict(row)
-                
-                # Make sure none of the key values are None to avoid JSON parsing errors
-                if workout['summary'] is not None:
-                    workout['summary'] = json.loads(workout['summary'])
-                else:
-                    workout['summary'] = {}
-                
-                # Add default device info if missing
-                if workout.get('device_name') is None:
-                    workout['device_name'] = 'Unknown Device'
-                if workout.get('device_type') is None:
-                    workout['device_type'] = 'unknown'
-                    
-                workouts.append(workout)
-            
-            return workouts
-        except sqlite3.Error as e:
-            logger.error(f"Error getting workouts without FIT files: {str(e)}")
-            return []
-    
-    def update_workout_fit_path(self, workout_id: int, fit_file_path: str) -> bool:
+        if not self.ingest_writer or not self.ingest_writer.has_pending(workout_id):
+            return True
+        if not self.flush_workout_data(READ_FLUSH_TIMEOUT_SECONDS if timeout is None else timeout):
+            logger.warning(f"Queued samples of workout {workout_id} are not written yet")
+            return False
+        return True
+
+    def archive_workout(self, workout_id: int) -> bool:
         """
-        Update the FIT file path for a workout.
+        Pack the samples of a finished workout into a compressed archive.
+        
+        The samples are delta/varint encoded per column, zlib compressed and
+        stored in workout_archive_blocks rows of up to ARCHIVE_BLOCK_SIZE
+        samples, with a workout_archive row holding the sample count; the
+        individual workout_data rows are deleted in the same transaction.
+        Samples added after a workout was archived, and version 1 archives,
+        are folded into new blocks on the next call. Readers decode archives
+        transparently.
         
         Args:
             workout_id: Workout ID
-            fit_file_path: Path to the FIT file
             
         Returns:
-            True if successful, False otherwise
+            True if the workout's samples are archived, False otherwise
+        """
+        # Queued samples belong in the archive; archiving without them would
+        # leave them behind as a partial workout
+        if not self._flush_workout(workout_id, ARCHIVE_FLUSH_TIMEOUT_SECONDS):
+            logger.warning(f"Not archiving workout {workout_id}: queued samples could not be written")
+            return False
+        
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT end_time FROM workouts WHERE id = ?", (workout_id,))
+            workout = cursor.fetchone()
+            if not workout:
+                logger.error(f"Workout {workout_id} not found")
+                return False
+            if workout['end_time'] is None:
+                logger.warning(f"Not archiving workout {workout_id}: workout is still active")
+                return False
+            
+            cursor.execute(f"""
+                SELECT id, timestamp, {_SAMPLE_COLUMN_LIST}, field_flags, extras, data
+                FROM workout_data
+                WHERE workout_id = ?
+                ORDER BY timestamp ASC, id ASC
+            """, (workout_id,))
+            rows = [self._row_to_archive_row(row) for row in cursor.fetchall()]
+            
+            cursor.execute("SELECT data FROM workout_archive WHERE workout_id = ?", (workout_id,))
+            archive = cursor.fetchone()
+            
+            if not rows and (archive is None or archive['data'] is None):
+                return archive is not None
+            
+            last_id = max(row['id'] for row in rows) if rows else None
+            if archive is not None:
+                rows = sorted(list(self._iter_archive_rows(conn, workout_id, strict=True)) + rows,
+                              key=lambda row: row['timestamp'])
+            
+            blocks = [(block_rows, encode_archive(block_rows)) for block_rows in split_blocks(rows)]
+            
+            cursor.execute("DELETE FROM workout_archive_blocks WHERE workout_id = ?", (workout_id,))
+            cursor.executemany(
+                "INSERT INTO workout_archive_blocks "
+                "(workout_id, block, first_timestamp, last_timestamp, sample_count, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(workout_id, index, block_rows[0]['timestamp'], block_rows[-1]['timestamp'],
+                  len(block_rows), sqlite3.Binary(blob))
+                 for index, (block_rows, blob) in enumerate(blocks)]
+            )
+            cursor.execute(
+                "INSERT OR REPLACE INTO workout_archive (workout_id, sample_count, format_version, data, created_at) "
+                "VALUES (?, ?, ?, NULL, ?)",
+                (workout_id, len(rows), ARCHIVE_VERSION, datetime.now().isoformat())
+            )
+            if last_id is not None:
+                cursor.execute(
+                    "DELETE FROM workout_data WHERE workout_id = ? AND id <= ?",
+                    (workout_id, last_id)
+                )
+            conn.commit()
+            self.connections.checkpoint_if_due()
+            
+            size = sum(len(blob) for _, blob in blocks)
+            logger.info(f"Archived {len(rows)} samples of workout {workout_id} in {len(blocks)} blocks "
+                        f"of {size} bytes")
+            return True
+        except ValueError as e:
+            logger.warning(f"Not archiving workout {workout_id}: {str(e)}")
+            return False
+        except sqlite3.Error as e:
+            logger.error(f"Error archiving workout {workout_id}: {str(e)}")
+            conn.rollback()
+            return False
+    
+    def archive_finished_workouts(self, limit: Optional[int] = None, pause: float = 0.0) -> int:
+        """
+        Archive every finished workout that still has individual sample rows.
+        
+        Args:
+            limit: Maximum number of workouts to archive (optional)
+            pause: Seconds to sleep between workouts to leave room for live writes
+            
+        Returns:
+            Number of workouts archived
+        """
+        try:
+            cursor = self._get_cursor()
+            query = """
+                SELECT id FROM workouts
+                WHERE end_time IS NOT NULL
+                AND EXISTS (SELECT 1 FROM workout_data WHERE workout_data.workout_id = workouts.id)
+                ORDER BY id
+            """
+            if limit is not None:
+                cursor.execute(query + " LIMIT ?", (limit,))
+            else:
+                cursor.execute(query)
+            workout_ids = [row['id'] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error finding workouts to archive: {str(e)}")
+            return 0
+        
+        archived = 0
+        for workout_id in workout_ids:
+            if self.archive_workout(workout_id):
+                archived += 1
+            if pause:
+                time.sleep(pause)
+        
+        logger.info(f"Archived {archived} of {len(workout_ids)} finished workouts")
+        return archived
+    
+    def convert_legacy_archives(self, pause: float = 0.0) -> bool:
+        """
+        Split every version 1 archive (one blob per workout) into blocks.
+        
+        Args:
+            pause: Seconds to sleep between workouts to leave room for live writes
+            
+        Returns:
+            True if no version 1 archive is left, False otherwise
+        """
+        try:
+            cursor = self._get_cursor()
+            cursor.execute("SELECT workout_id FROM workout_archive WHERE data IS NOT NULL ORDER BY workout_id")
+            workout_ids = [row['workout_id'] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error finding archives to convert: {str(e)}")
+            return False
+        
+        converted = 0
+        for workout_id in workout_ids:
+            if self.archive_workout(workout_id):
+                converted += 1
+            if pause:
+                time.sleep(pause)
+        
+        if workout_ids:
+            logger.info(f"Split {converted} of {len(workout_ids)} workout archives into blocks")
+        return converted == len(workout_ids)
+    
+    def _row_to_archive_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """
+        Convert a workout_data row to the row format of workout archives.
+        
+        Args:
+            row: Row with id, timestamp, the typed columns, field_flags, extras and data
+            
+        Returns:
+            Archive row dictionary
+        """
+        if row['data'] is not None:
+            # Legacy sample not migrated yet
+            try:
+                values, flags, extras_json = split_sample(json.loads(row['data']))
+            except (TypeError, ValueError):
+                # Unreadable samples are read back as empty ones either way
+                values, flags, extras_json = [None] * len(SAMPLE_COLUMN_NAMES), 0, None
+        else:
+            values = [row[name] for name in SAMPLE_COLUMN_NAMES]
+            flags, extras_json = row['field_flags'], row['extras']
+        
+        archive_row = dict(zip(SAMPLE_COLUMN_NAMES, values))
+        archive_row.update({
+            'id': row['id'],
+            'timestamp': row['timestamp'],
+            'field_flags': flags or 0,
+            'extras': extras_json,
+        })
+        return archive_row
+    
+    def get_workout(self, workout_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get workout information.
+        
+        Args:
+            workout_id: Workout ID
+            
+        Returns:
+            Workout dictionary or None if not found
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT * FROM workouts WHERE id = ?", (workout_id,))
+            workout = cursor.fetchone()
+            
+            if workout:
+                workout_dict = dict(workout)
+                workout_dict['summary'] = json.loads(workout_dict['summary'])
+                return workout_dict
+            return None
+        except sqlite3.Error as e:
+            logger.error(f"Error getting workout: {str(e)}")
+            return None
+    
+    def get_workout_version(self, workout_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the change version of a workout without reading its samples.
+        
+        Args:
+            workout_id: Workout ID
+            
+        Returns:
+            Dictionary with end_time, row_version (bumped on every update) and
+            modified_at (UTC time of the last update, None if never updated),
+            or None if the workout does not exist
+        """
+        try:
+            cursor = self._get_cursor()
+            cursor.execute(
+                "SELECT end_time, row_version, modified_at FROM workouts WHERE id = ?",
+                (workout_id,)
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error getting version of workout {workout_id}: {str(e)}")
+            return None
+    
+    def get_workout_data_version(self, workout_id: int) -> Optional[int]:
+        """
+        Get the version of a workout's sample data without reading the samples.
+        
+        Triggers bump the version whenever a sample of the workout is
+        inserted or updated; archiving the samples leaves it unchanged.
+        
+        Args:
+            workout_id: Workout ID
+            
+        Returns:
+            Sample data version (0 for a workout without samples), or None on error
+        """
+        # Queued samples count as written
+        self._flush_workout(workout_id)
+        
+        try:
+            cursor = self._get_cursor()
+            cursor.execute("SELECT version FROM workout_data_versions WHERE workout_id = ?", (workout_id,))
+            row = cursor.fetchone()
+            return row[0] if row else 0
+        except sqlite3.Error as e:
+            logger.error(f"Error getting sample data version of workout {workout_id}: {str(e)}")
+            return None
+    
+    def get_table_versions(self) -> Dict[str, int]:
+        """
+        Get the change counters of the versioned tables.
+        
+        Each counter goes up whenever a row of its table is inserted, updated
+        or deleted, so a response built from those tables is still current
+        while the counters are unchanged.
+        
+        Returns:
+            Dictionary of table name to change counter (empty on error)
+        """
+        try:
+            cursor = self._get_cursor()
+            cursor.execute("SELECT name, version FROM table_versions")
+            return {row['name']: row['version'] for row in cursor.fetchall()}
+        except sqlite3.Error as e:
+            logger.error(f"Error getting table versions: {str(e)}")
+            return {}
+    
+    def iter_workout_data(self, workout_id: int, fields: Optional[List[str]] = None,
+                          chunk_size: int = READ_CHUNK_SIZE, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream workout data points in timestamp order.
+        
+        Rows are fetched chunk_size at a time, so memory use does not grow
+        with the length of the workout as long as the caller does not keep
+        every point.
+        
+        Args:
+            workout_id: Workout ID
+            fields: Typed columns to read (e.g. ['power', 'heart_rate']). When
+                given, each point is a flat dictionary with 'timestamp' and the
+                requested columns (None for missing values). When omitted, each
+                point has the same structure as get_workout_data() returns.
+            chunk_size: Number of rows fetched per round trip
+            start: Only samples at or after this time
+            end: Only samples before this time
+            
+        Returns:
+            Iterator over workout data dictionaries
+            
+        Raises:
+            ValueError: If fields contains an unknown column name
+        """
+        if fields is not None:
+            unknown = [name for name in fields if name not in SAMPLE_COLUMN_NAMES]
+            if unknown:
+                raise ValueError(f"Unknown workout data fields: {', '.join(unknown)}")
+            fields = list(fields)
+        
+        # Make queued samples visible to the read
+        self._flush_workout(workout_id)
+        
+        return self._iter_workout_rows(workout_id, fields, max(1, chunk_size),
+                                       start.isoformat() if start is not None else None,
+                                       end.isoformat() if end is not None else None)
+    
+    def _iter_workout_rows(self, workout_id: int, fields: Optional[List[str]], chunk_size: int,
+                           start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Generator behind iter_workout_data()."""
+        if fields is None:
+            columns = f"id, timestamp, {_SAMPLE_COLUMN_LIST}, field_flags, extras, data"
+        else:
+            columns = ', '.join(['timestamp'] + fields + ['data'])
+        
+        # Time windows are read as a range of the (workout_id, timestamp) index
+        conditions = "workout_id = ?"
+        params: List[Any] = [workout_id]
+        if start is not None:
+            conditions += " AND timestamp >= ?"
+            params.append(start)
+        if end is not None:
+            conditions += " AND timestamp < ?"
+            params.append(end)
+        
+        try:
+            conn = self._get_connection()
+            archived_rows = self._iter_archive_rows(conn, workout_id, fields, start, end)
+            
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {columns}
+                FROM workout_data
+                WHERE {conditions}
+                ORDER BY timestamp ASC
+            """, params)
+            
+            # Samples written after the workout was archived are merged in
+            rows = heapq.merge(archived_rows, self._fetch_chunks(cursor, chunk_size),
+                               key=lambda row: row['timestamp'])
+            
+            for row in rows:
+                if fields is None:
+                    point = self._row_to_data_point(row, workout_id)
+                else:
+                    point = self._row_to_fields(row, fields)
+                if point is not None:
+                    yield point
+        except sqlite3.Error as e:
+            logger.error(f"Error reading workout data: {str(e)}")
+    
+    def _fetch_chunks(self, cursor: sqlite3.Cursor, chunk_size: int) -> Iterator[sqlite3.Row]:
+        """Yield the rows of an executed query, fetching chunk_size at a time."""
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+    
+    def _iter_archive_rows(self, conn: sqlite3.Connection, workout_id: int,
+                           fields: Optional[List[str]] = None, start: Optional[str] = None,
+                           end: Optional[str] = None, strict: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Get the archived rows of a workout.
+        
+        Only the blocks covering the time window are read, and only the
+        timestamps and requested columns of each block are decoded.
+        
+        Args:
+            conn: SQLite connection
+            workout_id: Workout ID
+            fields: Typed columns to read (None reads whole rows)
+            start: Only samples at or after this ISO time
+            end: Only samples before this ISO time
+            strict: Raise ValueError on a corrupt archive instead of
+                logging it and skipping the unreadable part
+            
+        Returns:
+            Iterator over archived rows (empty if the workout is not archived)
+        """
+        cursor = conn.cursor()
+        cursor.execute("SELECT data FROM workout_archive WHERE workout_id = ?", (workout_id,))
+        archive = cursor.fetchone()
+        if archive is None:
+            return
+        
+        if archive['data'] is not None:
+            # Version 1 archive, not split into blocks yet
+            blobs = [archive['data']]
+        else:
+            conditions = "workout_id = ?"
+            params: List[Any] = [workout_id]
+            if end is not None:
+                conditions += " AND first_timestamp < ?"
+                params.append(end)
+            if start is not None:
+                conditions += " AND last_timestamp >= ?"
+                params.append(start)
+            cursor.execute(
+                f"SELECT data FROM workout_archive_blocks WHERE {conditions} ORDER BY first_timestamp, block",
+                params
+            )
+            blobs = (row['data'] for row in self._fetch_chunks(cursor, 1))
+        
+        for blob in blobs:
+            try:
+                rows = decode_archive(blob, fields)
+            except ValueError as e:
+                if strict:
+                    raise
+                logger.error(f"Error decoding archive of workout {workout_id}: {str(e)}")
+                continue
+            if start is None and end is None:
+                yield from rows
+                continue
+            for row in rows:
+                if (start is None or row['timestamp'] >= start) and (end is None or row['timestamp'] < end):
+                    yield row
+    
+    def _row_to_data_point(self, row: sqlite3.Row, workout_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Build a get_workout_data() style data point from a workout_data row.
+        
+        Args:
+            row: Row with id, timestamp and the sample columns
+            workout_id: Workout ID
+            
+        Returns:
+            Data point dictionary or None if the row is unreadable
+        """
+        try:
+            data_point = {
+                "id": row["id"],
+                "workout_id": workout_id,
+                # Convert timestamp string back to datetime object
+                "timestamp": datetime.fromisoformat(row["timestamp"])
+            }
+            
+            # Parse JSON data with better error handling
+            try:
+                data_point["data"] = self._row_to_sample(row)
+            except json.JSONDecodeError as e:
+                logger.error(f"JSON decode error for workout_data id {row['id']}: {e}")
+                data_point["data"] = {}
+            
+            return data_point
+        except Exception as row_e:
+            logger.error(f"Error processing workout data row: {row_e}")
+            return None
+    
+    def _row_to_fields(self, row: sqlite3.Row, fields: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Build a flat data point with the requested typed columns.
+        
+        Args:
+            row: Row with timestamp, the requested columns and data
+            fields: Typed column names
+            
+        Returns:
+            Data point dictionary or None if the row is unreadable
+        """
+        try:
+            point = {'timestamp': datetime.fromisoformat(row['timestamp'])}
+        except (TypeError, ValueError) as e:
+            logger.error(f"Error processing workout data row: {e}")
+            return None
+        
+        if row['data'] is not None:
+            # Legacy sample not migrated yet
+            try:
+                values = split_sample(json.loads(row['data']))[0]
+            except (TypeError, ValueError):
+                values = [None] * len(SAMPLE_COLUMN_NAMES)
+            for name in fields:
+                point[name] = values[_SAMPLE_COLUMN_INDEX[name]]
+        else:
+            for name in fields:
+                point[name] = row[name]
+        
+        return point
+    
+    def get_workout_data(self, workout_id: int) -> List[Dict[str, Any]]:
+        """
+        Get workout data points.
+        
+        Prefer iter_workout_data() for long workouts; this method keeps every
+        point in memory.
+        
+        Args:
+            workout_id: Workout ID
+            
+        Returns:
+            List of workout data dictionaries
+        """
+        data_points = list(self.iter_workout_data(workout_id))
+        logger.info(f"Retrieved {len(data_points)} data points for workout {workout_id}")
+        return data_points
+    
+    def iter_workout_data_optimized(self, workout_id: int,
+                                    chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Stream workout data points with the structure used for FIT conversion.
+        
+        Args:
+            workout_id: Workout ID
+            chunk_size: Number of rows fetched per round trip
+            
+        Returns:
+            Iterator over workout data dictionaries with optimized structure
+        """
+        for point in self.iter_workout_data(workout_id, fields=_FIT_FIELDS, chunk_size=chunk_size):
+            power, cadence, speed = point['power'], point['cadence'], point['speed']
+            heart_rate, distance, stroke_rate = point['heart_rate'], point['distance'], point['stroke_rate']
+            
+            # Create data point with exact structure needed for FIT conversion
+            yield {
+                'timestamp': point['timestamp'],
+                'instantaneous_power': int(power) if power is not None else 0,
+                'heart_rate': int(heart_rate) if heart_rate is not None else 0,
+                'total_distance': float(distance) if distance is not None else 0,
+                'instantaneous_cadence': int(cadence) if cadence is not None else 0,
+                'instantaneous_speed': float(speed) if speed is not None else 0,
+                'stroke_rate': int(stroke_rate) if stroke_rate is not None else 0
+            }
+    
+    def get_workout_data_optimized(self, workout_id: int) -> List[Dict[str, Any]]:
+        """
+        Get workout data points optimized for FIT conversion.
+        
+        This method reads the typed metric columns directly and returns the
+        exact fields needed for FIT conversion. Only samples that have not been
+        migrated yet fall back to parsing their JSON blob.
+        
+        Args:
+            workout_id: Workout ID
+            
+        Returns:
+            List of workout data dictionaries with optimized structure
+        """
+        return list(self.iter_workout_data_optimized(workout_id))
+    
+    def _row_to_sample(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """
+        Build a sample dictionary from a workout_data row.
+        
+        Args:
+            row: Row with the typed columns, field_flags, extras and data
+            
+        Returns:
+            Workout sample dictionary
+        """
+        if row['data'] is not None:
+            return json.loads(row['data'])
+        values = [row[name] for name in SAMPLE_COLUMN_NAMES]
+        return merge_sample(values, row['field_flags'], row['extras'])
+    
+    def get_workouts(self, limit: int = 10, offset: int = 0, sort_by: str = 'start_time',
+                     descending: bool = True) -> List[Dict[str, Any]]:
+        """
+        Get recent workouts.
+        
+        Args:
+            limit: Maximum number of workouts to return
+            offset: Offset for pagination
+            sort_by: Column to sort by (one of WORKOUT_SORT_COLUMNS)
+            descending: Sort from the highest value down
+            
+        Returns:
+            List of workout dictionaries
+            
+        Raises:
+            ValueError: If sort_by is not a sortable column
+        """
+        if sort_by not in WORKOUT_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort workouts by '{sort_by}'")
+        direction = 'DESC' if descending else 'ASC'
+        
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            # Use LEFT JOIN instead of INNER JOIN to include workouts with missing device data
+            cursor.execute(
+                f"""
+                SELECT w.*, d.name as device_name, d.device_type 
+                FROM workouts w
+                LEFT JOIN devices d ON w.device_id = d.id
+                ORDER BY w.{sort_by} {direction}
+                LIMIT ? OFFSET ?
+                """,
+                (limit, offset)
+            )
+            workouts = [self._workout_row_to_dict(row) for row in cursor.fetchall()]
+            
+            # Log what we found
+            logger.info(f"Retrieved {len(workouts)} workouts from database")
+            
+            return workouts
+        except sqlite3.Error as e:
+            logger.error(f"Error getting workouts: {str(e)}")
+            return []
+    
+    def search_workouts(self, workout_type: Optional[str] = None, device_id: Optional[int] = None,
+                        start_after: Optional[Union[str, datetime]] = None,
+                        start_before: Optional[Union[str, datetime]] = None,
+                        min_duration: Optional[float] = None, min_distance: Optional[float] = None,
+                        limit: int = SEARCH_PAGE_SIZE,
+                        page_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Search workouts, newest first, one page at a time.
+        
+        All filters are evaluated in SQL. Pages are addressed by keyset
+        (start_time, id) instead of an offset, so every page costs the same
+        no matter how deep it is, and pages stay stable while new workouts
+        are added.
+        
+        Args:
+            workout_type: Only workouts of this type ('bike' or 'rower')
+            device_id: Only workouts recorded with this device
+            start_after: Only workouts starting at or after this time
+            start_before: Only workouts starting at or before this time
+            min_duration: Minimum duration in seconds
+            min_distance: Minimum total distance (same units as the summary)
+            limit: Page size (capped at MAX_SEARCH_PAGE_SIZE)
+            page_token: Token returned with the previous page
+            
+        Returns:
+            Tuple of (workout dictionaries, token for the next page or None
+            if this is the last page)
+            
+        Raises:
+            ValueError: If a date or the page token is invalid
+        """
+        limit = max(1, min(int(limit), MAX_SEARCH_PAGE_SIZE))
+        
+        conditions = []
+        params: List[Any] = []
+        if workout_type is not None:
+            conditions.append("w.workout_type = ?")
+            params.append(workout_type)
+        if device_id is not None:
+            conditions.append("w.device_id = ?")
+            params.append(device_id)
+        if start_after is not None:
+            conditions.append("w.start_time >= ?")
+            params.append(self._normalize_time(start_after))
+        if start_before is not None:
+            conditions.append("w.start_time <= ?")
+            params.append(self._normalize_time(start_before))
+        if min_duration is not None:
+            conditions.append("w.duration >= ?")
+            params.append(min_duration)
+        if min_distance is not None:
+            conditions.append("w.total_distance >= ?")
+            params.append(min_distance)
+        if page_token:
+            last_start_time, last_id = self._decode_page_token(page_token)
+            conditions.append("(w.start_time < ? OR (w.start_time = ? AND w.id < ?))")
+            params.extend([last_start_time, last_start_time, last_id])
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        try:
+            cursor = self._get_cursor()
+            # One extra row tells whether another page follows
+            cursor.execute(
+                f"""
+                SELECT w.*, d.name as device_name, d.device_type
+                FROM workouts w
+                LEFT JOIN devices d ON w.device_id = d.id
+                {where}
+                ORDER BY w.start_time DESC, w.id DESC
+                LIMIT ?
+                """,
+                (*params, limit + 1)
+            )
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error searching workouts: {str(e)}")
+            return [], None
+        
+        next_page_token = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_page_token = self._encode_page_token(rows[-1]['start_time'], rows[-1]['id'])
+        
+        return [self._workout_row_to_dict(row) for row in rows], next_page_token
+    
+    def iter_workouts(self, page_size: int = MAX_SEARCH_PAGE_SIZE, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over every workout matching the search filters, newest first.
+        
+        Args:
+            page_size: Number of workouts fetched per query
+            **filters: Filters accepted by search_workouts()
+            
+        Returns:
+            Iterator over workout dictionaries
+        """
+        page_token = None
+        while True:
+            workouts, page_token = self.search_workouts(limit=page_size, page_token=page_token, **filters)
+            yield from workouts
+            if not page_token:
+                return
+    
+    def _normalize_time(self, value: Union[str, datetime]) -> str:
+        """Convert a filter time to the ISO format start_time is stored in."""
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return value.isoformat()
+    
+    def _encode_page_token(self, start_time: str, workout_id: int) -> str:
+        """Encode the keyset of the last workout on a page."""
+        payload = json.dumps([start_time, workout_id]).encode('utf-8')
+        return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+    
+    def _decode_page_token(self, page_token: str) -> Tuple[str, int]:
+        """
+        Decode a page token.
+        
+        Raises:
+            ValueError: If the token is malformed
+        """
+        try:
+            padded = page_token + '=' * (-len(page_token) % 4)
+            start_time, workout_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if not isinstance(start_time, str) or not isinstance(workout_id, int):
+                raise ValueError
+            return start_time, workout_id
+        except (ValueError, TypeError, UnicodeError):
+            raise ValueError("Invalid page token")
+    
+    def _workout_row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """
+        Build a workout list entry from a workouts row joined with its device.
+        
+        Args:
+            row: Row with the workouts columns, device_name and device_type
+            
+        Returns:
+            Workout dictionary with the summary parsed
+        """
+        workout = dict(row)
+        # Make sure none of the key values are None to avoid JSON parsing errors
+        if workout['summary'] is not None:
+            workout['summary'] = json.loads(workout['summary'])
+        else:
+            workout['summary'] = {}
+        
+        # Add default device info if missing
+        if workout.get('device_name') is None:
+            workout['device_name'] = 'Unknown Device'
+        if workout.get('device_type') is None:
+            workout['device_type'] = 'unknown'
+        
+        return workout
+    
+    def get_workouts_without_fit_files(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get workouts that don't have associated FIT files.
+        
+        Args:
+            limit: Maximum number of workouts to return (None for all)
+            
+        Returns:
+            List of workout dictionaries
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            query = """
+            SELECT w.*, d.name as device_name, d.device_type 
+            FROM workouts w
+            LEFT JOIN devices d ON w.device_id = d.id
+            WHERE (w.fit_file_path IS NULL OR w.fit_file_path = '')
+            AND w.end_time IS NOT NULL
+            ORDER BY w.start_time DESC
+            """
+            
+            if limit is not None:
+                query += f" LIMIT {int(limit)}"
+            
+            cursor.execute(query)
+            
+            return [self._workout_row_to_dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error getting workouts without FIT files: {str(e)}")
+            return []
+    
+    def get_finished_workout_ids(self, only_missing_fit: bool = False,
+                                 limit: Optional[int] = None) -> List[int]:
+        """
+        Get the IDs of finished workouts, newest first.
+        
+        Args:
+            only_missing_fit: Only workouts without a FIT file
+            limit: Maximum number of IDs to return (None for all)
+            
+        Returns:
+            List of workout IDs
+        """
+        query = "SELECT id FROM workouts WHERE end_time IS NOT NULL"
+        if only_missing_fit:
+            query += " AND (fit_file_path IS NULL OR fit_file_path = '')"
+        query += " ORDER BY start_time DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        
+        try:
+            cursor = self._get_cursor()
+            cursor.execute(query)
+            return [row['id'] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error getting finished workout IDs: {str(e)}")
+            return []
+    
+    def update_workout_fit_path(self, workout_id: int, fit_file_path: str) -> bool:
+        """
+        Update the FIT file path for a workout.
+        
+        Args:
+            workout_id: Workout ID
+            fit_file_path: Path to the FIT file
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "UPDATE workouts SET fit_file_path = ? WHERE id = ?",
+                (fit_file_path, workout_id)
+            )
+            
+            conn.commit()
+            logger.info(f"Updated FIT file path for workout {workout_id}: {fit_file_path}")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error updating workout FIT file path: {str(e)}")
+            conn.rollback()
+            return False
+    
+    def get_fit_cache_entry(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the FIT file recorded for a conversion.
+        
+        Args:
+            cache_key: Hash of the conversion inputs
+            
+        Returns:
+            Dictionary with workout_id, fit_file_path, file_size, checksum
+            and created_at, or None if not found
+        """
+        try:
+            cursor = self._get_cursor()
+            cursor.execute("SELECT * FROM fit_cache WHERE cache_key = ?", (cache_key,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error getting FIT cache entry: {str(e)}")
+            return None
+    
+    def put_fit_cache_entry(self, cache_key: str, workout_id: int, fit_file_path: str, file_size: int,
+                            checksum: str) -> bool:
+        """
+        Record the FIT file of a conversion.
+        
+        Entries of older conversions of the workout, or of other conversions
+        written to the same path, are removed: their file has been replaced.
+        
+        Args:
+            cache_key: Hash of the conversion inputs
+            workout_id: Workout ID
+            fit_file_path: Path to the FIT file
+            file_size: Size of the FIT file in bytes
+            checksum: Hex SHA-256 of the FIT file
+            
+        Returns:
+            True if successful, False otherwise
         """
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
             
             cursor.execute(
-                "UPDATE workouts SET fit_file_path = ? WHERE id = ?",
-                (fit_file_path, workout_id)
+                "DELETE FROM fit_cache WHERE workout_id = ? OR fit_file_path = ?",
+                (workout_id, fit_file_path)
+            )
+            cursor.execute(
+                "INSERT OR REPLACE INTO fit_cache "
+                "(cache_key, workout_id, fit_file_path, file_size, checksum, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key, workout_id, fit_file_path, file_size, checksum, datetime.now().isoformat())
             )
             
             conn.commit()
-            logger.info(f"Updated FIT file path for workout {workout_id}: {fit_file_path}")
             return True
         except sqlite3.Error as e:
-            logger.error(f"Error updating workout FIT file path: {str(e)}")
+            logger.error(f"Error recording FIT cache entry of workout {workout_id}: {str(e)}")
+            conn.rollback()
+            return False
+    
+    def delete_fit_cache_entry(self, cache_key: str) -> bool:
+        """
+        Forget the FIT file recorded for a conversion.
+        
+        Args:
+            cache_key: Hash of the conversion inputs
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("DELETE FROM fit_cache WHERE cache_key = ?", (cache_key,))
+            
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting FIT cache entry: {str(e)}")
+            conn.rollback()
+            return False
+    
+    def put_fit_files(self, entries: List[Dict[str, Any]]) -> bool:
+        """
+        Add or update FIT file catalog entries.
+        
+        Args:
+            entries: Dictionaries with the FIT_FILE_COLUMNS (only path,
+                directory, filename, size and modified are required)
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not entries:
+            return True
+        cataloged_at = datetime.now().isoformat()
+        rows = [
+            tuple(entry.get(column) for column in FIT_FILE_COLUMNS) + (cataloged_at,)
+            for entry in entries
+        ]
+        # A file found without its workout keeps the workout it was cataloged with
+        updates = ', '.join(
+            f"{column} = COALESCE(excluded.{column}, {column})" if column == 'workout_id'
+            else f"{column} = excluded.{column}"
+            for column in FIT_FILE_COLUMNS[1:] + ['cataloged_at']
+        )
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            # An upsert (not INSERT OR REPLACE) so the storage total triggers
+            # see an update instead of an unreported delete
+            cursor.executemany(
+                f"INSERT INTO fit_files ({', '.join(FIT_FILE_COLUMNS)}, cataloged_at) "
+                f"VALUES ({', '.join('?' * (len(FIT_FILE_COLUMNS) + 1))}) "
+                f"ON CONFLICT (path) DO UPDATE SET {updates}",
+                rows
+            )
+            
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error cataloging FIT files: {str(e)}")
+            conn.rollback()
+            return False
+    
+    def delete_fit_files(self, paths: List[str]) -> bool:
+        """
+        Remove FIT files from the catalog.
+        
+        Args:
+            paths: Absolute FIT file paths
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not paths:
+            return True
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.executemany("DELETE FROM fit_files WHERE path = ?", [(path,) for path in paths])
+            
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error removing FIT files from the catalog: {str(e)}")
+            conn.rollback()
+            return False
+    
+    def get_fit_file(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the catalog entry of a FIT file.
+        
+        Args:
+            path: Absolute FIT file path
+            
+        Returns:
+            Catalog entry dictionary or None if not cataloged
+        """
+        try:
+            cursor = self._get_cursor()
+            cursor.execute("SELECT * FROM fit_files WHERE path = ?", (path,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error getting FIT file catalog entry: {str(e)}")
+            return None
+    
+    def get_fit_file_stats(self, directory: str) -> Dict[str, Tuple[int, float]]:
+        """
+        Get the recorded size and modification time of the cataloged files
+        of a directory.
+        
+        Args:
+            directory: Absolute directory path
+            
+        Returns:
+            Dictionary of path to (size, modified)
+        """
+        try:
+            cursor = self._get_cursor()
+            cursor.execute("SELECT path, size, modified FROM fit_files WHERE directory = ?", (directory,))
+            return {row['path']: (row['size'], row['modified']) for row in cursor.fetchall()}
+        except sqlite3.Error as e:
+            logger.error(f"Error getting FIT file catalog of {directory}: {str(e)}")
+            return {}
+    
+    def list_fit_files(self, limit: int = SEARCH_PAGE_SIZE,
+                       page_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List cataloged FIT files, newest first, one page at a time.
+        
+        Pages are addressed by keyset (modified, path) on an index, so a page
+        costs the same however many files there are.
+        
+        Args:
+            limit: Page size (capped at MAX_SEARCH_PAGE_SIZE)
+            page_token: Token returned with the previous page
+            
+        Returns:
+            Tuple of (catalog entries, token for the next page or None if
+            this is the last page)
+            
+        Raises:
+            ValueError: If the page token is invalid
+        """
+        limit = max(1, min(int(limit), MAX_SEARCH_PAGE_SIZE))
+        where = ""
+        params: List[Any] = []
+        if page_token:
+            # A row value comparison is a range seek on the (modified, path) index
+            where = "WHERE (modified, path) < (?, ?)"
+            params = list(self._decode_fit_page_token(page_token))
+        
+        try:
+            cursor = self._get_cursor()
+            # One extra row tells whether another page follows
+            cursor.execute(
+                f"SELECT * FROM fit_files {where} ORDER BY modified DESC, path DESC LIMIT ?",
+                (*params, limit + 1)
+            )
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error listing FIT files: {str(e)}")
+            return [], None
+        
+        next_page_token = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_page_token = self._encode_fit_page_token(rows[-1]['modified'], rows[-1]['path'])
+        
+        return [dict(row) for row in rows], next_page_token
+    
+    def _encode_fit_page_token(self, modified: float, path: str) -> str:
+        """Encode the keyset of the last FIT file on a page."""
+        payload = json.dumps([modified, path]).encode('utf-8')
+        return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+    
+    def _decode_fit_page_token(self, page_token: str) -> Tuple[float, str]:
+        """
+        Decode a FIT file list page token.
+        
+        Raises:
+            ValueError: If the token is malformed
+        """
+        try:
+            padded = page_token + '=' * (-len(page_token) % 4)
+            modified, path = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if not isinstance(modified, (int, float)) or not isinstance(path, str):
+                raise ValueError
+            return modified, path
+        except (ValueError, TypeError, UnicodeError):
+            raise ValueError("Invalid page token")
+    
+    def get_storage_totals(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the running storage totals.
+        
+        Returns:
+            Dictionary of name ('fit_files', 'workouts') to item_count and
+            total_bytes (empty on error)
+        """
+        try:
+            cursor = self._get_cursor()
+            cursor.execute("SELECT name, item_count, total_bytes FROM storage_totals")
+            return {row['name']: {'item_count': row['item_count'], 'total_bytes': row['total_bytes']}
+                    for row in cursor.fetchall()}
+        except sqlite3.Error as e:
+            logger.error(f"Error getting storage totals: {str(e)}")
+            return {}
+    
+    def get_workout_ids_by_fit_path(self) -> Dict[str, int]:
+        """
+        Get the workout each recorded FIT file path belongs to.
+        
+        Returns:
+            Dictionary of FIT file path to workout ID
+        """
+        try:
+            cursor = self._get_cursor()
+            cursor.execute("SELECT id, fit_file_path FROM workouts WHERE fit_file_path IS NOT NULL")
+            return {row['fit_file_path']: row['id'] for row in cursor.fetchall()}
+        except sqlite3.Error as e:
+            logger.error(f"Error getting workout FIT file paths: {str(e)}")
+            return {}
+    
+    def create_job(self, kind: str, workout_id: Optional[int] = None,
+                   params: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """
+        Queue a background job.
+        
+        Args:
+            kind: Job kind (selects the handler that runs it)
+            workout_id: Workout the job works on, if any
+            params: JSON-serializable job parameters
+            
+        Returns:
+            Job ID or None on error
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "INSERT INTO jobs (kind, workout_id, params, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (kind, workout_id, json.dumps(params or {}), datetime.now().isoformat())
+            )
+            
+            conn.commit()
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            logger.error(f"Error creating {kind} job: {str(e)}")
+            conn.rollback()
+            return None
+    
+    def claim_next_job(self, kinds: List[str], worker_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Mark the oldest queued job of the given kinds as running.
+        
+        The status check in the UPDATE makes the claim atomic, so a job is
+        handed to exactly one worker.
+        
+        Args:
+            kinds: Job kinds the caller can run
+            worker_id: Identifier of the claiming worker, recorded with a
+                first heartbeat
+            
+        Returns:
+            Claimed job dictionary or None if no job is queued
+        """
+        if not kinds:
+            return None
+        placeholders = ', '.join('?' for _ in kinds)
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            while True:
+                cursor.execute(
+                    f"SELECT id FROM jobs WHERE status = 'queued' AND kind IN ({placeholders}) ORDER BY id LIMIT 1",
+                    kinds
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                cursor.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                    "worker_id = ?, heartbeat_at = ? WHERE id = ? AND status = 'queued'",
+                    (datetime.now().isoformat(), worker_id, time.time(), row['id'])
+                )
+                conn.commit()
+                if cursor.rowcount:
+                    return self.get_job(row['id'])
+        except sqlite3.Error as e:
+            logger.error(f"Error claiming job: {str(e)}")
+            conn.rollback()
+            return None
+    
+    def update_job_progress(self, job_id: int, worker_id: Optional[str], progress: float,
+                            message: Optional[str] = None) -> bool:
+        """
+        Record the progress of a running job.
+        
+        Only the worker running the job can update it, so a worker whose job
+        was requeued and claimed by another can't overwrite its progress.
+        
+        Args:
+            job_id: Job ID
+            worker_id: Identifier of the worker that claimed the job
+            progress: Fraction done, 0.0 to 1.0
+            message: Short description of the current step
+            
+        Returns:
+            True if the job is still running under worker_id and was updated,
+            False otherwise
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "UPDATE jobs SET progress = ?, message = ? WHERE id = ? AND status = 'running' AND worker_id IS ?",
+                (max(0.0, min(1.0, progress)), message, job_id, worker_id)
+            )
+            updated = cursor.rowcount == 1
+            
+            conn.commit()
+            return updated
+        except sqlite3.Error as e:
+            logger.error(f"Error updating progress of job {job_id}: {str(e)}")
+            conn.rollback()
+            return False
+    
+    def finish_job(self, job_id: int, worker_id: Optional[str], result: Optional[Dict[str, Any]] = None,
+                   error: Optional[str] = None) -> bool:
+        """
+        Mark a job as succeeded, or as failed when an error is given.
+        
+        Only the worker running the job can finish it.
+        
+        Args:
+            job_id: Job ID
+            worker_id: Identifier of the worker that claimed the job
+            result: JSON-serializable job result
+            error: Error message of a failed job
+            
+        Returns:
+            True if the job was still running under worker_id and is now
+            finished, False otherwise
+        """
+        status = 'failed' if error else 'succeeded'
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "UPDATE jobs SET status = ?, progress = CASE WHEN ? THEN progress ELSE 1.0 END, "
+                "result = ?, error = ?, finished_at = ? WHERE id = ? AND status = 'running' AND worker_id IS ?",
+                (status, bool(error), json.dumps(result, default=str) if result is not None else None, error,
+                 datetime.now().isoformat(), job_id, worker_id)
+            )
+            updated = cursor.rowcount == 1
+            
+            conn.commit()
+            return updated
+        except sqlite3.Error as e:
+            logger.error(f"Error finishing job {job_id}: {str(e)}")
+            conn.rollback()
+            return False
+    
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get a job.
+        
+        Args:
+            job_id: Job ID
+            
+        Returns:
+            Job dictionary (params and result decoded) or None if not found
+        """
+        try:
+            cursor = self._get_cursor()
+            cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            return self._job_row_to_dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error getting job {job_id}: {str(e)}")
+            return None
+    
+    def get_pending_job(self, kind: str, workout_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the queued or running job of a kind for a workout.
+        
+        Args:
+            kind: Job kind
+            workout_id: Workout ID (None for jobs not tied to a workout)
+            
+        Returns:
+            Job dictionary or None if there is no unfinished job
+        """
+        try:
+            cursor = self._get_cursor()
+            cursor.execute(
+                "SELECT * FROM jobs WHERE workout_id IS ? AND kind = ? AND status IN ('queued', 'running') "
+                "ORDER BY id DESC LIMIT 1",
+                (workout_id, kind)
+            )
+            row = cursor.fetchone()
+            return self._job_row_to_dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error getting pending {kind} job of workout {workout_id}: {str(e)}")
+            return None
+    
+    def heartbeat_jobs(self, worker_id: str) -> bool:
+        """
+        Record that a worker's running jobs are still being worked on.
+        
+        Args:
+            worker_id: Identifier of the worker
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND worker_id = ?",
+                (time.time(), worker_id)
+            )
+            
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error recording heartbeat of worker {worker_id}: {str(e)}")
             conn.rollback()
             return False
     
+    def requeue_interrupted_jobs(self, is_abandoned: Callable[[Dict[str, Any]], bool]) -> int:
+        """
+        Queue again the running jobs whose worker has gone away.
+        
+        A job is only queued again if it is still running under the worker
+        and heartbeat it was judged by, so a job that a live worker touched
+        in the meantime is left alone.
+        
+        Args:
+            is_abandoned: Called with each running job; returns True if its
+                worker is gone
+            
+        Returns:
+            Number of jobs queued again
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT * FROM jobs WHERE status = 'running'")
+            abandoned = [row for row in cursor.fetchall() if is_abandoned(dict(row))]
+            requeued = 0
+            for row in abandoned:
+                cursor.execute(
+                    "UPDATE jobs SET status = 'queued', progress = 0, message = NULL, worker_id = NULL, "
+                    "heartbeat_at = NULL WHERE id = ? AND status = 'running' "
+                    "AND worker_id IS ? AND heartbeat_at IS ?",
+                    (row['id'], row['worker_id'], row['heartbeat_at'])
+                )
+                requeued += cursor.rowcount
+            
+            conn.commit()
+            return requeued
+        except sqlite3.Error as e:
+            logger.error(f"Error re-queuing interrupted jobs: {str(e)}")
+            conn.rollback()
+            return 0
+    
+    def _job_row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Convert a jobs row to a dictionary with decoded params and result."""
+        job = dict(row)
+        job['params'] = json.loads(job['params']) if job['params'] else {}
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+    
     def set_config(self, key: str, value: Any) -> bool:
         """
         Set a configuration value.
@@ -884,6 +2560,9 @@ class Database:
         Returns:
             True if successful, False otherwise
         """
+        # Don't let queued samples land after the workout is gone
+        self._flush_workout(workout_id)
+        
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
@@ -891,8 +2570,15 @@ class Database:
             # Start a transaction
             conn.execute("BEGIN TRANSACTION")
             
-            # First delete all workout data points
+            # First delete all workout data points, archived or not
             cursor.execute("DELETE FROM workout_data WHERE workout_id = ?", (workout_id,))
+            cursor.execute("DELETE FROM workout_archive WHERE workout_id = ?", (workout_id,))
+            cursor.execute("DELETE FROM workout_archive_blocks WHERE workout_id = ?", (workout_id,))
+            cursor.execute("DELETE FROM workout_rollups WHERE workout_id = ?", (workout_id,))
+            cursor.execute("DELETE FROM fit_cache WHERE workout_id = ?", (workout_id,))
+            cursor.execute("DELETE FROM workout_data_versions WHERE workout_id = ?", (workout_id,))
+            # The file itself stays cataloged until it is deleted
+            cursor.execute("UPDATE fit_files SET workout_id = NULL WHERE workout_id = ?", (workout_id,))
             logger.info(f"Deleted all data points for workout {workout_id}")
             
             # Then delete the workout record
@@ -908,6 +2594,8 @@ class Database:
             
             # Commit the transaction
             conn.commit()
+            with self._rollup_lock:
+                self._pop_rollup_builder(workout_id)
             return True
             
         except sqlite3.Error as e:
@@ -918,6 +2606,8 @@ class Database:
     def close(self):
         """Close all database connections."""
         try:
+            if self.ingest_writer:
+                self.ingest_writer.stop()
             self.connections.close_connection()
             logger.debug("Closed all database connections")
         except Exception as e:
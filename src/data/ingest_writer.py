@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Ingest Writer Module for Rogue to Garmin Bridge
+
+This module provides a write-behind writer for workout samples. Samples are
+queued by the BLE/HTTP callback threads and persisted by a dedicated writer
+thread in group commits (one transaction per batch), instead of paying a
+full commit for every sample. A batch that fails to commit is retried with
+backoff and then written sample by sample; samples that still fail stay
+queued, are retried on the latency timer, and flush() reports them until
+they are written.
+"""
+
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('ingest_writer')
+
+# Default flush triggers
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_LATENCY_MS = 1000
+DEFAULT_MAX_QUEUE_SIZE = 10000
+
+# How long a producer waits for queue space before writing synchronously
+ENQUEUE_TIMEOUT_SECONDS = 0.5
+
+# Attempts at committing a batch before it is written sample by sample, and
+# the delay before the first retry (doubled for each further retry)
+WRITE_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 0.05
+
+# Minimum delay before samples that failed to write are retried without
+# waiting for new samples
+RETRY_INTERVAL_SECONDS = 1.0
+
+
+class _FlushRequest:
+    """Queue marker asking the writer thread to commit everything queued before it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.success = True
+
+
+class IngestWriter:
+    """
+    Write-behind writer that drains a bounded queue of workout samples and
+    persists them with executemany in one transaction per batch.
+
+    A batch is committed when it reaches ``batch_size`` samples, when the oldest
+    queued sample is ``max_latency_ms`` old, or when ``flush()`` is called.
+    """
+
+    def __init__(self, database, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_latency_ms: int = DEFAULT_MAX_LATENCY_MS,
+                 max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE):
+        """
+        Initialize the ingest writer.
+
+        Args:
+            database: Database instance providing add_workout_data_batch()
+            batch_size: Number of samples that triggers a commit
+            max_latency_ms: Maximum time a sample may wait in the queue
+            max_queue_size: Capacity of the bounded sample queue
+        """
+        self.database = database
+        self.batch_size = max(1, int(batch_size))
+        self.max_latency = max(0, int(max_latency_ms)) / 1000.0
+        self.queue = queue.Queue(maxsize=max(1, int(max_queue_size)))
+
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._running = False
+
+        # Samples that failed to write, retried ahead of the next batch (at
+        # most max_queue_size are kept), and samples dropped since the last
+        # flush; both are only touched by the writer thread
+        self._failed_rows: List[Tuple[int, datetime, Dict[str, Any]]] = []
+        self._dropped_since_flush = 0
+
+        # Samples queued but not yet written or dropped, per workout, so a
+        # read only has to flush when its workout has some
+        self._pending_lock = threading.Lock()
+        self._pending: Dict[int, int] = {}
+
+        # Statistics, updated from the producer and writer threads
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'samples_queued': 0,
+            'samples_written': 0,
+            'samples_failed': 0,
+            'batches_written': 0,
+            'batch_retries': 0,
+            'synchronous_fallbacks': 0
+        }
+
+    def start(self) -> None:
+        """Start the writer thread if it is not already running."""
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+            self._thread.start()
+            logger.info(f"Ingest writer started (batch_size={self.batch_size}, "
+                        f"max_latency_ms={int(self.max_latency * 1000)})")
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the writer thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, workout_id: int, timestamp: datetime, data: Dict[str, Any]) -> bool:
+        """
+        Queue a sample for writing.
+
+        Args:
+            workout_id: Workout ID
+            timestamp: Data timestamp (absolute datetime object)
+            data: Workout data
+
+        Returns:
+            True if the sample was queued (or written synchronously), False otherwise
+        """
+        if not self.is_running:
+            self.start()
+
+        # Shallow copy so later mutations by the caller don't leak into the batch
+        row = (workout_id, timestamp, dict(data))
+        # Counted before queuing, so the writer can't settle it first
+        self._add_pending(workout_id, 1)
+        try:
+            self.queue.put(row, timeout=ENQUEUE_TIMEOUT_SECONDS)
+            self._count('samples_queued')
+            return True
+        except queue.Full:
+            self._add_pending(workout_id, -1)
+            # Never drop samples: fall back to a direct write on the caller's thread
+            logger.warning("Ingest queue full, writing sample synchronously")
+            self._count('synchronous_fallbacks')
+            return self.database.add_workout_data_batch([row])
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Commit every sample queued before this call.
+
+        Args:
+            timeout: Maximum time to wait in seconds (None waits indefinitely)
+
+        Returns:
+            True if all queued samples were written, False otherwise (samples
+            that failed to write stay queued and are retried)
+        """
+        if not self.is_running:
+            return self.queue.empty() and not self._failed_rows
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        request = _FlushRequest()
+        try:
+            self.queue.put(request, timeout=timeout)
+        except queue.Full:
+            logger.warning("Timed out queuing ingest writer flush: queue full")
+            return False
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not request.done.wait(remaining):
+            logger.warning("Timed out waiting for ingest writer flush")
+            return False
+        return request.success
+
+    def has_pending(self, workout_id: int) -> bool:
+        """
+        Whether samples of a workout are queued or waiting to be retried.
+
+        Args:
+            workout_id: Workout ID
+
+        Returns:
+            True if some of the workout's samples are not written yet
+        """
+        with self._pending_lock:
+            return workout_id in self._pending
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Flush pending samples and stop the writer thread.
+
+        Args:
+            timeout: Maximum time to wait for the final flush in seconds
+        """
+        if not self.is_running:
+            return
+        self.flush(timeout)
+        self._running = False
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            # The writer sees _running cleared after its next item
+            pass
+        self._thread.join(timeout)
+        logger.info("Ingest writer stopped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get writer statistics.
+
+        Returns:
+            Dictionary of counters plus the current queue depth and the
+            number of failed samples waiting to be retried
+        """
+        with self._stats_lock:
+            stats = self.stats.copy()
+        stats['queue_depth'] = self.queue.qsize()
+        stats['samples_pending_retry'] = len(self._failed_rows)
+        return stats
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        """Add to a statistics counter."""
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def _add_pending(self, workout_id: int, amount: int) -> None:
+        """Adjust the number of unwritten samples of a workout."""
+        with self._pending_lock:
+            count = self._pending.get(workout_id, 0) + amount
+            if count > 0:
+                self._pending[workout_id] = count
+            else:
+                self._pending.pop(workout_id, None)
+
+    def _settle(self, rows: List[Tuple[int, datetime, Dict[str, Any]]]) -> None:
+        """Stop counting samples that were written or dropped as pending."""
+        counts: Dict[int, int] = {}
+        for row in rows:
+            counts[row[0]] = counts.get(row[0], 0) + 1
+        for workout_id, count in counts.items():
+            self._add_pending(workout_id, -count)
+
+    def _run(self) -> None:
+        """Writer thread main loop."""
+        batch: List[Tuple[int, datetime, Dict[str, Any]]] = []
+        deadline = None
+
+        while self._running:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None if deadline is None else 'latency'
+
+            if isinstance(item, _FlushRequest):
+                item.success = self._write_batch(batch) and not self._dropped_since_flush
+                self._dropped_since_flush = 0
+                batch = []
+                deadline = None
+                if self._failed_rows:
+                    deadline = time.monotonic() + max(self.max_latency, RETRY_INTERVAL_SECONDS)
+                item.done.set()
+                continue
+
+            if isinstance(item, tuple):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_latency
+
+            if (batch or self._failed_rows) and (len(batch) >= self.batch_size or item == 'latency'
+                                                 or time.monotonic() >= deadline):
+                self._write_batch(batch)
+                batch = []
+                deadline = None
+
+            # Retry samples that failed to write on the timer, so they don't
+            # wait for the next sample or flush
+            if self._failed_rows and deadline is None:
+                deadline = time.monotonic() + max(self.max_latency, RETRY_INTERVAL_SECONDS)
+
+        # Write anything left over when stopping
+        if not self._write_batch(batch):
+            logger.error(f"Stopping with {len(self._failed_rows)} samples that could not be written")
+
+    def _write_batch(self, batch: List[Tuple[int, datetime, Dict[str, Any]]]) -> bool:
+        """
+        Persist a batch, along with earlier samples that failed, in a single
+        transaction.
+
+        A failed commit is retried with backoff, then the samples are written
+        one by one. Samples that still fail are kept for the next batch;
+        unserializable samples are dropped.
+
+        Args:
+            batch: List of (workout_id, timestamp, data) tuples
+
+        Returns:
+            True if every sample was written, False otherwise
+        """
+        batch = self._failed_rows + batch
+        self._failed_rows = []
+        if not batch:
+            return True
+
+        delay = RETRY_BACKOFF_SECONDS
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                if self.database.add_workout_data_batch(batch):
+                    self._settle(batch)
+                    self._count('samples_written', len(batch))
+                    self._count('batches_written')
+                    logger.debug(f"Committed batch of {len(batch)} samples")
+                    return True
+            except (TypeError, ValueError) as e:
+                # A sample that can't be serialized must not sink the whole batch
+                logger.error(f"Unserializable sample in batch, writing samples individually: {str(e)}")
+                break
+            if attempt < WRITE_ATTEMPTS:
+                logger.warning(f"Failed to commit batch of {len(batch)} samples, retrying in {delay:.2f}s")
+                self._count('batch_retries')
+                time.sleep(delay)
+                delay *= 2
+
+        return self._write_rows(batch)
+
+    def _write_rows(self, rows: List[Tuple[int, datetime, Dict[str, Any]]]) -> bool:
+        """
+        Persist samples one transaction each, keeping those that fail.
+
+        Args:
+            rows: List of (workout_id, timestamp, data) tuples
+
+        Returns:
+            True if every sample was written, False otherwise
+        """
+        written = 0
+        failed = []
+        for row in rows:
+            try:
+                if self.database.add_workout_data_batch([row]):
+                    written += 1
+                    self._settle([row])
+                    continue
+            except (TypeError, ValueError) as e:
+                logger.error(f"Dropping unserializable sample of workout {row[0]}: {str(e)}")
+                self._count('samples_failed')
+                self._dropped_since_flush += 1
+                self._settle([row])
+                continue
+            failed.append(row)
+
+        if written:
+            self._count('samples_written', written)
+            self._count('batches_written')
+        if failed:
+            overflow = len(failed) - self.queue.maxsize
+            if overflow > 0:
+                logger.error(f"Dropping {overflow} samples that repeatedly failed to write")
+                self._count('samples_failed', overflow)
+                self._dropped_since_flush += overflow
+                self._settle(failed[:overflow])
+                failed = failed[overflow:]
+            logger.error(f"Failed to write {len(failed)} samples, keeping them for the next batch")
+            self._failed_rows = failed
+        return written == len(rows)
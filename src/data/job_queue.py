@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Job Queue Module for Rogue to Garmin Bridge
+
+This module runs slow work such as FIT file generation in background worker
+threads instead of inside HTTP requests. Jobs are rows in the jobs table, so
+they survive a restart. Each queue claims jobs under its own worker ID and
+keeps a heartbeat on them while they run; a running job is queued again only
+once its worker is gone (its process on this host has exited, or its
+heartbeat is stale), so several processes can share the jobs table. Handlers
+report progress as they go, and registered callbacks are told when a job
+makes progress, succeeds or fails.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('job_queue')
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# Job events passed to callbacks
+JOB_PROGRESS = 'job_progress'
+JOB_COMPLETED = 'job_completed'
+JOB_FAILED_EVENT = 'job_failed'
+
+# Job kinds
+FIT_JOB = 'fit_file'
+FIT_REGENERATION_JOB = 'fit_regeneration'
+ARCHIVE_JOB = 'workout_archive'
+FIT_AUDIT_JOB = 'fit_audit'
+
+DEFAULT_WORKERS = 1
+
+# Workers also look for queued jobs this often, in case a job was added by
+# another process
+POLL_INTERVAL_SECONDS = 5.0
+
+# Running jobs get a heartbeat this often; a job whose heartbeat is older than
+# JOB_STALE_SECONDS is taken to be abandoned and is queued again
+HEARTBEAT_INTERVAL_SECONDS = 10.0
+JOB_STALE_SECONDS = 60.0
+
+# Handler signature: handler(job, report) -> result, where report(progress,
+# message) records progress between 0.0 and 1.0
+JobHandler = Callable[[Dict[str, Any], Callable[[float, Optional[str]], None]], Optional[Dict[str, Any]]]
+
+
+def _new_worker_id() -> str:
+    """Worker ID of the current process: host, process ID and a random suffix."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _process_exists(pid: int) -> bool:
+    """Whether a process with the given ID is running on this host."""
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # EPERM: the process exists but belongs to another user
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    Persistent job queue drained by a small pool of worker threads.
+
+    Workers are started by start(), or on the first submit().
+    """
+
+    def __init__(self, database, workers: int = DEFAULT_WORKERS,
+                 stale_after: float = JOB_STALE_SECONDS):
+        """
+        Initialize the job queue.
+
+        Args:
+            database: Database instance providing the job methods
+            workers: Number of worker threads
+            stale_after: Seconds without a heartbeat after which another
+                worker's running job is queued again
+        """
+        self.database = database
+        self.workers = max(1, int(workers))
+        self.stale_after = stale_after
+        self.worker_id = _new_worker_id()
+        self.handlers: Dict[str, JobHandler] = {}
+        self.callbacks: List[Callable[[str, Dict[str, Any]], None]] = []
+
+        self._wake = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._stopped = threading.Event()
+        # Set when a job was queued since the workers last looked
+        self._pending = False
+
+    def register_handler(self, kind: str, handler: JobHandler) -> None:
+        """
+        Register the function that runs jobs of a kind.
+
+        Args:
+            kind: Job kind
+            handler: Called as handler(job, report); returns the job result
+                and raises to fail the job
+        """
+        self.handlers[kind] = handler
+
+    def register_callback(self, callback: Callable[[str, Dict[str, Any]], None]) -> None:
+        """
+        Register a callback for job events.
+
+        Args:
+            callback: Called as callback(event, job) for JOB_PROGRESS,
+                JOB_COMPLETED and JOB_FAILED_EVENT
+        """
+        self.callbacks.append(callback)
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the worker threads are running."""
+        return self._running
+
+    def start(self) -> None:
+        """Queue abandoned jobs again and start the worker and heartbeat threads."""
+        with self._wake:
+            if self._running:
+                return
+            self._running = True
+            self._stopped.clear()
+            # A forked process must not pass for its parent
+            self.worker_id = _new_worker_id()
+            self.requeue_abandoned_jobs()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            self._threads.append(threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True))
+            for thread in self._threads:
+                thread.start()
+            self._wake.notify_all()
+        logger.info(f"Job queue started with {self.workers} worker(s)")
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Stop the workers after their current job.
+
+        Args:
+            timeout: Maximum time to wait for each worker in seconds
+        """
+        with self._wake:
+            if not self._running:
+                return
+            self._running = False
+            self._stopped.set()
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        logger.info("Job queue stopped")
+
+    def submit(self, kind: str, workout_id: Optional[int] = None,
+               params: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """
+        Queue a job, reusing an unfinished job of the same kind for the same
+        workout (or of the same kind without a workout).
+
+        Args:
+            kind: Job kind (must have a registered handler)
+            workout_id: Workout the job works on, if any
+            params: JSON-serializable job parameters
+
+        Returns:
+            Job ID or None if the job could not be queued
+        """
+        if kind not in self.handlers:
+            logger.error(f"No handler registered for {kind} jobs")
+            return None
+
+        pending = self.database.get_pending_job(kind, workout_id)
+        if pending:
+            return pending['id']
+
+        job_id = self.database.create_job(kind, workout_id, params)
+        if job_id is None:
+            return None
+
+        if not self._running:
+            self.start()
+        with self._wake:
+            self._pending = True
+            self._wake.notify()
+        logger.info(f"Queued {kind} job {job_id}" + (f" for workout {workout_id}" if workout_id else ""))
+        return job_id
+
+    def requeue_abandoned_jobs(self) -> int:
+        """
+        Queue again the running jobs whose worker is gone.
+
+        Returns:
+            Number of jobs queued again
+        """
+        requeued = self.database.requeue_interrupted_jobs(self._is_abandoned)
+        if requeued:
+            logger.info(f"Re-queued {requeued} interrupted job(s)")
+            with self._wake:
+                self._pending = True
+                self._wake.notify_all()
+        return requeued
+
+    def _is_abandoned(self, job: Dict[str, Any]) -> bool:
+        """
+        Whether the worker of a running job is gone.
+
+        Jobs without an owner or heartbeat (claimed before owners were
+        recorded) count as abandoned, as do jobs of an exited process on this
+        host. Any other job of another worker is abandoned once its heartbeat
+        is stale.
+
+        Args:
+            job: Running job row
+
+        Returns:
+            True if the job should be queued again
+        """
+        worker_id = job.get('worker_id')
+        heartbeat_at = job.get('heartbeat_at')
+        if worker_id == self.worker_id:
+            return False
+        if not worker_id or heartbeat_at is None:
+            return True
+        host, _, rest = worker_id.partition(':')
+        pid = rest.partition(':')[0]
+        if host == socket.gethostname() and pid.isdigit() and not _process_exists(int(pid)):
+            return True
+        return time.time() - heartbeat_at > self.stale_after
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the state of a job.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            Job dictionary or None if not found
+        """
+        return self.database.get_job(job_id)
+
+    def wait(self, job_id: int, timeout: Optional[float] = None,
+             interval: float = 0.05) -> Optional[Dict[str, Any]]:
+        """
+        Wait for a job to finish.
+
+        Args:
+            job_id: Job ID
+            timeout: Maximum time to wait in seconds (None waits indefinitely)
+            interval: Polling interval in seconds
+
+        Returns:
+            Last known job dictionary (check its status), or None if not found
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.database.get_job(job_id)
+            if job is None or job['status'] in FINISHED_STATES:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(interval)
+
+    def _notify(self, event: str, job: Dict[str, Any]) -> None:
+        """Pass a job event to the callbacks."""
+        for callback in self.callbacks:
+            try:
+                callback(event, job)
+            except Exception as e:
+                logger.error(f"Error in job callback: {str(e)}")
+
+    def _run(self) -> None:
+        """Worker thread main loop."""
+        while self._running:
+            job = self.database.claim_next_job(list(self.handlers), self.worker_id)
+            if job is None:
+                with self._wake:
+                    if self._running and not self._pending:
+                        self._wake.wait(POLL_INTERVAL_SECONDS)
+                    self._pending = False
+                continue
+            self._execute(job)
+
+    def _heartbeat(self) -> None:
+        """
+        Heartbeat thread main loop: keeps this worker's running jobs alive and
+        takes over jobs of workers that have gone away.
+        """
+        while not self._stopped.wait(HEARTBEAT_INTERVAL_SECONDS):
+            try:
+                self.database.heartbeat_jobs(self.worker_id)
+                self.requeue_abandoned_jobs()
+            except Exception as e:
+                logger.error(f"Error in job heartbeat: {str(e)}")
+
+    def _execute(self, job: Dict[str, Any]) -> None:
+        """Run one claimed job and record its outcome."""
+        job_id = job['id']
+
+        # A job requeued and claimed by another worker belongs to that worker
+        # now; this run's progress and outcome are not recorded or announced
+        def report(progress: float, message: Optional[str] = None) -> None:
+            if self.database.update_job_progress(job_id, self.worker_id, progress, message):
+                self._notify(JOB_PROGRESS, {**job, 'progress': progress, 'message': message})
+
+        started = time.monotonic()
+        try:
+            result = self.handlers[job['kind']](job, report)
+        except Exception as e:
+            logger.error(f"{job['kind']} job {job_id} failed: {str(e)}", exc_info=True)
+            if self.database.finish_job(job_id, self.worker_id, error=str(e) or type(e).__name__):
+                self._notify(JOB_FAILED_EVENT, self.database.get_job(job_id) or job)
+            else:
+                logger.warning(f"{job['kind']} job {job_id} is no longer held by this worker")
+            return
+
+        if not self.database.finish_job(job_id, self.worker_id, result=result):
+            logger.warning(f"{job['kind']} job {job_id} is no longer held by this worker, dropping its result")
+            return
+        logger.info(f"{job['kind']} job {job_id} finished in {time.monotonic() - started:.2f}s")
+        self._notify(JOB_COMPLETED, self.database.get_job(job_id) or job)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Live Publisher Module for Rogue to Garmin Bridge
+
+This module fans live workout events out to streaming clients (Server-Sent
+Events). Each event is JSON encoded once into an SSE frame and the same bytes
+are appended to every subscriber's queue. Queues are bounded and drop their
+oldest frame when full, so a slow client never holds back the publisher or
+makes memory grow.
+"""
+
+import json
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# Frames queued per subscriber before the oldest ones are dropped
+DEFAULT_QUEUE_SIZE = 64
+
+
+def normalize_live_sample(data: Dict[str, Any], workout_type: Optional[str] = None,
+                          workout_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Copy a live sample with the metric keys the dashboard relies on.
+
+    Args:
+        data: Sample as received from the device or browser
+        workout_type: Type of the active workout, used when the sample has no
+            device_type
+        workout_id: Active workout ID, if any
+
+    Returns:
+        New sample dictionary with power, instant_power, cadence, device_type
+        and workout_id filled in where they can be derived
+    """
+    sample = data.copy()
+
+    if 'power' not in sample:
+        if 'instant_power' in sample:
+            sample['power'] = sample['instant_power']
+        elif 'instantaneous_power' in sample:
+            sample['power'] = sample['instantaneous_power']
+    if 'instant_power' not in sample and 'instantaneous_power' in sample:
+        sample['instant_power'] = sample['instantaneous_power']
+
+    if 'cadence' not in sample:
+        for cad_key in ('instant_cadence', 'instantaneous_cadence', 'stroke_rate'):
+            if cad_key in sample:
+                sample['cadence'] = sample[cad_key]
+                break
+
+    if 'device_type' not in sample and workout_type:
+        sample['device_type'] = workout_type
+    if workout_id:
+        sample['workout_id'] = workout_id
+    return sample
+
+
+def encode_event(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    """
+    Encode an SSE frame.
+
+    Args:
+        event: Event name
+        data: JSON-serializable payload (other values are sent as strings)
+        event_id: Optional event ID
+
+    Returns:
+        Frame bytes, terminated by a blank line
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str, separators=(',', ':'))}")
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class Subscription:
+    """Bounded frame queue of one streaming client."""
+
+    def __init__(self, publisher: 'LivePublisher', queue_size: int):
+        self._publisher = publisher
+        self._frames = deque(maxlen=queue_size)
+        self._ready = threading.Condition(threading.Lock())
+        self.closed = False
+        self.dropped = 0
+
+    def _put(self, frame: bytes) -> None:
+        with self._ready:
+            if len(self._frames) == self._frames.maxlen:
+                # deque(maxlen) evicts the oldest frame on append
+                self.dropped += 1
+            self._frames.append(frame)
+            self._ready.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """
+        Wait for the next frame.
+
+        Args:
+            timeout: Longest time to wait in seconds (None waits forever)
+
+        Returns:
+            Frame bytes, or None on timeout or when the subscription is closed
+        """
+        with self._ready:
+            if not self._frames and not self.closed:
+                self._ready.wait(timeout)
+            if self._frames:
+                return self._frames.popleft()
+            return None
+
+    def close(self) -> None:
+        """Stop receiving frames and wake up a waiting reader."""
+        self._publisher._unsubscribe(self)
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+
+class LivePublisher:
+    """
+    Single publisher of live events with fan-out to bounded subscriber queues.
+
+    Events published with retain=True are remembered (the last one of each
+    name) and replayed to new subscribers, so a client that connects mid-workout
+    starts from the current state and can apply later deltas to it.
+    """
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        Initialize the publisher.
+
+        Args:
+            queue_size: Default number of frames queued per subscriber
+        """
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._retained: Dict[str, Any] = {}
+        self._next_id = 1
+
+    @property
+    def subscriber_count(self) -> int:
+        """Number of connected subscribers."""
+        return len(self._subscribers)
+
+    def subscribe(self, queue_size: Optional[int] = None) -> Subscription:
+        """
+        Add a subscriber, pre-loaded with the retained events.
+
+        Args:
+            queue_size: Frames queued before the oldest are dropped (defaults
+                to the publisher's queue_size)
+
+        Returns:
+            New subscription; close it when the client goes away
+        """
+        subscription = Subscription(self, queue_size or self.queue_size)
+        with self._lock:
+            for event, data in self._retained.items():
+                subscription._put(encode_event(event, data))
+            self._subscribers.append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def publish(self, event: str, data: Any, retain: Any = None) -> int:
+        """
+        Send an event to every subscriber.
+
+        Args:
+            event: Event name
+            data: JSON-serializable payload
+            retain: State replayed as this event to later subscribers (e.g.
+                the full summary when data is only a delta); None keeps the
+                previously retained state
+
+        Returns:
+            Number of subscribers the event was queued for
+        """
+        with self._lock:
+            if retain is not None:
+                self._retained[event] = retain
+            if not self._subscribers:
+                return 0
+            frame = encode_event(event, data, self._next_id)
+            self._next_id += 1
+            for subscription in self._subscribers:
+                subscription._put(frame)
+            return len(self._subscribers)
+
+    def forget(self, event: str) -> None:
+        """
+        Stop replaying an event to new subscribers.
+
+        Args:
+            event: Event name
+        """
+        with self._lock:
+            self._retained.pop(event, None)
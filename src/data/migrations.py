@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Schema Migrations Module for Rogue to Garmin Bridge
+
+This module keeps the database schema versioned. Each migration is an ordered
+step with a version number; applied versions are recorded in the
+schema_version table so every step runs exactly once per database.
+"""
+
+import sqlite3
+import json
+import logging
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from .workout_data_schema import SAMPLE_COLUMNS, SUMMARY_COLUMNS, summary_column_values
+from .workout_rollups import ROLLUP_METRICS
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('migrations')
+
+
+class Migration(NamedTuple):
+    """A single schema migration step."""
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Cursor], None]
+
+
+def _add_sample_columns(cursor: sqlite3.Cursor) -> None:
+    """Add the typed sample columns to a workout_data table created by an older version."""
+    cursor.execute("PRAGMA table_info(workout_data)")
+    existing = {row[1] for row in cursor.fetchall()}
+
+    wanted = [(name, column_type) for name, column_type, _ in SAMPLE_COLUMNS]
+    wanted += [('field_flags', 'INTEGER DEFAULT 0'), ('extras', 'TEXT')]
+
+    for name, column_type in wanted:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE workout_data ADD COLUMN {name} {column_type}")
+            logger.info(f"Added column workout_data.{name}")
+
+
+def _add_workout_data_index(cursor: sqlite3.Cursor) -> None:
+    """Index samples by workout in timestamp order for history and FIT reads."""
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_workout_data_workout_timestamp "
+        "ON workout_data (workout_id, timestamp)"
+    )
+
+
+def _add_workout_list_indexes(cursor: sqlite3.Cursor) -> None:
+    """Index the workout list and the pending FIT conversion filter."""
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_workouts_start_time "
+        "ON workouts (start_time DESC)"
+    )
+    # Partial index: only finished workouts still waiting for a FIT file
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_workouts_without_fit "
+        "ON workouts (start_time DESC) "
+        "WHERE (fit_file_path IS NULL OR fit_file_path = '') AND end_time IS NOT NULL"
+    )
+
+
+def _add_workout_archive_table(cursor: sqlite3.Cursor) -> None:
+    """Add the table holding compressed samples of finished workouts."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS workout_archive (
+            workout_id INTEGER PRIMARY KEY,
+            sample_count INTEGER,
+            format_version INTEGER,
+            data BLOB,
+            created_at TEXT,
+            FOREIGN KEY (workout_id) REFERENCES workouts (id)
+        )
+    ''')
+
+
+def _add_workout_summary_columns(cursor: sqlite3.Cursor) -> None:
+    """Copy the key summary metrics into indexed workouts columns."""
+    cursor.execute("PRAGMA table_info(workouts)")
+    existing = {row[1] for row in cursor.fetchall()}
+
+    for name, column_type in SUMMARY_COLUMNS:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE workouts ADD COLUMN {name} {column_type}")
+            logger.info(f"Added column workouts.{name}")
+
+    # Backfill from the summary JSON of existing workouts
+    cursor.execute("SELECT id, summary FROM workouts WHERE summary IS NOT NULL AND summary != '{}'")
+    updates = []
+    for workout_id, summary_json in cursor.fetchall():
+        try:
+            summary = json.loads(summary_json)
+        except ValueError:
+            continue
+        if isinstance(summary, dict):
+            updates.append((*summary_column_values(summary), workout_id))
+
+    assignments = ', '.join(f"{name} = ?" for name, _ in SUMMARY_COLUMNS)
+    cursor.executemany(f"UPDATE workouts SET {assignments} WHERE id = ?", updates)
+
+    for name in ['duration'] + [name for name, _ in SUMMARY_COLUMNS]:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_workouts_{name} ON workouts ({name})")
+
+
+def _add_workout_filter_indexes(cursor: sqlite3.Cursor) -> None:
+    """Index the workout search filters in keyset order."""
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_workouts_start_time_id "
+        "ON workouts (start_time DESC, id DESC)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_workouts_type_start_time "
+        "ON workouts (workout_type, start_time DESC, id DESC)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_workouts_device_start_time "
+        "ON workouts (device_id, start_time DESC, id DESC)"
+    )
+
+
+def _add_workout_rollups_table(cursor: sqlite3.Cursor) -> None:
+    """Add the table holding per-bucket sample aggregates for charts."""
+    stat_definitions = ' '.join(
+        f"{metric}_min REAL, {metric}_max REAL, {metric}_mean REAL, {metric}_count INTEGER NOT NULL DEFAULT 0,"
+        for metric in ROLLUP_METRICS
+    )
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS workout_rollups (
+            workout_id INTEGER NOT NULL,
+            resolution INTEGER NOT NULL,
+            bucket_start TEXT NOT NULL,
+            sample_count INTEGER NOT NULL,
+            {stat_definitions}
+            PRIMARY KEY (workout_id, resolution, bucket_start)
+        ) WITHOUT ROWID
+    ''')
+
+
+# Tables whose changes are counted in table_versions
+VERSIONED_TABLES = ['workouts', 'devices']
+
+
+def _add_change_versions(cursor: sqlite3.Cursor) -> None:
+    """Count changes per table and per workout row so responses can be revalidated cheaply."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+
+    cursor.execute("PRAGMA table_info(workouts)")
+    existing = {row[1] for row in cursor.fetchall()}
+    if 'row_version' not in existing:
+        cursor.execute("ALTER TABLE workouts ADD COLUMN row_version INTEGER NOT NULL DEFAULT 1")
+    if 'modified_at' not in existing:
+        cursor.execute("ALTER TABLE workouts ADD COLUMN modified_at TEXT")
+
+    # Every update bumps the row version and stamps the UTC modification time;
+    # the nested UPDATE does not fire the trigger again (recursive triggers are off)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS workouts_row_version
+        AFTER UPDATE ON workouts
+        WHEN NEW.row_version = OLD.row_version
+        BEGIN
+            UPDATE workouts
+            SET row_version = OLD.row_version + 1,
+                modified_at = strftime('%Y-%m-%dT%H:%M:%SZ', 'now')
+            WHERE id = NEW.id;
+        END
+    ''')
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    tables = {row[0] for row in cursor.fetchall()}
+    for table in VERSIONED_TABLES:
+        if table not in tables:
+            continue
+        cursor.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 1)", (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+                END
+            ''')
+
+
+def _add_jobs_table(cursor: sqlite3.Cursor) -> None:
+    """Add the table of background jobs (e.g. FIT file generation)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            workout_id INTEGER,
+            params TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_workout ON jobs (workout_id, kind)")
+
+
+def _add_fit_cache_table(cursor: sqlite3.Cursor) -> None:
+    """Add the table of FIT files by the hash of their conversion inputs."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fit_cache (
+            cache_key TEXT PRIMARY KEY,
+            workout_id INTEGER NOT NULL,
+            fit_file_path TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fit_cache_workout ON fit_cache (workout_id)")
+
+
+def _add_fit_files_catalog(cursor: sqlite3.Cursor) -> None:
+    """Add the catalog of FIT files on disk and the running storage totals."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fit_files (
+            path TEXT PRIMARY KEY,
+            directory TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            modified REAL NOT NULL,
+            workout_id INTEGER,
+            sport INTEGER,
+            start_time TEXT,
+            duration REAL,
+            total_distance REAL,
+            total_calories INTEGER,
+            avg_power INTEGER,
+            avg_heart_rate INTEGER,
+            record_count INTEGER,
+            checksum TEXT,
+            cataloged_at TEXT NOT NULL
+        )
+    ''')
+    # Newest first listing pages and per-directory reconciliation
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fit_files_modified ON fit_files (modified, path)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fit_files_directory ON fit_files (directory)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fit_files_workout ON fit_files (workout_id)")
+
+    # Item counts and byte totals kept current by triggers, so storage
+    # figures never need a scan
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS storage_totals (
+            name TEXT PRIMARY KEY,
+            item_count INTEGER NOT NULL,
+            total_bytes INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO storage_totals (name, item_count, total_bytes) "
+                   "SELECT 'fit_files', COUNT(*), COALESCE(SUM(size), 0) FROM fit_files")
+    cursor.execute("INSERT OR IGNORE INTO storage_totals (name, item_count, total_bytes) "
+                   "SELECT 'workouts', COUNT(*), 0 FROM workouts")
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS fit_files_insert_totals
+        AFTER INSERT ON fit_files
+        BEGIN
+            UPDATE storage_totals SET item_count = item_count + 1, total_bytes = total_bytes + NEW.size
+            WHERE name = 'fit_files';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS fit_files_update_totals
+        AFTER UPDATE OF size ON fit_files
+        BEGIN
+            UPDATE storage_totals SET total_bytes = total_bytes + NEW.size - OLD.size
+            WHERE name = 'fit_files';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS fit_files_delete_totals
+        AFTER DELETE ON fit_files
+        BEGIN
+            UPDATE storage_totals SET item_count = item_count - 1, total_bytes = total_bytes - OLD.size
+            WHERE name = 'fit_files';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS workouts_insert_totals
+        AFTER INSERT ON workouts
+        BEGIN
+            UPDATE storage_totals SET item_count = item_count + 1 WHERE name = 'workouts';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS workouts_delete_totals
+        AFTER DELETE ON workouts
+        BEGIN
+            UPDATE storage_totals SET item_count = item_count - 1 WHERE name = 'workouts';
+        END
+    ''')
+
+    # Count catalog changes like the other versioned tables
+    cursor.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES ('fit_files', 1)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS fit_files_{event.lower()}_version
+            AFTER {event} ON fit_files
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = 'fit_files';
+            END
+        ''')
+
+
+def _add_job_owners(cursor: sqlite3.Cursor) -> None:
+    """Record which worker runs a job and when it last showed signs of life."""
+    cursor.execute("PRAGMA table_info(jobs)")
+    existing = {row[1] for row in cursor.fetchall()}
+    if 'worker_id' not in existing:
+        cursor.execute("ALTER TABLE jobs ADD COLUMN worker_id TEXT")
+    if 'heartbeat_at' not in existing:
+        cursor.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+
+
+def _add_workout_archive_blocks(cursor: sqlite3.Cursor) -> None:
+    """Add the table holding archived samples in blocks keyed by their first timestamp."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS workout_archive_blocks (
+            workout_id INTEGER NOT NULL,
+            block INTEGER NOT NULL,
+            first_timestamp TEXT NOT NULL,
+            last_timestamp TEXT NOT NULL,
+            sample_count INTEGER,
+            data BLOB,
+            PRIMARY KEY (workout_id, block),
+            FOREIGN KEY (workout_id) REFERENCES workouts (id)
+        )
+    ''')
+    # Time windows seek to the blocks that cover them
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_workout_archive_blocks_window "
+        "ON workout_archive_blocks (workout_id, first_timestamp, block, last_timestamp)"
+    )
+
+
+def _add_sample_data_versions(cursor: sqlite3.Cursor) -> None:
+    """Count sample writes per workout and record the checksum of cached FIT files."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS workout_data_versions (
+            workout_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    # Archiving only deletes sample rows it has copied, so deletes leave the
+    # version alone
+    for event in ('INSERT', 'UPDATE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS workout_data_{event.lower()}_data_version
+            AFTER {event} ON workout_data
+            BEGIN
+                INSERT INTO workout_data_versions (workout_id, version) VALUES (NEW.workout_id, 1)
+                ON CONFLICT (workout_id) DO UPDATE SET version = version + 1;
+            END
+        ''')
+
+    cursor.execute("PRAGMA table_info(fit_cache)")
+    existing = {row[1] for row in cursor.fetchall()}
+    if 'checksum' not in existing:
+        cursor.execute("ALTER TABLE fit_cache ADD COLUMN checksum TEXT")
+
+
+# Ordered list of migrations. Append new steps with the next version number;
+# never change or reorder a step that has already shipped.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Add typed sample columns to workout_data", _add_sample_columns),
+    Migration(2, "Add workout_data (workout_id, timestamp) index", _add_workout_data_index),
+    Migration(3, "Add workouts start_time and pending FIT file indexes", _add_workout_list_indexes),
+    Migration(4, "Add workout_archive table", _add_workout_archive_table),
+    Migration(5, "Add indexed workout summary columns", _add_workout_summary_columns),
+    Migration(6, "Add workout search filter indexes", _add_workout_filter_indexes),
+    Migration(7, "Add workout_rollups table", _add_workout_rollups_table),
+    Migration(8, "Add workout row versions and table change counters", _add_change_versions),
+    Migration(9, "Add jobs table", _add_jobs_table),
+    Migration(10, "Add fit_cache table", _add_fit_cache_table),
+    Migration(11, "Add fit_files catalog and storage totals", _add_fit_files_catalog),
+    Migration(12, "Add job worker and heartbeat columns", _add_job_owners),
+    Migration(13, "Add workout_archive_blocks table", _add_workout_archive_blocks),
+    Migration(14, "Add sample data versions and FIT cache checksums", _add_sample_data_versions),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Get the highest applied migration version.
+
+    Args:
+        conn: SQLite connection
+
+    Returns:
+        Schema version (0 if no migration has been applied)
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    )
+    if cursor.fetchone() is None:
+        return 0
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    version = cursor.fetchone()[0]
+    return version or 0
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: List[Migration] = None) -> int:
+    """
+    Apply all pending migrations in version order.
+
+    Each step is recorded in schema_version as soon as it succeeds. Steps are
+    written to be idempotent, so a step that failed part way is simply run
+    again on the next start.
+
+    Args:
+        conn: SQLite connection
+        migrations: Migration steps (defaults to MIGRATIONS)
+
+    Returns:
+        Schema version after applying the pending steps
+
+    Raises:
+        sqlite3.Error: If a migration step fails
+    """
+    if migrations is None:
+        migrations = MIGRATIONS
+
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+    ''')
+    conn.commit()
+
+    current_version = get_schema_version(conn)
+
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= current_version:
+            continue
+        try:
+            migration.apply(cursor)
+            cursor.execute(
+                "INSERT OR IGNORE INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (migration.version, migration.description, datetime.now().isoformat())
+            )
+            conn.commit()
+            current_version = migration.version
+            logger.info(f"Applied migration {migration.version}: {migration.description}")
+        except sqlite3.Error as e:
+            logger.error(f"Error applying migration {migration.version}: {str(e)}")
+            conn.rollback()
+            raise
+
+    return current_version
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Sample Buffer Module for Rogue to Garmin Bridge
+
+This module provides a compact, array-backed buffer for live workout samples.
+Each canonical metric is kept in its own typed array (struct of arrays) with a
+monotonic timestamp column, so a sample costs tens of bytes instead of a full
+Python dictionary. Consumers get a read-only view that materializes sample
+dictionaries only when they are accessed.
+"""
+
+import math
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+from .workout_data_schema import SAMPLE_COLUMNS, extract_columns, build_sample
+
+# Metrics reported in whole or half units are exact as 4-byte floats; the rest
+# (speed in 0.01 km/h, distances, energy, elapsed time) need doubles.
+_SINGLE_PRECISION_COLUMNS = {'power', 'cadence', 'heart_rate', 'stroke_rate', 'stroke_count'}
+
+# (name, array typecode, sample keys in lookup order)
+BUFFER_COLUMNS: List[Tuple[str, str, Tuple[str, ...]]] = [
+    (name, 'f' if name in _SINGLE_PRECISION_COLUMNS else 'd', aliases)
+    for name, _, aliases in SAMPLE_COLUMNS
+]
+
+# Field flags use 3 bits per column in a 32-bit array item
+MAX_COLUMNS = 10
+
+_MISSING = float('nan')
+
+
+class SampleBuffer:
+    """
+    Struct-of-arrays buffer of workout samples.
+
+    Only the typed metric columns are kept; other sample keys are dropped.
+    The key each value came from is remembered, so samples read back have
+    the same keys as the dictionaries that were appended.
+    """
+
+    def __init__(self, columns: List[Tuple[str, str, Tuple[str, ...]]] = None,
+                 max_samples: Optional[int] = None):
+        """
+        Initialize the sample buffer.
+
+        Args:
+            columns: Column definitions as (name, typecode, aliases); defaults
+                to BUFFER_COLUMNS
+            max_samples: Keep at most about this many recent samples (None
+                keeps everything)
+        """
+        self.columns = list(columns) if columns is not None else BUFFER_COLUMNS
+        if len(self.columns) > MAX_COLUMNS:
+            raise ValueError(f"SampleBuffer supports at most {MAX_COLUMNS} columns")
+
+        self.max_samples = max_samples
+        self._column_index = {name: i for i, (name, _, _) in enumerate(self.columns)}
+        self._clear()
+
+    def _clear(self) -> None:
+        """Allocate empty arrays."""
+        self._values = [array(typecode) for _, typecode, _ in self.columns]
+        self._flags = array('I')
+        self._monotonic = array('d')
+        # Wall clock anchor used to turn monotonic times back into datetimes
+        self._anchor_wall: Optional[datetime] = None
+        self._anchor_monotonic = 0.0
+
+    def clear(self) -> None:
+        """Remove all samples."""
+        self._clear()
+
+    def append(self, data: Dict[str, Any], timestamp: Optional[datetime] = None,
+               monotonic: Optional[float] = None) -> int:
+        """
+        Append a sample.
+
+        Args:
+            data: Workout sample
+            timestamp: Wall clock time of the sample (defaults to now); only
+                the first sample's wall time is kept as the anchor
+            monotonic: Monotonic clock reading (defaults to time.monotonic());
+                clamped so timestamps never go backwards
+
+        Returns:
+            Index of the appended sample
+        """
+        if monotonic is None:
+            monotonic = time.monotonic()
+
+        if self._anchor_wall is None:
+            self._anchor_wall = timestamp if timestamp is not None else datetime.now()
+            self._anchor_monotonic = monotonic
+        elif self._monotonic and monotonic < self._monotonic[-1]:
+            monotonic = self._monotonic[-1]
+
+        values, flags, _ = extract_columns(data, self.columns)
+        for column, value in zip(self._values, values):
+            column.append(_MISSING if value is None else value)
+        self._flags.append(flags)
+        self._monotonic.append(monotonic)
+
+        self._trim()
+        return len(self._flags) - 1
+
+    def _trim(self) -> None:
+        """Drop the oldest samples once the buffer is a quarter over max_samples."""
+        if not self.max_samples:
+            return
+        excess = len(self._flags) - self.max_samples
+        if excess < max(1, self.max_samples // 4):
+            return
+        for column in self._values:
+            del column[:excess]
+        del self._flags[:excess]
+        del self._monotonic[:excess]
+
+    @property
+    def column_names(self) -> List[str]:
+        """Names of the metric columns."""
+        return [name for name, _, _ in self.columns]
+
+    def __len__(self) -> int:
+        return len(self._flags)
+
+    def __bool__(self) -> bool:
+        return len(self._flags) > 0
+
+    def _sample(self, index: int) -> Dict[str, Any]:
+        """Materialize one sample dictionary."""
+        values = []
+        for column in self._values:
+            value = column[index]
+            values.append(None if math.isnan(value) else value)
+        sample = build_sample(values, self._flags[index], self.columns)
+        sample['timestamp'] = self.wall_time(self._monotonic[index])
+        return sample
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        if isinstance(index, slice):
+            return [self._sample(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("sample index out of range")
+        return self._sample(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self._sample(i)
+
+    def wall_time(self, monotonic: float) -> Optional[datetime]:
+        """
+        Convert a monotonic time from this buffer to wall clock time.
+
+        Args:
+            monotonic: Monotonic clock reading
+
+        Returns:
+            Wall clock datetime (None if the buffer has no anchor yet)
+        """
+        if self._anchor_wall is None:
+            return None
+        return self._anchor_wall + timedelta(seconds=monotonic - self._anchor_monotonic)
+
+    def column(self, name: str, start: Optional[int] = None, stop: Optional[int] = None) -> array:
+        """
+        Get a copy of one metric column; missing values are NaN.
+
+        Args:
+            name: Column name (e.g. 'power')
+            start: First sample index (negative counts from the end)
+            stop: End sample index (exclusive)
+
+        Returns:
+            Typed array with the column values
+        """
+        return self._values[self._column_index[name]][start:stop]
+
+    def monotonic_times(self, start: Optional[int] = None, stop: Optional[int] = None) -> array:
+        """
+        Get a copy of the monotonic timestamps.
+
+        Args:
+            start: First sample index (negative counts from the end)
+            stop: End sample index (exclusive)
+
+        Returns:
+            array('d') of monotonic clock readings
+        """
+        return self._monotonic[start:stop]
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Get the most recent sample (None if empty)."""
+        if not self._flags:
+            return None
+        return self._sample(len(self._flags) - 1)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the sample arrays."""
+        arrays = self._values + [self._flags, self._monotonic]
+        return sum(len(a) * a.itemsize for a in arrays)
+
+    def view(self) -> 'SampleBufferView':
+        """Get a read-only view of this buffer."""
+        return SampleBufferView(self)
+
+
+class SampleBufferView:
+    """Read-only view of a SampleBuffer; reflects samples appended later."""
+
+    def __init__(self, buffer: SampleBuffer):
+        self._buffer = buffer
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def __bool__(self) -> bool:
+        return bool(self._buffer)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        return self._buffer[index]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._buffer)
+
+    @property
+    def column_names(self) -> List[str]:
+        """Names of the metric columns."""
+        return self._buffer.column_names
+
+    def column(self, name: str, start: Optional[int] = None, stop: Optional[int] = None) -> array:
+        """Get a copy of one metric column (see SampleBuffer.column)."""
+        return self._buffer.column(name, start, stop)
+
+    def monotonic_times(self, start: Optional[int] = None, stop: Optional[int] = None) -> array:
+        """Get a copy of the monotonic timestamps (see SampleBuffer.monotonic_times)."""
+        return self._buffer.monotonic_times(start, stop)
+
+    def wall_time(self, monotonic: float) -> Optional[datetime]:
+        """Convert a monotonic time to wall clock time (see SampleBuffer.wall_time)."""
+        return self._buffer.wall_time(monotonic)
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Get the most recent sample (None if empty)."""
+        return self._buffer.latest()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the sample arrays."""
+        return self._buffer.nbytes
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Status Log Module for Rogue to Garmin Bridge
+
+This module gives the polled status response a sequence number. Every status
+that differs from the previous one gets the next number, and the last few
+versions are kept so a client that passes the number it last saw receives
+only what changed since then, as a JSON Merge Patch (RFC 7386): changed keys
+carry their new value, nested objects are patched recursively and removed
+keys are sent as null.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Status versions kept for building deltas
+DEFAULT_HISTORY = 32
+
+
+def merge_patch(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compute the JSON Merge Patch that turns one object into another.
+
+    Args:
+        old: Previous object
+        new: Current object
+
+    Returns:
+        Patch with the changed and added keys, nested patches for changed
+        objects and None for removed keys (empty when nothing changed)
+    """
+    patch = {}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+            continue
+        previous = old[key]
+        if previous == value:
+            continue
+        if isinstance(previous, dict) and isinstance(value, dict):
+            patch[key] = merge_patch(previous, value)
+        else:
+            patch[key] = value
+    for key in old:
+        if key not in new:
+            patch[key] = None
+    return patch
+
+
+class StatusLog:
+    """
+    Sequence-numbered log of recent status versions.
+
+    Sequence numbers start from the current time in milliseconds, so numbers
+    handed out before a server restart are older than the new ones and are
+    answered with a full status instead of a wrong delta.
+    """
+
+    def __init__(self, history: int = DEFAULT_HISTORY):
+        """
+        Initialize the log.
+
+        Args:
+            history: Number of status versions kept for deltas
+        """
+        self.history = history
+        self._lock = threading.Lock()
+        self._versions: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self._seq = int(time.time() * 1000)
+        self._current: Optional[Dict[str, Any]] = None
+        # Patches to the current version, by the version they start from
+        self._patches: Dict[int, Dict[str, Any]] = {}
+
+    def record(self, status: Dict[str, Any]) -> int:
+        """
+        Record the current status.
+
+        Args:
+            status: Status object; it must not be modified afterwards
+
+        Returns:
+            Sequence number of the status (unchanged if it equals the last one)
+        """
+        with self._lock:
+            if self._current is not None and status == self._current:
+                return self._seq
+            self._seq += 1
+            self._current = status
+            self._versions[self._seq] = status
+            while len(self._versions) > self.history:
+                self._versions.popitem(last=False)
+            self._patches = {}
+            return self._seq
+
+    def changes_since(self, since: int) -> Tuple[int, Optional[Dict[str, Any]], bool]:
+        """
+        Get what changed after a sequence number.
+
+        Args:
+            since: Sequence number the client last saw
+
+        Returns:
+            Tuple of (current sequence number, changes, reset). changes is None
+            when nothing changed. When the version is no longer (or was
+            never) in the log, reset is True and changes is the full status.
+        """
+        with self._lock:
+            if since == self._seq:
+                return self._seq, None, False
+            old = self._versions.get(since)
+            if old is None:
+                return self._seq, self._current, True
+            patch = self._patches.get(since)
+            if patch is None:
+                patch = self._patches[since] = merge_patch(old, self._current)
+            return self._seq, patch, False
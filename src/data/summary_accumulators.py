@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Summary Accumulators Module for Rogue to Garmin Bridge
+
+This module provides streaming accumulators used by the workout manager to
+keep running averages up to date without rescanning every data point of the
+workout on each new sample.
+"""
+
+import math
+from collections import deque
+from typing import List, Optional
+
+
+class RunningStats:
+    """
+    Running count, sum, maximum and Welford mean/variance of a metric.
+
+    Every update is O(1) and the accumulator keeps no per-sample history.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float) -> None:
+        """
+        Add a value.
+
+        Args:
+            value: Metric value
+        """
+        self.count += 1
+        self.total += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        # Welford's online update
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+    @property
+    def mean(self) -> Optional[float]:
+        """Arithmetic mean of the values added so far (None if empty)."""
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the values added so far."""
+        if self.count == 0:
+            return 0.0
+        return self._m2 / self.count
+
+    @property
+    def std_dev(self) -> float:
+        """Population standard deviation of the values added so far."""
+        return math.sqrt(max(self.variance, 0.0))
+
+
+class _FenwickTree:
+    """Binary indexed tree holding per-bucket sums with prefix queries."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.tree: List[float] = [0] * (size + 1)
+
+    def add(self, index: int, amount: float) -> None:
+        index += 1
+        while index <= self.size:
+            self.tree[index] += amount
+            index += index & -index
+
+    def prefix(self, index: int) -> float:
+        """Sum of buckets 0..index inclusive."""
+        index = min(index, self.size - 1) + 1
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+
+class StreamingOutlierMean:
+    """
+    Mean of the values within ``sigma`` standard deviations of the overall mean.
+
+    Equivalent to collecting every value, computing the population mean and
+    standard deviation, dropping values further than ``sigma`` standard
+    deviations from the mean and averaging the rest, but without keeping the
+    values. Counts and sums are kept per ``resolution`` sized bucket in
+    Fenwick trees, so each update and query costs O(log buckets) regardless of
+    workout length. The result is exact for values on the resolution grid
+    (FTMS reports speed in 0.01 km/h steps); for other values only the
+    in/out decision near the cut-off is approximated to the bucket width.
+
+    The filter is only applied once more than ``min_samples`` values have
+    been added; below that, and when every value would be filtered out, the
+    plain mean is returned.
+    """
+
+    def __init__(self, sigma: float = 2.0, min_samples: int = 4,
+                 resolution: float = 0.01, max_value: float = 200.0):
+        """
+        Initialize the accumulator.
+
+        Args:
+            sigma: Number of standard deviations a value may be from the mean
+            min_samples: Apply the filter only when more values than this exist
+            resolution: Bucket width
+            max_value: Values above this share the last bucket
+        """
+        self.sigma = sigma
+        self.min_samples = min_samples
+        self.resolution = resolution
+        self.stats = RunningStats()
+        self._bucket_count = int(math.ceil(max_value / resolution)) + 1
+        self._counts = _FenwickTree(self._bucket_count)
+        self._sums = _FenwickTree(self._bucket_count)
+
+    @property
+    def count(self) -> int:
+        """Number of values added."""
+        return self.stats.count
+
+    def add(self, value: float) -> None:
+        """
+        Add a value.
+
+        Args:
+            value: Non-negative metric value
+        """
+        self.stats.add(value)
+        bucket = self._bucket(value)
+        self._counts.add(bucket, 1)
+        self._sums.add(bucket, value)
+
+    def _bucket(self, value: float) -> int:
+        """Bucket index holding a value."""
+        return min(max(int(round(value / self.resolution)), 0), self._bucket_count - 1)
+
+    def filtered_stats(self):
+        """
+        Get the outlier-filtered mean and the number of values it covers.
+
+        Returns:
+            Tuple of (mean, values kept) or (None, 0) if nothing was added
+        """
+        count = self.stats.count
+        if count == 0:
+            return None, 0
+
+        mean = self.stats.mean
+        if count <= self.min_samples:
+            return mean, count
+
+        spread = self.sigma * self.stats.std_dev
+        # Small tolerance so grid values sitting exactly on the bound are kept
+        tolerance = self.resolution * 1e-6
+        low = int(math.ceil((mean - spread - tolerance) / self.resolution))
+        high = int(math.floor((mean + spread + tolerance) / self.resolution))
+        low = max(low, 0)
+        high = min(high, self._bucket_count - 1)
+
+        if high < low:
+            return mean, count
+
+        kept = self._counts.prefix(high) - (self._counts.prefix(low - 1) if low > 0 else 0)
+        if kept <= 0:
+            # Filtering removed every value, fall back to the plain mean
+            return mean, count
+
+        kept_sum = self._sums.prefix(high) - (self._sums.prefix(low - 1) if low > 0 else 0)
+        return kept_sum / kept, int(kept)
+
+    @property
+    def mean(self) -> Optional[float]:
+        """Outlier-filtered mean (None if empty)."""
+        return self.filtered_stats()[0]
+
+
+class NormalizedPower:
+    """
+    Streaming normalized power over a rolling window of power samples.
+
+    Matches DataProcessor's calculation (fourth root of the mean fourth power
+    of the 30 sample rolling average) while keeping only the current window.
+    """
+
+    def __init__(self, window_size: int = 30):
+        """
+        Initialize the accumulator.
+
+        Args:
+            window_size: Number of samples in the rolling average
+        """
+        self.window_size = window_size
+        self._window = deque()
+        self._window_sum = 0.0
+        self._fourth_power_sum = 0.0
+        self._window_count = 0
+
+    def add(self, power: float) -> None:
+        """
+        Add a power sample.
+
+        Args:
+            power: Instantaneous power in watts
+        """
+        self._window.append(power)
+        self._window_sum += power
+        if len(self._window) > self.window_size:
+            self._window_sum -= self._window.popleft()
+        if len(self._window) == self.window_size:
+            self._fourth_power_sum += (self._window_sum / self.window_size) ** 4
+            self._window_count += 1
+
+    @property
+    def value(self) -> float:
+        """Normalized power rounded to 0.1 W (0 until a full window was seen)."""
+        if self._window_count == 0:
+            return 0
+        return round((self._fourth_power_sum / self._window_count) ** 0.25, 1)
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Workout Archive Module for Rogue to Garmin Bridge
+
+This module packs the samples of a finished workout into compact binary
+blocks of up to ARCHIVE_BLOCK_SIZE samples. Samples are stored column by
+column: timestamps, row ids and metric values are delta encoded as zigzag
+varints and missing values are kept in a presence bitmap. Each column is zlib
+compressed on its own behind a small uncompressed directory, so a reader that
+asks for two metrics only decompresses those two and the timestamps. Decoding
+gives back rows with the same values the workout_data table held.
+
+Version 1 archives, one blob per workout compressed as a whole, are still
+decoded.
+"""
+
+import math
+import struct
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from .workout_data_schema import SAMPLE_COLUMNS
+
+# Blob header: format tag and version
+ARCHIVE_MAGIC = b'RGA'
+ARCHIVE_VERSION = 2
+LEGACY_ARCHIVE_VERSION = 1
+
+# Samples per archive block (about 17 minutes at one sample per second)
+ARCHIVE_BLOCK_SIZE = 1024
+
+# Block sections besides the metric columns
+_SECTION_OFFSETS = '.offsets'
+_SECTION_IDS = '.ids'
+_SECTION_FLAGS = '.flags'
+_SECTION_EXTRAS = '.extras'
+
+# Largest number of decimal places tried before falling back to raw doubles
+MAX_DECIMAL_PLACES = 6
+
+# Column presence modes
+_PRESENT_NONE = 0
+_PRESENT_ALL = 1
+_PRESENT_BITMAP = 2
+
+# Column value encodings
+_ENCODING_INT = 0
+_ENCODING_DECIMAL = 1
+_ENCODING_DOUBLE = 2
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    """Append an unsigned LEB128 varint."""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_signed(out: bytearray, value: int) -> None:
+    """Append a zigzag encoded signed varint."""
+    _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+
+
+def _write_bytes(out: bytearray, data: bytes) -> None:
+    """Append a length prefixed byte string."""
+    _write_varint(out, len(data))
+    out += data
+
+
+class _Reader:
+    """Sequential reader over an archive payload."""
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+        self.pos = 0
+
+    def varint(self) -> int:
+        payload = self.payload
+        pos = self.pos
+        result = 0
+        shift = 0
+        while True:
+            byte = payload[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        self.pos = pos
+        return result
+
+    def signed(self) -> int:
+        value = self.varint()
+        return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+    def deltas(self, count: int) -> List[int]:
+        """Read count zigzag deltas and return the running values."""
+        values = []
+        current = 0
+        for _ in range(count):
+            current += self.signed()
+            values.append(current)
+        return values
+
+    def raw(self, size: int) -> bytes:
+        data = self.payload[self.pos:self.pos + size]
+        if len(data) != size:
+            raise ValueError("Truncated workout archive")
+        self.pos += size
+        return data
+
+    def bytes(self) -> bytes:
+        return self.raw(self.varint())
+
+
+def _write_deltas(out: bytearray, values: List[int]) -> None:
+    """Append integers as zigzag varint deltas."""
+    previous = 0
+    for value in values:
+        _write_signed(out, value - previous)
+        previous = value
+
+
+def _decimal_places(values: List[float]) -> Optional[int]:
+    """Smallest number of decimal places that represents every value exactly."""
+    for places in range(MAX_DECIMAL_PLACES + 1):
+        scale = 10 ** places
+        if all(round(value * scale) / scale == value for value in values):
+            return places
+    return None
+
+
+def _encode_column(out: bytearray, values: List[Optional[float]]) -> None:
+    """Append one metric column."""
+    present = [value for value in values if value is not None]
+
+    if not present:
+        out.append(_PRESENT_NONE)
+        return
+
+    if len(present) == len(values):
+        out.append(_PRESENT_ALL)
+    else:
+        out.append(_PRESENT_BITMAP)
+        bitmap = bytearray((len(values) + 7) // 8)
+        for index, value in enumerate(values):
+            if value is not None:
+                bitmap[index >> 3] |= 1 << (index & 7)
+        out += bitmap
+
+    if all(isinstance(value, int) for value in present):
+        out.append(_ENCODING_INT)
+        _write_deltas(out, present)
+        return
+
+    places = None
+    if all(math.isfinite(value) and abs(value) < 2 ** 53 for value in present):
+        places = _decimal_places(present)
+
+    if places is None:
+        out.append(_ENCODING_DOUBLE)
+        out += struct.pack(f'<{len(present)}d', *present)
+    else:
+        out.append(_ENCODING_DECIMAL)
+        out.append(places)
+        scale = 10 ** places
+        _write_deltas(out, [int(round(value * scale)) for value in present])
+
+
+def _decode_column(reader: _Reader, count: int) -> List[Optional[float]]:
+    """Read one metric column written by _encode_column()."""
+    mode = reader.payload[reader.pos]
+    reader.pos += 1
+
+    if mode == _PRESENT_NONE:
+        return [None] * count
+
+    if mode == _PRESENT_ALL:
+        mask = None
+        present_count = count
+    elif mode == _PRESENT_BITMAP:
+        mask = reader.raw((count + 7) // 8)
+        present_count = sum(bin(byte).count('1') for byte in mask)
+    else:
+        raise ValueError(f"Unknown column presence mode {mode}")
+
+    encoding = reader.payload[reader.pos]
+    reader.pos += 1
+
+    if encoding == _ENCODING_INT:
+        present = reader.deltas(present_count)
+    elif encoding == _ENCODING_DECIMAL:
+        scale = 10 ** reader.payload[reader.pos]
+        reader.pos += 1
+        present = [value / scale for value in reader.deltas(present_count)]
+    elif encoding == _ENCODING_DOUBLE:
+        present = list(struct.unpack(f'<{present_count}d', reader.raw(8 * present_count)))
+    else:
+        raise ValueError(f"Unknown column encoding {encoding}")
+
+    if mask is None:
+        return present
+
+    values: List[Optional[float]] = [None] * count
+    position = 0
+    for index in range(count):
+        if mask[index >> 3] & (1 << (index & 7)):
+            values[index] = present[position]
+            position += 1
+    return values
+
+
+def _timestamp_offsets(timestamps: List[str]) -> Tuple[str, List[int]]:
+    """
+    Convert ISO timestamps to microsecond offsets from the first one.
+
+    Raises:
+        ValueError: If a timestamp cannot be rebuilt exactly from its offset
+    """
+    base = datetime.fromisoformat(timestamps[0])
+    offsets = []
+    for text in timestamps:
+        moment = datetime.fromisoformat(text)
+        if (moment.tzinfo is None) != (base.tzinfo is None):
+            raise ValueError("Workout mixes naive and timezone aware timestamps")
+        offset = (moment - base) // timedelta(microseconds=1)
+        if (base + timedelta(microseconds=offset)).isoformat() != text:
+            raise ValueError(f"Timestamp {text} cannot be archived losslessly")
+        offsets.append(offset)
+    return timestamps[0], offsets
+
+
+def split_blocks(rows: List[Dict[str, Any]], block_size: int = ARCHIVE_BLOCK_SIZE) -> List[List[Dict[str, Any]]]:
+    """
+    Split samples in read order into archive blocks.
+
+    Args:
+        rows: Samples in read order
+        block_size: Maximum number of samples per block
+
+    Returns:
+        List of blocks, each a list of rows
+    """
+    block_size = max(1, int(block_size))
+    return [rows[start:start + block_size] for start in range(0, len(rows), block_size)]
+
+
+def encode_archive(rows: List[Dict[str, Any]]) -> bytes:
+    """
+    Pack workout samples into an archive block.
+
+    Args:
+        rows: Samples in read order, each with 'id', 'timestamp' (ISO
+            string), the typed column values, 'field_flags' and 'extras'
+
+    Returns:
+        Archive block blob
+
+    Raises:
+        ValueError: If the rows cannot be archived without loss
+    """
+    header = bytearray()
+    _write_varint(header, len(rows))
+    if not rows:
+        return ARCHIVE_MAGIC + bytes([ARCHIVE_VERSION]) + bytes(header)
+
+    base, offsets = _timestamp_offsets([row['timestamp'] for row in rows])
+    _write_bytes(header, base.encode('utf-8'))
+
+    sections = []
+    section = bytearray()
+    _write_deltas(section, offsets)
+    sections.append((_SECTION_OFFSETS, section))
+
+    section = bytearray()
+    _write_deltas(section, [row['id'] for row in rows])
+    sections.append((_SECTION_IDS, section))
+
+    section = bytearray()
+    for row in rows:
+        _write_varint(section, row['field_flags'] or 0)
+    sections.append((_SECTION_FLAGS, section))
+
+    section = bytearray()
+    extras = [(index, row['extras']) for index, row in enumerate(rows) if row['extras']]
+    _write_varint(section, len(extras))
+    previous = 0
+    for index, extras_json in extras:
+        _write_varint(section, index - previous)
+        _write_bytes(section, extras_json.encode('utf-8'))
+        previous = index
+    sections.append((_SECTION_EXTRAS, section))
+
+    # Columns without any value are left out and read back as None
+    for name, _, _ in SAMPLE_COLUMNS:
+        values = [row[name] for row in rows]
+        if any(value is not None for value in values):
+            section = bytearray()
+            _encode_column(section, values)
+            sections.append((name, section))
+
+    compressed = [(name, zlib.compress(bytes(section))) for name, section in sections]
+    _write_varint(header, len(compressed))
+    for name, data in compressed:
+        _write_bytes(header, name.encode('utf-8'))
+        _write_varint(header, len(data))
+    return ARCHIVE_MAGIC + bytes([ARCHIVE_VERSION]) + bytes(header) + b''.join(data for _, data in compressed)
+
+
+def decode_archive(blob: bytes, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Unpack an archive block (or a version 1 archive).
+
+    Only the timestamps and the requested columns of a block are
+    decompressed; row dictionaries are built one at a time as the iterator
+    is consumed.
+
+    Args:
+        blob: Archive blob written by encode_archive()
+        fields: Typed columns to read. When given, rows only have
+            'timestamp', those columns and 'data' (always None).
+
+    Returns:
+        Iterator over rows with 'id', 'timestamp' (ISO string), the typed
+        column values, 'field_flags', 'extras' and 'data' (always None)
+
+    Raises:
+        ValueError: If the blob is not a supported archive
+    """
+    blob = bytes(blob)
+    if blob[:3] != ARCHIVE_MAGIC or len(blob) < 4:
+        raise ValueError("Not a workout archive")
+    if blob[3] == LEGACY_ARCHIVE_VERSION:
+        return _decode_legacy_archive(blob, fields)
+    if blob[3] != ARCHIVE_VERSION:
+        raise ValueError(f"Unsupported workout archive version {blob[3]}")
+
+    try:
+        columns = _decode_block(blob, fields)
+    except (IndexError, struct.error, zlib.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Corrupt workout archive: {e}")
+    return _iter_rows(*columns, fields=fields)
+
+
+def _decode_block(blob: bytes, fields: Optional[List[str]]):
+    """Read the timestamps and the wanted columns of an archive block."""
+    reader = _Reader(blob)
+    reader.pos = 4
+    count = reader.varint()
+    if count == 0:
+        return 0, None, array('q'), None, None, {}, {}
+
+    base = datetime.fromisoformat(reader.bytes().decode('utf-8'))
+    sections = {}
+    directory = []
+    for _ in range(reader.varint()):
+        directory.append((reader.bytes().decode('utf-8'), reader.varint()))
+    position = reader.pos
+    for name, size in directory:
+        sections[name] = (position, size)
+        position += size
+    if position != len(blob):
+        raise ValueError("Truncated workout archive block")
+
+    def section(name: str) -> Optional[_Reader]:
+        if name not in sections:
+            return None
+        start, size = sections[name]
+        return _Reader(zlib.decompress(blob[start:start + size]))
+
+    if _SECTION_OFFSETS not in sections:
+        raise ValueError("Workout archive block without timestamps")
+    offsets = array('q', section(_SECTION_OFFSETS).deltas(count))
+
+    names = [name for name, _, _ in SAMPLE_COLUMNS] if fields is None else fields
+    values = {name: _decode_column(section(name), count) for name in names if name in sections}
+
+    if fields is not None:
+        return count, base, offsets, None, None, values, {}
+
+    ids = array('q', section(_SECTION_IDS).deltas(count))
+    flags_reader = section(_SECTION_FLAGS)
+    flags = array('q', (flags_reader.varint() for _ in range(count)))
+    extras = {}
+    extras_reader = section(_SECTION_EXTRAS)
+    index = 0
+    for _ in range(extras_reader.varint()):
+        index += extras_reader.varint()
+        extras[index] = extras_reader.bytes().decode('utf-8')
+    return count, base, offsets, ids, flags, values, extras
+
+
+def _decode_legacy_archive(blob: bytes, fields: Optional[List[str]]) -> Iterator[Dict[str, Any]]:
+    """Unpack a version 1 archive, compressed as a whole."""
+    try:
+        reader = _Reader(zlib.decompress(blob[4:]))
+    except zlib.error as e:
+        raise ValueError(f"Corrupt workout archive: {e}")
+
+    try:
+        columns = _decode_columns(reader)
+    except (IndexError, struct.error) as e:
+        raise ValueError(f"Corrupt workout archive: {e}")
+    return _iter_rows(*columns, fields=fields)
+
+
+def _decode_columns(reader: _Reader):
+    """Read every column of a version 1 archive payload."""
+    count = reader.varint()
+    if count == 0:
+        return 0, None, array('q'), array('q'), array('q'), {}, {}
+
+    base = datetime.fromisoformat(reader.bytes().decode('utf-8'))
+    offsets = array('q', reader.deltas(count))
+    ids = array('q', reader.deltas(count))
+    flags = array('q', (reader.varint() for _ in range(count)))
+
+    values = {}
+    for _ in range(reader.varint()):
+        name = reader.bytes().decode('utf-8')
+        values[name] = _decode_column(reader, count)
+
+    extras = {}
+    index = 0
+    for _ in range(reader.varint()):
+        index += reader.varint()
+        extras[index] = reader.bytes().decode('utf-8')
+
+    return count, base, offsets, ids, flags, values, extras
+
+
+def _iter_rows(count, base, offsets, ids, flags, values, extras,
+               fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Build row dictionaries from decoded columns."""
+    if fields is not None:
+        columns = [values.get(name) for name in fields]
+        for index in range(count):
+            row = {'timestamp': (base + timedelta(microseconds=offsets[index])).isoformat(), 'data': None}
+            for name, column in zip(fields, columns):
+                row[name] = column[index] if column is not None else None
+            yield row
+        return
+
+    names = [name for name, _, _ in SAMPLE_COLUMNS]
+    columns = [values.get(name) for name in names]
+
+    for index in range(count):
+        row = {
+            'id': ids[index],
+            'timestamp': (base + timedelta(microseconds=offsets[index])).isoformat(),
+            'field_flags': flags[index],
+            'extras': extras.get(index),
+            'data': None,
+        }
+        for name, column in zip(names, columns):
+            row[name] = column[index] if column is not None else None
+        yield row
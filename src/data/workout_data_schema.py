@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Workout Data Schema Module for Rogue to Garmin Bridge
+
+This module defines the typed columns of the workout_data table and converts
+between sample dictionaries and column values. Canonical metrics live in their
+own columns; any other keys are kept in a small JSON extras blob so samples
+round-trip unchanged. It also lists the workout summary metrics that are
+copied into columns of the workouts table.
+"""
+
+import json
+import math
+from typing import Dict, Any, List, Optional, Tuple
+
+# Typed columns and the sample keys they are filled from, in lookup order.
+# The index of the key that supplied the value is remembered so reads return
+# the sample with its original key.
+SAMPLE_COLUMNS: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ('power', 'REAL', ('instantaneous_power', 'instant_power', 'power')),
+    ('cadence', 'REAL', ('instantaneous_cadence', 'instant_cadence', 'cadence')),
+    ('speed', 'REAL', ('instantaneous_speed', 'instant_speed', 'speed')),
+    ('heart_rate', 'INTEGER', ('heart_rate',)),
+    ('distance', 'REAL', ('total_distance', 'distance')),
+    ('stroke_rate', 'REAL', ('stroke_rate',)),
+    ('stroke_count', 'INTEGER', ('stroke_count',)),
+    ('energy', 'REAL', ('total_energy', 'energy', 'calories')),
+    ('elapsed_time', 'REAL', ('elapsed_time',)),
+]
+
+SAMPLE_COLUMN_NAMES = [name for name, _, _ in SAMPLE_COLUMNS]
+
+# Summary metrics stored as indexed workouts columns, as (column, type).
+# The column names match the workout summary keys.
+SUMMARY_COLUMNS: List[Tuple[str, str]] = [
+    ('total_distance', 'REAL'),
+    ('total_calories', 'REAL'),
+    ('avg_power', 'REAL'),
+    ('max_power', 'REAL'),
+    ('avg_heart_rate', 'REAL'),
+    ('normalized_power', 'REAL'),
+]
+
+SUMMARY_COLUMN_NAMES = [name for name, _ in SUMMARY_COLUMNS]
+
+# Per column flag bits: two bits of alias index plus one "was an int" bit
+_FLAG_BITS = 3
+_ALIAS_MASK = 0b011
+_INT_FLAG = 0b100
+
+# SQLite integers are signed 64-bit
+_MAX_SQLITE_INT = 2 ** 63 - 1
+
+
+def _is_column_value(value: Any) -> bool:
+    """Whether a value can be stored in a typed column without loss."""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return -_MAX_SQLITE_INT <= value <= _MAX_SQLITE_INT
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return False
+
+
+def extract_columns(data: Dict[str, Any],
+                    columns: List[Tuple[str, str, Tuple[str, ...]]] = None) -> Tuple[List[Optional[float]], int, set]:
+    """
+    Pick the typed column values out of a sample dictionary.
+
+    Args:
+        data: Workout sample
+        columns: Column definitions (defaults to SAMPLE_COLUMNS)
+
+    Returns:
+        Tuple of (column values, field flags, sample keys that were used)
+    """
+    if columns is None:
+        columns = SAMPLE_COLUMNS
+
+    values: List[Optional[float]] = []
+    flags = 0
+    used_keys = set()
+
+    for position, (_, _, aliases) in enumerate(columns):
+        value = None
+        for alias_index, key in enumerate(aliases):
+            candidate = data.get(key)
+            if key in data and _is_column_value(candidate):
+                value = candidate
+                used_keys.add(key)
+                column_flags = alias_index
+                if isinstance(candidate, int):
+                    column_flags |= _INT_FLAG
+                flags |= column_flags << (position * _FLAG_BITS)
+                break
+        values.append(value)
+
+    return values, flags, used_keys
+
+
+def build_sample(values: List[Optional[float]], flags: int,
+                 columns: List[Tuple[str, str, Tuple[str, ...]]] = None) -> Dict[str, Any]:
+    """
+    Rebuild the typed part of a sample dictionary from column values.
+
+    Args:
+        values: Column values (None for missing)
+        flags: Field flags written by extract_columns()
+        columns: Column definitions (defaults to SAMPLE_COLUMNS)
+
+    Returns:
+        Sample dictionary keyed by the original field names
+    """
+    if columns is None:
+        columns = SAMPLE_COLUMNS
+
+    data: Dict[str, Any] = {}
+    flags = flags or 0
+
+    for position, (_, _, aliases) in enumerate(columns):
+        value = values[position]
+        if value is None:
+            continue
+        column_flags = flags >> (position * _FLAG_BITS)
+        key = aliases[min(column_flags & _ALIAS_MASK, len(aliases) - 1)]
+        if column_flags & _INT_FLAG:
+            value = int(value)
+        elif isinstance(value, int):
+            value = float(value)
+        data[key] = value
+
+    return data
+
+
+def split_sample(data: Dict[str, Any]) -> Tuple[List[Optional[float]], int, Optional[str]]:
+    """
+    Split a sample dictionary into typed column values.
+
+    Args:
+        data: Workout sample
+
+    Returns:
+        Tuple of (column values in SAMPLE_COLUMNS order, field flags,
+        extras JSON or None)
+
+    Raises:
+        TypeError: If the extra keys are not JSON serializable
+    """
+    values, flags, used_keys = extract_columns(data)
+
+    extras = {key: value for key, value in data.items() if key not in used_keys}
+    extras_json = json.dumps(extras) if extras else None
+
+    return values, flags, extras_json
+
+
+def merge_sample(values: List[Optional[float]], flags: int, extras_json: Optional[str]) -> Dict[str, Any]:
+    """
+    Rebuild a sample dictionary from typed column values.
+
+    Args:
+        values: Column values in SAMPLE_COLUMNS order
+        flags: Field flags written by split_sample()
+        extras_json: Extras JSON or None
+
+    Returns:
+        Workout sample dictionary
+    """
+    data = build_sample(values, flags)
+
+    if extras_json:
+        data.update(json.loads(extras_json))
+
+    return data
+
+
+def summary_column_values(summary: Optional[Dict[str, Any]]) -> List[Optional[float]]:
+    """
+    Pick the summary column values out of a workout summary.
+
+    Args:
+        summary: Workout summary dictionary (or None)
+
+    Returns:
+        Values in SUMMARY_COLUMNS order (None for missing or non-numeric)
+    """
+    summary = summary or {}
+    values = []
+    for name, _ in SUMMARY_COLUMNS:
+        value = summary.get(name)
+        values.append(float(value) if _is_column_value(value) else None)
+    return values
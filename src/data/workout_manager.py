@@ -11,13 +11,22 @@ import time
 import os  # Added for path joining
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, Iterator, List, Any, Optional, Callable, Tuple
 from datetime import datetime
 
 from ..ftms.ftms_manager import FTMSDeviceManager
 from .database import Database
+from .ingest_writer import DEFAULT_BATCH_SIZE, DEFAULT_MAX_LATENCY_MS
 from .data_processor import DataProcessor  # Added import
+from .summary_accumulators import RunningStats, StreamingOutlierMean, NormalizedPower
+from .sample_buffer import SampleBuffer, SampleBufferView
+from .live_publisher import LivePublisher, normalize_live_sample
+from .job_queue import (
+    JobQueue, FIT_JOB, FIT_REGENERATION_JOB, ARCHIVE_JOB, FIT_AUDIT_JOB, JOB_PROGRESS, JOB_COMPLETED, JOB_FAILED_EVENT
+)
 from ..fit.fit_converter import FITConverter  # Added import
+from ..fit.fit_catalog import FITCatalog, FITCatalogReconciler
+from ..fit.live_fit_writer import LiveFitWriter, PARTIAL_SUFFIX, recover_partial_fit_file
 
 # Configure logging
 logging.basicConfig(
@@ -26,33 +35,84 @@ logging.basicConfig(
 )
 logger = logging.getLogger('workout_manager')
 
+# Time end_workout waits for queued samples; the FIT and archive jobs flush
+# again, up to JOB_FLUSH_ATTEMPTS times, before reading the samples back
+END_FLUSH_TIMEOUT_SECONDS = 2.0
+JOB_FLUSH_TIMEOUT_SECONDS = 10.0
+JOB_FLUSH_ATTEMPTS = 3
+
 class WorkoutManager:
     """
     Class for managing workout sessions, collecting and processing data.
     """
     
-    def __init__(self, db_path: str, ftms_manager: FTMSDeviceManager = None):
+    def __init__(self, db_path: str, ftms_manager: FTMSDeviceManager = None,
+                 write_behind: bool = True,
+                 ingest_batch_size: int = DEFAULT_BATCH_SIZE,
+                 ingest_max_latency_ms: int = DEFAULT_MAX_LATENCY_MS,
+                 db_profile: Optional[str] = None,
+                 live_fit: bool = False):
         """
         Initialize the workout manager.
         
         Args:
             db_path: Path to the SQLite database file
             ftms_manager: FTMS device manager instance (optional)
+            write_behind: Persist samples through the batched ingest writer
+            ingest_batch_size: Number of queued samples that triggers a commit
+            ingest_max_latency_ms: Maximum time a queued sample waits before commit
+            db_profile: Database connection profile ('ssd', 'sd_card' or
+                'rollback'; defaults to 'ssd')
+            live_fit: Write the FIT file while the workout runs instead of
+                converting the stored samples after it ends
         """
-        self.database = Database(db_path)
+        self.database = Database(
+            db_path,
+            write_behind=write_behind,
+            batch_size=ingest_batch_size,
+            max_latency_ms=ingest_max_latency_ms,
+            profile=db_profile
+        )
         self.ftms_manager = ftms_manager
         self.data_processor = DataProcessor() # Initialize DataProcessor
         # Define the output directory for FIT files relative to the project root
         fit_output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "fit_files"))
         self.fit_converter = FITConverter(output_dir=fit_output_dir) # Initialize FITConverter
         
+        # Catalog of the FIT files on disk, reconciled in the background
+        self.fit_catalog = FITCatalog(self.database)
+        self.fit_catalog_reconciler = FITCatalogReconciler(self.fit_catalog, fit_output_dir)
+        
         # Current workout state
         self.active_workout_id = None
         self.active_device_id = None
         self.workout_start_time = None
         self.workout_type = None
-        self.data_points = []
+        self.sample_buffer = SampleBuffer()
         self.summary_metrics = {}
+        self._reset_accumulators()
+        
+        # Live event stream: each sample and summary change is encoded once
+        # and fanned out to every streaming client
+        self.live_publisher = LivePublisher()
+        self._live_summary: Dict[str, Any] = {}
+        
+        # Background jobs (FIT file generation) run outside the request that
+        # ends the workout
+        self.job_queue = JobQueue(self.database)
+        self.job_queue.register_handler(FIT_JOB, self._run_fit_job)
+        self.job_queue.register_handler(FIT_REGENERATION_JOB, self._run_fit_regeneration_job)
+        self.job_queue.register_handler(ARCHIVE_JOB, self._run_archive_job)
+        self.job_queue.register_handler(FIT_AUDIT_JOB, self._run_fit_audit_job)
+        self.job_queue.register_callback(self._handle_job_event)
+        self.last_fit_job_id: Optional[int] = None
+        
+        # Optional FIT file written as samples arrive; partial files left
+        # by a crash are finished on start
+        self.live_fit = live_fit
+        self.live_fit_writer: Optional[LiveFitWriter] = None
+        if self.live_fit:
+            self._recover_live_fit_files()
         
         # Callbacks
         self.data_callbacks = []
@@ -63,6 +123,27 @@ class WorkoutManager:
             self.ftms_manager.register_data_callback(self._handle_ftms_data)
             self.ftms_manager.register_status_callback(self._handle_ftms_status)
     
+    @property
+    def data_points(self) -> SampleBuffer:
+        """Samples of the active workout (the live sample buffer)."""
+        return self.sample_buffer
+    
+    @data_points.setter
+    def data_points(self, samples) -> None:
+        """Replace the samples of the active workout."""
+        self.sample_buffer.clear()
+        for sample in samples:
+            self.sample_buffer.append(sample)
+    
+    def get_live_samples(self) -> SampleBufferView:
+        """
+        Get a read-only view of the active workout's samples.
+        
+        Returns:
+            View over the live sample buffer
+        """
+        return self.sample_buffer.view()
+    
     def register_data_callback(self, callback: Callable[[Dict[str, Any]], None]) -> None:
         """
         Register a callback function to receive processed workout data.
@@ -104,7 +185,9 @@ class WorkoutManager:
         self.active_device_id = device_id
         self.workout_start_time = datetime.now()
         self.workout_type = workout_type
-        self.data_points = []
+        self.sample_buffer.clear()
+        self._reset_accumulators()
+        self._open_live_fit()
         self.summary_metrics = {
             'total_distance': 0,
             'total_calories': 0,
@@ -129,6 +212,8 @@ class WorkoutManager:
             'start_time': datetime.now().isoformat()
         })
         
+        self._publish_workout_state()
+        
         logger.info(f"Started workout {workout_id} with device {device_id}")
         return workout_id
     
@@ -151,6 +236,12 @@ class WorkoutManager:
         # Calculate final summary metrics
         self._calculate_summary_metrics()
         
+        # Force queued samples to disk; the FIT and archive jobs flush again
+        # before reading them back, so samples still failing here are not lost
+        if not self.database.flush_workout_data(END_FLUSH_TIMEOUT_SECONDS):
+            logger.warning(f"Not all samples for workout {workout_id_to_end} were flushed yet, "
+                           f"leaving them to the background job")
+        
         # End workout in database with summary metrics (but no FIT file path yet)
         success = self.database.end_workout(
             workout_id_to_end,
@@ -161,60 +252,117 @@ class WorkoutManager:
             logger.error(f"Failed to end workout {workout_id_to_end}")
             return False
         
-        # Use the optimized FIT processor to generate the FIT file
-        try:
-            # Import FITProcessor here to avoid circular imports
-            from ..fit.fit_processor import FITProcessor
-            
-            # Define the output directory for FIT files
-            fit_output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "fit_files"))
-            
-            # Create FIT processor
-            fit_processor = FITProcessor(self.database.db_path, fit_output_dir)
-            
-            # Process workout and generate FIT file
-            fit_file_path = fit_processor.process_workout(
-                workout_id_to_end, 
-                user_profile=self.get_user_profile()
-            )
+        # Streaming clients see the end before the FIT file is built
+        self._publish_workout_state(ended=True)
+        
+        # Close the live FIT file if there is one; otherwise build the FIT
+        # file in the background so ending returns immediately. The samples
+        # are packed into a compressed archive in the background too: by the
+        # FIT job once the converter has read them, or by an archive job.
+        fit_file_path = self._finish_live_fit(workout_id_to_end)
+        if fit_file_path:
+            self.last_fit_job_id = None
+            if self.job_queue.submit(ARCHIVE_JOB, workout_id_to_end) is None:
+                logger.warning(f"Failed to queue archiving of workout {workout_id_to_end}")
+        else:
+            self.last_fit_job_id = self.generate_fit_file(workout_id_to_end)
+        
+        # Notify status
+        duration = (datetime.now() - start_time_to_end).total_seconds()
+        self._notify_status("workout_ended", {
+            "workout_id": workout_id_to_end,
+            "device_id": self.active_device_id,
+            "workout_type": workout_type_to_end,
+            "duration": int(duration),
+            "summary": self.summary_metrics,
+            "fit_file_path": fit_file_path,
+            "fit_job_id": self.last_fit_job_id
+        })
+        
+        # Clear current workout state
+        self.active_workout_id = None
+        self.active_device_id = None
+        self.workout_start_time = None
+        self.workout_type = None
+        self.sample_buffer.clear()
+        self.summary_metrics = {}
+        
+        return True
+    
+    def generate_fit_file(self, workout_id: int) -> Optional[int]:
+        """
+        Queue generation of the FIT file of a finished workout.
+        
+        Args:
+            workout_id: Workout ID
             
-            # Update the workout record with the FIT file path
-            if fit_file_path:
-                logger.info(f"Successfully created FIT file for workout {workout_id_to_end}: {fit_file_path}")
-            else:
-                logger.warning(f"Failed to create FIT file for workout {workout_id_to_end}")
-        
-            # Notify status
-            duration = (datetime.now() - start_time_to_end).total_seconds()
-            self._notify_status("workout_ended", {
-                "workout_id": workout_id_to_end,
-                "device_id": self.active_device_id,
-                "workout_type": workout_type_to_end,
-                "duration": int(duration),
-                "summary": self.summary_metrics,
-                "fit_file_path": fit_file_path
-            })
-            
-            # Clear current workout state
-            self.active_workout_id = None
-            self.active_device_id = None
-            self.workout_start_time = None
-            self.workout_type = None
-            self.data_points = []
-            self.summary_metrics = {}
+        Returns:
+            ID of the FIT job (an unfinished job for the workout is reused),
+            or None if it could not be queued
+        """
+        job_id = self.job_queue.submit(FIT_JOB, workout_id)
+        if job_id is None:
+            logger.error(f"Failed to queue FIT file generation for workout {workout_id}")
+        return job_id
+    
+    def regenerate_fit_files(self, only_missing: bool = False, limit: Optional[int] = None,
+                             workers: Optional[int] = None) -> Optional[int]:
+        """
+        Queue a parallel regeneration of the FIT files of finished workouts.
+        
+        An interrupted regeneration is resumed from its checkpoint, in which
+        case the selection arguments are not used.
+        
+        Args:
+            only_missing: Only workouts without a FIT file
+            limit: Maximum number of workouts (newest first)
+            workers: Number of worker processes (defaults to one per core)
             
-            return True
-        except Exception as e:
-            logger.error(f"Error processing workout for FIT file: {str(e)}")
+        Returns:
+            ID of the regeneration job (a running one is reused), or None if
+            it could not be queued
+        """
+        params = {'only_missing': only_missing, 'limit': limit, 'workers': workers}
+        return self.job_queue.submit(FIT_REGENERATION_JOB, params=params)
+    
+    def audit_fit_files(self, mode: Optional[str] = None, workers: Optional[int] = None,
+                        include_files: bool = False) -> Optional[int]:
+        """
+        Queue an audit of the FIT file directory.
+        
+        The job result is the audit report; see fit_audit.audit_fit_directory.
+        
+        Args:
+            mode: Audit mode (defaults to analyzing and validating)
+            workers: Number of worker processes (defaults to one per core)
+            include_files: Keep the per-file results in the report
             
-            # Clear current workout state            self.active_workout_id = None
-            self.active_device_id = None
-            self.workout_start_time = None
-            self.workout_type = None
-            self.data_points = []
-            self.summary_metrics = {}
+        Returns:
+            ID of the audit job (a running one is reused), or None if it
+            could not be queued
+        """
+        params = {'mode': mode, 'workers': workers, 'include_files': include_files}
+        return self.job_queue.submit(FIT_AUDIT_JOB, params=params)
+    
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the state of a background job.
+        
+        Args:
+            job_id: Job ID
             
-            return True  # Still return True since the workout was ended in database
+        Returns:
+            Job dictionary or None if not found
+        """
+        return self.job_queue.get_job(job_id)
+    
+    def start_job_workers(self) -> None:
+        """Start the background job workers, resuming jobs left by a previous run."""
+        self.job_queue.start()
+    
+    def start_fit_catalog_reconciler(self) -> None:
+        """Start reconciling the FIT file catalog with the FIT file directory."""
+        self.fit_catalog_reconciler.start()
     
     def add_data_point(self, data: Dict[str, Any]) -> bool:
         """
@@ -235,11 +383,8 @@ class WorkoutManager:
         logger.info(f"ADDING DATA POINT at {absolute_timestamp.isoformat()}")
         logger.info(f"Data: {data}")
         
-        # Store data point locally (optional, consider if needed for summary)
-        # Add absolute timestamp to local data point if keeping it
-        data_with_ts = data.copy()
-        data_with_ts["timestamp"] = absolute_timestamp 
-        self.data_points.append(data_with_ts)
+        # Keep the typed metrics in the compact live buffer
+        self.sample_buffer.append(data, absolute_timestamp)
           # Update summary metrics
         self._update_summary_metrics(data)
         
@@ -255,8 +400,12 @@ class WorkoutManager:
                 # Log successful data point storage
                 logger.info(f"Successfully saved data point to workout {self.active_workout_id}")
                 
+                if self.live_fit_writer:
+                    self.live_fit_writer.add_sample(absolute_timestamp, data)
+                
                 # Notify data callbacks
                 self._notify_data(data)
+                self._publish_sample(data)
                 return True
             else:
                 logger.error(f"Failed to add data point to workout {self.active_workout_id}")
@@ -265,6 +414,54 @@ class WorkoutManager:
             logger.error(f"Exception adding data point to workout {self.active_workout_id}: {str(e)}")
             return False
     
+    def add_data_points(self, samples: List[Tuple[datetime, Dict[str, Any]]]) -> bool:
+        """
+        Add several data points to the current workout in one transaction.
+        
+        The batch is stored before the live buffer, summary metrics and
+        callbacks see it, so a batch that failed can be sent again without
+        being counted twice.
+        
+        Args:
+            samples: List of (timestamp, data) tuples in time order
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not self.active_workout_id:
+            logger.warning("No active workout to add data to")
+            return False
+        if not samples:
+            return True
+        
+        workout_id = self.active_workout_id
+        try:
+            success = self.database.add_workout_data_batch(
+                [(workout_id, timestamp, data) for timestamp, data in samples]
+            )
+        except Exception as e:
+            logger.error(f"Exception adding {len(samples)} data points to workout {workout_id}: {str(e)}")
+            return False
+        if not success:
+            logger.error(f"Failed to add {len(samples)} data points to workout {workout_id}")
+            return False
+        
+        # Place the samples on the monotonic clock by their age
+        now_wall = datetime.now()
+        now_monotonic = time.monotonic()
+        for timestamp, data in samples:
+            age = (now_wall - timestamp).total_seconds()
+            self.sample_buffer.append(data, timestamp, monotonic=now_monotonic - age)
+            self._update_summary_metrics(data)
+            if self.live_fit_writer:
+                self.live_fit_writer.add_sample(timestamp, data)
+            self._notify_data(data)
+            self._publish_sample(data, summary=False)
+        self._publish_summary()
+        
+        logger.info(f"Saved {len(samples)} data points to workout {workout_id}")
+        return True
+    
     def get_workout(self, workout_id: int) -> Optional[Dict[str, Any]]:
         """
         Get workout information.
@@ -277,6 +474,27 @@ class WorkoutManager:
         """
         return self.database.get_workout(workout_id)
     
+    def get_workout_version(self, workout_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the change version of a workout (see Database.get_workout_version).
+        
+        Args:
+            workout_id: Workout ID
+            
+        Returns:
+            Version dictionary or None if not found
+        """
+        return self.database.get_workout_version(workout_id)
+    
+    def get_table_versions(self) -> Dict[str, int]:
+        """
+        Get the change counters of the versioned tables.
+        
+        Returns:
+            Dictionary of table name to change counter
+        """
+        return self.database.get_table_versions()
+
     def get_workout_data(self, workout_id: int) -> List[Dict[str, Any]]:
         """
         Get all data points for a workout.
@@ -289,18 +507,73 @@ class WorkoutManager:
         """
         return self.database.get_workout_data(workout_id)
     
-    def get_workouts(self, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+    def iter_workout_data(self, workout_id: int, fields: Optional[List[str]] = None,
+                          start: Optional[datetime] = None,
+                          end: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the data points of a workout without loading them all at once.
+        
+        Args:
+            workout_id: Workout ID
+            fields: Typed columns to read (see Database.iter_workout_data)
+            start: Only samples at or after this time
+            end: Only samples before this time
+            
+        Returns:
+            Iterator over workout data dictionaries
+        """
+        return self.database.iter_workout_data(workout_id, fields=fields, start=start, end=end)
+    
+    def get_workout_rollups(self, workout_id: int, resolution: int,
+                            start: Optional[datetime] = None,
+                            end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Get the aggregated buckets of a workout at one resolution.
+        
+        Args:
+            workout_id: Workout ID
+            resolution: Bucket size in seconds
+            start: Only buckets overlapping this time or later
+            end: Only buckets starting before this time
+            
+        Returns:
+            List of rollup buckets (see Database.get_workout_rollups)
+        """
+        return self.database.get_workout_rollups(workout_id, resolution, start=start, end=end)
+    
+    def get_workouts(self, limit: int = 10, offset: int = 0, sort_by: str = 'start_time',
+                     descending: bool = True) -> List[Dict[str, Any]]:
         """
         Get recent workouts.
         
         Args:
             limit: Maximum number of workouts to return
             offset: Offset for pagination
+            sort_by: Column to sort by (see Database.get_workouts)
+            descending: Sort from the highest value down
             
         Returns:
             List of workout dictionaries
         """
-        return self.database.get_workouts(limit, offset)
+        return self.database.get_workouts(limit, offset, sort_by=sort_by, descending=descending)
+    
+    def search_workouts(self, **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Search workouts one page at a time (see Database.search_workouts).
+        
+        Returns:
+            Tuple of (workout dictionaries, next page token or None)
+        """
+        return self.database.search_workouts(**kwargs)
+    
+    def iter_workouts(self, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over every workout matching the search filters, newest first.
+        
+        Returns:
+            Iterator over workout dictionaries
+        """
+        return self.database.iter_workouts(**filters)
     
     def get_devices(self) -> List[Dict[str, Any]]:
         """
@@ -341,6 +614,9 @@ class WorkoutManager:
         """
         if self.active_workout_id:
             self.add_data_point(data)
+        else:
+            # Live metrics are streamed before a workout is started too
+            self._publish_sample(data)
     
     def _handle_ftms_status(self, status: str, data: Any) -> None:
         """
@@ -380,6 +656,15 @@ class WorkoutManager:
             if self.active_workout_id:
                 self.end_workout()
     
+    def _reset_accumulators(self) -> None:
+        """Reset the streaming accumulators behind the running averages."""
+        self._power_stats = RunningStats()
+        self._heart_rate_stats = RunningStats()
+        self._cadence_stats = RunningStats()
+        self._stroke_rate_stats = RunningStats()
+        self._speed_stats = StreamingOutlierMean(sigma=2.0, min_samples=4)
+        self._normalized_power = NormalizedPower()
+    
     def _update_summary_metrics(self, data: Dict[str, Any]) -> None:
         """
         Update summary metrics with new data point.
@@ -450,28 +735,29 @@ class WorkoutManager:
             if power > self.summary_metrics.get('max_power', 0):
                 self.summary_metrics['max_power'] = power
         
+        # Accumulate instantaneous power for the running average
+        for key in ['instant_power', 'instantaneous_power', 'power']:
+            if key in data and data[key] is not None:
+                self._power_stats.add(data[key])
+                self._normalized_power.add(data[key])
+                break
+        
         # Use average power directly from device if available
         if 'average_power' in data and data['average_power'] is not None:
             self.summary_metrics['avg_power'] = data['average_power']
         # Otherwise calculate from instantaneous values
         elif any(key in data for key in ['instant_power', 'instantaneous_power', 'power']):
-            power_values = []
-            for d in self.data_points:
-                for key in ['instant_power', 'instantaneous_power', 'power']:
-                    if key in d and d[key] is not None:
-                        power_values.append(d[key])
-                        break
-            if power_values:
-                self.summary_metrics['avg_power'] = sum(power_values) / len(power_values)
+            if self._power_stats.count:
+                self.summary_metrics['avg_power'] = self._power_stats.mean
         
         # Update heart rate metrics
         if 'heart_rate' in data:
             hr = data['heart_rate']
             
             # Check for potential heart rate sensor issues (bike-specific)
-            if hr > 0 and hr < 80 and len(self.data_points) > 10:
+            if hr > 0 and hr < 80 and len(self.sample_buffer) > 10:
                 # Check if heart rate has been consistently low
-                recent_hr_values = [d.get('heart_rate', 0) for d in self.data_points[-10:] if 'heart_rate' in d and d['heart_rate'] > 0]
+                recent_hr_values = [v for v in self.sample_buffer.column('heart_rate', -10) if v > 0]
                 if recent_hr_values and all(hr_val < 80 for hr_val in recent_hr_values):
                     logger.warning(f"Heart rate consistently low ({hr} BPM) - this may indicate:")
                     logger.warning("1. No heart rate sensor connected to the bike")
@@ -484,9 +770,8 @@ class WorkoutManager:
                 self.summary_metrics['max_heart_rate'] = hr
             
             # Update average heart rate
-            hr_values = [d.get('heart_rate', 0) for d in self.data_points if 'heart_rate' in d]
-            if hr_values:
-                self.summary_metrics['avg_heart_rate'] = sum(hr_values) / len(hr_values)
+            self._heart_rate_stats.add(hr)
+            self.summary_metrics['avg_heart_rate'] = self._heart_rate_stats.mean
           # Update cadence metrics - check for multiple possible field names
         cadence_keys = ['instant_cadence', 'instantaneous_cadence', 'cadence']
         cadence_value = None
@@ -501,6 +786,9 @@ class WorkoutManager:
             # Log the received cadence value for debugging
             logger.debug(f"Received cadence value: {cadence_value}")
             
+            # Accumulate non-zero cadence for the running average
+            self._cadence_stats.add(cadence_value)
+            
             # Update max cadence if higher
             if cadence_value > self.summary_metrics.get('max_cadence', 0):
                 self.summary_metrics['max_cadence'] = cadence_value
@@ -512,18 +800,9 @@ class WorkoutManager:
             logger.debug(f"Using device-reported average cadence: {data['average_cadence']}")
         # Otherwise calculate from instantaneous values
         elif cadence_value is not None:
-            # Collect all non-zero cadence values
-            cadence_values = []
-            for d in self.data_points:
-                for key in cadence_keys:
-                    if key in d and d[key] is not None and d[key] > 0:
-                        cadence_values.append(d[key])
-                        break
-                        
-            if cadence_values:
-                avg_cadence = sum(cadence_values) / len(cadence_values)
-                self.summary_metrics['avg_cadence'] = avg_cadence
-                logger.debug(f"Calculated average cadence from {len(cadence_values)} data points: {avg_cadence}")
+            avg_cadence = self._cadence_stats.mean
+            self.summary_metrics['avg_cadence'] = avg_cadence
+            logger.debug(f"Calculated average cadence from {self._cadence_stats.count} data points: {avg_cadence}")
         
         # Update speed metrics - check instantaneous values only
         if 'instant_speed' in data or 'instantaneous_speed' in data or 'speed' in data:
@@ -538,35 +817,21 @@ class WorkoutManager:
                 self.summary_metrics['max_speed'] = speed
           # IMPROVED: Calculate average speed from instantaneous values with outlier filtering
         # Ignore device-reported average_speed completely as it's often inaccurate
-        speed_values = []
-        for d in self.data_points:
-            for key in ['instant_speed', 'instantaneous_speed', 'speed']:
-                if key in d and d[key] is not None and d[key] > 0:  # Only include positive values
-                    speed_values.append(d[key])
-                    break
+        for key in ['instant_speed', 'instantaneous_speed', 'speed']:
+            if key in data and data[key] is not None and data[key] > 0:  # Only include positive values
+                self._speed_stats.add(data[key])
+                break
         
-        if speed_values:
-            # Basic outlier removal - filter out values more than 2 standard deviations from mean
-            if len(speed_values) > 4:  # Only apply filtering if we have enough data points
-                mean_speed = sum(speed_values) / len(speed_values)
-                std_dev = (sum((x - mean_speed) ** 2 for x in speed_values) / len(speed_values)) ** 0.5
-                
-                # Filter out outliers
-                filtered_speeds = [s for s in speed_values if abs(s - mean_speed) <= 2 * std_dev]
-                
-                if filtered_speeds:  # Ensure we still have values after filtering
-                    avg_calculated_speed = sum(filtered_speeds) / len(filtered_speeds)
-                    logger.info(f"Calculated average speed from {len(filtered_speeds)} filtered data points " +
-                              f"(removed {len(speed_values) - len(filtered_speeds)} outliers): {avg_calculated_speed} km/h")
-                else:
-                    # Fall back to simple average if filtering removed all points
-                    avg_calculated_speed = sum(speed_values) / len(speed_values)
-                    logger.info(f"Falling back to unfiltered average speed from {len(speed_values)} data points: " +
-                              f"{avg_calculated_speed} km/h")
+        if self._speed_stats.count:
+            # Basic outlier removal - values more than 2 standard deviations from the
+            # mean are left out once there are more than 4 data points
+            avg_calculated_speed, kept = self._speed_stats.filtered_stats()
+            speed_count = self._speed_stats.count
+            if kept < speed_count:
+                logger.info(f"Calculated average speed from {kept} filtered data points " +
+                          f"(removed {speed_count - kept} outliers): {avg_calculated_speed} km/h")
             else:
-                # Simple average for small number of data points
-                avg_calculated_speed = sum(speed_values) / len(speed_values)
-                logger.info(f"Calculated average speed from {len(speed_values)} data points: {avg_calculated_speed} km/h")
+                logger.info(f"Calculated average speed from {speed_count} data points: {avg_calculated_speed} km/h")
             
             self.summary_metrics['avg_speed'] = avg_calculated_speed
             
@@ -598,9 +863,9 @@ class WorkoutManager:
                 self.summary_metrics['max_power'] = power
             
             # Update average power
-            power_values = [d.get('instantaneous_power', 0) for d in self.data_points if 'instantaneous_power' in d]
-            if power_values:
-                self.summary_metrics['avg_power'] = sum(power_values) / len(power_values)
+            self._power_stats.add(power)
+            self._normalized_power.add(power)
+            self.summary_metrics['avg_power'] = self._power_stats.mean
         
         # Update heart rate metrics
         if 'heart_rate' in data:
@@ -611,9 +876,8 @@ class WorkoutManager:
                 self.summary_metrics['max_heart_rate'] = hr
             
             # Update average heart rate
-            hr_values = [d.get('heart_rate', 0) for d in self.data_points if 'heart_rate' in d]
-            if hr_values:
-                self.summary_metrics['avg_heart_rate'] = sum(hr_values) / len(hr_values)
+            self._heart_rate_stats.add(hr)
+            self.summary_metrics['avg_heart_rate'] = self._heart_rate_stats.mean
         
         # Update stroke metrics
         if 'stroke_count' in data:
@@ -627,9 +891,8 @@ class WorkoutManager:
                 self.summary_metrics['max_stroke_rate'] = stroke_rate
             
             # Update average stroke rate
-            stroke_rate_values = [d.get('stroke_rate', 0) for d in self.data_points if 'stroke_rate' in d]
-            if stroke_rate_values:
-                self.summary_metrics['avg_stroke_rate'] = sum(stroke_rate_values) / len(stroke_rate_values)
+            self._stroke_rate_stats.add(stroke_rate)
+            self.summary_metrics['avg_stroke_rate'] = self._stroke_rate_stats.mean
     
     def get_workout_summary_metrics(self) -> Dict[str, Any]:
         """
@@ -678,12 +941,269 @@ class WorkoutManager:
         """Calculate final summary metrics for the workout."""
         # Most metrics are already calculated incrementally
         # This method can be used for any final calculations
+        if self._normalized_power.value > 0:
+            self.summary_metrics['normalized_power'] = self._normalized_power.value
         
         # Round average values
         for key in self.summary_metrics:
             if key.startswith('avg_'):
                 self.summary_metrics[key] = round(self.summary_metrics[key], 2)
     
+    def _publish_sample(self, data: Dict[str, Any], summary: bool = True) -> None:
+        """
+        Stream a sample and the summary metrics that changed with it.
+        
+        Args:
+            data: Workout data point
+            summary: Also stream the summary change (batches send it once at the end)
+        """
+        sample = normalize_live_sample(data, self.workout_type, self.active_workout_id)
+        self.live_publisher.publish('sample', sample, retain=sample)
+        if summary:
+            self._publish_summary()
+    
+    def _publish_summary(self) -> None:
+        """Stream the summary metrics that changed since the last summary event."""
+        publisher = self.live_publisher
+        if not publisher.subscriber_count or not self.active_workout_id:
+            # Without subscribers the summary is not computed; the next
+            # subscriber starts from the last summary sent and its deltas
+            return
+        
+        try:
+            summary = self.get_workout_summary_metrics()
+        except Exception as e:
+            logger.error(f"Error getting workout summary: {str(e)}")
+            return
+        delta = {key: value for key, value in summary.items() if self._live_summary.get(key) != value}
+        if delta:
+            self._live_summary = summary
+            publisher.publish('summary', delta, retain=summary)
+    
+    def _publish_workout_state(self, ended: bool = False) -> None:
+        """
+        Stream the start or end of the active workout.
+        
+        Args:
+            ended: Whether the active workout has just ended
+        """
+        publisher = self.live_publisher
+        publisher.forget('sample')
+        publisher.forget('summary')
+        self._live_summary = {}
+        state = {
+            'workout_active': not ended,
+            'workout_id': None if ended else self.active_workout_id,
+            'workout_type': None if ended else self.workout_type,
+        }
+        publisher.publish('status', state, retain=state)
+    
+    def _run_fit_job(self, job: Dict[str, Any], report: Callable[[float, Optional[str]], None]) -> Dict[str, Any]:
+        """
+        Generate the FIT file of a workout (job queue handler).
+        
+        Args:
+            job: Claimed FIT job
+            report: Progress reporter
+            
+        Returns:
+            Job result with the FIT file path and name
+            
+        Raises:
+            RuntimeError: If the workout's samples could not be written or
+                no FIT file was created
+        """
+        # Import FITProcessor here to avoid circular imports
+        from ..fit.fit_processor import FITProcessor
+        
+        workout_id = job['workout_id']
+        self._flush_samples(workout_id)
+        self._finalize_rollups(workout_id)
+        fit_output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "fit_files"))
+        fit_processor = FITProcessor(self.database.db_path, fit_output_dir)
+        try:
+            fit_file_path = fit_processor.process_workout(
+                workout_id,
+                user_profile=self.get_user_profile(),
+                progress=report
+            )
+        finally:
+            # Archive only after the converter is done reading the sample rows
+            self._archive_workout(workout_id)
+        if not fit_file_path:
+            raise RuntimeError(f"FIT file for workout {workout_id} was not created")
+        
+        logger.info(f"Successfully created FIT file for workout {workout_id}: {fit_file_path}")
+        return {'fit_file_path': fit_file_path, 'fit_file_name': os.path.basename(fit_file_path)}
+    
+    def _run_archive_job(self, job: Dict[str, Any], report: Callable[[float, Optional[str]], None]) -> Dict[str, Any]:
+        """
+        Pack the samples of a finished workout into its archive (job queue handler).
+        
+        Args:
+            job: Claimed archive job
+            report: Progress reporter
+            
+        Returns:
+            Job result saying whether the samples are archived
+            
+        Raises:
+            RuntimeError: If the workout's samples could not be written
+        """
+        self._flush_samples(job['workout_id'])
+        self._finalize_rollups(job['workout_id'])
+        return {'archived': self._archive_workout(job['workout_id'])}
+    
+    def _flush_samples(self, workout_id: int) -> None:
+        """
+        Write the queued samples of a finished workout before a job reads them.
+        
+        Args:
+            workout_id: Workout ID
+            
+        Raises:
+            RuntimeError: If samples are still unwritten after JOB_FLUSH_ATTEMPTS flushes
+        """
+        for attempt in range(1, JOB_FLUSH_ATTEMPTS + 1):
+            if self.database.flush_workout_data(JOB_FLUSH_TIMEOUT_SECONDS):
+                return
+            logger.warning(f"Flushing samples of workout {workout_id} failed (attempt {attempt}/{JOB_FLUSH_ATTEMPTS})")
+        raise RuntimeError(f"Samples of workout {workout_id} could not be written")
+    
+    def _finalize_rollups(self, workout_id: int) -> None:
+        """Write the last rollup buckets of a finished workout, logging a failure."""
+        if not self.database.finalize_rollups(workout_id):
+            logger.warning(f"Rollups of workout {workout_id} are incomplete")
+    
+    def _archive_workout(self, workout_id: int) -> bool:
+        """Archive the samples of a finished workout, logging a failure."""
+        archived = self.database.archive_workout(workout_id)
+        if not archived:
+            logger.warning(f"Samples of workout {workout_id} were left unarchived")
+        return archived
+    
+    def _run_fit_regeneration_job(self, job: Dict[str, Any],
+                                  report: Callable[[float, Optional[str]], None]) -> Dict[str, Any]:
+        """
+        Regenerate FIT files in a process pool (job queue handler).
+        
+        Args:
+            job: Claimed regeneration job
+            report: Progress reporter
+            
+        Returns:
+            Run statistics, including workouts_per_second
+        """
+        from ..fit.bulk_regenerator import run_in_subprocess
+        
+        params = job['params']
+        fit_output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "fit_files"))
+        return run_in_subprocess(
+            self.database.db_path,
+            fit_output_dir,
+            only_missing=params.get('only_missing', False),
+            limit=params.get('limit'),
+            workers=params.get('workers'),
+            progress=report
+        )
+    
+    def _run_fit_audit_job(self, job: Dict[str, Any],
+                           report: Callable[[float, Optional[str]], None]) -> Dict[str, Any]:
+        """
+        Audit the FIT file directory (job queue handler).
+        
+        Args:
+            job: Claimed audit job
+            report: Progress reporter
+            
+        Returns:
+            Audit report, without the per-file results unless the job asked
+            for them
+        """
+        from ..fit.fit_audit import MODE_BOTH, run_in_subprocess
+        
+        params = job['params']
+        fit_output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "fit_files"))
+        # A process pool started here would re-import the web server in
+        # every spawned worker
+        audit = run_in_subprocess(
+            fit_output_dir,
+            mode=params.get('mode') or MODE_BOTH,
+            workers=params.get('workers'),
+            progress=lambda done, total: report(done / total if total else 1.0, f"{done}/{total} files")
+        )
+        if not params.get('include_files'):
+            audit.pop('files', None)
+        return audit
+    
+    def _open_live_fit(self) -> None:
+        """Start the live FIT file of the workout that was just started."""
+        if self.live_fit_writer:
+            self.live_fit_writer.abort()
+        self.live_fit_writer = None
+        if not self.live_fit:
+            return
+        
+        writer = LiveFitWriter(self.fit_converter, self.workout_type, self.workout_start_time,
+                               user_profile=self.get_user_profile())
+        if writer.open():
+            self.live_fit_writer = writer
+        else:
+            logger.warning("Live FIT file could not be created; it will be built after the workout")
+    
+    def _finish_live_fit(self, workout_id: int) -> Optional[str]:
+        """
+        Close the live FIT file of the workout being ended.
+        
+        Args:
+            workout_id: Workout ID
+            
+        Returns:
+            Path to the FIT file, or None if there is no complete live file
+        """
+        writer, self.live_fit_writer = self.live_fit_writer, None
+        if writer is None:
+            return None
+        if writer.failed:
+            writer.abort()
+            logger.warning(f"Live FIT file of workout {workout_id} failed; converting the stored samples instead")
+            return None
+        
+        fit_file_path = writer.finish(self.summary_metrics)
+        if fit_file_path:
+            self.database.update_workout_fit_path(workout_id, fit_file_path)
+            self.fit_catalog.add(fit_file_path, workout_id)
+        return fit_file_path
+    
+    def _recover_live_fit_files(self) -> None:
+        """Finish partial live FIT files left behind by a crash."""
+        output_dir = self.fit_converter.output_dir
+        try:
+            names = [name for name in os.listdir(output_dir) if name.endswith('.fit' + PARTIAL_SUFFIX)]
+        except OSError as e:
+            logger.error(f"Error listing {output_dir}: {str(e)}")
+            return
+        for name in names:
+            recover_partial_fit_file(os.path.join(output_dir, name), self.fit_converter,
+                                     user_profile=self.get_user_profile())
+    
+    def _handle_job_event(self, event: str, job: Dict[str, Any]) -> None:
+        """
+        Stream job progress and report finished jobs to the status callbacks.
+        
+        Args:
+            event: Job event
+            job: Job dictionary
+        """
+        state = {key: job.get(key) for key in
+                 ('id', 'kind', 'workout_id', 'status', 'progress', 'message', 'result', 'error')}
+        if event == JOB_PROGRESS:
+            state['status'] = 'running'
+        self.live_publisher.publish('job', state)
+        
+        if event in (JOB_COMPLETED, JOB_FAILED_EVENT):
+            self._notify_status(event, state)
+    
     def _notify_data(self, data: Dict[str, Any]) -> None:
         """
         Notify all registered data callbacks with new data.
@@ -755,6 +1275,7 @@ class WorkoutManager:
                 if os.path.exists(fit_file_path):
                     os.remove(fit_file_path)
                     logger.info(f"Deleted FIT file: {fit_file_path}")
+                self.fit_catalog.remove(fit_file_path)
             except Exception as e:
                 # Log but don't fail if file deletion fails
                 logger.warning(f"Could not delete FIT file {fit_file_path}: {str(e)}")
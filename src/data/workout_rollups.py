@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Workout Rollups Module for Rogue to Garmin Bridge
+
+This module aggregates workout samples into fixed time buckets at several
+resolutions (5 s, 30 s and 5 min). Each bucket keeps the minimum, maximum,
+mean and count of every chart metric, so an overview of a long workout reads
+a few hundred rollup rows instead of every sample.
+
+Buckets are aligned to whole multiples of the resolution since the epoch, so
+rollups built incrementally while a workout is live and rollups rebuilt from
+the stored samples land on the same bucket boundaries.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Bucket sizes in seconds, finest first
+ROLLUP_RESOLUTIONS: Tuple[int, ...] = (5, 30, 300)
+
+# Sample columns that are rolled up
+ROLLUP_METRICS: List[str] = ['power', 'cadence', 'speed', 'heart_rate', 'distance', 'stroke_rate']
+
+ROLLUP_STATS = ('min', 'max', 'mean', 'count')
+
+# Metric columns of the workout_rollups table, in row order
+ROLLUP_COLUMN_NAMES: List[str] = [f"{metric}_{stat}" for metric in ROLLUP_METRICS for stat in ROLLUP_STATS]
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_start(timestamp: datetime, resolution: int) -> datetime:
+    """
+    Get the start of the bucket a timestamp falls in.
+
+    Args:
+        timestamp: Sample time (naive or timezone aware)
+        resolution: Bucket size in seconds
+
+    Returns:
+        Bucket start with the same tzinfo as timestamp
+    """
+    epoch = _EPOCH.replace(tzinfo=timestamp.tzinfo)
+    seconds = (timestamp - epoch) // timedelta(seconds=1)
+    return epoch + timedelta(seconds=seconds - seconds % resolution)
+
+
+def choose_resolution(window_seconds: float, max_points: int) -> Optional[int]:
+    """
+    Pick the rollup resolution for a chart window.
+
+    Args:
+        window_seconds: Length of the requested time window
+        max_points: Largest number of points the chart wants
+
+    Returns:
+        Finest resolution that gives at most max_points buckets (the coarsest
+        one if none does), or None when raw samples fit the window
+    """
+    if window_seconds <= max_points:
+        return None
+    for resolution in ROLLUP_RESOLUTIONS:
+        if window_seconds / resolution <= max_points:
+            return resolution
+    return ROLLUP_RESOLUTIONS[-1]
+
+
+class _Bucket:
+    """Running statistics of one open bucket."""
+
+    __slots__ = ('start', 'sample_count', 'mins', 'maxs', 'sums', 'counts')
+
+    def __init__(self, start: datetime, width: int):
+        self.start = start
+        self.sample_count = 0
+        self.mins: List[Optional[float]] = [None] * width
+        self.maxs: List[Optional[float]] = [None] * width
+        self.sums = [0.0] * width
+        self.counts = [0] * width
+
+    def add(self, values: Sequence[Optional[float]]) -> None:
+        self.sample_count += 1
+        mins, maxs, sums, counts = self.mins, self.maxs, self.sums, self.counts
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            if counts[i]:
+                if value < mins[i]:
+                    mins[i] = value
+                elif value > maxs[i]:
+                    maxs[i] = value
+            else:
+                mins[i] = maxs[i] = value
+            sums[i] += value
+            counts[i] += 1
+
+    def row(self, resolution: int) -> tuple:
+        stats = []
+        for low, high, total, count in zip(self.mins, self.maxs, self.sums, self.counts):
+            stats += [low, high, total / count if count else None, count]
+        return (resolution, self.start.isoformat(), self.sample_count, *stats)
+
+
+class RollupBuilder:
+    """
+    Incremental rollup aggregation for one workout.
+
+    Samples are expected in time order; a sample that falls outside the open
+    bucket closes it. Rows for the same bucket emitted more than once (late
+    samples, or a builder restarted mid-workout) are meant to be merged by
+    the caller, as the Database rollup upsert does.
+    """
+
+    def __init__(self, resolutions: Sequence[int] = ROLLUP_RESOLUTIONS, complete: bool = True):
+        """
+        Initialize the builder.
+
+        Args:
+            resolutions: Bucket sizes in seconds
+            complete: Whether the builder sees every sample of the workout;
+                owners clear it when samples were missed
+        """
+        self.resolutions = tuple(resolutions)
+        self.complete = complete
+        self._open: Dict[int, _Bucket] = {}
+
+    def add(self, timestamp: datetime, values: Sequence[Optional[float]]) -> List[tuple]:
+        """
+        Add a sample.
+
+        Args:
+            timestamp: Sample time
+            values: Metric values in ROLLUP_METRICS order (None when missing)
+
+        Returns:
+            Rows of the buckets this sample closed, as (resolution,
+            bucket_start, sample_count, *ROLLUP_COLUMN_NAMES values)
+        """
+        closed = []
+        for resolution in self.resolutions:
+            start = bucket_start(timestamp, resolution)
+            bucket = self._open.get(resolution)
+            if bucket is None or bucket.start != start:
+                if bucket is not None:
+                    closed.append(bucket.row(resolution))
+                bucket = self._open[resolution] = _Bucket(start, len(values))
+            bucket.add(values)
+        return closed
+
+    def flush(self) -> List[tuple]:
+        """
+        Close every open bucket.
+
+        Returns:
+            Rows of the closed buckets (see add())
+        """
+        rows = [bucket.row(resolution) for resolution, bucket in self._open.items()]
+        self._open = {}
+        return rows
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Bulk FIT Regeneration Module for Rogue to Garmin Bridge
+
+This module regenerates the FIT files of many workouts at once, e.g. after a
+converter fix. Workouts are fanned out to a process pool; each worker process
+keeps one FIT processor on a read-only database connection, and files are
+written under a temporary name and renamed into place. The parent process
+records the new file paths and a checkpoint of the workouts still to do in
+the configuration table, so an interrupted run resumes where it stopped.
+Workouts whose conversion inputs have not changed keep their cached file
+(see fit_cache), so a run after a converter fix only rebuilds the workout
+types whose converter version was bumped.
+
+Usage:
+    python -m src.fit.bulk_regenerator [--all] [--limit N] [--workers N] [--restart]
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..data.database import Database
+from .fit_cache import FITCache
+from .fit_catalog import FITCatalog
+from .fit_processor import FITProcessor
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('bulk_regenerator')
+
+# Configuration key holding the checkpoint of an unfinished run
+CHECKPOINT_KEY = 'fit_regeneration_checkpoint'
+
+# Seconds between throughput log lines
+LOG_INTERVAL_SECONDS = 10.0
+
+DEFAULT_DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "rogue_garmin.db"))
+DEFAULT_FIT_OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "fit_files"))
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Seconds between checkpoint reads while a run is watched from another process
+WATCH_INTERVAL_SECONDS = 1.0
+
+# FIT processor of a worker process, created once by _init_worker
+_worker_processor: Optional[FITProcessor] = None
+_worker_user_profile: Optional[Dict[str, Any]] = None
+
+
+def _init_worker(db_path: str, fit_output_dir: str, user_profile: Optional[Dict[str, Any]]) -> None:
+    """Open the worker's read-only FIT processor."""
+    global _worker_processor, _worker_user_profile
+    _worker_processor = FITProcessor(db_path, fit_output_dir, read_only=True)
+    _worker_user_profile = user_profile
+
+
+def _regenerate_workout(workout_id: int) -> Tuple[int, Optional[str], Optional[str], Optional[str]]:
+    """
+    Build the FIT file of one workout in a worker process.
+
+    Returns:
+        Tuple of (workout ID, FIT file path or None, error message or None,
+        FIT cache key or None)
+    """
+    try:
+        fit_file_path = _worker_processor.process_workout(workout_id, user_profile=_worker_user_profile)
+    except Exception as e:
+        return workout_id, None, str(e) or type(e).__name__, None
+    if not fit_file_path:
+        return workout_id, None, 'FIT file was not created', None
+    return workout_id, fit_file_path, None, _worker_processor.last_cache_key
+
+
+def default_workers() -> int:
+    """Number of worker processes used when none is given (one per core)."""
+    return max(1, os.cpu_count() or 1)
+
+
+def regenerate_fit_files(db_path: str = DEFAULT_DB_PATH, fit_output_dir: str = DEFAULT_FIT_OUTPUT_DIR,
+                         only_missing: bool = False, limit: Optional[int] = None,
+                         workers: Optional[int] = None, resume: bool = True,
+                         progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Regenerate the FIT files of finished workouts in parallel.
+
+    Args:
+        db_path: Path to the SQLite database file
+        fit_output_dir: Directory to save FIT files
+        only_missing: Only workouts without a FIT file
+        limit: Maximum number of workouts (newest first)
+        workers: Number of worker processes (defaults to one per core)
+        resume: Continue an interrupted run from its checkpoint instead of
+            selecting workouts again
+        progress: Called with the run statistics after each workout
+
+    Returns:
+        Run statistics: total, completed, succeeded, failed (workout IDs),
+        elapsed_seconds, workouts_per_second and resumed
+    """
+    database = Database(db_path, migrate_in_background=False)
+    fit_cache = FITCache(database)
+    fit_catalog = FITCatalog(database)
+    workers = max(1, int(workers or default_workers()))
+
+    checkpoint = database.get_config(CHECKPOINT_KEY) if resume else None
+    resumed = bool(checkpoint and checkpoint.get('pending'))
+    if resumed:
+        pending = list(checkpoint['pending'])
+        logger.info(f"Resuming FIT regeneration: {len(pending)} of {checkpoint['total']} workouts left")
+    else:
+        pending = database.get_finished_workout_ids(only_missing_fit=only_missing, limit=limit)
+        checkpoint = {
+            'total': len(pending),
+            'succeeded': 0,
+            'failed': [],
+            'started_at': datetime.now().isoformat()
+        }
+    checkpoint['pending'] = pending
+    database.set_config(CHECKPOINT_KEY, checkpoint)
+
+    stats = {
+        'total': checkpoint['total'],
+        'completed': checkpoint['total'] - len(pending),
+        'succeeded': checkpoint['succeeded'],
+        'failed': list(checkpoint['failed']),
+        'elapsed_seconds': 0.0,
+        'workouts_per_second': 0.0,
+        'resumed': resumed
+    }
+    if not pending:
+        database.set_config(CHECKPOINT_KEY, None)
+        database.close()
+        return stats
+
+    logger.info(f"Regenerating {len(pending)} FIT files with {workers} worker process(es)")
+    remaining = set(pending)
+    done_this_run = 0
+    started = time.perf_counter()
+    last_log = started
+
+    # Spawned workers start from a clean interpreter instead of a fork of a
+    # possibly multithreaded parent
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(pending)), mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(db_path, fit_output_dir, database.get_user_profile())) as pool:
+        futures = [pool.submit(_regenerate_workout, workout_id) for workout_id in pending]
+        for future in as_completed(futures):
+            workout_id, fit_file_path, error, cache_key = future.result()
+            if error:
+                logger.warning(f"FIT regeneration failed for workout {workout_id}: {error}")
+                stats['failed'].append(workout_id)
+            else:
+                database.update_workout_fit_path(workout_id, fit_file_path)
+                fit_catalog.add(fit_file_path, workout_id)
+                if cache_key:
+                    fit_cache.store(cache_key, workout_id, fit_file_path)
+                stats['succeeded'] += 1
+
+            remaining.discard(workout_id)
+            done_this_run += 1
+            stats['completed'] += 1
+            elapsed = time.perf_counter() - started
+            stats['elapsed_seconds'] = round(elapsed, 3)
+            stats['workouts_per_second'] = round(done_this_run / elapsed, 3) if elapsed > 0 else 0.0
+
+            checkpoint.update({
+                'pending': [pending_id for pending_id in pending if pending_id in remaining],
+                'succeeded': stats['succeeded'],
+                'failed': stats['failed']
+            })
+            database.set_config(CHECKPOINT_KEY, checkpoint)
+
+            if progress:
+                progress(dict(stats))
+            now = time.perf_counter()
+            if now - last_log >= LOG_INTERVAL_SECONDS:
+                last_log = now
+                logger.info(f"Regenerated {stats['completed']}/{stats['total']} FIT files "
+                            f"({stats['workouts_per_second']:.2f} workouts/s)")
+
+    database.set_config(CHECKPOINT_KEY, None)
+    database.close()
+    logger.info(f"Regenerated {stats['succeeded']} FIT files ({len(stats['failed'])} failed) in "
+                f"{stats['elapsed_seconds']:.1f}s, {stats['workouts_per_second']:.2f} workouts/s")
+    return stats
+
+
+def get_checkpoint(database: Database) -> Optional[Dict[str, Any]]:
+    """
+    Get the checkpoint of an unfinished regeneration run.
+
+    Args:
+        database: Database instance
+
+    Returns:
+        Checkpoint with total, pending, succeeded and failed, or None if no
+        run is unfinished
+    """
+    checkpoint = database.get_config(CHECKPOINT_KEY)
+    return checkpoint if checkpoint and checkpoint.get('pending') else None
+
+
+def run_in_subprocess(db_path: str = DEFAULT_DB_PATH, fit_output_dir: str = DEFAULT_FIT_OUTPUT_DIR,
+                      only_missing: bool = False, limit: Optional[int] = None,
+                      workers: Optional[int] = None,
+                      progress: Optional[Callable[[float, Optional[str]], None]] = None) -> Dict[str, Any]:
+    """
+    Run a regeneration through the command line entry point and watch it.
+
+    Used from the web server: the process pool then lives in a separate
+    process whose main module is this one, instead of re-importing the
+    server in every spawned worker.
+
+    Args:
+        db_path: Path to the SQLite database file
+        fit_output_dir: Directory to save FIT files
+        only_missing: Only workouts without a FIT file
+        limit: Maximum number of workouts (newest first)
+        workers: Number of worker processes (defaults to one per core)
+        progress: Called as progress(fraction, message) while the run is going
+
+    Returns:
+        Run statistics as returned by regenerate_fit_files
+
+    Raises:
+        RuntimeError: If the run did not finish
+    """
+    command = [sys.executable, '-m', 'src.fit.bulk_regenerator', '--db', db_path, '--output-dir', fit_output_dir]
+    if not only_missing:
+        command.append('--all')
+    if limit is not None:
+        command += ['--limit', str(int(limit))]
+    if workers:
+        command += ['--workers', str(int(workers))]
+
+    database = Database(db_path, read_only=True)
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        while process.poll() is None:
+            checkpoint = get_checkpoint(database) if progress else None
+            if checkpoint and checkpoint['total']:
+                completed = checkpoint['total'] - len(checkpoint['pending'])
+                progress(completed / checkpoint['total'], f"{completed}/{checkpoint['total']} workouts")
+            time.sleep(WATCH_INTERVAL_SECONDS)
+        output = process.stdout.read().strip()
+    finally:
+        if process.poll() is None:
+            process.terminate()
+        database.close()
+
+    lines = output.splitlines()
+    if process.returncode not in (0, 1) or not lines:
+        raise RuntimeError(f"FIT regeneration exited with status {process.returncode}")
+    return json.loads(lines[-1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point; prints the run statistics as JSON."""
+    parser = argparse.ArgumentParser(description="Regenerate FIT files of finished workouts in parallel")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Path to the SQLite database")
+    parser.add_argument("--output-dir", default=DEFAULT_FIT_OUTPUT_DIR, help="Directory to save FIT files")
+    parser.add_argument("--all", action="store_true",
+                        help="Regenerate every finished workout, not only those without a FIT file")
+    parser.add_argument("--limit", type=int, help="Maximum number of workouts (newest first)")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: one per core)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the checkpoint of an interrupted run and select workouts again")
+    args = parser.parse_args(argv)
+
+    stats = regenerate_fit_files(
+        db_path=args.db,
+        fit_output_dir=args.output_dir,
+        only_missing=not args.all,
+        limit=args.limit,
+        workers=args.workers,
+        resume=not args.restart
+    )
+    print(json.dumps(stats))
+    return 0 if not stats['failed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
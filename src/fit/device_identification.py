@@ -12,6 +12,9 @@ from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+# User profile fields read by enhance_device_identification
+PROFILE_FIELDS = ('ftp', 'max_heart_rate')
+
 class DeviceType(Enum):
     """Supported device types"""
     BIKE = "bike"
@@ -8,7 +8,7 @@ detailed logging for FIT file generation, and compatibility verification.
 import logging
 import os
 import json
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, Iterable, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime, timezone
 from pathlib import Path
@@ -25,6 +25,8 @@ try:
 except ImportError as e:
     logging.warning(f"FIT tool imports failed: {e}")
 
+from .fit_validator import data_messages, message_type_key
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -96,6 +98,20 @@ class FITAnalyzer:
             logger.error(f"Failed to parse FIT file {file_path}: {e}")
             raise
         
+        return self.analyze_messages(data_messages(fit_file), file_path, file_size)
+    
+    def analyze_messages(self, messages: Iterable[Any], file_path: str, file_size: int) -> FITFileInfo:
+        """
+        Analyze the data messages of an already decoded FIT file
+        
+        Args:
+            messages: Data messages in file order
+            file_path: Path of the FIT file (for the report)
+            file_size: Size of the FIT file in bytes
+            
+        Returns:
+            FITFileInfo with detailed analysis
+        """
         # Initialize analysis data
         message_counts = {}
         start_time = None
@@ -111,8 +127,8 @@ class FITAnalyzer:
         speed_values = []
         
         # Analyze messages
-        for message in fit_file.messages:
-            message_type = type(message).__name__.lower()
+        for message in messages:
+            message_type = message_type_key(type(message))
             message_counts[message_type] = message_counts.get(message_type, 0) + 1
             
             # Extract timestamps
@@ -297,7 +313,7 @@ class FITAnalyzer:
         }
         
         # Inspect each message
-        for i, message in enumerate(fit_file.messages):
+        for i, message in enumerate(data_messages(fit_file)):
             message_data = {
                 'index': i,
                 'type': type(message).__name__,
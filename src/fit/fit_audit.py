@@ -0,0 +1,588 @@
+#!/usr/bin/env python3
+"""
+FIT Audit Module for Rogue to Garmin Bridge
+
+This module analyzes and validates every FIT file in a directory at once.
+Files are fanned out to a process pool; each worker reads a file once,
+decodes it once and runs both the analyzer and the validator on the decoded
+messages. The summary mode instead reads only the header, file_id, session
+and activity messages of each file (see fit_summary), for a quick inventory.
+Results are kept in a sidecar SQLite cache keyed by path, size, modification
+time and content hash, so a rerun only decodes new or changed files. The run
+ends with an aggregate report and throughput statistics.
+
+The web server runs audits through run_in_subprocess, so the process pool
+lives in a separate process instead of re-importing the server in every
+spawned worker.
+
+Usage:
+    python -m src.fit.fit_audit [DIRECTORY] [--mode both|analyze|validate|summary] [--workers N] [--recursive]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fit_tool.fit_file import FitFile
+
+from .fit_analyzer import FITAnalyzer
+from .fit_summary import read_fit_summary_bytes
+from .fit_validator import FITValidator, ValidationSeverity, data_messages
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('fit_audit')
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_FIT_DIR = os.path.join(PROJECT_ROOT, "fit_files")
+
+# Sidecar cache file created in the audited directory
+CACHE_FILE_NAME = '.fit_audit_cache.sqlite'
+
+# Audit modes
+MODE_ANALYZE = 'analyze'
+MODE_VALIDATE = 'validate'
+MODE_BOTH = 'both'
+MODE_SUMMARY = 'summary'
+MODES = (MODE_ANALYZE, MODE_VALIDATE, MODE_BOTH, MODE_SUMMARY)
+
+# Bump when the stored results change shape, to audit every file again
+CACHE_FORMAT_VERSION = 1
+
+# Most frequent validation issues listed in the report
+TOP_ISSUES = 10
+
+# Bytes read at a time when hashing a file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    Hash the contents of a file.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex SHA-256 of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _analysis_to_dict(info) -> Dict[str, Any]:
+    """JSON-serializable form of a FITFileInfo."""
+    analysis = asdict(info)
+    for key in ('start_time', 'end_time'):
+        if analysis[key] is not None:
+            analysis[key] = analysis[key].isoformat()
+    return analysis
+
+
+def _validation_to_dict(result) -> Dict[str, Any]:
+    """JSON-serializable form of a ValidationResult."""
+    return {
+        'is_valid': result.is_valid,
+        'total_messages': result.total_messages,
+        'message_counts': result.message_counts,
+        'validation_time_ms': result.validation_time_ms,
+        'issues': [
+            {
+                'severity': issue.severity.value,
+                'message': issue.message,
+                'field_name': issue.field_name,
+                'message_type': issue.message_type
+            }
+            for issue in result.issues
+        ]
+    }
+
+
+def audit_fit_file(file_path: str, analyze: bool = True, validate: bool = True,
+                   summarize: bool = False) -> Dict[str, Any]:
+    """
+    Analyze and/or validate one FIT file with a single read and decode.
+
+    Args:
+        file_path: Path to the FIT file
+        analyze: Run FITAnalyzer on the file
+        validate: Run FITValidator on the file
+        summarize: Read the file's summary messages with fit_summary
+
+    Returns:
+        Dictionary with path, size, sha256, decode_seconds, analysis,
+        validation and summary (None when not run) and error (None on
+        success)
+    """
+    started = time.perf_counter()
+    result = {'path': file_path, 'size': None, 'sha256': None, 'analysis': None,
+              'validation': None, 'summary': None, 'error': None, 'decode_seconds': 0.0}
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        result['size'] = len(data)
+        result['sha256'] = hashlib.sha256(data).hexdigest()
+
+        if summarize:
+            result['summary'] = read_fit_summary_bytes(data, file_path).to_dict()
+        if not (analyze or validate):
+            result['decode_seconds'] = round(time.perf_counter() - started, 4)
+            return result
+
+        messages = data_messages(FitFile.from_bytes(data))
+        result['decode_seconds'] = round(time.perf_counter() - started, 4)
+
+        if analyze:
+            result['analysis'] = _analysis_to_dict(
+                FITAnalyzer().analyze_messages(messages, file_path, len(data)))
+        if validate:
+            result['validation'] = _validation_to_dict(
+                FITValidator().validate_messages(messages, len(data)))
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+    return result
+
+
+def _audit_worker(job: Tuple[str, bool, bool, bool]) -> Dict[str, Any]:
+    """Process pool entry point for audit_fit_file."""
+    return audit_fit_file(*job)
+
+
+class AuditCache:
+    """
+    Sidecar SQLite cache of FIT audit results.
+    """
+
+    def __init__(self, cache_path: str):
+        """
+        Open (and create if needed) the cache.
+
+        Args:
+            cache_path: Path to the SQLite cache file
+        """
+        self.cache_path = cache_path
+        self.conn = sqlite3.connect(cache_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS fit_audit (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT,
+                format_version INTEGER NOT NULL,
+                analysis TEXT,
+                validation TEXT,
+                error TEXT,
+                audited_at TEXT NOT NULL,
+                summary TEXT
+            )
+        ''')
+        # Caches written before the summary mode existed
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(fit_audit)")}
+        if 'summary' not in columns:
+            self.conn.execute("ALTER TABLE fit_audit ADD COLUMN summary TEXT")
+        self.conn.commit()
+
+    def get_all(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get every cached result.
+
+        Returns:
+            Dictionary of path to cached row
+        """
+        rows = self.conn.execute("SELECT * FROM fit_audit").fetchall()
+        return {row['path']: dict(row) for row in rows}
+
+    def put(self, result: Dict[str, Any], mtime_ns: int) -> None:
+        """
+        Store the result of auditing one file.
+
+        Args:
+            result: Result from audit_fit_file
+            mtime_ns: Modification time of the file when it was read
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO fit_audit (path, size, mtime_ns, sha256, format_version, analysis, "
+            "validation, summary, error, audited_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (result['path'], result['size'] or 0, mtime_ns, result['sha256'], CACHE_FORMAT_VERSION,
+             json.dumps(result['analysis']) if result['analysis'] is not None else None,
+             json.dumps(result['validation']) if result['validation'] is not None else None,
+             json.dumps(result['summary']) if result['summary'] is not None else None,
+             result['error'], datetime.now().isoformat())
+        )
+
+    def touch(self, path: str, mtime_ns: int) -> None:
+        """Record a new modification time for a file whose contents did not change."""
+        self.conn.execute("UPDATE fit_audit SET mtime_ns = ? WHERE path = ?", (mtime_ns, path))
+
+    def remove(self, paths: List[str]) -> None:
+        """Forget files that are gone."""
+        self.conn.executemany("DELETE FROM fit_audit WHERE path = ?", [(path,) for path in paths])
+
+    def commit(self) -> None:
+        """Commit pending changes."""
+        self.conn.commit()
+
+    def close(self) -> None:
+        """Close the cache."""
+        self.conn.commit()
+        self.conn.close()
+
+
+def _row_to_result(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Result dictionary of a cached row."""
+    return {
+        'path': row['path'],
+        'size': row['size'],
+        'sha256': row['sha256'],
+        'analysis': json.loads(row['analysis']) if row['analysis'] else None,
+        'validation': json.loads(row['validation']) if row['validation'] else None,
+        'summary': json.loads(row['summary']) if row['summary'] else None,
+        'error': row['error'],
+        'decode_seconds': 0.0
+    }
+
+
+def iter_fit_files(directory: str, recursive: bool = False) -> Iterator[str]:
+    """
+    Iterate over the FIT files of a directory, in sorted order.
+
+    Args:
+        directory: Directory to walk
+        recursive: Include subdirectories
+
+    Yields:
+        Absolute FIT file paths
+    """
+    directory = os.path.abspath(directory)
+    if recursive:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith('.fit'):
+                    yield os.path.join(root, name)
+    else:
+        for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+            if entry.is_file() and entry.name.lower().endswith('.fit'):
+                yield entry.path
+
+
+def audit_fit_directory(directory: str = DEFAULT_FIT_DIR, mode: str = MODE_BOTH,
+                        workers: Optional[int] = None, cache_path: Optional[str] = None,
+                        recursive: bool = False,
+                        progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    Analyze and/or validate every FIT file in a directory.
+
+    Files whose path, size and modification time match the cache reuse the
+    cached result. A file with a new modification time is hashed, and reused
+    if its contents are unchanged. Everything else is decoded in a process
+    pool.
+
+    Args:
+        directory: Directory holding the FIT files
+        mode: MODE_ANALYZE, MODE_VALIDATE, MODE_BOTH or MODE_SUMMARY
+        workers: Number of worker processes (defaults to one per core)
+        cache_path: Sidecar cache file (defaults to CACHE_FILE_NAME in the
+            directory)
+        recursive: Include subdirectories
+        progress: Called as progress(done, total) as files are audited
+
+    Returns:
+        Aggregate report (see build_report) with a 'files' list of per-file
+        results
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown audit mode: {mode}")
+    analyze = mode in (MODE_ANALYZE, MODE_BOTH)
+    validate = mode in (MODE_VALIDATE, MODE_BOTH)
+    summarize = mode == MODE_SUMMARY
+    workers = max(1, int(workers or os.cpu_count() or 1))
+
+    started = time.perf_counter()
+    cache = AuditCache(cache_path or os.path.join(directory, CACHE_FILE_NAME))
+    try:
+        cached_rows = cache.get_all()
+        results: Dict[str, Dict[str, Any]] = {}
+        to_audit: List[Tuple[str, int]] = []
+
+        paths = list(iter_fit_files(directory, recursive))
+        for path in paths:
+            stat = os.stat(path)
+            row = cached_rows.get(path)
+            if row is None or row['format_version'] != CACHE_FORMAT_VERSION or row['size'] != stat.st_size \
+                    or (analyze and not row['analysis'] and not row['error']) \
+                    or (validate and not row['validation'] and not row['error']) \
+                    or (summarize and not row['summary'] and not row['error']):
+                to_audit.append((path, stat.st_mtime_ns))
+            elif row['mtime_ns'] == stat.st_mtime_ns:
+                results[path] = _row_to_result(row)
+            elif row['sha256'] and file_sha256(path) == row['sha256']:
+                cache.touch(path, stat.st_mtime_ns)
+                results[path] = _row_to_result(row)
+            else:
+                to_audit.append((path, stat.st_mtime_ns))
+
+        present = set(paths)
+        cache.remove([path for path in cached_rows if path not in present])
+        cache.commit()
+        cached_count = len(results)
+        if progress:
+            progress(cached_count, len(paths))
+
+        decoded_bytes = 0
+        audit_started = time.perf_counter()
+        mtimes = dict(to_audit)
+        jobs = [(path, analyze, validate, summarize) for path, _ in to_audit]
+        if jobs:
+            logger.info(f"Auditing {len(jobs)} of {len(paths)} FIT files with {min(workers, len(jobs))} worker(s)")
+
+        def record(result: Dict[str, Any]) -> None:
+            nonlocal decoded_bytes
+            results[result['path']] = result
+            decoded_bytes += result['size'] or 0
+            cache.put(result, mtimes[result['path']])
+            if progress:
+                progress(len(results), len(paths))
+
+        if workers == 1 or len(jobs) <= 1:
+            for job in jobs:
+                record(audit_fit_file(*job))
+        else:
+            # Spawned workers start from a clean interpreter instead of a fork
+            # of a possibly multithreaded parent
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as pool:
+                futures = [pool.submit(_audit_worker, job) for job in jobs]
+                for future in as_completed(futures):
+                    record(future.result())
+        cache.commit()
+        audit_seconds = time.perf_counter() - audit_started
+    finally:
+        cache.close()
+
+    report = build_report([results[path] for path in paths if path in results], mode)
+    elapsed = time.perf_counter() - started
+    report.update({
+        'directory': os.path.abspath(directory),
+        'mode': mode,
+        'workers': workers,
+        'cached': cached_count,
+        'audited': len(jobs),
+        'elapsed_seconds': round(elapsed, 3),
+        'files_per_second': round(len(paths) / elapsed, 3) if elapsed > 0 else 0.0,
+        'audited_files_per_second': round(len(jobs) / audit_seconds, 3) if jobs and audit_seconds > 0 else 0.0,
+        'audited_mb_per_second': round(decoded_bytes / 1e6 / audit_seconds, 3) if jobs and audit_seconds > 0 else 0.0
+    })
+    logger.info(f"Audited {report['total_files']} FIT files ({report['audited']} decoded, {report['cached']} cached) "
+                f"in {report['elapsed_seconds']:.1f}s")
+    return report
+
+
+def build_report(results: List[Dict[str, Any]], mode: str = MODE_BOTH) -> Dict[str, Any]:
+    """
+    Aggregate per-file audit results.
+
+    Args:
+        results: Results from audit_fit_file (or the cache)
+        mode: Audit mode the results were produced with
+
+    Returns:
+        Dictionary with total_files, total_bytes, failed (paths that could
+        not be read or decoded), valid, invalid, error_count, warning_count,
+        top_issues, total_duration_seconds, sports, message_counts (or
+        total_distance and record_count for summaries) and files
+    """
+    report = {
+        'total_files': len(results),
+        'total_bytes': sum(result['size'] or 0 for result in results),
+        'failed': [result['path'] for result in results if result['error']],
+        'files': results
+    }
+
+    if mode in (MODE_VALIDATE, MODE_BOTH):
+        validations = [result['validation'] for result in results if result['validation']]
+        severity_counts = Counter()
+        # Number of files each issue occurs in
+        issue_files = Counter()
+        for validation in validations:
+            severity_counts.update(issue['severity'] for issue in validation['issues'])
+            issue_files.update({(issue['severity'], issue['message']) for issue in validation['issues']})
+        report.update({
+            'valid': sum(1 for validation in validations if validation['is_valid']),
+            'invalid': sum(1 for validation in validations if not validation['is_valid']),
+            'error_count': severity_counts[ValidationSeverity.ERROR.value],
+            'warning_count': severity_counts[ValidationSeverity.WARNING.value],
+            'top_issues': [
+                {'severity': severity, 'message': message, 'files': count}
+                for (severity, message), count in issue_files.most_common(TOP_ISSUES)
+            ]
+        })
+
+    if mode in (MODE_ANALYZE, MODE_BOTH):
+        analyses = [result['analysis'] for result in results if result['analysis']]
+        message_counts = Counter()
+        for analysis in analyses:
+            message_counts.update(analysis['message_counts'])
+        report.update({
+            'total_duration_seconds': sum(analysis['duration_seconds'] or 0 for analysis in analyses),
+            'sports': dict(Counter(analysis['sport_type'] for analysis in analyses)),
+            'message_counts': dict(message_counts)
+        })
+
+    if mode == MODE_SUMMARY:
+        summaries = [result['summary'] for result in results if result['summary']]
+        report.update({
+            'total_duration_seconds': sum(summary['duration_seconds'] or 0 for summary in summaries),
+            'total_distance': sum(summary['total_distance'] or 0 for summary in summaries),
+            'record_count': sum(summary['record_count'] for summary in summaries),
+            # Keyed like FITAnalyzer's sport_type
+            'sports': dict(Counter(str(summary['sport']) if summary['sport'] is not None else None
+                                   for summary in summaries))
+        })
+
+    return report
+
+
+def print_audit_report(report: Dict[str, Any]) -> None:
+    """
+    Print a formatted audit report.
+
+    Args:
+        report: Report from audit_fit_directory
+    """
+    print("=" * 60)
+    print("FIT DIRECTORY AUDIT REPORT")
+    print("=" * 60)
+    print(f"Directory: {report['directory']}")
+    print(f"Files: {report['total_files']} ({report['total_bytes']:,} bytes)")
+    print(f"Decoded: {report['audited']}, cached: {report['cached']}, failed: {len(report['failed'])}")
+    print(f"Elapsed: {report['elapsed_seconds']:.2f}s ({report['files_per_second']:.1f} files/s, "
+          f"{report['audited_files_per_second']:.1f} decoded files/s, "
+          f"{report['audited_mb_per_second']:.2f} MB/s decoded)")
+
+    if 'valid' in report:
+        print(f"Valid: {report['valid']}, invalid: {report['invalid']} "
+              f"({report['error_count']} errors, {report['warning_count']} warnings)")
+        if report['top_issues']:
+            print("Most frequent issues:")
+            for issue in report['top_issues']:
+                print(f"  {issue['files']:>6}  {issue['severity']}: {issue['message']}")
+
+    if 'sports' in report:
+        print(f"Total duration: {report['total_duration_seconds'] / 3600:.1f} h")
+        print("Sports: " + ", ".join(f"{sport}: {count}" for sport, count in sorted(report['sports'].items(),
+                                                                                 key=lambda item: str(item[0]))))
+
+    for path in report['failed']:
+        print(f"  ✗ {path}")
+    print("=" * 60)
+
+
+def run_in_subprocess(directory: str = DEFAULT_FIT_DIR, mode: str = MODE_BOTH,
+                      workers: Optional[int] = None,
+                      progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    Run an audit through the command line entry point and watch it.
+
+    Used from the web server: the process pool then lives in a separate
+    process whose main module is this one, instead of re-importing the
+    server in every spawned worker.
+
+    Args:
+        directory: Directory holding the FIT files
+        mode: MODE_ANALYZE, MODE_VALIDATE, MODE_BOTH or MODE_SUMMARY
+        workers: Number of worker processes (defaults to one per core)
+        progress: Called as progress(done, total) as files are audited
+
+    Returns:
+        Aggregate report as returned by audit_fit_directory
+
+    Raises:
+        ValueError: If the mode is unknown
+        RuntimeError: If the audit did not finish
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown audit mode: {mode}")
+    command = [sys.executable, '-m', 'src.fit.fit_audit', directory, '--mode', mode, '--json', '--progress']
+    if workers:
+        command += ['--workers', str(int(workers))]
+
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT, stdout=subprocess.PIPE, text=True)
+    report = None
+    try:
+        # Progress lines come first, the report is the last line; log lines
+        # that reach stdout are skipped
+        for line in process.stdout:
+            if not line.startswith('{'):
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if 'progress' in message:
+                if progress:
+                    progress(*message['progress'])
+            else:
+                report = message
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.terminate()
+        process.stdout.close()
+
+    if process.returncode not in (0, 1) or report is None:
+        raise RuntimeError(f"FIT audit exited with status {process.returncode}")
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point; exits with 1 if a file failed or is invalid."""
+    parser = argparse.ArgumentParser(description="Analyze and validate a directory of FIT files in parallel")
+    parser.add_argument("directory", nargs="?", default=DEFAULT_FIT_DIR, help="Directory holding the FIT files")
+    parser.add_argument("--mode", choices=MODES, default=MODE_BOTH, help="Audit to run (default: both)")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: one per core)")
+    parser.add_argument("--cache", help=f"Sidecar cache file (default: DIRECTORY/{CACHE_FILE_NAME})")
+    parser.add_argument("--recursive", action="store_true", help="Include subdirectories")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON, including per-file results")
+    parser.add_argument("--progress", action="store_true",
+                        help="Print {\"progress\": [done, total]} JSON lines while auditing")
+    args = parser.parse_args(argv)
+
+    def print_progress(done: int, total: int) -> None:
+        print(json.dumps({'progress': [done, total]}), flush=True)
+
+    report = audit_fit_directory(args.directory, mode=args.mode, workers=args.workers,
+                                 cache_path=args.cache, recursive=args.recursive,
+                                 progress=print_progress if args.progress else None)
+    if args.json:
+        print(json.dumps(report, default=str))
+    else:
+        print_audit_report(report)
+    return 0 if not report['failed'] and not report.get('invalid') else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
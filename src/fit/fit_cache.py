@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+FIT Cache Module for Rogue to Garmin Bridge
+
+This module lets a FIT conversion return the file of an earlier conversion
+with the same inputs instead of building it again. A conversion is keyed by a
+hash of everything the file is built from: the workout row (type, device,
+times and summary), the version of its sample data, the user profile fields
+the converter reads and the converter version for the workout type. Entries
+live in the fit_cache table and are used while their file is still on disk
+with the size and SHA-256 it was written with.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from .device_identification import PROFILE_FIELDS
+from .fit_catalog import file_checksum
+from .fit_converter import converter_version
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('fit_cache')
+
+# Workout columns that go into a FIT file
+WORKOUT_KEY_FIELDS = ('id', 'device_id', 'workout_type', 'start_time', 'end_time', 'duration')
+
+
+def conversion_key(workout: Dict[str, Any], data_version: Any,
+                   user_profile: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Hash the inputs of a FIT conversion.
+
+    Args:
+        workout: Workout dictionary as returned by Database.get_workout
+        data_version: Version of the workout's sample data
+            (Database.get_workout_data_version)
+        user_profile: User profile passed to the converter (optional)
+
+    Returns:
+        Hex SHA-256 of the conversion inputs
+    """
+    summary = workout.get('summary') or {}
+    if isinstance(summary, str):
+        try:
+            summary = json.loads(summary)
+        except ValueError:
+            pass
+
+    workout_type = workout.get('workout_type', 'bike')
+    inputs = {
+        'converter_version': converter_version(workout_type),
+        'workout': {field: workout.get(field) for field in WORKOUT_KEY_FIELDS},
+        'summary': summary,
+        'data_version': data_version,
+        'profile': {field: (user_profile or {}).get(field) for field in PROFILE_FIELDS}
+    }
+    encoded = json.dumps(inputs, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class FITCache:
+    """
+    Cache of generated FIT files shared by all conversion paths.
+    """
+
+    def __init__(self, database):
+        """
+        Initialize the FIT cache.
+
+        Args:
+            database: Database instance holding the fit_cache table
+        """
+        self.database = database
+
+    def key_for(self, workout: Dict[str, Any], user_profile: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Get the cache key of converting a workout, without reading its samples.
+
+        Args:
+            workout: Workout dictionary as returned by Database.get_workout
+            user_profile: User profile passed to the converter (optional)
+
+        Returns:
+            Cache key, or None if the sample data version is unavailable
+        """
+        data_version = self.database.get_workout_data_version(workout['id'])
+        if data_version is None:
+            return None
+        return conversion_key(workout, data_version, user_profile)
+
+    def lookup(self, cache_key: str) -> Optional[str]:
+        """
+        Get the FIT file of an earlier conversion with the same inputs.
+
+        Args:
+            cache_key: Key from key_for
+
+        Returns:
+            Path to the FIT file, or None if there is no usable file
+        """
+        entry = self.database.get_fit_cache_entry(cache_key)
+        if not entry:
+            return None
+
+        fit_file_path = entry['fit_file_path']
+        # The size rules out most changes without reading the file
+        try:
+            unchanged = (os.path.getsize(fit_file_path) == entry['file_size']
+                         and file_checksum(fit_file_path) == entry['checksum'])
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            logger.info(f"Cached FIT file of workout {entry['workout_id']} is gone or changed: {fit_file_path}")
+            if not self.database.read_only:
+                self.database.delete_fit_cache_entry(cache_key)
+            return None
+
+        logger.info(f"Using cached FIT file for workout {entry['workout_id']}: {fit_file_path}")
+        return fit_file_path
+
+    def store(self, cache_key: str, workout_id: int, fit_file_path: str) -> bool:
+        """
+        Record the FIT file of a conversion.
+
+        Args:
+            cache_key: Key from key_for
+            workout_id: Workout ID
+            fit_file_path: Path to the generated FIT file
+
+        Returns:
+            True if recorded, False otherwise (e.g. on a read-only database)
+        """
+        if self.database.read_only:
+            return False
+        try:
+            file_size = os.path.getsize(fit_file_path)
+            checksum = file_checksum(fit_file_path)
+        except OSError as e:
+            logger.error(f"Not caching FIT file of workout {workout_id}: {str(e)}")
+            return False
+        return self.database.put_fit_cache_entry(cache_key, workout_id, fit_file_path, file_size, checksum)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+FIT Catalog Module for Rogue to Garmin Bridge
+
+This module keeps the fit_files table in step with the FIT files on disk, so
+the file browser and storage figures are indexed queries instead of
+directory scans. Every code path that writes or deletes a FIT file records it
+here, with the size, modification time, checksum and the sport, start time,
+duration and session totals read by the summary reader. A background
+reconciler picks up files added, changed or removed by anything else.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from .fit_summary import read_fit_summary_bytes
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('fit_catalog')
+
+# Seconds between two reconciliations of a directory
+RECONCILE_INTERVAL_SECONDS = 300.0
+
+# Changed files cataloged per transaction while reconciling
+RECONCILE_BATCH_SIZE = 500
+
+# Bytes read at a time when hashing a file
+CHECKSUM_CHUNK_SIZE = 1 << 16
+
+
+def file_checksum(file_path: str) -> str:
+    """
+    Hash a file the way catalog entries record its checksum.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex SHA-256 of the file contents
+
+    Raises:
+        OSError: If the file cannot be read
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def catalog_entry(file_path: str, workout_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build the catalog entry of a FIT file.
+
+    The file is read once for both its checksum and its summary. A file the
+    summary reader cannot parse is still cataloged, without summary fields.
+
+    Args:
+        file_path: Path to the FIT file
+        workout_id: Workout the file belongs to, if known
+
+    Returns:
+        Entry dictionary with the fit_files columns
+
+    Raises:
+        OSError: If the file cannot be read
+    """
+    file_path = os.path.abspath(file_path)
+    with open(file_path, 'rb') as f:
+        data = f.read()
+        modified = os.fstat(f.fileno()).st_mtime
+
+    entry = {
+        'path': file_path,
+        'directory': os.path.dirname(file_path),
+        'filename': os.path.basename(file_path),
+        'size': len(data),
+        'modified': modified,
+        'workout_id': workout_id,
+        'sport': None,
+        'start_time': None,
+        'duration': None,
+        'total_distance': None,
+        'total_calories': None,
+        'avg_power': None,
+        'avg_heart_rate': None,
+        'record_count': None,
+        'checksum': hashlib.sha256(data).hexdigest()
+    }
+    try:
+        summary = read_fit_summary_bytes(data, file_path)
+    except ValueError as e:
+        logger.warning(f"Cataloging {file_path} without a summary: {str(e)}")
+        return entry
+
+    entry.update({
+        'sport': summary.sport,
+        'start_time': summary.start_time.isoformat() if summary.start_time else None,
+        'duration': summary.duration_seconds,
+        'total_distance': summary.total_distance,
+        'total_calories': summary.total_calories,
+        'avg_power': summary.avg_power,
+        'avg_heart_rate': summary.avg_heart_rate,
+        'record_count': summary.record_count
+    })
+    return entry
+
+
+class FITCatalog:
+    """
+    Catalog of FIT files on disk, kept in the fit_files table.
+    """
+
+    def __init__(self, database):
+        """
+        Initialize the FIT catalog.
+
+        Args:
+            database: Database instance holding the fit_files table
+        """
+        self.database = database
+
+    def add(self, file_path: str, workout_id: Optional[int] = None) -> bool:
+        """
+        Record a FIT file that was written (or rewritten).
+
+        Args:
+            file_path: Path to the FIT file
+            workout_id: Workout the file belongs to, if known
+
+        Returns:
+            True if recorded, False otherwise (e.g. on a read-only database)
+        """
+        if self.database.read_only:
+            return False
+        try:
+            entry = catalog_entry(file_path, workout_id)
+        except OSError as e:
+            logger.error(f"Not cataloging FIT file {file_path}: {str(e)}")
+            return False
+        return self.database.put_fit_files([entry])
+
+    def remove(self, file_path: str) -> bool:
+        """
+        Forget a FIT file that was deleted.
+
+        Args:
+            file_path: Path to the FIT file
+
+        Returns:
+            True if removed, False otherwise
+        """
+        if self.database.read_only:
+            return False
+        return self.database.delete_fit_files([os.path.abspath(file_path)])
+
+    def reconcile(self, directory: str) -> Dict[str, int]:
+        """
+        Bring the catalog of a directory in line with its files.
+
+        Files whose size and modification time match their entry are left
+        alone; new and changed files are read and cataloged, and entries of
+        files that are gone are removed.
+
+        Args:
+            directory: Directory holding FIT files
+
+        Returns:
+            Counts of added, updated, removed, unchanged and failed files
+        """
+        stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0, 'failed': 0}
+        if self.database.read_only:
+            return stats
+        directory = os.path.abspath(directory)
+        try:
+            dir_entries = list(os.scandir(directory))
+        except OSError as e:
+            logger.error(f"Error listing {directory}: {str(e)}")
+            return stats
+
+        known = self.database.get_fit_file_stats(directory)
+        workout_ids: Optional[Dict[str, int]] = None
+        seen = set()
+        pending: List[Dict[str, Any]] = []
+        for dir_entry in dir_entries:
+            if not dir_entry.name.lower().endswith('.fit'):
+                continue
+            try:
+                if not dir_entry.is_file():
+                    continue
+                stat = dir_entry.stat()
+            except OSError:
+                continue
+            path = dir_entry.path
+            seen.add(path)
+            if known.get(path) == (stat.st_size, stat.st_mtime):
+                stats['unchanged'] += 1
+                continue
+
+            if workout_ids is None:
+                workout_ids = self.database.get_workout_ids_by_fit_path()
+            try:
+                pending.append(catalog_entry(path, workout_ids.get(path)))
+            except OSError as e:
+                logger.warning(f"Could not catalog {path}: {str(e)}")
+                stats['failed'] += 1
+                continue
+            stats['updated' if path in known else 'added'] += 1
+            if len(pending) >= RECONCILE_BATCH_SIZE:
+                self.database.put_fit_files(pending)
+                pending = []
+        self.database.put_fit_files(pending)
+
+        removed = [path for path in known if path not in seen]
+        self.database.delete_fit_files(removed)
+        stats['removed'] = len(removed)
+
+        if stats['added'] or stats['updated'] or stats['removed']:
+            logger.info(f"Reconciled FIT catalog of {directory}: {stats}")
+        return stats
+
+
+class FITCatalogReconciler:
+    """
+    Background thread reconciling the FIT catalog of a directory.
+
+    Runs once when started, then every interval seconds.
+    """
+
+    def __init__(self, catalog: FITCatalog, directory: str,
+                 interval: float = RECONCILE_INTERVAL_SECONDS):
+        """
+        Initialize the reconciler.
+
+        Args:
+            catalog: Catalog to reconcile
+            directory: Directory holding FIT files
+            interval: Seconds between two reconciliations
+        """
+        self.catalog = catalog
+        self.directory = directory
+        self.interval = interval
+        self.last_stats: Optional[Dict[str, int]] = None
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the reconciler thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the reconciler thread if it is not already running."""
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='fit-catalog-reconciler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Stop the reconciler thread after its current pass.
+
+        Args:
+            timeout: Maximum time to wait in seconds
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        """Reconcile until stopped."""
+        while not self._stop.is_set():
+            try:
+                self.last_stats = self.catalog.reconcile(self.directory)
+            except Exception as e:
+                logger.error(f"Error reconciling FIT catalog of {self.directory}: {str(e)}")
+            self._stop.wait(self.interval)
@@ -5,15 +5,18 @@ This module handles conversion of processed workout data to Garmin FIT format.
 """
 
 import os
+import itertools
 import logging
 import traceback
+import threading
 import math # For rounding
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta, timezone
 
 from .speed_calculator import EnhancedSpeedCalculator, fix_device_reported_speeds
 from .device_identification import enhance_device_identification
-from .fit_validator import validate_fit_file, ValidationSeverity
+from .fit_validator import data_messages, validate_fit_messages, ValidationSeverity
+from .fit_record_encoder import iter_record_views, write_fit_file
 
 from fit_tool.fit_file_builder import FitFileBuilder
 from fit_tool.profile.messages.file_id_message import FileIdMessage
@@ -35,13 +38,61 @@ logger = logging.getLogger("fit_converter")
 # FIT epoch constant for specific fields like activity_mesg.local_timestamp
 FIT_EPOCH_DATETIME_UTC = datetime(1989, 12, 31, 0, 0, 0, tzinfo=timezone.utc)
 
+# Version of the converter output per workout type. Bump the entry of each
+# workout type whose FIT files change, so that only those cached files are
+# rebuilt (see fit_cache).
+CONVERTER_VERSIONS = {
+    'bike': 1,
+    'rower': 1,
+}
+
+def converter_version(workout_type: str) -> int:
+    """Returns the converter output version for a workout type."""
+    return CONVERTER_VERSIONS.get(workout_type, 1)
+
+def extract_sample_metrics(point: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the record metrics of one stored sample, checking the field names the
+    different devices report them under.
+
+    Args:
+        point: Sample data
+        
+    Returns:
+        Dictionary with power, cadence, speed (km/h), heart_rate and distance
+        (meters); missing values are 0
+    """
+    power = point.get('instant_power', 
+              point.get('instantaneous_power', 
+              point.get('power', 0)))
+    cadence = point.get('instant_cadence', 
+               point.get('instantaneous_cadence', 
+               point.get('cadence', 0)))
+    speed = point.get('instant_speed', 
+             point.get('instantaneous_speed', 
+             point.get('speed', 0)))
+    return {
+        'power': power if power is not None else 0,
+        'cadence': cadence if cadence is not None else 0,
+        'speed': speed if speed is not None else 0,
+        'heart_rate': point.get('heart_rate', 0) or 0,
+        'distance': point.get('total_distance', 0) or 0
+    }
+
 class FITConverter:
     """
     Class for converting processed workout data to Garmin FIT format.
     """
     
-    def __init__(self, output_dir: str):
+    def __init__(self, output_dir: str, use_record_encoder: bool = True):
+        """
+        Args:
+            output_dir: Directory to save FIT files
+            use_record_encoder: Pack the record messages with the struct based
+                record encoder instead of one fit_tool RecordMessage per sample
+        """
         self.output_dir = output_dir
+        self.use_record_encoder = use_record_encoder
         os.makedirs(output_dir, exist_ok=True)
 
     def _ensure_datetime_utc(self, time_input: Any, base_datetime_utc: Optional[datetime] = None) -> Optional[datetime]:
@@ -119,6 +170,176 @@ class FITConverter:
             return array[:expected_length]
         return array
 
+    @staticmethod
+    def new_record_columns() -> Dict[str, List[Any]]:
+        """Returns empty record columns for append_record and the record encoder."""
+        return {name: [] for name in ('timestamp', 'heart_rate', 'cadence', 'distance', 'speed', 'enhanced_speed', 'power')}
+
+    @staticmethod
+    def append_record(columns: Dict[str, List[Any]], unix_ms_record_time: int, power: Any, heart_rate: Any,
+                      cadence: Any, speed_kmh: Any, distance: Any) -> None:
+        """Appends one sample to record columns, in the units of the FIT record message."""
+        # Convert from km/h to m/s (FIT files require speed in m/s)
+        speed_mps = float(speed_kmh) / 3.6 if speed_kmh is not None else None
+        columns['timestamp'].append(unix_ms_record_time)
+        columns['power'].append(int(power) if power is not None else None)
+        columns['heart_rate'].append(int(heart_rate) if heart_rate is not None else None)
+        columns['cadence'].append(int(cadence) if cadence is not None else None)
+        columns['speed'].append(speed_mps)
+        columns['enhanced_speed'].append(speed_mps)
+        columns['distance'].append(float(distance) if distance is not None else None)
+
+    def add_head_messages(self, builder, processed_data: Dict[str, Any], unix_ms_start_time: int) -> None:
+        """Adds the file ID, device info and timer start messages that precede the records."""
+        # Use enhanced device identification
+        manufacturer_id = processed_data.get("device_manufacturer_id", 65534)  # Default to development ID
+        product_id = processed_data.get("device_product_id", 1001)  # Default product ID
+        
+        file_id_mesg = FileIdMessage()
+        file_id_mesg.type = FileType.ACTIVITY
+        file_id_mesg.manufacturer = manufacturer_id
+        file_id_mesg.product = product_id
+        file_id_mesg.serial_number = processed_data.get("serial_number", 123456789)
+        file_id_mesg.time_created = unix_ms_start_time
+        builder.add(file_id_mesg)
+
+        device_info_mesg = DeviceInfoMessage()
+        device_info_mesg.timestamp = unix_ms_start_time
+        device_info_mesg.manufacturer = manufacturer_id
+        device_info_mesg.product = product_id
+        device_info_mesg.serial_number = processed_data.get("serial_number", 123456789)
+        device_info_mesg.software_version = processed_data.get("software_version_scaled", 100.0)
+        device_info_mesg.hardware_version = processed_data.get("hardware_version", 1)
+        builder.add(device_info_mesg)
+
+        event_mesg_start = EventMessage()
+
+        event_mesg_start.timestamp = unix_ms_start_time
+        event_mesg_start.event = Event.TIMER
+        event_mesg_start.event_type = EventType.START
+        builder.add(event_mesg_start)
+
+    def add_tail_messages(self, builder, processed_data: Dict[str, Any], unix_ms_start_time: int,
+                           unix_ms_stop_time: int, duration_seconds: float, start_time_dt_utc: datetime) -> None:
+        """Adds the timer stop, lap, session and activity messages that follow the records."""
+        total_distance = float(processed_data.get("total_distance", 0))
+        total_calories = int(processed_data.get("total_calories", 0))
+        avg_power = processed_data.get("avg_power")
+        max_power = processed_data.get("max_power")
+        avg_heart_rate = processed_data.get("avg_heart_rate")
+        max_heart_rate = processed_data.get("max_heart_rate")
+        avg_cadence = processed_data.get("avg_cadence")
+        max_cadence = processed_data.get("max_cadence")
+        avg_speed = processed_data.get("avg_speed")
+        max_speed = processed_data.get("max_speed")
+        normalized_power = processed_data.get("normalized_power")
+
+        event_mesg_stop = EventMessage()
+        event_mesg_stop.timestamp = unix_ms_stop_time
+        event_mesg_stop.event = Event.TIMER
+        event_mesg_stop.event_type = EventType.STOP
+        builder.add(event_mesg_stop)
+
+        lap_mesg = LapMessage()
+        lap_mesg.timestamp = unix_ms_stop_time
+        lap_mesg.start_time = unix_ms_start_time
+        lap_mesg.total_elapsed_time = duration_seconds
+        lap_mesg.total_timer_time = duration_seconds
+        lap_mesg.event = Event.LAP
+        lap_mesg.event_type = EventType.STOP
+        lap_mesg.lap_trigger = LapTrigger.MANUAL
+        if avg_speed is not None:
+            # Convert from km/h to m/s (FIT files require speed in m/s)
+            avg_speed_kmh = float(avg_speed)
+            avg_speed_mps = avg_speed_kmh / 3.6  # Convert km/h to m/s
+            lap_mesg.avg_speed = avg_speed_mps
+        if max_speed is not None:
+            # Convert from km/h to m/s (FIT files require speed in m/s)
+            max_speed_kmh = float(max_speed)
+            max_speed_mps = max_speed_kmh / 3.6  # Convert km/h to m/s
+            lap_mesg.max_speed = max_speed_mps
+        if total_distance is not None: lap_mesg.total_distance = float(total_distance)
+        if total_calories is not None: lap_mesg.total_calories = int(total_calories)
+        if avg_power is not None: lap_mesg.avg_power = int(avg_power)
+        if max_power is not None: lap_mesg.max_power = int(max_power)
+        if normalized_power is not None and normalized_power > 0 : lap_mesg.normalized_power = int(normalized_power)
+        if avg_cadence is not None: lap_mesg.avg_cadence = int(avg_cadence)
+        if max_cadence is not None: lap_mesg.max_cadence = int(max_cadence)
+        if avg_heart_rate is not None: lap_mesg.avg_heart_rate = int(avg_heart_rate)
+        if max_heart_rate is not None: lap_mesg.max_heart_rate = int(max_heart_rate)
+        # Use enhanced sport type identification
+        sport_type = processed_data.get("sport_type", 2)  # Default to cycling
+        sub_sport_type = processed_data.get("sub_sport_type", 6)  # Default to indoor cycling
+        
+        try:
+            lap_mesg.sport = sport_type
+            lap_mesg.sub_sport = sub_sport_type
+            logger.info(f"Set LapMessage sport={sport_type}, sub_sport={sub_sport_type}")
+        except (AttributeError, ValueError) as e:
+            logger.warning(f"Error setting sport types: {e}, using fallback values")
+            lap_mesg.sport = Sport.CYCLING if hasattr(Sport, 'CYCLING') else 2
+            lap_mesg.sub_sport = 6  # Indoor cycling fallback
+        builder.add(lap_mesg)
+
+        session_mesg = SessionMessage()
+        session_mesg.timestamp = unix_ms_stop_time
+        session_mesg.start_time = unix_ms_start_time
+        session_mesg.total_elapsed_time = duration_seconds
+        session_mesg.total_timer_time = duration_seconds
+        session_mesg.event = Event.SESSION
+        session_mesg.event_type = EventType.STOP
+        session_mesg.trigger = SessionTrigger.ACTIVITY_END
+        if avg_speed is not None:
+            # Convert from km/h to m/s (FIT files require speed in m/s)
+            avg_speed_kmh = float(avg_speed)
+            avg_speed_mps = avg_speed_kmh / 3.6  # Convert km/h to m/s
+            session_mesg.avg_speed = avg_speed_mps
+        if max_speed is not None:
+            # Convert from km/h to m/s (FIT files require speed in m/s)
+            max_speed_kmh = float(max_speed)
+            max_speed_mps = max_speed_kmh / 3.6  # Convert km/h to m/s
+            session_mesg.max_speed = max_speed_mps
+        if total_distance is not None: session_mesg.total_distance = float(total_distance)
+        if total_calories is not None: session_mesg.total_calories = int(total_calories)
+        if avg_power is not None: session_mesg.avg_power = int(avg_power)
+        if max_power is not None: session_mesg.max_power = int(max_power)
+        if normalized_power is not None and normalized_power > 0 : session_mesg.normalized_power = int(normalized_power)
+        if avg_cadence is not None: session_mesg.avg_cadence = int(avg_cadence)
+        if max_cadence is not None: session_mesg.max_cadence = int(max_cadence)
+        if avg_heart_rate is not None: session_mesg.avg_heart_rate = int(avg_heart_rate)
+        if max_heart_rate is not None: session_mesg.max_heart_rate = int(max_heart_rate)
+        # Use enhanced sport type identification
+        try:
+            session_mesg.sport = sport_type
+            session_mesg.sub_sport = sub_sport_type
+            logger.info(f"Set SessionMessage sport={sport_type}, sub_sport={sub_sport_type}")
+        except (AttributeError, ValueError) as e:
+            logger.warning(f"Error setting sport types: {e}, using fallback values")
+            session_mesg.sport = Sport.CYCLING if hasattr(Sport, 'CYCLING') else 2
+            session_mesg.sub_sport = 6  # Indoor cycling fallback
+        builder.add(session_mesg)
+
+        activity_mesg = ActivityMessage()
+        activity_mesg.timestamp = unix_ms_start_time
+        activity_mesg.total_timer_time = duration_seconds
+        activity_mesg.num_sessions = 1
+        # Use enhanced activity type identification
+        activity_type = processed_data.get("activity_type", 6)  # Default to indoor cycling
+        
+        try:
+            activity_mesg.type = activity_type
+            logger.info(f"Set ActivityType to {activity_type}")
+        except (AttributeError, ValueError) as e:
+            logger.warning(f"Error setting activity type: {e}, using fallback")
+            activity_mesg.type = 6  # Indoor cycling fallback
+
+        activity_mesg.event = Event.ACTIVITY
+        activity_mesg.event_type = EventType.STOP
+        
+        local_midnight_dt = start_time_dt_utc.replace(hour=0, minute=0, second=0, microsecond=0)
+        activity_mesg.local_timestamp = self._datetime_to_fit_epoch_seconds_for_local(local_midnight_dt)
+        builder.add(activity_mesg)
+
     def convert_workout(self, processed_data, user_profile=None):
         try:
             # Apply enhanced speed calculation fixes
@@ -131,17 +352,6 @@ class FITConverter:
             start_time_metadata_input = processed_data.get("start_time")
             
             total_duration_from_data = float(processed_data.get("total_duration", 0))
-            total_distance = float(processed_data.get("total_distance", 0))
-            total_calories = int(processed_data.get("total_calories", 0))
-            avg_power = processed_data.get("avg_power")
-            max_power = processed_data.get("max_power")
-            avg_heart_rate = processed_data.get("avg_heart_rate")
-            max_heart_rate = processed_data.get("max_heart_rate")
-            avg_cadence = processed_data.get("avg_cadence")
-            max_cadence = processed_data.get("max_cadence")
-            avg_speed = processed_data.get("avg_speed") 
-            max_speed = processed_data.get("max_speed") 
-            normalized_power = processed_data.get("normalized_power")
 
             data_series = processed_data.get("data_series", {})
             timestamps_rel_sec = data_series.get("timestamps", [])
@@ -217,53 +427,40 @@ class FITConverter:
 
             builder = FitFileBuilder(auto_define=True)
 
-            # Use enhanced device identification
-            manufacturer_id = processed_data.get("device_manufacturer_id", 65534)  # Default to development ID
-            product_id = processed_data.get("device_product_id", 1001)  # Default product ID
-            
-            file_id_mesg = FileIdMessage()
-            file_id_mesg.type = FileType.ACTIVITY
-            file_id_mesg.manufacturer = manufacturer_id
-            file_id_mesg.product = product_id
-            file_id_mesg.serial_number = processed_data.get("serial_number", 123456789)
-            file_id_mesg.time_created = unix_ms_start_time
-            builder.add(file_id_mesg)
-
-            device_info_mesg = DeviceInfoMessage()
-            device_info_mesg.timestamp = unix_ms_start_time
-            device_info_mesg.manufacturer = manufacturer_id
-            device_info_mesg.product = product_id
-            device_info_mesg.serial_number = processed_data.get("serial_number", 123456789)
-            device_info_mesg.software_version = processed_data.get("software_version_scaled", 100.0)
-            device_info_mesg.hardware_version = processed_data.get("hardware_version", 1)
-            builder.add(device_info_mesg)
-
-            event_mesg_start = EventMessage()
-
-            event_mesg_start.timestamp = unix_ms_start_time
-            event_mesg_start.event = Event.TIMER
-            event_mesg_start.event_type = EventType.START
-            builder.add(event_mesg_start)
+            self.add_head_messages(builder, processed_data, unix_ms_start_time)
             
-            for i in valid_records_indices:
-                record_dt = record_datetimes[i]
-                unix_ms_record_time = self._datetime_to_unix_epoch_milliseconds(record_dt)
-                if unix_ms_record_time is None:
-                    continue
-
-                record_mesg = RecordMessage()
-                record_mesg.timestamp = unix_ms_record_time
-                if powers[i] is not None: record_mesg.power = int(powers[i])
-                if heart_rates[i] is not None: record_mesg.heart_rate = int(heart_rates[i])
-                if cadences[i] is not None: record_mesg.cadence = int(cadences[i])
-                if speeds[i] is not None:
-                    # Convert from km/h to m/s (FIT files require speed in m/s)
-                    current_speed_kmh = float(speeds[i])
-                    current_speed_mps = current_speed_kmh / 3.6  # Convert km/h to m/s
-                    record_mesg.speed = current_speed_mps
-                    record_mesg.enhanced_speed = current_speed_mps
-                if distances[i] is not None: record_mesg.distance = float(distances[i])
-                builder.add(record_mesg)
+            record_columns = None
+            if self.use_record_encoder:
+                # Columnar record data for the record encoder; the messages
+                # after the records go into a builder of their own
+                record_columns = self.new_record_columns()
+                for i in valid_records_indices:
+                    unix_ms_record_time = self._datetime_to_unix_epoch_milliseconds(record_datetimes[i])
+                    if unix_ms_record_time is None:
+                        continue
+                    self.append_record(record_columns, unix_ms_record_time, powers[i], heart_rates[i],
+                                       cadences[i], speeds[i], distances[i])
+                head_builder, builder = builder, FitFileBuilder(auto_define=True)
+            else:
+                for i in valid_records_indices:
+                    record_dt = record_datetimes[i]
+                    unix_ms_record_time = self._datetime_to_unix_epoch_milliseconds(record_dt)
+                    if unix_ms_record_time is None:
+                        continue
+
+                    record_mesg = RecordMessage()
+                    record_mesg.timestamp = unix_ms_record_time
+                    if powers[i] is not None: record_mesg.power = int(powers[i])
+                    if heart_rates[i] is not None: record_mesg.heart_rate = int(heart_rates[i])
+                    if cadences[i] is not None: record_mesg.cadence = int(cadences[i])
+                    if speeds[i] is not None:
+                        # Convert from km/h to m/s (FIT files require speed in m/s)
+                        current_speed_kmh = float(speeds[i])
+                        current_speed_mps = current_speed_kmh / 3.6  # Convert km/h to m/s
+                        record_mesg.speed = current_speed_mps
+                        record_mesg.enhanced_speed = current_speed_mps
+                    if distances[i] is not None: record_mesg.distance = float(distances[i])
+                    builder.add(record_mesg)
 
             unix_ms_event_stop_time = unix_ms_end_time
             if unix_ms_event_stop_time is None:
@@ -271,120 +468,36 @@ class FITConverter:
                 last_valid_unix_ms_record_time = self._datetime_to_unix_epoch_milliseconds(record_datetimes[valid_records_indices[-1]])
                 unix_ms_event_stop_time = last_valid_unix_ms_record_time if last_valid_unix_ms_record_time is not None else unix_ms_start_time
             
-            event_mesg_stop = EventMessage()
-            event_mesg_stop.timestamp = unix_ms_event_stop_time
-            event_mesg_stop.event = Event.TIMER
-            event_mesg_stop.event_type = EventType.STOP
-            builder.add(event_mesg_stop)
-
-            lap_mesg = LapMessage()
-            lap_mesg.timestamp = unix_ms_event_stop_time
-            lap_mesg.start_time = unix_ms_start_time
-            lap_mesg.total_elapsed_time = actual_total_duration_seconds
-            lap_mesg.total_timer_time = actual_total_duration_seconds
-            lap_mesg.event = Event.LAP
-            lap_mesg.event_type = EventType.STOP
-            lap_mesg.lap_trigger = LapTrigger.MANUAL
-            if avg_speed is not None:
-                # Convert from km/h to m/s (FIT files require speed in m/s)
-                avg_speed_kmh = float(avg_speed)
-                avg_speed_mps = avg_speed_kmh / 3.6  # Convert km/h to m/s
-                lap_mesg.avg_speed = avg_speed_mps
-            if max_speed is not None:
-                # Convert from km/h to m/s (FIT files require speed in m/s)
-                max_speed_kmh = float(max_speed)
-                max_speed_mps = max_speed_kmh / 3.6  # Convert km/h to m/s
-                lap_mesg.max_speed = max_speed_mps
-            if total_distance is not None: lap_mesg.total_distance = float(total_distance)
-            if total_calories is not None: lap_mesg.total_calories = int(total_calories)
-            if avg_power is not None: lap_mesg.avg_power = int(avg_power)
-            if max_power is not None: lap_mesg.max_power = int(max_power)
-            if normalized_power is not None and normalized_power > 0 : lap_mesg.normalized_power = int(normalized_power)
-            if avg_cadence is not None: lap_mesg.avg_cadence = int(avg_cadence)
-            if max_cadence is not None: lap_mesg.max_cadence = int(max_cadence)
-            if avg_heart_rate is not None: lap_mesg.avg_heart_rate = int(avg_heart_rate)
-            if max_heart_rate is not None: lap_mesg.max_heart_rate = int(max_heart_rate)
-            # Use enhanced sport type identification
-            sport_type = processed_data.get("sport_type", 2)  # Default to cycling
-            sub_sport_type = processed_data.get("sub_sport_type", 6)  # Default to indoor cycling
-            
-            try:
-                lap_mesg.sport = sport_type
-                lap_mesg.sub_sport = sub_sport_type
-                logger.info(f"Set LapMessage sport={sport_type}, sub_sport={sub_sport_type}")
-            except (AttributeError, ValueError) as e:
-                logger.warning(f"Error setting sport types: {e}, using fallback values")
-                lap_mesg.sport = Sport.CYCLING if hasattr(Sport, 'CYCLING') else 2
-                lap_mesg.sub_sport = 6  # Indoor cycling fallback
-            builder.add(lap_mesg)
-
-            session_mesg = SessionMessage()
-            session_mesg.timestamp = unix_ms_event_stop_time
-            session_mesg.start_time = unix_ms_start_time
-            session_mesg.total_elapsed_time = actual_total_duration_seconds
-            session_mesg.total_timer_time = actual_total_duration_seconds
-            session_mesg.event = Event.SESSION
-            session_mesg.event_type = EventType.STOP
-            session_mesg.trigger = SessionTrigger.ACTIVITY_END
-            if avg_speed is not None:
-                # Convert from km/h to m/s (FIT files require speed in m/s)
-                avg_speed_kmh = float(avg_speed)
-                avg_speed_mps = avg_speed_kmh / 3.6  # Convert km/h to m/s
-                session_mesg.avg_speed = avg_speed_mps
-            if max_speed is not None:
-                # Convert from km/h to m/s (FIT files require speed in m/s)
-                max_speed_kmh = float(max_speed)
-                max_speed_mps = max_speed_kmh / 3.6  # Convert km/h to m/s
-                session_mesg.max_speed = max_speed_mps
-            if total_distance is not None: session_mesg.total_distance = float(total_distance)
-            if total_calories is not None: session_mesg.total_calories = int(total_calories)
-            if avg_power is not None: session_mesg.avg_power = int(avg_power)
-            if max_power is not None: session_mesg.max_power = int(max_power)
-            if normalized_power is not None and normalized_power > 0 : session_mesg.normalized_power = int(normalized_power)
-            if avg_cadence is not None: session_mesg.avg_cadence = int(avg_cadence)
-            if max_cadence is not None: session_mesg.max_cadence = int(max_cadence)
-            if avg_heart_rate is not None: session_mesg.avg_heart_rate = int(avg_heart_rate)
-            if max_heart_rate is not None: session_mesg.max_heart_rate = int(max_heart_rate)
-            # Use enhanced sport type identification
-            try:
-                session_mesg.sport = sport_type
-                session_mesg.sub_sport = sub_sport_type
-                logger.info(f"Set SessionMessage sport={sport_type}, sub_sport={sub_sport_type}")
-            except (AttributeError, ValueError) as e:
-                logger.warning(f"Error setting sport types: {e}, using fallback values")
-                session_mesg.sport = Sport.CYCLING if hasattr(Sport, 'CYCLING') else 2
-                session_mesg.sub_sport = 6  # Indoor cycling fallback
-            builder.add(session_mesg)
-
-            activity_mesg = ActivityMessage()
-            activity_mesg.timestamp = unix_ms_start_time
-            activity_mesg.total_timer_time = actual_total_duration_seconds
-            activity_mesg.num_sessions = 1
-            # Use enhanced activity type identification
-            activity_type = processed_data.get("activity_type", 6)  # Default to indoor cycling
-            
-            try:
-                activity_mesg.type = activity_type
-                logger.info(f"Set ActivityType to {activity_type}")
-            except (AttributeError, ValueError) as e:
-                logger.warning(f"Error setting activity type: {e}, using fallback")
-                activity_mesg.type = 6  # Indoor cycling fallback
-
-            activity_mesg.event = Event.ACTIVITY
-            activity_mesg.event_type = EventType.STOP
-            
-            local_midnight_dt = start_time_dt_utc.replace(hour=0, minute=0, second=0, microsecond=0)
-            activity_mesg.local_timestamp = self._datetime_to_fit_epoch_seconds_for_local(local_midnight_dt)
-            builder.add(activity_mesg)
+            self.add_tail_messages(builder, processed_data, unix_ms_start_time, unix_ms_event_stop_time,
+                                    actual_total_duration_seconds, start_time_dt_utc)
 
             file_name_base = f"{workout_type}_{start_time_dt_utc.strftime("%Y%m%d_%H%M%S")}"
             output_path = os.path.join(self.output_dir, f"{file_name_base}.fit")
             
-            fit_file = builder.build()
-            fit_file.to_file(output_path)
-
-            # Validate the generated FIT file
-            validation_result = validate_fit_file(output_path)
+            # Write under a temporary name and rename, so readers (and
+            # parallel regeneration) never see a partly written file
+            temp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                if record_columns is not None:
+                    head = b''.join(record.to_bytes() for record in head_builder.records)
+                    tail = b''.join(record.to_bytes() for record in builder.records)
+                    with open(temp_path, 'wb') as fit_file_obj:
+                        file_size = write_fit_file(fit_file_obj, head, record_columns, tail)
+                    messages = itertools.chain(data_messages(head_builder.records),
+                                               iter_record_views(record_columns),
+                                               data_messages(builder.records))
+                else:
+                    fit_file = builder.build()
+                    fit_file.to_file(temp_path)
+                    file_size = os.path.getsize(temp_path)
+                    messages = data_messages(fit_file)
+                os.replace(temp_path, output_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+            # Validate the messages just written, instead of parsing the file back
+            validation_result = validate_fit_messages(messages, file_size)
             
             if validation_result.is_valid:
                 logger.info(f"FIT file successfully created and validated: {output_path}")
@@ -7,11 +7,13 @@ This module handles the optimized conversion of workout data to FIT format.
 
 import logging
 import os
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, Iterable, List, Any, Optional
 from datetime import datetime
 
 from ..data.database import Database
-from .fit_converter import FITConverter
+from .fit_cache import FITCache
+from .fit_catalog import FITCatalog
+from .fit_converter import FITConverter, extract_sample_metrics
 from .speed_calculator import EnhancedSpeedCalculator
 
 # Configure logging
@@ -26,15 +28,21 @@ class FITProcessor:
     Efficiently processes and converts workout data to FIT format.
     """
     
-    def __init__(self, db_path: str, fit_output_dir: str = None):
+    def __init__(self, db_path: str, fit_output_dir: str = None, read_only: bool = False,
+                 use_cache: bool = True):
         """
         Initialize the FIT processor.
         
         Args:
             db_path: Path to the SQLite database file
             fit_output_dir: Directory to save FIT files (optional)
+            read_only: Read the database through a read-only connection and
+                leave recording the FIT file paths to the caller
+            use_cache: Return the file of an earlier conversion with the same
+                inputs instead of converting again (see fit_cache)
         """
-        self.database = Database(db_path)
+        self.read_only = read_only
+        self.database = Database(db_path, read_only=read_only)
         
         # If fit_output_dir is not provided, use default directory
         if fit_output_dir is None:
@@ -43,39 +51,66 @@ class FITProcessor:
             ))
         
         self.fit_converter = FITConverter(output_dir=fit_output_dir)
+        self.fit_cache = FITCache(self.database) if use_cache else None
+        self.fit_catalog = FITCatalog(self.database)
+        # Cache key of the last processed workout, for callers that record
+        # the conversion themselves (read-only processors)
+        self.last_cache_key: Optional[str] = None
     
-    def process_workout(self, workout_id: int, user_profile: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    def process_workout(self, workout_id: int, user_profile: Optional[Dict[str, Any]] = None,
+                        progress: Optional[Callable[[float, Optional[str]], None]] = None) -> Optional[str]:
         """
         Process a workout and convert it to FIT format.
         
         Args:
             workout_id: ID of the workout to process
             user_profile: User profile information (optional)
+            progress: Called as progress(fraction, message) after each step (optional)
             
         Returns:
             Path to the generated FIT file or None if processing failed
         """
+        report = progress or (lambda fraction, message=None: None)
+        
         # 1. Get workout metadata
         workout = self.database.get_workout(workout_id)
         if not workout:
             logger.error(f"Workout {workout_id} not found")
             return None
         
-        # 2. Get workout data points using an optimized database query
-        data_points = self.database.get_workout_data_optimized(workout_id)
-        if not data_points:
-            logger.error(f"No data points found for workout {workout_id}")
-            return None
+        # 2. Return the file of an earlier conversion with the same inputs
+        cache_key = self.fit_cache.key_for(workout, user_profile) if self.fit_cache else None
+        self.last_cache_key = cache_key
+        if cache_key:
+            cached_path = self.fit_cache.lookup(cache_key)
+            if cached_path:
+                if not self.read_only and workout.get('fit_file_path') != cached_path:
+                    self.database.update_workout_fit_path(workout_id, cached_path)
+                report(0.95, 'Using cached FIT file')
+                return cached_path
+        report(0.05, 'Loading samples')
         
-        # 3. Prepare data in the structure expected by fit_converter
+        # 3. Stream workout data points using an optimized database query
+        data_points = self.database.iter_workout_data_optimized(workout_id)
+        
+        # 4. Prepare data in the structure expected by fit_converter
         processed_data = self._structure_data_for_fit(workout, data_points)
+        if not processed_data['data_series']['powers']:
+            logger.error(f"No data points found for workout {workout_id}")
+            return None
+        report(0.4, 'Building FIT file')
         
-        # 4. Convert to FIT file
+        # 5. Convert to FIT file
         fit_file_path = self.fit_converter.convert_workout(processed_data, user_profile)
+        report(0.95, 'Saving FIT file')
         
-        # 5. Update workout record with FIT file path
+        # 6. Update workout record with FIT file path and remember the conversion
         if fit_file_path:
-            self.database.update_workout_fit_path(workout_id, fit_file_path)
+            if not self.read_only:
+                self.database.update_workout_fit_path(workout_id, fit_file_path)
+                self.fit_catalog.add(fit_file_path, workout_id)
+            if cache_key:
+                self.fit_cache.store(cache_key, workout_id, fit_file_path)
             logger.info(f"Successfully created FIT file for workout {workout_id}: {fit_file_path}")
         else:
             logger.error(f"Failed to create FIT file for workout {workout_id}")
@@ -104,13 +139,13 @@ class FITProcessor:
         
         return fit_files
     
-    def _structure_data_for_fit(self, workout: Dict[str, Any], data_points: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _structure_data_for_fit(self, workout: Dict[str, Any], data_points: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Structure workout data for FIT converter.
         
         Args:
             workout: Workout metadata
-            data_points: List of workout data points
+            data_points: Workout data points (consumed once)
             
         Returns:
             Structured data for FIT converter
@@ -205,13 +240,13 @@ class FITProcessor:
         
         return structured_data
     
-    def _extract_data_series(self, workout_type: str, data_points: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    def _extract_data_series(self, workout_type: str, data_points: Iterable[Dict[str, Any]]) -> Dict[str, List[Any]]:
         """
         Extract data series from data points for use in FIT file.
         
         Args:
             workout_type: Type of workout ('bike' or 'rower')
-            data_points: List of data points
+            data_points: Data points (consumed once)
             
         Returns:
             Dictionary of data series
@@ -242,33 +277,19 @@ class FITProcessor:
                 if 'absolute_timestamp' in point:
                     series['absolute_timestamps'].append(point['absolute_timestamp'])
             
-            # Add common metrics - check multiple possible field names
-            # For power, check various field names with fallback
+            # Add common metrics, always included (missing values become 0)
+            metrics = extract_sample_metrics(point)
             power = point.get('instant_power', 
                       point.get('instantaneous_power', 
                       point.get('power', 0)))
-            # Ensure power is always included - very important!
-            series['powers'].append(power if power is not None else 0)
-            
-            # For cadence, check various field names with fallback (moved outside workout_type check)
             cadence = point.get('instant_cadence', 
                        point.get('instantaneous_cadence', 
                        point.get('cadence', 0)))
-            # Ensure cadence is always included
-            series['cadences'].append(cadence if cadence is not None else 0)
-            
-            # For speed, check various field names with fallback (moved outside workout_type check)
-            speed = point.get('instant_speed', 
-                     point.get('instantaneous_speed', 
-                     point.get('speed', 0)))
-            # Ensure speed is always included
-            series['speeds'].append(speed if speed is not None else 0)
-            
-            # Heart rate
-            series['heart_rates'].append(point.get('heart_rate', 0) or 0)  # Convert None to 0
-            
-            # Distance
-            series['distances'].append(point.get('total_distance', 0) or 0)  # Convert None to 0
+            series['powers'].append(metrics['power'])
+            series['cadences'].append(metrics['cadence'])
+            series['speeds'].append(metrics['speed'])
+            series['heart_rates'].append(metrics['heart_rate'])
+            series['distances'].append(metrics['distance'])
             
             # Add average values for all workout types
             series['average_powers'].append(point.get('average_power', power) or 0)
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+FIT Summary Module for Rogue to Garmin Bridge
+
+This module reads the metadata of a FIT file (file type, device, sport, start
+time, duration and session totals) without decoding its per-second records.
+The file is walked message by message: definition messages are parsed, the
+file_id, session and activity data messages are unpacked with a struct built
+from their definition, and every other data message (records, events, laps)
+is stepped over by its defined size.
+
+This is what the FIT file browser and bulk audits need, at a small fraction
+of the cost of FITAnalyzer.analyze_fit_file, which builds a fit_tool object
+for every message in the file.
+"""
+
+import logging
+import math
+import struct
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('fit_summary')
+
+# FIT timestamps count seconds from 1989-12-31T00:00:00Z
+FIT_EPOCH = datetime(1989, 12, 31, tzinfo=timezone.utc)
+
+# Global message numbers in the FIT profile
+FILE_ID_GLOBAL_ID = 0
+SESSION_GLOBAL_ID = 18
+RECORD_GLOBAL_ID = 20
+ACTIVITY_GLOBAL_ID = 34
+
+# Base types: base type number -> (struct code, invalid value)
+BASE_TYPES = {
+    0x00: ('B', 0xFF),                  # enum
+    0x01: ('b', 0x7F),                  # sint8
+    0x02: ('B', 0xFF),                  # uint8
+    0x83: ('h', 0x7FFF),                # sint16
+    0x84: ('H', 0xFFFF),                # uint16
+    0x85: ('i', 0x7FFFFFFF),            # sint32
+    0x86: ('I', 0xFFFFFFFF),            # uint32
+    0x88: ('f', None),                  # float32
+    0x89: ('d', None),                  # float64
+    0x0A: ('B', 0x00),                  # uint8z
+    0x8B: ('H', 0x0000),                # uint16z
+    0x8C: ('I', 0x00000000),            # uint32z
+    0x8E: ('q', 0x7FFFFFFFFFFFFFFF),    # sint64
+    0x8F: ('Q', 0xFFFFFFFFFFFFFFFF),    # uint64
+    0x90: ('Q', 0x0000000000000000),    # uint64z
+}
+
+# Marks a field holding a FIT date_time
+DATE_TIME = 'date_time'
+
+# Fields read from each summary message: field number -> (name, scale)
+SUMMARY_FIELDS = {
+    FILE_ID_GLOBAL_ID: {
+        0: ('file_type', 1),
+        1: ('manufacturer', 1),
+        2: ('product', 1),
+        3: ('serial_number', 1),
+        4: ('time_created', DATE_TIME),
+    },
+    SESSION_GLOBAL_ID: {
+        253: ('timestamp', DATE_TIME),
+        2: ('start_time', DATE_TIME),
+        5: ('sport', 1),
+        6: ('sub_sport', 1),
+        7: ('total_elapsed_time', 1000),
+        8: ('total_timer_time', 1000),
+        9: ('total_distance', 100),
+        11: ('total_calories', 1),
+        14: ('avg_speed', 1000),
+        15: ('max_speed', 1000),
+        16: ('avg_heart_rate', 1),
+        17: ('max_heart_rate', 1),
+        18: ('avg_cadence', 1),
+        19: ('max_cadence', 1),
+        20: ('avg_power', 1),
+        21: ('max_power', 1),
+        124: ('enhanced_avg_speed', 1000),
+        125: ('enhanced_max_speed', 1000),
+    },
+    ACTIVITY_GLOBAL_ID: {
+        253: ('timestamp', DATE_TIME),
+        0: ('total_timer_time', 1000),
+        1: ('num_sessions', 1),
+    },
+}
+
+
+@dataclass
+class FITSummary:
+    """Metadata of a FIT file read without decoding its records"""
+    file_path: Optional[str]
+    file_size_bytes: int
+    file_type: Optional[int]
+    manufacturer: Optional[int]
+    product: Optional[int]
+    serial_number: Optional[int]
+    time_created: Optional[datetime]
+    sport: Optional[int]
+    sub_sport: Optional[int]
+    start_time: Optional[datetime]
+    end_time: Optional[datetime]
+    total_elapsed_time: Optional[float]
+    total_timer_time: Optional[float]
+    total_distance: Optional[float]
+    total_calories: Optional[int]
+    avg_speed: Optional[float]
+    max_speed: Optional[float]
+    avg_heart_rate: Optional[int]
+    max_heart_rate: Optional[int]
+    avg_cadence: Optional[int]
+    max_cadence: Optional[int]
+    avg_power: Optional[int]
+    max_power: Optional[int]
+    session_count: int
+    record_count: int
+    message_count: int
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        """Elapsed time of the session, or the span of its start and end times"""
+        if self.total_elapsed_time is not None:
+            return self.total_elapsed_time
+        if self.start_time and self.end_time:
+            return (self.end_time - self.start_time).total_seconds()
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the summary to a JSON friendly dictionary.
+
+        Returns:
+            Dictionary with times as ISO 8601 strings
+        """
+        result = asdict(self)
+        for name, value in result.items():
+            if isinstance(value, datetime):
+                result[name] = value.isoformat()
+        result['duration_seconds'] = self.duration_seconds
+        return result
+
+
+class _Definition:
+    """Layout of the data messages of one local message type"""
+
+    __slots__ = ('global_id', 'size', 'unpacker', 'fields')
+
+    def __init__(self, global_id: int, size: int, unpacker: Optional[struct.Struct],
+                 fields: List[Tuple[str, Any, Any]]):
+        self.global_id = global_id
+        self.size = size
+        self.unpacker = unpacker
+        self.fields = fields
+
+
+def _read_definition(data: bytes, pos: int, has_developer_data: bool) -> Tuple[_Definition, int]:
+    """
+    Parse a definition message.
+
+    Args:
+        data: FIT file bytes
+        pos: Offset of the definition content, after its record header
+        has_developer_data: Whether the definition lists developer fields
+
+    Returns:
+        Tuple of the definition and the offset after it
+    """
+    architecture = data[pos + 1]
+    endian = '>' if architecture == 1 else '<'
+    global_id = struct.unpack_from(endian + 'H', data, pos + 2)[0]
+    field_count = data[pos + 4]
+    pos += 5
+
+    wanted = SUMMARY_FIELDS.get(global_id)
+    layout = [endian]
+    fields = []
+    size = 0
+    for _ in range(field_count):
+        number, field_size, base_type = data[pos], data[pos + 1], data[pos + 2]
+        pos += 3
+        size += field_size
+        if wanted is None:
+            continue
+        code, invalid = BASE_TYPES.get(base_type & 0x9F, (None, None))
+        if number in wanted and code and struct.calcsize(code) == field_size:
+            layout.append(code)
+            name, scale = wanted[number]
+            fields.append((name, scale, invalid))
+        elif field_size:
+            layout.append(f'{field_size}x')
+
+    if has_developer_data:
+        developer_count = data[pos]
+        pos += 1
+        for _ in range(developer_count):
+            field_size = data[pos + 1]
+            pos += 3
+            size += field_size
+            if wanted is not None and field_size:
+                layout.append(f'{field_size}x')
+
+    unpacker = struct.Struct(''.join(layout)) if wanted is not None else None
+    return _Definition(global_id, size, unpacker, fields), pos
+
+
+def _decode(definition: _Definition, data: bytes, pos: int) -> Dict[str, Any]:
+    """
+    Unpack the summary fields of a data message.
+
+    Args:
+        definition: Definition of the message's local type
+        data: FIT file bytes
+        pos: Offset of the message content
+
+    Returns:
+        Dictionary of scaled field values, without invalid fields
+    """
+    values = {}
+    for (name, scale, invalid), raw in zip(definition.fields, definition.unpacker.unpack_from(data, pos)):
+        if raw == invalid or (isinstance(raw, float) and math.isnan(raw)):
+            continue
+        if scale == DATE_TIME:
+            values[name] = FIT_EPOCH + timedelta(seconds=raw)
+        elif scale != 1:
+            values[name] = raw / scale
+        else:
+            values[name] = raw
+    return values
+
+
+def read_fit_summary_bytes(data: bytes, file_path: Optional[str] = None) -> FITSummary:
+    """
+    Read the summary of a FIT file held in memory.
+
+    Args:
+        data: FIT file bytes
+        file_path: Path reported in the summary (optional)
+
+    Returns:
+        FITSummary of the file
+
+    Raises:
+        ValueError: If the data is not a well formed FIT file
+    """
+    if len(data) < 12 or data[0] not in (12, 14) or data[8:12] != b'.FIT':
+        raise ValueError("Not a FIT file: bad header")
+    header_size = data[0]
+    end = header_size + struct.unpack_from('<I', data, 4)[0]
+    if end > len(data):
+        raise ValueError(f"Truncated FIT file: {end} bytes of data expected, {len(data)} present")
+
+    definitions: Dict[int, _Definition] = {}
+    file_id: Dict[str, Any] = {}
+    sessions: List[Dict[str, Any]] = []
+    activity: Dict[str, Any] = {}
+    record_count = 0
+    message_count = 0
+
+    pos = header_size
+    try:
+        while pos < end:
+            header = data[pos]
+            pos += 1
+            if header & 0x80:
+                # Compressed timestamp header
+                local_type = (header >> 5) & 0x03
+            elif header & 0x40:
+                definition, pos = _read_definition(data, pos, bool(header & 0x20))
+                definitions[header & 0x0F] = definition
+                continue
+            else:
+                local_type = header & 0x0F
+
+            definition = definitions.get(local_type)
+            if definition is None:
+                raise ValueError(f"Data message of undefined local type {local_type} at offset {pos - 1}")
+            message_count += 1
+
+            if definition.unpacker is not None:
+                values = _decode(definition, data, pos)
+                if definition.global_id == SESSION_GLOBAL_ID:
+                    sessions.append(values)
+                elif definition.global_id == ACTIVITY_GLOBAL_ID:
+                    activity = values
+                elif not file_id:
+                    file_id = values
+            elif definition.global_id == RECORD_GLOBAL_ID:
+                record_count += 1
+            pos += definition.size
+    except (IndexError, struct.error) as e:
+        raise ValueError(f"Truncated FIT message at offset {pos}: {e}") from e
+
+    if pos != end:
+        raise ValueError(f"FIT data overruns its declared size by {pos - end} bytes")
+
+    session = sessions[0] if sessions else {}
+    return FITSummary(
+        file_path=file_path,
+        file_size_bytes=len(data),
+        file_type=file_id.get('file_type'),
+        manufacturer=file_id.get('manufacturer'),
+        product=file_id.get('product'),
+        serial_number=file_id.get('serial_number'),
+        time_created=file_id.get('time_created'),
+        sport=session.get('sport'),
+        sub_sport=session.get('sub_sport'),
+        start_time=session.get('start_time'),
+        end_time=session.get('timestamp', activity.get('timestamp')),
+        total_elapsed_time=session.get('total_elapsed_time'),
+        total_timer_time=session.get('total_timer_time', activity.get('total_timer_time')),
+        total_distance=session.get('total_distance'),
+        total_calories=session.get('total_calories'),
+        avg_speed=session.get('enhanced_avg_speed', session.get('avg_speed')),
+        max_speed=session.get('enhanced_max_speed', session.get('max_speed')),
+        avg_heart_rate=session.get('avg_heart_rate'),
+        max_heart_rate=session.get('max_heart_rate'),
+        avg_cadence=session.get('avg_cadence'),
+        max_cadence=session.get('max_cadence'),
+        avg_power=session.get('avg_power'),
+        max_power=session.get('max_power'),
+        session_count=len(sessions),
+        record_count=record_count,
+        message_count=message_count
+    )
+
+
+def read_fit_summary(file_path: str) -> FITSummary:
+    """
+    Read the summary of a FIT file.
+
+    Args:
+        file_path: Path to the FIT file
+
+    Returns:
+        FITSummary of the file
+
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If the file is not a well formed FIT file
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    return read_fit_summary_bytes(data, file_path)
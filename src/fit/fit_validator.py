@@ -8,7 +8,9 @@ and automated compatibility testing.
 
 import logging
 import os
-from typing import Dict, List, Any, Optional, Tuple, Set
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Any, Optional, Tuple, Set
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from enum import Enum
@@ -28,6 +30,38 @@ except ImportError as e:
 
 logger = logging.getLogger(__name__)
 
+# Word boundaries in CamelCase message class names
+_CAMEL_BOUNDARY = re.compile(r'(?<=[a-z0-9])(?=[A-Z])')
+
+@lru_cache(maxsize=None)
+def message_type_key(message_class: type) -> str:
+    """Snake case message type of a message class, e.g. 'file_id_message'"""
+    name = getattr(message_class, 'NAME', None)
+    if isinstance(name, str):
+        return f"{name}_message"
+    return _CAMEL_BOUNDARY.sub('_', message_class.__name__).lower()
+
+def _is_number(value: Any) -> bool:
+    """Whether a field value can be compared against a range"""
+    return isinstance(value, (int, float))
+
+def data_messages(source: Any) -> List[Any]:
+    """
+    Get the data messages of a parsed FIT file or a list of FIT records,
+    leaving out the definition messages
+    
+    Args:
+        source: FitFile, list of fit_tool records (e.g. FitFileBuilder.records)
+            or object with a messages list
+        
+    Returns:
+        List of data messages in file order
+    """
+    records = source if isinstance(source, list) else getattr(source, 'records', None)
+    if isinstance(records, list):
+        return [record.message for record in records if not record.is_definition]
+    return list(source.messages)
+
 class ValidationSeverity(Enum):
     """Validation issue severity levels"""
     ERROR = "error"
@@ -135,29 +169,9 @@ class FITValidator:
                 ))
                 return self._create_result(False, issues, message_counts, total_messages, file_size)
             
-            # Count messages by type
-            for message in fit_file.messages:
-                message_type = type(message).__name__.lower()
-                message_counts[message_type] = message_counts.get(message_type, 0) + 1
-                total_messages += 1
-            
-            # Validate message type completeness
-            issues.extend(self._validate_message_completeness(message_counts))
-            
-            # Validate individual messages
-            issues.extend(self._validate_messages(fit_file.messages))
-            
-            # Validate message sequence and consistency
-            issues.extend(self._validate_message_sequence(fit_file.messages))
-            
-            # Validate field value ranges
-            issues.extend(self._validate_field_ranges(fit_file.messages))
-            
-            # Validate timestamps
-            issues.extend(self._validate_timestamps(fit_file.messages))
-            
-            # Check for Garmin Connect compatibility
-            issues.extend(self._validate_garmin_compatibility(fit_file.messages))
+            # Check every rule in one pass over the messages
+            pass_issues, message_counts, total_messages = self._validate_single_pass(data_messages(fit_file))
+            issues.extend(pass_issues)
             
         except Exception as e:
             issues.append(ValidationIssue(
@@ -171,6 +185,57 @@ class FITValidator:
         
         return self._create_result(is_valid, issues, message_counts, total_messages, file_size)
     
+    def validate_messages(self, messages: Iterable[Any], file_size: int = 0) -> ValidationResult:
+        """
+        Validate FIT data messages that are already in memory, e.g. the
+        messages a converter has just written, without reading the file back
+        
+        Args:
+            messages: Data messages in file order (any iterable, read once)
+            file_size: Size of the encoded file in bytes, if known
+            
+        Returns:
+            ValidationResult with validation details
+        """
+        self.validation_start_time = datetime.now()
+        issues = []
+        message_counts = {}
+        total_messages = 0
+        
+        try:
+            issues, message_counts, total_messages = self._validate_single_pass(messages)
+        except Exception as e:
+            issues.append(ValidationIssue(
+                ValidationSeverity.ERROR,
+                f"Unexpected validation error: {str(e)}"
+            ))
+        
+        is_valid = not any(issue.severity == ValidationSeverity.ERROR for issue in issues)
+        return self._create_result(is_valid, issues, message_counts, total_messages, file_size)
+    
+    def validate_fit_bytes(self, data: bytes) -> ValidationResult:
+        """
+        Validate an encoded FIT file held in memory
+        
+        Args:
+            data: FIT file bytes
+            
+        Returns:
+            ValidationResult with validation details
+        """
+        self.validation_start_time = datetime.now()
+        if not data:
+            return self._create_result(False, [ValidationIssue(ValidationSeverity.ERROR, "FIT file is empty")],
+                                       {}, 0, 0)
+        try:
+            fit_file = FitFile.from_bytes(data)
+        except Exception as e:
+            return self._create_result(False, [ValidationIssue(
+                ValidationSeverity.ERROR,
+                f"Failed to parse FIT file: {str(e)}"
+            )], {}, 0, len(data))
+        return self.validate_messages(data_messages(fit_file), len(data))
+    
     def _create_result(self, is_valid: bool, issues: List[ValidationIssue], 
                       message_counts: Dict[str, int], total_messages: int, 
                       file_size: int) -> ValidationResult:
@@ -186,6 +251,147 @@ class FITValidator:
             validation_time_ms=validation_time
         )
     
+    def _validate_single_pass(self, messages: Iterable[Any]) -> Tuple[List[ValidationIssue], Dict[str, int], int]:
+        """
+        Count the messages and check every validation rule in one traversal
+        
+        Gives the same issues, in the same order, as running the completeness,
+        message, sequence, field range, timestamp and Garmin compatibility
+        checks one after the other.
+        
+        Returns:
+            Tuple of (issues, message counts by type, total messages)
+        """
+        message_counts = {}
+        total_messages = 0
+        message_issues = []
+        sequence_issues = []
+        range_issues = []
+        timestamp_issues = []
+        session_sport_issues = []
+        
+        message_validators = {
+            'file_id_message': self._validate_file_id_message,
+            'device_info_message': self._validate_device_info_message,
+            'record_message': self._validate_record_message,
+            'session_message': self._validate_session_message,
+            'activity_message': self._validate_activity_message,
+        }
+        range_fields_by_class = {}
+        
+        current_time_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        one_year_ms = 365 * 24 * 60 * 60 * 1000
+        oldest_ms = current_time_ms - one_year_ms
+        newest_ms = current_time_ms + one_year_ms
+        
+        has_timestamp = False
+        has_power_data = False
+        has_hr_data = False
+        record_timestamp_count = 0
+        last_record_timestamp = None
+        records_out_of_order = False
+        
+        for message in messages:
+            message_class = type(message)
+            message_type = message_type_key(message_class)
+            message_counts[message_type] = message_counts.get(message_type, 0) + 1
+            total_messages += 1
+            
+            if total_messages == 1 and message_type != 'file_id_message':
+                sequence_issues.append(ValidationIssue(
+                    ValidationSeverity.ERROR,
+                    "FileIdMessage must be the first message"
+                ))
+            
+            validate_message = message_validators.get(message_type)
+            if validate_message:
+                message_issues.extend(validate_message(message))
+            
+            timestamp = getattr(message, 'timestamp', None)
+            if timestamp is not None:
+                has_timestamp = True
+                if not timestamp_issues and _is_number(timestamp):
+                    if timestamp < oldest_ms:
+                        timestamp_issues.append(ValidationIssue(
+                            ValidationSeverity.WARNING,
+                            f"Timestamp {timestamp} is more than a year in the past"
+                        ))
+                    elif timestamp > newest_ms:
+                        timestamp_issues.append(ValidationIssue(
+                            ValidationSeverity.WARNING,
+                            f"Timestamp {timestamp} is more than a year in the future"
+                        ))
+                
+                if message_type == 'record_message':
+                    if (not records_out_of_order and last_record_timestamp is not None
+                            and _is_number(timestamp) and timestamp < last_record_timestamp):
+                        records_out_of_order = True
+                        sequence_issues.append(ValidationIssue(
+                            ValidationSeverity.WARNING,
+                            f"Record timestamps not in ascending order at position {record_timestamp_count}"
+                        ))
+                    record_timestamp_count += 1
+                    last_record_timestamp = timestamp if _is_number(timestamp) else last_record_timestamp
+            
+            if message_type == 'session_message' and getattr(message, 'sport', True) is None:
+                session_sport_issues.append(ValidationIssue(
+                    ValidationSeverity.WARNING,
+                    "SessionMessage missing sport type - may affect activity categorization in Garmin Connect"
+                ))
+            
+            # Profile message classes define their fields as class
+            # attributes, so the fields to check are looked up once per class
+            range_fields = range_fields_by_class.get(message_class)
+            if range_fields is None:
+                if hasattr(message_class, 'NAME'):
+                    range_fields = [(field_name, limits) for field_name, limits in self.FIELD_RANGES.items()
+                                    if hasattr(message_class, field_name)]
+                else:
+                    range_fields = list(self.FIELD_RANGES.items())
+                range_fields_by_class[message_class] = range_fields
+            
+            for field_name, (min_val, max_val) in range_fields:
+                value = getattr(message, field_name, None)
+                if value is None:
+                    continue
+                if field_name == 'power':
+                    has_power_data = True
+                elif field_name == 'heart_rate':
+                    has_hr_data = True
+                if _is_number(value) and (value < min_val or value > max_val):
+                    range_issues.append(ValidationIssue(
+                        ValidationSeverity.WARNING,
+                        f"Field {field_name} value {value} outside expected range [{min_val}, {max_val}]",
+                        field_name=field_name,
+                        message_type=message_class.__name__,
+                        expected_value=f"[{min_val}, {max_val}]",
+                        actual_value=value
+                    ))
+        
+        if not has_timestamp:
+            timestamp_issues.append(ValidationIssue(
+                ValidationSeverity.ERROR,
+                "No valid timestamps found in file"
+            ))
+        
+        compatibility_issues = []
+        if 'device_info_message' not in message_counts:
+            compatibility_issues.append(ValidationIssue(
+                ValidationSeverity.WARNING,
+                "Missing DeviceInfoMessage - may affect Garmin Connect compatibility"
+            ))
+        compatibility_issues.extend(session_sport_issues)
+        if not has_power_data and not has_hr_data:
+            compatibility_issues.append(ValidationIssue(
+                ValidationSeverity.WARNING,
+                "No power or heart rate data found - training load calculation may be inaccurate"
+            ))
+        
+        issues = self._validate_message_completeness(message_counts)
+        for category in (message_issues, sequence_issues, range_issues, timestamp_issues, compatibility_issues):
+            issues.extend(category)
+        return issues, message_counts, total_messages
+    
     def _validate_message_completeness(self, message_counts: Dict[str, int]) -> List[ValidationIssue]:
         """Validate that required message types are present"""
         issues = []
@@ -255,8 +461,8 @@ class FITValidator:
         """Validate FileIdMessage content"""
         issues = []
         
-        # Check file type
-        if not hasattr(message, 'type') or message.type != FileType.ACTIVITY:
+        # Check file type (fit_tool returns enum fields as their raw value)
+        if not hasattr(message, 'type') or message.type not in (FileType.ACTIVITY, FileType.ACTIVITY.value):
             issues.append(ValidationIssue(
                 ValidationSeverity.ERROR,
                 "FileIdMessage must have type ACTIVITY",
@@ -589,6 +795,33 @@ def validate_fit_file(file_path: str) -> ValidationResult:
     validator = FITValidator()
     return validator.validate_fit_file(file_path)
 
+def validate_fit_messages(messages: Iterable[Any], file_size: int = 0) -> ValidationResult:
+    """
+    Convenience function to validate FIT data messages held in memory
+    
+    Args:
+        messages: Data messages in file order
+        file_size: Size of the encoded file in bytes, if known
+        
+    Returns:
+        ValidationResult with validation details
+    """
+    validator = FITValidator()
+    return validator.validate_messages(messages, file_size)
+
+def validate_fit_bytes(data: bytes) -> ValidationResult:
+    """
+    Convenience function to validate an encoded FIT file held in memory
+    
+    Args:
+        data: FIT file bytes
+        
+    Returns:
+        ValidationResult with validation details
+    """
+    validator = FITValidator()
+    return validator.validate_fit_bytes(data)
+
 def print_validation_report(result: ValidationResult, file_path: str = None):
     """
     Print a formatted validation report
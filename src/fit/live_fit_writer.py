@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Live FIT Writer Module for Rogue to Garmin Bridge
+
+This module builds a workout's FIT file while the workout is running. The
+header placeholder and the file ID, device info and timer start messages are
+written when the workout starts; samples are appended as record messages in
+buffered chunks, keeping a running CRC of everything after the header. Ending
+the workout only appends the timer stop, lap, session and activity messages,
+writes the real header and combines the CRCs, so it takes the same time
+however long the workout was.
+
+Until then the file is named <name>.fit.partial. Every chunk ends on a
+message boundary, so after a crash recover_partial_fit_file() can cut a torn
+last chunk, add the closing messages from the records and finish the file.
+"""
+
+import logging
+import os
+import struct
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from fit_tool.fit_file_builder import FitFileBuilder
+from fit_tool.fit_file_header import FitFileHeader
+
+from .device_identification import enhance_device_identification
+from .fit_converter import FITConverter, extract_sample_metrics
+from .fit_record_encoder import RecordEncoder, crc16, crc16_combine
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('live_fit_writer')
+
+PARTIAL_SUFFIX = '.partial'
+
+# Samples buffered before a chunk is appended (one chunk per 30 s at 1 Hz)
+DEFAULT_FLUSH_SAMPLES = 30
+
+# Size of the header written by fit_tool (no header CRC)
+HEADER_SIZE = 12
+
+# Seconds between the Unix and FIT epochs
+FIT_EPOCH_OFFSET_SECONDS = 631065600
+
+# Invalid values of the record fields read back by recovery, by field number
+_RECORD_INVALID = {253: 0xFFFFFFFF, 3: 0xFF, 4: 0xFF, 5: 0xFFFFFFFF, 7: 0xFFFF}
+_STRUCT_CODES = {1: 'B', 2: 'H', 4: 'I'}
+
+
+class LiveFitWriter:
+    """
+    Appends the FIT file of the active workout as samples arrive.
+    """
+
+    def __init__(self, converter: FITConverter, workout_type: str, start_time: datetime,
+                 user_profile: Optional[Dict[str, Any]] = None,
+                 flush_samples: int = DEFAULT_FLUSH_SAMPLES):
+        """
+        Initialize the writer.
+
+        Args:
+            converter: FIT converter providing the output directory and the
+                messages around the records
+            workout_type: Type of workout (bike, rower, etc.)
+            start_time: Workout start time
+            user_profile: User profile information (optional)
+            flush_samples: Samples buffered before they are appended
+        """
+        self.converter = converter
+        self.workout_type = workout_type
+        self.start_time = converter._ensure_datetime_utc(start_time)
+        self.flush_samples = max(1, int(flush_samples))
+        self.device_data = enhance_device_identification({'workout_type': workout_type}, user_profile)
+
+        file_name = f"{workout_type}_{self.start_time.strftime('%Y%m%d_%H%M%S')}.fit"
+        self.path = os.path.join(converter.output_dir, file_name)
+        self.partial_path = self.path + PARTIAL_SUFFIX
+
+        self.sample_count = 0
+        self.failed = False
+        self._file = None
+        self._columns = FITConverter.new_record_columns()
+        self._mask: Optional[int] = None
+        self._data_size = 0
+        self._data_crc = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the partial file is open for appending."""
+        return self._file is not None
+
+    def open(self) -> bool:
+        """
+        Create the partial file with the messages that precede the records.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        unix_ms_start_time = self.converter._datetime_to_unix_epoch_milliseconds(self.start_time)
+        builder = FitFileBuilder(auto_define=True)
+        self.converter.add_head_messages(builder, self.device_data, unix_ms_start_time)
+        head = b''.join(record.to_bytes() for record in builder.records)
+
+        with self._lock:
+            try:
+                self._file = open(self.partial_path, 'wb')
+                self._file.write(FitFileHeader(records_size=0).to_bytes())
+                self._append(head)
+            except OSError as e:
+                logger.error(f"Error creating live FIT file {self.partial_path}: {str(e)}")
+                self._fail()
+                return False
+
+        logger.info(f"Writing live FIT file {self.partial_path}")
+        return True
+
+    def add_sample(self, timestamp: datetime, data: Dict[str, Any]) -> None:
+        """
+        Buffer one sample, appending the buffer when it is full.
+
+        Args:
+            timestamp: Sample time
+            data: Sample data as stored in the database
+        """
+        unix_ms_record_time = self.converter._datetime_to_unix_epoch_milliseconds(timestamp)
+        if unix_ms_record_time is None:
+            return
+        metrics = extract_sample_metrics(data)
+        with self._lock:
+            if self._file is None:
+                return
+            FITConverter.append_record(self._columns, unix_ms_record_time, metrics['power'],
+                                       metrics['heart_rate'], metrics['cadence'], metrics['speed'],
+                                       metrics['distance'])
+            self.sample_count += 1
+            if len(self._columns['timestamp']) >= self.flush_samples:
+                self._flush_records()
+
+    def flush(self) -> bool:
+        """
+        Append the buffered samples now.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        with self._lock:
+            return self._flush_records()
+
+    def finish(self, summary: Dict[str, Any], end_time: Optional[datetime] = None) -> Optional[str]:
+        """
+        Append the closing messages, write the header and CRC and rename the
+        partial file into place.
+
+        Args:
+            summary: Workout summary metrics
+            end_time: Workout end time (defaults to now)
+
+        Returns:
+            Path to the FIT file or None if it could not be finished
+        """
+        with self._lock:
+            if self._file is None or not self._flush_records():
+                return None
+            if self.sample_count == 0:
+                logger.warning(f"No samples were written to {self.partial_path}")
+                self._discard()
+                return None
+
+            end_time = self.converter._ensure_datetime_utc(end_time or datetime.now())
+            duration_seconds = (end_time - self.start_time).total_seconds()
+            if duration_seconds <= 0:
+                duration_seconds = float(self.sample_count)
+
+            processed_data = dict(self.device_data)
+            processed_data.update(_summary_for_fit(self.workout_type, summary))
+            try:
+                tail = _tail_bytes(self.converter, processed_data, self.start_time, duration_seconds)
+                self._append(tail)
+                _finalize(self._file, self._data_size, self._data_crc)
+                self._file.close()
+                self._file = None
+                os.replace(self.partial_path, self.path)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error finishing live FIT file {self.partial_path}: {str(e)}")
+                self._fail()
+                return None
+
+        logger.info(f"Finished live FIT file {self.path} with {self.sample_count} records")
+        return self.path
+
+    def abort(self) -> None:
+        """Close the partial file and leave it for recovery."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _flush_records(self) -> bool:
+        """Append the buffered samples (lock held)."""
+        if self._file is None:
+            return False
+        if not self._columns['timestamp']:
+            return True
+        try:
+            encoder = RecordEncoder(self._columns, previous_mask=self._mask)
+            self._append(encoder.encode())
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except (OSError, ValueError) as e:
+            logger.error(f"Error appending to live FIT file {self.partial_path}: {str(e)}")
+            self._fail()
+            return False
+        self._mask = encoder.last_mask
+        self._columns = FITConverter.new_record_columns()
+        return True
+
+    def _append(self, data: bytes) -> None:
+        """Write bytes after the header and add them to the running CRC."""
+        self._file.write(data)
+        self._data_crc = crc16(data, self._data_crc)
+        self._data_size += len(data)
+
+    def _fail(self) -> None:
+        """Stop writing after an error; the caller falls back to converting afterwards."""
+        self.failed = True
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _discard(self) -> None:
+        """Close and delete the partial file."""
+        self._fail()
+        self.failed = False
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+def _summary_for_fit(workout_type: str, summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Map workout summary metrics to the converter's keys, as the FIT processor does."""
+    keys = ['total_distance', 'total_calories', 'avg_power', 'max_power', 'avg_heart_rate',
+            'max_heart_rate', 'normalized_power']
+    mapped = {key: summary[key] for key in keys if summary.get(key) is not None}
+    if workout_type == 'rower':
+        mapped['avg_cadence'] = summary.get('avg_stroke_rate', 0)
+        mapped['max_cadence'] = summary.get('max_stroke_rate', 0)
+    else:
+        for key in ('avg_cadence', 'max_cadence', 'avg_speed', 'max_speed'):
+            mapped[key] = summary.get(key, 0)
+    return mapped
+
+
+def _tail_bytes(converter: FITConverter, processed_data: Dict[str, Any], start_time: datetime,
+                duration_seconds: float) -> bytes:
+    """Encode the timer stop, lap, session and activity messages."""
+    unix_ms_start_time = converter._datetime_to_unix_epoch_milliseconds(start_time)
+    unix_ms_stop_time = converter._datetime_to_unix_epoch_milliseconds(
+        start_time + timedelta(seconds=duration_seconds))
+    builder = FitFileBuilder(auto_define=True)
+    converter.add_tail_messages(builder, processed_data, unix_ms_start_time, unix_ms_stop_time,
+                                duration_seconds, start_time)
+    return b''.join(record.to_bytes() for record in builder.records)
+
+
+def _finalize(file_obj, data_size: int, data_crc: int) -> None:
+    """Write the header and the file CRC of a file whose data is complete."""
+    header = FitFileHeader(records_size=data_size).to_bytes()
+    crc = crc16_combine(crc16(header), data_crc, data_size)
+    file_obj.seek(0)
+    file_obj.write(header)
+    file_obj.seek(0, os.SEEK_END)
+    file_obj.write(struct.pack('<H', crc))
+    file_obj.flush()
+    os.fsync(file_obj.fileno())
+
+
+def _scan_messages(data: bytes) -> Tuple[int, Dict[str, Any]]:
+    """
+    Walk the messages after the header of a partial file.
+
+    Returns:
+        Tuple of (offset after the last complete message, record statistics)
+    """
+    definitions: Dict[int, Tuple[int, list, int]] = {}
+    stats: Dict[str, Any] = {'records': 0, 'first_timestamp': None, 'last_timestamp': None,
+                             'distance': None, 'power': [], 'heart_rate': [], 'cadence': []}
+    offset = HEADER_SIZE
+    complete = HEADER_SIZE
+    while offset < len(data):
+        header = data[offset]
+        if header & 0x80:
+            break  # Compressed timestamp headers are never written here
+        local_type = header & 0x0F
+        if header & 0x40:
+            if header & 0x20 or offset + 6 > len(data):
+                break
+            _, architecture, global_id, count = struct.unpack_from('<BBHB', data, offset + 1)
+            end = offset + 6 + 3 * count
+            if architecture != 0 or end > len(data):
+                break
+            fields = [struct.unpack_from('<BBB', data, offset + 6 + 3 * i) for i in range(count)]
+            definitions[local_type] = (global_id, fields, sum(size for _, size, _ in fields))
+            offset = end
+        else:
+            definition = definitions.get(local_type)
+            if definition is None:
+                break
+            global_id, fields, size = definition
+            end = offset + 1 + size
+            if end > len(data):
+                break
+            if global_id == 20:
+                _collect_record(data, offset + 1, fields, stats)
+            offset = end
+        complete = offset
+    return complete, stats
+
+
+def _collect_record(data: bytes, offset: int, fields: list, stats: Dict[str, Any]) -> None:
+    """Add one record message to the recovery statistics."""
+    values = {}
+    for number, size, _ in fields:
+        code = _STRUCT_CODES.get(size)
+        if code and number in _RECORD_INVALID:
+            value, = struct.unpack_from('<' + code, data, offset)
+            if value != _RECORD_INVALID[number]:
+                values[number] = value
+        offset += size
+
+    stats['records'] += 1
+    if 253 in values:
+        timestamp = values[253] + FIT_EPOCH_OFFSET_SECONDS
+        if stats['first_timestamp'] is None:
+            stats['first_timestamp'] = timestamp
+        stats['last_timestamp'] = timestamp
+    if 5 in values:
+        stats['distance'] = values[5] / 100.0
+    for number, key in ((7, 'power'), (3, 'heart_rate'), (4, 'cadence')):
+        if number in values:
+            stats[key].append(values[number])
+
+
+def recover_partial_fit_file(partial_path: str, converter: FITConverter,
+                             user_profile: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Finish a partial FIT file left behind by a crash.
+
+    A torn last chunk is cut off, and the closing messages are built from the
+    records that made it to disk.
+
+    Args:
+        partial_path: Path to the .fit.partial file
+        converter: FIT converter providing the messages around the records
+        user_profile: User profile information (optional)
+
+    Returns:
+        Path to the recovered FIT file, or None if it held no records
+    """
+    try:
+        with open(partial_path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        logger.error(f"Error reading partial FIT file {partial_path}: {str(e)}")
+        return None
+
+    complete, stats = _scan_messages(data)
+    if not stats['records'] or stats['first_timestamp'] is None:
+        logger.warning(f"Partial FIT file {partial_path} has no records to recover")
+        return None
+
+    path = partial_path[:-len(PARTIAL_SUFFIX)] if partial_path.endswith(PARTIAL_SUFFIX) else partial_path
+    workout_type = os.path.basename(path).split('_', 1)[0] or 'bike'
+    start_time = datetime.fromtimestamp(stats['first_timestamp'], timezone.utc)
+    duration_seconds = float(max(stats['last_timestamp'] - stats['first_timestamp'], stats['records']))
+
+    summary = {'total_distance': stats['distance'] or 0}
+    for key in ('power', 'heart_rate', 'cadence'):
+        if stats[key]:
+            summary[f'avg_{key}'] = sum(stats[key]) / len(stats[key])
+            summary[f'max_{key}'] = max(stats[key])
+    if workout_type == 'rower':
+        summary['avg_stroke_rate'] = summary.pop('avg_cadence', 0)
+        summary['max_stroke_rate'] = summary.pop('max_cadence', 0)
+
+    processed_data = enhance_device_identification({'workout_type': workout_type}, user_profile)
+    processed_data.update(_summary_for_fit(workout_type, summary))
+    tail = _tail_bytes(converter, processed_data, start_time, duration_seconds)
+
+    body = data[HEADER_SIZE:complete] + tail
+    try:
+        with open(partial_path, 'r+b') as f:
+            f.truncate(HEADER_SIZE)
+            f.seek(HEADER_SIZE)
+            f.write(body)
+            _finalize(f, len(body), crc16(body))
+        os.replace(partial_path, path)
+    except OSError as e:
+        logger.error(f"Error recovering partial FIT file {partial_path}: {str(e)}")
+        return None
+
+    logger.info(f"Recovered {stats['records']} records from {partial_path} into {path}")
+    return path
@@ -120,8 +120,9 @@ class FTMSDeviceManager:
                 # Use validated data
                 validated_data = validated_point.validated_data
                 
-                # Store the latest validated data for status queries
-                self.latest_data = validated_data.copy()
+                # Store the latest validated data for status queries. The
+                # validator already returns a fresh dict, so no extra copy.
+                self.latest_data = validated_data
                 
                 # Log the received data for debugging
                 logger.debug(f"Received and validated data: quality={validated_point.quality.value}, "
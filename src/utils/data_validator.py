@@ -8,6 +8,7 @@ and error handling for FTMS workout data processing.
 
 import math
 import statistics
+from collections import deque
 from typing import Dict, Any, List, Optional, Tuple, Union
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
@@ -21,6 +22,21 @@ from src.utils.logging_config import get_component_logger
 
 logger = get_component_logger('data_validator')
 
+# Validated fields kept in the compact history for outlier detection,
+# as SampleBuffer column definitions (name, array typecode, sample keys)
+HISTORY_COLUMNS = [
+    ('speed', 'd', ('speed',)),
+    ('cadence', 'f', ('cadence',)),
+    ('power', 'f', ('power',)),
+    ('heart_rate', 'f', ('heart_rate',)),
+    ('distance', 'd', ('distance',)),
+    ('stroke_rate', 'f', ('stroke_rate',)),
+    ('pace', 'd', ('pace',)),
+]
+
+# Number of recent points used for the quality distribution
+QUALITY_HISTORY_SIZE = 100
+
 class DataQuality(Enum):
     """Data quality indicators"""
     EXCELLENT = "excellent"
@@ -96,9 +112,16 @@ class DataValidator:
         """
         self.thresholds = ValidationThresholds()
         self.historical_data: Dict[str, List[float]] = {}
-        self.data_history: List[DataPoint] = []
         self.max_history_size = 1000
         
+        # Compact per device type history of validated values; full DataPoint
+        # objects are not retained
+        self.value_history: Dict[str, Any] = {}  # device type -> SampleBuffer
+        self.history_length = 0
+        self.recent_quality = deque(maxlen=QUALITY_HISTORY_SIZE)
+        self.last_timestamp: Optional[datetime] = None
+        self.last_distance: Optional[float] = None
+        
         # Load custom thresholds if provided
         if config_file and os.path.exists(config_file):
             self._load_thresholds(config_file)
@@ -215,9 +238,7 @@ class DataValidator:
         self._update_historical_data(validated_data, device_type)
         
         # Store in history (with size limit)
-        self.data_history.append(data_point)
-        if len(self.data_history) > self.max_history_size:
-            self.data_history = self.data_history[-self.max_history_size:]
+        self._add_to_history(timestamp, device_type, validated_data, quality)
         
         # Log validation results
         if corrections or warnings:
@@ -338,11 +359,10 @@ class DataValidator:
         # Distance validation (check for unrealistic jumps)
         if 'distance' in data and data['distance'] is not None:
             current_distance = data['distance']
-            if len(self.data_history) > 0:
-                last_point = self.data_history[-1]
-                if 'distance' in last_point.validated_data and last_point.validated_data['distance'] is not None:
-                    last_distance = last_point.validated_data['distance']
-                    time_diff = (datetime.now() - last_point.timestamp).total_seconds()
+            if self.history_length > 0:
+                if self.last_distance is not None:
+                    last_distance = self.last_distance
+                    time_diff = (datetime.now() - self.last_timestamp).total_seconds()
                     
                     if time_diff > 0:
                         distance_jump = abs(current_distance - last_distance)
@@ -363,9 +383,11 @@ class DataValidator:
         warnings = []
         
         # Only perform outlier detection if we have enough historical data
-        if len(self.data_history) < self.thresholds.min_samples_for_outlier_detection:
+        if self.history_length < self.thresholds.min_samples_for_outlier_detection:
             return corrections, warnings
         
+        history = self.value_history.get(device_type)
+        
         # Define fields to check for outliers based on device type
         fields_to_check = []
         if device_type == 'bike':
@@ -381,11 +403,9 @@ class DataValidator:
                 
                 # Get historical values for this field
                 historical_values = []
-                for point in self.data_history[-50:]:  # Use last 50 points
-                    if (point.device_type == device_type and 
-                        field in point.validated_data and 
-                        point.validated_data[field] is not None):
-                        historical_values.append(point.validated_data[field])
+                if history is not None and field in history.column_names:
+                    # Use last 50 points; missing values are stored as NaN
+                    historical_values = [v for v in history.column(field, -50) if not math.isnan(v)]
                 
                 if len(historical_values) >= self.thresholds.min_samples_for_outlier_detection:
                     mean_val = statistics.mean(historical_values)
@@ -433,6 +453,23 @@ class DataValidator:
         else:
             return DataQuality.INVALID
     
+    def _add_to_history(self, timestamp: datetime, device_type: str,
+                        validated_data: Dict[str, Any], quality: DataQuality):
+        """Record a validated point in the compact history"""
+        # Imported here to avoid a circular import through the data package
+        from src.data.sample_buffer import SampleBuffer
+        
+        history = self.value_history.get(device_type)
+        if history is None:
+            history = SampleBuffer(HISTORY_COLUMNS, max_samples=self.max_history_size)
+            self.value_history[device_type] = history
+        history.append(validated_data, timestamp)
+        
+        self.history_length = min(self.history_length + 1, self.max_history_size)
+        self.recent_quality.append(quality)
+        self.last_timestamp = timestamp
+        self.last_distance = validated_data.get('distance')
+    
     def _update_historical_data(self, data: Dict[str, Any], device_type: str):
         """Update historical data for outlier detection"""
         for field, value in data.items():
@@ -551,11 +588,10 @@ class DataValidator:
     
     def _get_recent_quality_distribution(self) -> Dict[str, int]:
         """Get distribution of data quality in recent data points"""
-        recent_points = self.data_history[-100:]  # Last 100 points
         quality_counts = {quality.value: 0 for quality in DataQuality}
         
-        for point in recent_points:
-            quality_counts[point.quality.value] += 1
+        for quality in self.recent_quality:  # Last 100 points
+            quality_counts[quality.value] += 1
         
         return quality_counts
     
@@ -569,6 +605,10 @@ class DataValidator:
             'rejected_points': 0,
             'outliers_detected': 0
         }
-        self.data_history.clear()
+        self.value_history.clear()
+        self.history_length = 0
+        self.recent_quality.clear()
+        self.last_timestamp = None
+        self.last_distance = None
         self.historical_data.clear()
         logger.info("Validation statistics reset")
\ No newline at end of file
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Downsampling Module for Rogue to Garmin Bridge
+
+This module reduces parallel workout series to a size a chart can draw. All
+series share one time axis, so every method keeps them aligned:
+
+- lttb: Largest-Triangle-Three-Buckets; one index set is chosen using the
+  triangle areas of all series (each normalized to its own range), so peaks
+  in any metric survive
+- min-max: each bucket keeps the lowest and highest value of every series
+- average: each bucket keeps the mean of every series
+
+Bucket work is done on slices with the built-in min/max/sum so the per-point
+cost stays in C.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+DOWNSAMPLING_METHODS = ('lttb', 'min-max', 'average')
+
+# Smallest max_points every method can honour
+MIN_POINTS = 3
+
+
+def _bucket_bounds(start: int, stop: int, buckets: int) -> List[int]:
+    """Split [start, stop) into buckets of near equal size and return the edges."""
+    length = stop - start
+    return [start + (length * i) // buckets for i in range(buckets + 1)]
+
+
+def lttb_indices(series: Sequence[Sequence[float]], max_points: int) -> List[int]:
+    """
+    Choose sample indices with Largest-Triangle-Three-Buckets.
+
+    The sample index is used as the x axis. With several series the triangle
+    areas are summed after scaling each series to its range, so a flat series
+    does not influence the choice and a spiky one keeps its peaks.
+
+    Args:
+        series: Parallel value sequences of equal length
+        max_points: Number of indices to return (at least 3)
+
+    Returns:
+        Sorted list of at most max_points indices, always including the first
+        and last sample
+    """
+    count = len(series[0]) if series else 0
+    if count <= max_points:
+        return list(range(count))
+
+    scaled = []
+    for values in series:
+        low, high = min(values), max(values)
+        if high > low:
+            scale = 1.0 / (high - low)
+            scaled.append([value * scale for value in values])
+    if not scaled:
+        # Every series is flat, any even spread is as good as another
+        return _bucket_bounds(0, count - 1, max_points - 1)
+
+    edges = _bucket_bounds(1, count - 1, max_points - 2)
+    indices = [0]
+    selected = 0
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_stop = stop, edges[bucket + 2]
+        else:
+            next_start, next_stop = count - 1, count
+        next_length = next_stop - next_start
+        avg_x = (next_start + next_stop - 1) / 2.0
+
+        areas = [0.0] * (stop - start)
+        for values in scaled:
+            anchor = values[selected]
+            dy = sum(values[next_start:next_stop]) / next_length - anchor
+            dx = selected - avg_x
+            # Twice the triangle area; constant factors don't change the argmax
+            for offset, value in enumerate(values[start:stop]):
+                areas[offset] += abs(dx * (value - anchor) - (selected - start - offset) * dy)
+
+        selected = start + areas.index(max(areas))
+        indices.append(selected)
+
+    indices.append(count - 1)
+    return indices
+
+
+def downsample_series(timestamps: Sequence, series: Dict[str, Sequence[float]],
+                      max_points: int, method: str = 'lttb') -> Tuple[List, Dict[str, List[float]]]:
+    """
+    Reduce parallel series to at most max_points points.
+
+    Args:
+        timestamps: Time axis shared by every series
+        series: Series name to values, each as long as timestamps
+        max_points: Largest number of points to return per series
+        method: One of DOWNSAMPLING_METHODS
+
+    Returns:
+        Tuple of (timestamps, series) with the reduced values; the input is
+        returned as lists unchanged when it already fits
+
+    Raises:
+        ValueError: If the method is unknown or max_points is too small
+    """
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Unknown downsampling method '{method}', expected one of {', '.join(DOWNSAMPLING_METHODS)}")
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+
+    count = len(timestamps)
+    if count <= max_points:
+        return list(timestamps), {name: list(values) for name, values in series.items()}
+
+    if method == 'lttb':
+        indices = lttb_indices(list(series.values()), max_points)
+        return ([timestamps[i] for i in indices],
+                {name: [values[i] for i in indices] for name, values in series.items()})
+
+    if method == 'average':
+        edges = _bucket_bounds(0, count, max_points)
+        bounds = list(zip(edges, edges[1:]))
+        return ([timestamps[start] for start, _ in bounds],
+                {name: [sum(values[start:stop]) / (stop - start) for start, stop in bounds]
+                 for name, values in series.items()})
+
+    # min-max: two points per bucket, placed at the bucket's first and last
+    # sample and kept in the order they occurred
+    edges = _bucket_bounds(0, count, max_points // 2)
+    bounds = list(zip(edges, edges[1:]))
+    reduced_timestamps = []
+    for start, stop in bounds:
+        reduced_timestamps.append(timestamps[start])
+        reduced_timestamps.append(timestamps[stop - 1])
+
+    reduced_series = {}
+    for name, values in series.items():
+        reduced = []
+        for start, stop in bounds:
+            window = values[start:stop]
+            low, high = min(window), max(window)
+            if window.index(low) <= window.index(high):
+                reduced.append(low)
+                reduced.append(high)
+            else:
+                reduced.append(high)
+                reduced.append(low)
+        reduced_series[name] = reduced
+    return reduced_timestamps, reduced_series
@@ -76,6 +76,8 @@ BLE_LOG_FILE = os.path.join(LOG_DIR, 'bluetooth.log')
 WORKOUT_LOG_FILE = os.path.join(LOG_DIR, 'workout.log')
 PERFORMANCE_LOG_FILE = os.path.join(LOG_DIR, 'performance.log')
 ALERTS_LOG_FILE = os.path.join(LOG_DIR, 'alerts.log')
+LOG_FILES = [MAIN_LOG_FILE, ERROR_LOG_FILE, DATA_FLOW_LOG_FILE, WEB_LOG_FILE, BLE_LOG_FILE,
+             WORKOUT_LOG_FILE, PERFORMANCE_LOG_FILE, ALERTS_LOG_FILE]
 
 # Max log file size (10 MB)
 MAX_LOG_SIZE = 10 * 1024 * 1024
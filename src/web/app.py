@@ -11,7 +11,11 @@ import asyncio
 import threading
 import logging # Add logging import
 import sqlite3 # Add sqlite3 import for direct database access
+import hashlib
+from array import array
+from datetime import datetime, timedelta, timezone
 from flask import Flask, render_template, request, jsonify, redirect, url_for, send_from_directory
+from werkzeug.http import is_resource_modified
 import sys
 import importlib  # Add importlib for module reloading
 
@@ -26,7 +30,12 @@ importlib.reload(src.ftms.ftms_simulator)
 from src.data.workout_manager import WorkoutManager
 from src.data.database import Database
 from src.ftms.ftms_manager import FTMSDeviceManager
-from src.utils.logging_config import get_component_logger
+from src.utils.logging_config import get_component_logger, LOG_FILES
+from src.utils.downsampling import downsample_series, DOWNSAMPLING_METHODS, MIN_POINTS
+from src.data.workout_rollups import choose_resolution
+from src.data.live_publisher import normalize_live_sample, encode_event
+from src.data.status_log import StatusLog
+from src.fit.fit_audit import MODES as AUDIT_MODES
 
 # Get component logger
 logger = get_component_logger('web')
@@ -37,20 +46,32 @@ app = Flask(__name__)
 # Default configuration
 use_simulator = False
 device_type = 'bike'
+db_profile = 'ssd'
+live_fit = False
 
 # Parse command line arguments only when run as main
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Start the Rogue Garmin Bridge web application')
     parser.add_argument('--use-simulator', action='store_true', help='Use the FTMS device simulator instead of real devices')
     parser.add_argument('--device-type', default='bike', choices=['bike', 'rower'], help='Type of device to simulate (bike or rower)')
+    parser.add_argument('--db-profile', default='ssd', choices=['ssd', 'sd_card', 'rollback'], help='SQLite tuning preset for the storage the database lives on')
+    parser.add_argument('--live-fit', action='store_true', help='Write FIT files while workouts run instead of after they end')
     args = parser.parse_args()
     use_simulator = args.use_simulator
     device_type = args.device_type
+    db_profile = args.db_profile
+    live_fit = args.live_fit
 
 # Create database and workout manager
 db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'src', 'data', 'rogue_garmin.db')
-db = Database(db_path)
-workout_manager = WorkoutManager(db_path)  # Pass the path string, not the Database object
+db = Database(db_path, profile=db_profile)
+workout_manager = WorkoutManager(db_path, db_profile=db_profile, live_fit=live_fit)  # Pass the path string, not the Database object
+
+# FIT files are built by background job workers; resume jobs left by a restart
+workout_manager.start_job_workers()
+
+# Catalog FIT files added, changed or removed while the app was not watching
+workout_manager.start_fit_catalog_reconciler()
 
 # Start FTMS device manager
 logger.info(f"Initializing FTMSDeviceManager with use_simulator={use_simulator}, device_type={device_type}")
@@ -62,8 +83,15 @@ web_ble_state = {
     'device': None,
     'workout_id': None,
     'last_data': None,
-    'last_seen_ts': None
+    'last_seen_ts': None,
+    'last_seq': None,
+    'last_sample_time': None
 }
+# Serializes batch ingest so retried batches are de-duplicated consistently
+web_ble_lock = threading.Lock()
+
+# Largest number of samples accepted in one batch ingest request
+MAX_INGEST_BATCH = 600
 
 if use_simulator:
     logger.info(f"Using FTMS device simulator for {device_type}")
@@ -363,10 +391,13 @@ def webble_start():
             'device': {'name': device_name, 'address': device_address},
             'workout_id': workout_id,
             'last_data': None,
-            'last_seen_ts': time.time()
+            'last_seen_ts': time.time(),
+            'last_seq': None,
+            'last_sample_time': None
         })
         
         logger.info(f"Web BLE session started for {device_name} ({device_address}) with workout {workout_id}")
+        _publish_device_status()
         return jsonify({'success': True, 'workout_id': workout_id})
     except Exception as e:
         logger.error(f"Error starting Web BLE session: {str(e)}", exc_info=True)
@@ -387,17 +418,7 @@ def webble_ingest():
         web_ble_state['last_seen_ts'] = time.time()
         
         # Protect against missing workout
-        if not workout_manager.active_workout_id:
-            logger.warning("Received Web BLE data without an active workout; re-hydrating workout state")
-            device = web_ble_state.get('device') or {}
-            device_id = _ensure_device_in_database(
-                device.get('address') or device.get('id') or device.get('name'),
-                device.get('name', 'Web Bluetooth Device'),
-                data.get('workout_type', 'bike')
-            )
-            if device_id:
-                workout_id = workout_manager.start_workout(device_id, data.get('workout_type', 'bike'))
-                web_ble_state['workout_id'] = workout_id
+        _ensure_web_ble_workout(data.get('workout_type', 'bike'))
         
         # Persist data
         success = workout_manager.add_data_point(data)
@@ -408,29 +429,147 @@ def webble_ingest():
         logger.error(f"Error ingesting Web BLE data: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)})
 
+def _ensure_web_ble_workout(workout_type):
+    """Start a workout for the Web BLE session if none is active."""
+    if workout_manager.active_workout_id:
+        return
+    logger.warning("Received Web BLE data without an active workout; re-hydrating workout state")
+    device = web_ble_state.get('device') or {}
+    device_id = _ensure_device_in_database(
+        device.get('address') or device.get('id') or device.get('name'),
+        device.get('name', 'Web Bluetooth Device'),
+        workout_type
+    )
+    if device_id:
+        workout_id = workout_manager.start_workout(device_id, workout_type)
+        web_ble_state['workout_id'] = workout_id
+
+@app.route('/api/webble/ingest/batch', methods=['POST'])
+def webble_ingest_batch():
+    """
+    Ingest a batch of samples buffered by the browser Web Bluetooth client.
+    
+    The body is {"sent_at": ms, "samples": [{"seq": n, "t": ms, "data": {...}}]}
+    where t and sent_at are readings of the client's monotonic clock (e.g.
+    performance.now()) and seq increases by sample. The batch is stored in
+    one transaction; samples at or below the last stored seq are reported as
+    duplicates, so a batch can be resent safely after a failed request.
+    """
+    try:
+        if not web_ble_state.get('active'):
+            return jsonify({'success': False, 'error': 'Web BLE session not active'})
+        
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict) or not isinstance(payload.get('samples'), list):
+            return jsonify({'success': False, 'error': 'Expected an object with a samples list'}), 400
+        items = payload['samples']
+        if len(items) > MAX_INGEST_BATCH:
+            return jsonify({'success': False, 'error': f'At most {MAX_INGEST_BATCH} samples per batch'}), 413
+        
+        received_at = datetime.now()
+        web_ble_state['last_seen_ts'] = time.time()
+        
+        # Validate, then order by sequence number; items without a usable seq
+        # cannot be reported individually and are only counted
+        results = {}
+        valid = []
+        unnumbered = 0
+        for item in items:
+            seq = item.get('seq') if isinstance(item, dict) else None
+            if not isinstance(seq, int) or isinstance(seq, bool):
+                unnumbered += 1
+                continue
+            t = item.get('t')
+            if not isinstance(item.get('data'), dict) or not isinstance(t, (int, float)) or isinstance(t, bool):
+                results[seq] = 'invalid'
+                continue
+            valid.append(item)
+        valid.sort(key=lambda item: item['seq'])
+        
+        sent_at = payload.get('sent_at')
+        if not isinstance(sent_at, (int, float)) or isinstance(sent_at, bool):
+            sent_at = max((item['t'] for item in valid), default=0)
+        
+        with web_ble_lock:
+            last_seq = web_ble_state.get('last_seq')
+            last_time = web_ble_state.get('last_sample_time')
+            samples = []
+            stored_seqs = []
+            for item in valid:
+                seq = item['seq']
+                if seq in results:
+                    # Sent more than once in this batch: the first copy's
+                    # status stands, and a malformed copy makes it invalid
+                    continue
+                if last_seq is not None and seq <= last_seq:
+                    results[seq] = 'duplicate'
+                    continue
+                # Client clock readings become server wall time by their age,
+                # kept in order across batches
+                age_seconds = max(0.0, (sent_at - item['t']) / 1000.0)
+                timestamp = received_at - timedelta(seconds=age_seconds)
+                if last_time is not None and timestamp < last_time:
+                    timestamp = last_time
+                samples.append((timestamp, item['data']))
+                stored_seqs.append(seq)
+                results[seq] = 'stored'
+                last_seq, last_time = seq, timestamp
+            
+            success = True
+            if samples:
+                _ensure_web_ble_workout(samples[0][1].get('workout_type', 'bike'))
+                success = workout_manager.add_data_points(samples)
+                if success:
+                    web_ble_state.update({
+                        'last_seq': last_seq,
+                        'last_sample_time': last_time,
+                        'last_data': samples[-1][1]
+                    })
+                else:
+                    for seq in stored_seqs:
+                        results[seq] = 'failed'
+            last_seq = web_ble_state.get('last_seq')
+        
+        counts = {'stored': 0, 'duplicate': 0, 'invalid': unnumbered, 'failed': 0}
+        for status in results.values():
+            counts[status] += 1
+        return jsonify({
+            'success': success,
+            'last_seq': last_seq,
+            'summary': counts,
+            'results': [{'seq': seq, 'status': status} for seq, status in sorted(results.items())]
+        })
+    except Exception as e:
+        logger.error(f"Error ingesting Web BLE batch: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/webble/end', methods=['POST'])
 def webble_end():
     """End a Web Bluetooth session and workout."""
     try:
         success = True
+        fit_job_id = None
         if workout_manager.active_workout_id:
             success = workout_manager.end_workout()
+            fit_job_id = workout_manager.last_fit_job_id if success else None
         
         web_ble_state.update({
             'active': False,
             'device': None,
             'workout_id': None,
             'last_data': None,
-            'last_seen_ts': None
+            'last_seen_ts': None,
+            'last_seq': None,
+            'last_sample_time': None
         })
-        return jsonify({'success': success})
+        _publish_device_status()
+        return jsonify({'success': success, 'fit_job_id': fit_job_id})
     except Exception as e:
         logger.error(f"Error ending Web BLE session: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/status')
-def get_status():
-    """Get current status."""
+def _device_status():
+    """Build the connection and workout state part of the status response."""
     # Debug logging
     logger.debug(f"FTMS Manager device_status: {ftms_manager.device_status}")
     logger.debug(f"FTMS Manager connected_device: {ftms_manager.connected_device}")
@@ -443,13 +582,11 @@ def get_status():
     connected_device_info = None
     device_name = None
     device_status = ftms_manager.device_status
-    latest_data = None
     
     if using_web_ble:
         connected_device_info = web_ble_state.get('device')
         device_name = connected_device_info.get('name') if connected_device_info else None
         device_status = 'connected'
-        latest_data = web_ble_state.get('last_data')
     elif ftms_manager.connected_device:
         if isinstance(ftms_manager.connected_device, dict):
             connected_device_info = {
@@ -464,9 +601,8 @@ def get_status():
             }
             device_name = getattr(ftms_manager.connected_device, 'name', None)
         device_status = ftms_manager.device_status
-        latest_data = getattr(ftms_manager, 'latest_data', None)
     
-    status = {
+    return {
         'device_status': device_status,
         'connected_device': connected_device_info,
         'connected_device_address': getattr(ftms_manager, 'connected_device_address', None),
@@ -480,37 +616,38 @@ def get_status():
             'last_seen_ts': web_ble_state.get('last_seen_ts')
         }
     }
+
+def _publish_device_status(status=None, data=None):
+    """Stream the connection state after a device or Web BLE session change."""
+    workout_manager.live_publisher.publish('device', _device_status())
+
+ftms_manager.register_status_callback(_publish_device_status)
+
+# Recent status versions, for clients polling with ?since=<seq>
+status_log = StatusLog()
+
+@app.route('/api/status')
+def get_status():
+    """Get current status, or only what changed after the sequence number in ?since=."""
+    status = _device_status()
     
     logger.debug(f"Status response: {status}")
     
+    if web_ble_state.get('active'):
+        latest_data = web_ble_state.get('last_data')
+    elif ftms_manager.connected_device:
+        latest_data = getattr(ftms_manager, 'latest_data', None)
+    else:
+        latest_data = None
+    
     # Include latest data if available
     if latest_data:
-        latest_copy = latest_data.copy()
-
         # Normalize common metric fields so the frontend can rely on consistent keys
-        if 'power' not in latest_copy:
-            if 'instant_power' in latest_copy:
-                latest_copy['power'] = latest_copy['instant_power']
-            elif 'instantaneous_power' in latest_copy:
-                latest_copy['power'] = latest_copy['instantaneous_power']
-        if 'instant_power' not in latest_copy and 'instantaneous_power' in latest_copy:
-            latest_copy['instant_power'] = latest_copy['instantaneous_power']
-
-        if 'cadence' not in latest_copy:
-            for cad_key in ('instant_cadence', 'instantaneous_cadence', 'stroke_rate'):
-                if cad_key in latest_copy:
-                    latest_copy['cadence'] = latest_copy[cad_key]
-                    break
-
-        # Ensure device type is present for downstream UI logic
-        if 'device_type' not in latest_copy and workout_manager.workout_type:
-            latest_copy['device_type'] = workout_manager.workout_type
-        
-        # Include the active workout ID
+        latest_copy = normalize_live_sample(latest_data, workout_manager.workout_type,
+                                            workout_manager.active_workout_id)
+        
+        # Add accumulated workout summary statistics
         if workout_manager.active_workout_id:
-            latest_copy['workout_id'] = workout_manager.active_workout_id
-            
-            # Add accumulated workout summary statistics
             try:
                 summary = workout_manager.get_workout_summary_metrics()
                 if summary:
@@ -519,8 +656,48 @@ def get_status():
                 logger.error(f"Error getting workout summary: {str(e)}")
                 
         status['latest_data'] = latest_copy
-        
-    return jsonify(status)
+    
+    seq = status_log.record(status)
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({**status, 'seq': seq})
+    
+    # Delta response: a JSON Merge Patch against the client's version, the
+    # full status if that version is gone, or no content if nothing changed
+    seq, changes, reset = status_log.changes_since(since)
+    if changes is None and not reset:
+        return '', 204, {'X-Status-Seq': str(seq)}
+    return jsonify({'seq': seq, 'reset': reset, 'changes': changes})
+
+# Seconds between keep-alive comments on an idle event stream
+STREAM_KEEPALIVE_SECONDS = 15
+
+@app.route('/api/stream')
+def live_stream():
+    """Stream live samples, summary deltas and status changes as Server-Sent Events."""
+    def generate():
+        subscription = workout_manager.live_publisher.subscribe()
+        device_frame = encode_event('device', _device_status())
+        try:
+            # Reconnect quickly, and start from the current connection state
+            # (retained sample, summary and workout state are already queued)
+            yield b'retry: 2000\n\n' + device_frame
+            while True:
+                frame = subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                if frame is not None:
+                    yield frame
+                elif subscription.closed:
+                    return
+                else:
+                    yield b': keepalive\n\n'
+        finally:
+            subscription.close()
+    
+    return app.response_class(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Keep nginx from buffering the stream
+        'X-Accel-Buffering': 'no',
+    })
 
 @app.route('/api/start_workout', methods=['POST'])
 def start_workout():
@@ -602,44 +779,137 @@ def end_workout():
     try:
         # Workout ID is not needed as end_workout() only ends the active workout
         success = workout_manager.end_workout()
-        return jsonify({'success': success})
+        # The FIT file is built in the background; poll /api/jobs/<id> for it
+        fit_job_id = workout_manager.last_fit_job_id if success else None
+        return jsonify({'success': success, 'fit_job_id': fit_job_id})
     except Exception as e:
         logger.error(f"Error ending workout: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/fit/regenerate', methods=['POST'])
+def regenerate_fit_files():
+    """Start a parallel regeneration of FIT files; progress is reported by /api/jobs/<id>."""
+    try:
+        payload = request.get_json(silent=True) or {}
+        limit = payload.get('limit')
+        workers = payload.get('workers')
+        for name, value in (('limit', limit), ('workers', workers)):
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+                return jsonify({'success': False, 'error': f'{name} must be a positive integer'}), 400
+        
+        job_id = workout_manager.regenerate_fit_files(
+            only_missing=bool(payload.get('only_missing', False)),
+            limit=limit,
+            workers=workers
+        )
+        if job_id is None:
+            return jsonify({'success': False, 'error': 'Unable to queue FIT regeneration'}), 500
+        return jsonify({'success': True, 'job_id': job_id}), 202
+    except Exception as e:
+        logger.error(f"Error starting FIT regeneration: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/fit/audit', methods=['POST'])
+def audit_fit_files():
+    """Start an audit of the FIT file directory; the report is returned by /api/jobs/<id>."""
+    try:
+        payload = request.get_json(silent=True) or {}
+        mode = payload.get('mode')
+        workers = payload.get('workers')
+        if mode is not None and mode not in AUDIT_MODES:
+            return jsonify({'success': False, 'error': f"mode must be one of {', '.join(AUDIT_MODES)}"}), 400
+        if workers is not None and (not isinstance(workers, int) or isinstance(workers, bool) or workers < 1):
+            return jsonify({'success': False, 'error': 'workers must be a positive integer'}), 400
+        
+        job_id = workout_manager.audit_fit_files(
+            mode=mode,
+            workers=workers,
+            include_files=bool(payload.get('include_files', False))
+        )
+        if job_id is None:
+            return jsonify({'success': False, 'error': 'Unable to queue FIT audit'}), 500
+        return jsonify({'success': True, 'job_id': job_id}), 202
+    except Exception as e:
+        logger.error(f"Error starting FIT audit: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/jobs/<int:job_id>')
+def get_job(job_id):
+    """Get the status and progress of a background job."""
+    try:
+        job = workout_manager.get_job(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        
+        response = jsonify({'success': True, 'job': job})
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except Exception as e:
+        logger.error(f"Error getting job {job_id}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Cached responses are revalidated with their ETag on every use: finished
+# workouts and FIT files can still be edited, converted or deleted, and the
+# 304 answer is cheap. A max-age is only safe on content-addressed URLs.
+CACHE_REVALIDATE = 'no-cache'
+
+def _request_etag(*parts):
+    """Build an ETag from version parts and the query string the response depends on."""
+    query_digest = hashlib.sha1(request.query_string).hexdigest()[:12]
+    return '-'.join(str(part) for part in parts) + f'-{query_digest}'
+
+def _with_validators(response, etag, last_modified=None, cache_control=CACHE_REVALIDATE):
+    """Add ETag, Last-Modified and Cache-Control headers to a response."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def _not_modified(etag, last_modified=None, cache_control=CACHE_REVALIDATE):
+    """Return a 304 response if the client's cached copy is current, else None."""
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return _with_validators(app.response_class(status=304), etag, last_modified, cache_control)
+
+def _workout_last_modified(version):
+    """Get the Last-Modified time of a workout from its version row."""
+    if version['modified_at']:
+        return datetime.strptime(version['modified_at'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+    if version['end_time']:
+        # end_time is stored in local time
+        return datetime.fromisoformat(version['end_time']).astimezone(timezone.utc)
+    return None
+
 @app.route('/api/workouts')
 def get_workouts():
     """Get workout history."""
     try:
-        # Get query parameters for pagination
+        # Get query parameters for pagination and sorting
         limit = request.args.get('limit', 100, type=int)  # Increase default limit
         offset = request.args.get('offset', 0, type=int)
+        sort_by = request.args.get('sort', 'start_time')
+        descending = request.args.get('order', 'desc').lower() != 'asc'
         
-        logger.info(f"Getting workouts with limit={limit}, offset={offset}")
+        logger.info(f"Getting workouts with limit={limit}, offset={offset}, sort={sort_by}")
         
-        # Get workouts from database
-        workouts = workout_manager.get_workouts(limit, offset)
+        # The list only changes when a workout or device row does
+        versions = workout_manager.get_table_versions()
+        etag = _request_etag('workouts', versions.get('workouts'), versions.get('devices'))
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        
+        # Get workouts from database (sorted in SQL on an indexed column;
+        # summaries arrive already parsed)
+        try:
+            workouts = workout_manager.get_workouts(limit, offset, sort_by=sort_by, descending=descending)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         # Log the result for debugging
         logger.info(f"Retrieved {len(workouts) if workouts else 0} workouts from database")
         
-        # Process each workout to ensure summary is properly parsed
-        for workout in workouts:
-            # Ensure summary is a dictionary, not a string
-            if 'summary' in workout:
-                if isinstance(workout['summary'], str):
-                    try:
-                        import json
-                        workout['summary'] = json.loads(workout['summary'])
-                        logger.info(f"Parsed summary JSON string for workout {workout['id']}")
-                    except Exception as e:
-                        logger.error(f"Error parsing summary for workout {workout['id']}: {str(e)}")
-                        workout['summary'] = {}  # Use empty dict if parsing fails
-                elif workout['summary'] is None:
-                    workout['summary'] = {}
-            else:
-                workout['summary'] = {}
-                
         if not workouts:
             # Check if database has any workouts at all
             logger.warning("No workouts found in database")
@@ -657,13 +927,74 @@ def get_workouts():
                 logger.error(f"Error checking database directly: {str(db_error)}")
             
             # Still return empty list with success=True
-            return jsonify({'success': True, 'workouts': []})
+            return _with_validators(jsonify({'success': True, 'workouts': []}), etag)
             
-        return jsonify({'success': True, 'workouts': workouts})
+        return _with_validators(jsonify({'success': True, 'workouts': workouts}), etag)
     except Exception as e:
         logger.error(f"Error getting workouts: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/workouts/search')
+def search_workouts():
+    """Search workout history with filters and keyset pagination."""
+    try:
+        filters = {
+            'workout_type': request.args.get('type'),
+            'device_id': request.args.get('device_id', type=int),
+            'start_after': request.args.get('start'),
+            'start_before': request.args.get('end'),
+            'min_duration': request.args.get('min_duration', type=float),
+            'min_distance': request.args.get('min_distance', type=float),
+        }
+        limit = request.args.get('limit', 50, type=int)
+        page_token = request.args.get('page_token')
+        
+        try:
+            workouts, next_page_token = workout_manager.search_workouts(
+                limit=limit, page_token=page_token, **filters
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        return jsonify({'success': True, 'workouts': workouts, 'next_page_token': next_page_token})
+    except Exception as e:
+        logger.error(f"Error searching workouts: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)})
+
+# Series of the workout detail charts, as (data_series key, sample column)
+CHART_SERIES = [
+    ('powers', 'power'),
+    ('cadences', 'cadence'),
+    ('heart_rates', 'heart_rate'),
+    ('speeds', 'speed'),
+    ('distances', 'distance'),
+]
+
+def _read_chart_samples(workout_id, start=None, end=None):
+    """Stream the chart columns of a workout's samples into arrays."""
+    timestamps = []
+    series = {key: array('d') for key, _ in CHART_SERIES}
+    columns = [(series[key], column) for key, column in CHART_SERIES]
+    
+    fields = [column for _, column in CHART_SERIES]
+    for data_point in workout_manager.iter_workout_data(workout_id, fields=fields, start=start, end=end):
+        timestamps.append(data_point['timestamp'])
+        # Missing metrics are charted as 0
+        for values, column in columns:
+            values.append(float(data_point[column] or 0))
+    return timestamps, series
+
+def _read_chart_rollups(workout_id, resolution, start=None, end=None):
+    """Read the chart series from rollup buckets: means, plus min/max series."""
+    buckets = workout_manager.get_workout_rollups(workout_id, resolution, start=start, end=end)
+    timestamps = [bucket['timestamp'] for bucket in buckets]
+    series = {}
+    for key, column in CHART_SERIES:
+        series[key] = array('d', (bucket[column]['mean'] or 0 for bucket in buckets))
+        series[f'{key}_min'] = array('d', (bucket[column]['min'] or 0 for bucket in buckets))
+        series[f'{key}_max'] = array('d', (bucket[column]['max'] or 0 for bucket in buckets))
+    return timestamps, series, sum(bucket['sample_count'] for bucket in buckets)
+
 @app.route('/api/workout/<int:workout_id>', methods=['GET', 'DELETE'])
 def workout_operations(workout_id):
     """Get or delete workout details."""
@@ -675,34 +1006,62 @@ def workout_operations(workout_id):
         else:
             # GET method - Get workout details
             # Get workout details
+            # Optional downsampling for charts that can't draw every sample
+            max_points = request.args.get('max_points', type=int)
+            method = request.args.get('method', 'lttb')
+            if max_points is not None and (max_points < MIN_POINTS or method not in DOWNSAMPLING_METHODS):
+                return jsonify({
+                    'success': False,
+                    'error': f"max_points must be at least {MIN_POINTS} and method one of {', '.join(DOWNSAMPLING_METHODS)}"
+                }), 400
+            
+            # Optional time window in seconds from the start of the workout
+            window_start = request.args.get('start', type=float)
+            window_end = request.args.get('end', type=float)
+            if window_start is not None and window_end is not None and window_end <= window_start:
+                return jsonify({'success': False, 'error': 'end must be after start'}), 400
+            
+            # A finished workout only changes when its row is updated, so a
+            # cached copy is revalidated without reading any samples
+            version = workout_manager.get_workout_version(workout_id)
+            if not version:
+                return jsonify({'success': False, 'error': 'Workout not found'})
+            etag = last_modified = None
+            if version['end_time']:
+                etag = _request_etag('workout', workout_id, version['row_version'])
+                last_modified = _workout_last_modified(version)
+                not_modified = _not_modified(etag, last_modified)
+                if not_modified is not None:
+                    return not_modified
+            
             workout = workout_manager.get_workout(workout_id)
             if not workout:
                 return jsonify({'success': False, 'error': 'Workout not found'})
-                
-            # Get workout data points
-            workout_data = workout_manager.get_workout_data(workout_id)
             
-            # Process data for charts
-            timestamps = []
-            powers = []
-            cadences = []
-            heart_rates = []
-            speeds = []
-            distances = []
+            workout_start = datetime.fromisoformat(workout['start_time'])
+            start = workout_start + timedelta(seconds=window_start) if window_start is not None else None
+            end = workout_start + timedelta(seconds=window_end) if window_end is not None else None
             
-            for data_point in workout_data:
-                # Extract the data from the data point structure
-                data = data_point.get('data', {})
-                
-                # Add the timestamp (this should always be available)
-                timestamps.append(data_point.get('timestamp', 0))
-                
-                # Extract metrics - check for different possible key names
-                powers.append(data.get('instant_power', data.get('instantaneous_power', data.get('power', 0))))
-                cadences.append(data.get('instant_cadence', data.get('instantaneous_cadence', data.get('cadence', 0))))
-                heart_rates.append(data.get('heart_rate', 0))
-                speeds.append(data.get('instant_speed', data.get('instantaneous_speed', data.get('speed', 0))))
-                distances.append(data.get('total_distance', data.get('distance', 0)))
+            # Long windows are charted from rollup buckets instead of samples
+            resolution = None
+            if max_points is not None:
+                if window_end is not None:
+                    window_seconds = window_end - (window_start or 0)
+                else:
+                    duration = workout['duration'] or (datetime.now() - workout_start).total_seconds()
+                    window_seconds = duration - (window_start or 0)
+                resolution = choose_resolution(window_seconds, max_points)
+            
+            timestamps = []
+            if resolution is not None:
+                timestamps, series, point_count = _read_chart_rollups(workout_id, resolution, start, end)
+            if not timestamps:
+                resolution = None
+                timestamps, series = _read_chart_samples(workout_id, start, end)
+                point_count = len(timestamps)
+            powers = series['powers']
+            cadences = series['cadences']
+            speeds = series['speeds']
             
             # Convert workout to a regular dict if it's a sqlite Row
             if hasattr(workout, 'keys'):
@@ -717,33 +1076,32 @@ def workout_operations(workout_id):
                         logger.info(f"Successfully parsed workout summary from JSON string for workout {workout_id}")
                     except Exception as e:
                         logger.error(f"Error parsing workout summary JSON for workout {workout_id}: {str(e)}")
-                        # Keep the summary as is if it cannot be parsed            # Add data series to workout
-            workout['data_series'] = {
-                'timestamps': timestamps,
-                'powers': powers,
-                'cadences': cadences,
-                'heart_rates': heart_rates,
-                'speeds': speeds,
-                'distances': distances
-            }
+                        # Keep the summary as is if it cannot be parsed
             
-            # Convert values in data series to ensure they're numeric, except timestamps
-            for key, values in workout['data_series'].items():
-                if key != 'timestamps':  # Skip converting timestamps to float
-                    try:
-                        workout['data_series'][key] = [float(v) if v is not None else 0 for v in values]
-                    except (ValueError, TypeError) as e:
-                        logger.error(f"Error converting {key} to float: {str(e)}")
-                        # Keep the original values if conversion fails
+            # Add data series to workout
+            if max_points is not None:
+                chart_timestamps, chart_series = downsample_series(timestamps, series, max_points, method)
+                workout['downsampling'] = {'method': method, 'max_points': max_points, 'resolution': resolution}
+            else:
+                chart_timestamps = timestamps
+                chart_series = {name: values.tolist() for name, values in series.items()}
+            workout['data_series'] = {'timestamps': chart_timestamps}
+            for key, _ in CHART_SERIES:
+                workout['data_series'][key] = chart_series[key]
+                if resolution is not None:
+                    workout['data_series'].setdefault('ranges', {})[key] = {
+                        'min': chart_series[f'{key}_min'],
+                        'max': chart_series[f'{key}_max'],
+                    }
             
-            # Add data point count for UI reference
-            workout['data_point_count'] = len(workout_data)
+            # Add data point count for UI reference (samples covered, before downsampling)
+            workout['data_point_count'] = point_count
             
             # Add a log statement to see what's being sent
-            logger.info(f"Sending workout {workout_id} with {len(workout_data)} data points, type: {workout.get('workout_type')}")
+            logger.info(f"Sending workout {workout_id} with {point_count} data points, type: {workout.get('workout_type')}")
             
             # Add a debug log to check workout data structure
-            logger.debug(f"Workout data series for {workout_id} - points: {len(workout_data)}")
+            logger.debug(f"Workout data series for {workout_id} - points: {point_count}")
             logger.debug(f"Sample data (powers): {powers[:5] if powers else []}")
             logger.debug(f"Sample data (cadences): {cadences[:5] if cadences else []}")
             
@@ -768,7 +1126,12 @@ def workout_operations(workout_id):
                     workout['summary']['avg_speed'] = sum(filter(None, speeds)) / len(list(filter(None, speeds))) if any(speeds) else 0
                     logger.info(f"Added missing avg_speed to summary: {workout['summary']['avg_speed']}")
             
-            return jsonify({'success': True, 'workout': workout})
+            response = jsonify({'success': True, 'workout': workout})
+            if etag is None:
+                # Live workouts change with every sample
+                response.headers['Cache-Control'] = 'no-store'
+                return response
+            return _with_validators(response, etag, last_modified)
     except Exception as e:
         logger.error(f"Error in workout operations: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)})
@@ -777,8 +1140,9 @@ def workout_operations(workout_id):
 def convert_workout_to_fit(workout_id):
     """Convert workout to FIT file and return the file path."""
     try:
-        # Import the FIT converter
+        # Import the FIT converter and the conversion cache
         from src.fit.fit_converter import FITConverter
+        from src.fit.fit_cache import FITCache
         
         # Get workout details
         workout = workout_manager.get_workout(workout_id)
@@ -795,9 +1159,6 @@ def convert_workout_to_fit(workout_id):
             except Exception as e:
                 logger.error(f"Error parsing workout summary JSON for workout {workout_id}: {str(e)}")
                 workout['summary'] = {} # Use empty dict if parsing fails
-                
-        # Get workout data points
-        workout_data = workout_manager.get_workout_data(workout_id)
         
         # Get user profile
         user_profile = None
@@ -810,6 +1171,19 @@ def convert_workout_to_fit(workout_id):
             except Exception as e:
                 logger.error(f"Error loading user profile: {str(e)}")
         
+        # Return the file of an earlier conversion with the same inputs
+        fit_cache = FITCache(workout_manager.database)
+        cache_key = fit_cache.key_for(workout, user_profile)
+        cached_path = fit_cache.lookup(cache_key) if cache_key else None
+        if cached_path:
+            if workout.get('fit_file_path') != cached_path:
+                workout_manager.update_workout_fit_file(workout_id, cached_path)
+            return jsonify({'success': True, 'fit_file_path': cached_path,
+                            'fit_file_name': os.path.basename(cached_path), 'cached': True})
+        
+        # Stream workout data points; they are consumed once below
+        workout_data = workout_manager.iter_workout_data(workout_id)
+        
         # Create processed data for FIT converter
         processed_data = {
             'workout_type': workout.get('workout_type', 'bike'),
@@ -974,10 +1348,14 @@ def convert_workout_to_fit(workout_id):
             # Store FIT file path in workout record
             try:
                 workout_manager.update_workout_fit_file(workout_id, fit_file_path)
+                workout_manager.fit_catalog.add(fit_file_path, workout_id)
+                if cache_key:
+                    fit_cache.store(cache_key, workout_id, fit_file_path)
             except Exception as e:
                 logger.error(f"Error updating workout with FIT file path: {str(e)}")
             
-            return jsonify({'success': True, 'fit_file_path': fit_file_path, 'fit_file_name': fit_file_name})
+            return jsonify({'success': True, 'fit_file_path': fit_file_path, 'fit_file_name': fit_file_name,
+                            'cached': False})
         else:
             logger.error(f"FIT conversion returned None for workout {workout_id}")
             return jsonify({'success': False, 'error': 'Failed to create FIT file'})
@@ -1012,41 +1390,68 @@ def download_fit_file(filename):
         file_path = os.path.join(fit_files_dir, filename)
         
         # Check if file exists
-        if not os.path.exists(file_path):
+        if not os.path.isfile(file_path):
             logger.warning(f"FIT file not found: {filename}")
             return jsonify({'success': False, 'error': 'File not found'}), 404
         
+        # A FIT file is rewritten as a whole, so its mtime and size identify the content
+        file_stat = os.stat(file_path)
+        etag = f"fit-{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"
+        last_modified = datetime.fromtimestamp(file_stat.st_mtime, timezone.utc)
+        not_modified = _not_modified(etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
         logger.info(f"Downloading FIT file: {filename} from directory: {fit_files_dir}")
-        return send_from_directory(fit_files_dir, filename, as_attachment=True)
+        response = send_from_directory(fit_files_dir, filename, as_attachment=True,
+                                       etag=etag, last_modified=last_modified)
+        response.headers['Cache-Control'] = CACHE_REVALIDATE
+        return response
         
     except Exception as e:
         logger.error(f"Error downloading FIT file {filename}: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Default page size of the FIT file list
+FIT_FILES_PAGE_SIZE = 100
+
 @app.route('/api/fit_files')
 def list_fit_files():
-    """List available FIT files."""
+    """List available FIT files, newest first, from the FIT file catalog."""
     try:
-        fit_files_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'fit_files')
-        
-        if not os.path.exists(fit_files_dir):
-            return jsonify({'success': True, 'files': []})
-        
-        files = []
-        for filename in os.listdir(fit_files_dir):
-            if filename.endswith('.fit'):
-                file_path = os.path.join(fit_files_dir, filename)
-                file_stat = os.stat(file_path)
-                files.append({
-                    'filename': filename,
-                    'size': file_stat.st_size,
-                    'modified': file_stat.st_mtime
-                })
-        
-        # Sort by modification time (newest first)
-        files.sort(key=lambda x: x['modified'], reverse=True)
-        
-        return jsonify({'success': True, 'files': files})
+        limit = request.args.get('limit', FIT_FILES_PAGE_SIZE, type=int)
+        page_token = request.args.get('page_token')
+        
+        # The listing only changes when a catalog row does
+        versions = workout_manager.get_table_versions()
+        etag = _request_etag('fit-files', versions.get('fit_files'))
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        
+        try:
+            entries, next_page_token = workout_manager.database.list_fit_files(limit, page_token)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        files = [{
+            'filename': entry['filename'],
+            'size': entry['size'],
+            'modified': entry['modified'],
+            'workout_id': entry['workout_id'],
+            'sport': entry['sport'],
+            'start_time': entry['start_time'],
+            'duration_seconds': entry['duration'],
+            'total_distance': entry['total_distance'],
+            'total_calories': entry['total_calories'],
+            'avg_power': entry['avg_power'],
+            'avg_heart_rate': entry['avg_heart_rate'],
+            'record_count': entry['record_count'],
+            'checksum': entry['checksum']
+        } for entry in entries]
+        
+        return _with_validators(jsonify({'success': True, 'files': files, 'next_page_token': next_page_token}),
+                                etag)
         
     except Exception as e:
         logger.error(f"Error listing FIT files: {str(e)}")
@@ -1056,30 +1461,23 @@ def list_fit_files():
 def get_storage_info():
     """Get storage information for data management."""
     try:
-        import os
-        import glob
-        
         # Get database size
         db_size = 0
         if os.path.exists(db.db_path):
             db_size = os.path.getsize(db.db_path)
         
-        # Get workout count
-        workout_count = len(workout_manager.get_workouts(limit=10000) or [])
+        # Workout and FIT file totals are kept current by triggers
+        totals = workout_manager.database.get_storage_totals()
+        workout_count = totals.get('workouts', {}).get('item_count', 0)
+        fit_files_count = totals.get('fit_files', {}).get('item_count', 0)
+        fit_files_size = totals.get('fit_files', {}).get('total_bytes', 0)
         
-        # Get log files size
+        # Get log files size (only the files the log handlers write)
         log_size = 0
-        log_files = glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'logs', '*.log'))
-        for log_file in log_files:
+        for log_file in LOG_FILES:
             if os.path.exists(log_file):
                 log_size += os.path.getsize(log_file)
         
-        # Get FIT files count
-        fit_files_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'fit_files')
-        fit_files_count = 0
-        if os.path.exists(fit_files_dir):
-            fit_files_count = len([f for f in os.listdir(fit_files_dir) if f.endswith('.fit')])
-        
         def format_size(size_bytes):
             if size_bytes == 0:
                 return "0 B"
@@ -1094,7 +1492,8 @@ def get_storage_info():
             'database_size': format_size(db_size),
             'workout_count': workout_count,
             'log_size': format_size(log_size),
-            'fit_files_count': fit_files_count
+            'fit_files_count': fit_files_count,
+            'fit_files_size': format_size(fit_files_size)
         }
         
         return jsonify({'success': True, 'storage': storage_info})
@@ -1103,6 +1502,31 @@ def get_storage_info():
         logger.error(f"Error getting storage info: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
+def _stream_backup_json(backup_data, workouts):
+    """
+    Yield a backup document as JSON text, reading workout data point by point.
+    
+    Args:
+        backup_data: Backup dictionary without the workout data
+        workouts: Workouts whose data points are included
+        
+    Yields:
+        Chunks of JSON text
+    """
+    import json
+    from src.utils.json_utils import DateTimeEncoder
+    
+    header = {key: value for key, value in backup_data.items() if key != 'workout_data'}
+    yield json.dumps(header, indent=2, cls=DateTimeEncoder)[:-2] + ',\n  "workout_data": ['
+    
+    for index, workout in enumerate(workouts):
+        yield (',' if index else '') + '\n    {"workout_id": ' + json.dumps(workout['id']) + ', "data": ['
+        for point_index, data_point in enumerate(workout_manager.iter_workout_data(workout['id'])):
+            yield (',' if point_index else '') + '\n      ' + json.dumps(data_point, cls=DateTimeEncoder)
+        yield '\n    ]}'
+    
+    yield '\n  ]\n}\n'
+
 @app.route('/api/backup', methods=['POST'])
 def create_backup():
     """Create a backup of all user data."""
@@ -1137,17 +1561,9 @@ def create_backup():
         workouts = workout_manager.get_workouts(limit=10000) or []
         backup_data['workouts'] = workouts
         
-        # Get workout data for each workout
-        for workout in workouts:
-            workout_data = workout_manager.get_workout_data(workout['id'])
-            backup_data['workout_data'].append({
-                'workout_id': workout['id'],
-                'data': workout_data
-            })
-        
-        # Create JSON response
+        # Stream the JSON so only one chunk of workout data is held at a time
         response = app.response_class(
-            response=json.dumps(backup_data, indent=2),
+            response=_stream_backup_json(backup_data, workouts),
             status=200,
             mimetype='application/json'
         )
@@ -1208,27 +1624,22 @@ def export_data():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        # Get workouts based on date range
-        workouts = workout_manager.get_workouts(limit=10000) or []
-        
-        # Filter by date range if specified
-        if date_range != 'all':
-            from datetime import datetime, timedelta
-            now = datetime.now()
-            
-            if date_range == 'last-30':
-                cutoff = now - timedelta(days=30)
-                workouts = [w for w in workouts if datetime.fromisoformat(w['start_time']) >= cutoff]
-            elif date_range == 'last-90':
-                cutoff = now - timedelta(days=90)
-                workouts = [w for w in workouts if datetime.fromisoformat(w['start_time']) >= cutoff]
-            elif date_range == 'last-year':
-                cutoff = now - timedelta(days=365)
-                workouts = [w for w in workouts if datetime.fromisoformat(w['start_time']) >= cutoff]
-            elif date_range == 'custom' and start_date and end_date:
-                start = datetime.fromisoformat(start_date)
-                end = datetime.fromisoformat(end_date)
-                workouts = [w for w in workouts if start <= datetime.fromisoformat(w['start_time']) <= end]
+        # Get workouts based on date range; the range is filtered in SQL
+        from datetime import datetime, timedelta
+        filters = {}
+        now = datetime.now()
+        
+        if date_range == 'last-30':
+            filters['start_after'] = now - timedelta(days=30)
+        elif date_range == 'last-90':
+            filters['start_after'] = now - timedelta(days=90)
+        elif date_range == 'last-year':
+            filters['start_after'] = now - timedelta(days=365)
+        elif date_range == 'custom' and start_date and end_date:
+            filters['start_after'] = start_date
+            filters['start_before'] = end_date
+        
+        workouts = list(workout_manager.iter_workouts(**filters))
         
         if format_type == 'json':
             import json
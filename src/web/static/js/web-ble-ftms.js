@@ -21,7 +21,11 @@ class WebBLEFTMSClient {
         this.workoutId = null;
         this.sendIntervalMs = sendIntervalMs;
         this.sendTimer = null;
-        this.latestPayload = null;
+        // Samples not yet acknowledged by the server, oldest first
+        this.pendingSamples = [];
+        this.maxPendingSamples = 600;
+        this.nextSeq = 1;
+        this.sending = null;
         this.isConnected = false;
 
         this.onData = onData || (() => {});
@@ -108,6 +112,13 @@ class WebBLEFTMSClient {
     }
 
     async disconnect() {
+        this._stopSendTimer();
+        try {
+            await this._flushPending();
+        } catch (err) {
+            console.warn('Error sending remaining Web BLE samples', err);
+        }
+
         try {
             await fetch('/api/webble/end', { method: 'POST' });
         } catch (err) {
@@ -184,10 +195,20 @@ class WebBLEFTMSClient {
     }
 
     _scheduleSend(payload) {
-        this.latestPayload = payload;
+        // Every sample is kept with its sequence number and monotonic time so
+        // the server can place it in time and drop copies of resent batches.
+        this.pendingSamples.push({ seq: this.nextSeq++, t: performance.now(), data: payload });
+        if (this.pendingSamples.length > this.maxPendingSamples) {
+            this.pendingSamples.splice(0, this.pendingSamples.length - this.maxPendingSamples);
+        }
         if (this.sendTimer) return;
 
-        this.sendTimer = setTimeout(() => this._flushLatest(), this.sendIntervalMs);
+        this.sendTimer = setTimeout(() => {
+            this.sendTimer = null;
+            this._flushPending().catch((err) => {
+                console.warn('Failed to stream Web BLE data to backend', err);
+            });
+        }, this.sendIntervalMs);
     }
 
     _stopSendTimer() {
@@ -197,18 +218,35 @@ class WebBLEFTMSClient {
         }
     }
 
-    async _flushLatest() {
-        this.sendTimer = null;
-        if (!this.latestPayload) return;
+    async _flushPending() {
+        // One batch in flight at a time keeps batches in sequence order
+        if (this.sending) {
+            await this.sending;
+        }
+        if (!this.pendingSamples.length) return;
 
-        try {
-            await fetch('/api/webble/ingest', {
+        const samples = this.pendingSamples.slice();
+        this.sending = (async () => {
+            const response = await fetch('/api/webble/ingest/batch', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(this.latestPayload)
+                body: JSON.stringify({ sent_at: performance.now(), samples })
             });
-        } catch (err) {
-            console.warn('Failed to stream Web BLE data to backend', err);
+            const result = await response.json();
+            // Acknowledged samples are dropped; the rest stay queued and are
+            // sent again with the next batch
+            if (result && typeof result.last_seq === 'number') {
+                this.pendingSamples = this.pendingSamples.filter((sample) => sample.seq > result.last_seq);
+            }
+            if (!result.success) {
+                throw new Error(result.error || 'Batch was not stored');
+            }
+        })();
+
+        try {
+            await this.sending;
+        } finally {
+            this.sending = null;
         }
     }
 
@@ -227,6 +265,7 @@ class WebBLEFTMSClient {
             throw new Error(result.error || 'Unable to start workout');
         }
         this.workoutId = result.workout_id;
+        this.pendingSamples = [];
     }
 
     _parseIndoorBikeData(view) {
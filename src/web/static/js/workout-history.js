@@ -440,7 +440,7 @@ class WorkoutHistoryManager {
     
     async viewWorkoutDetails(workoutId) {
         try {
-            const response = await fetch(`/api/workout/${workoutId}`);
+            const response = await fetch(`/api/workout/${workoutId}?max_points=1000`);
             const data = await response.json();
             
             if (data.success && data.workout) {
@@ -1,13 +1,17 @@
 /**
  * Real-time Workout Monitoring with Enhanced Features
- * Implements optimized data polling, client-side caching, responsive charts,
- * and workout phase indicators for improved user experience.
+ * Implements live updates over Server-Sent Events (with polling as a fallback),
+ * client-side caching, responsive charts, and workout phase indicators for
+ * improved user experience.
  */
 
 class WorkoutMonitor {
     constructor() {
         this.isActive = false;
         this.pollInterval = null;
+        this.eventSource = null;
+        this.streamUnavailable = false;
+        this.statusSeq = null; // Sequence number of the last polled status
         this.pollRate = 1000; // 1 second default
         this.adaptivePollRate = true;
         
@@ -148,6 +152,9 @@ class WorkoutMonitor {
                     if (data.success) {
                         console.log("Workout ended successfully.");
                         this.stop(); // Stop monitoring
+                        if (data.fit_job_id) {
+                            this.watchFitJob(data.fit_job_id);
+                        }
                     } else {
                         console.error("Failed to end workout:", data.error);
                         alert("Failed to end workout: " + data.error);
@@ -160,6 +167,26 @@ class WorkoutMonitor {
         }
     }
     
+    async watchFitJob(jobId, intervalMs = 1000) {
+        // The FIT file is built in the background after the workout ends
+        try {
+            const response = await fetch(`/api/jobs/${jobId}`);
+            const data = await response.json();
+            if (!data.success) return;
+            const job = data.job;
+            if (job.status === "succeeded") {
+                console.log("FIT file ready:", job.result && job.result.fit_file_name);
+            } else if (job.status === "failed") {
+                console.error("FIT file generation failed:", job.error);
+            } else {
+                console.log(`FIT file ${Math.round(job.progress * 100)}%: ${job.message || job.status}`);
+                setTimeout(() => this.watchFitJob(jobId, intervalMs), intervalMs);
+            }
+        } catch (error) {
+            console.error("Error checking FIT job:", error);
+        }
+    }
+    
     async loadUserPreferences() {
         try {
             const response = await fetch('/api/settings');
@@ -203,6 +230,15 @@ class WorkoutMonitor {
     }
     
     startPolling() {
+        // Prefer the server push stream; poll only where it is unavailable
+        if (window.EventSource && !this.streamUnavailable) {
+            if (!this.eventSource) {
+                this.stopPolling();
+                this.startStream();
+            }
+            return;
+        }
+        
         this.stopPolling(); // Clear any existing interval
         
         this.pollInterval = setInterval(() => {
@@ -218,6 +254,72 @@ class WorkoutMonitor {
             clearInterval(this.pollInterval);
             this.pollInterval = null;
         }
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+    }
+    
+    startStream() {
+        // Status object in the /api/status shape, kept current from stream events
+        const status = { latest_data: null };
+        let summary = {};
+        let opened = false;
+        this.statusSeq = null; // Polling restarts from a full status
+        const source = new EventSource('/api/stream');
+        this.eventSource = source;
+        
+        const apply = () => {
+            this.connectionQuality.consecutiveFailures = 0;
+            this.connectionQuality.lastSuccessTime = Date.now();
+            this.updateConnectionQuality('good');
+            this.cacheData(status);
+            this.processWorkoutData(status);
+        };
+        
+        source.addEventListener('open', () => { opened = true; });
+        source.addEventListener('device', (event) => {
+            Object.assign(status, JSON.parse(event.data));
+            apply();
+        });
+        source.addEventListener('status', (event) => {
+            const state = JSON.parse(event.data);
+            Object.assign(status, state);
+            if (!state.workout_active) {
+                summary = {};
+                status.latest_data = null;
+            }
+            apply();
+        });
+        source.addEventListener('summary', (event) => {
+            // Summary events carry only the metrics that changed
+            summary = { ...summary, ...JSON.parse(event.data) };
+            if (status.latest_data) {
+                status.latest_data = { ...status.latest_data, workout_summary: summary };
+            }
+            apply();
+        });
+        source.addEventListener('sample', (event) => {
+            const startTime = performance.now();
+            const sample = JSON.parse(event.data);
+            if (status.workout_active) {
+                sample.workout_summary = summary;
+            }
+            status.latest_data = sample;
+            apply();
+            this.trackPerformance(performance.now() - startTime);
+        });
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                // Stream not supported by the server: fall back to polling
+                this.eventSource = null;
+                this.streamUnavailable = !opened;
+                console.warn('Live stream closed, falling back to polling');
+                this.startPolling();
+            } else {
+                this.handleFetchError(new Error('Live stream interrupted, reconnecting'));
+            }
+        };
     }
     
     handleFetchError(error) {
@@ -883,8 +985,15 @@ class WorkoutMonitor {
         const startTime = performance.now();
         
         try {
-            const response = await fetch('/api/status');
-            const data = await response.json();
+            // Ask only for what changed since the last status we applied
+            const url = this.statusSeq !== null ? `/api/status?since=${this.statusSeq}` : '/api/status';
+            const response = await fetch(url);
+            if (response.status === 204) {
+                this.connectionQuality.consecutiveFailures = 0;
+                this.connectionQuality.lastSuccessTime = Date.now();
+                return;
+            }
+            const data = this.applyStatusResponse(await response.json());
             
             // Update connection quality
             this.connectionQuality.consecutiveFailures = 0;
@@ -912,6 +1021,36 @@ class WorkoutMonitor {
         }
     }
     
+    applyStatusResponse(body) {
+        if (body.changes === undefined) {
+            // Full status (first request)
+            this.statusSeq = body.seq ?? null;
+            return body;
+        }
+        
+        this.statusSeq = body.seq;
+        if (body.reset) {
+            return body.changes;
+        }
+        return WorkoutMonitor.mergePatch(this.dataCache.status || {}, body.changes);
+    }
+    
+    static mergePatch(target, patch) {
+        // JSON Merge Patch (RFC 7386): null removes a key, objects merge recursively
+        const result = { ...target };
+        for (const [key, value] of Object.entries(patch)) {
+            if (value === null) {
+                delete result[key];
+            } else if (typeof value === 'object' && !Array.isArray(value) &&
+                       result[key] && typeof result[key] === 'object' && !Array.isArray(result[key])) {
+                result[key] = WorkoutMonitor.mergePatch(result[key], value);
+            } else {
+                result[key] = value;
+            }
+        }
+        return result;
+    }
+    
     async processChartUpdateQueue() {
         if (this.chartUpdateQueue.length === 0) return;
         
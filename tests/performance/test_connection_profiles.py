@@ -0,0 +1,124 @@
+"""
+Concurrent read/write benchmark for the database connection profiles.
+
+Runs a writer thread committing small sample batches, as the ingest writer
+does during a workout, next to reader threads opening workout history, once
+with the old rollback journal and once per WAL preset. Prints the throughput
+of each run and checks that with WAL neither side fails on a locked database.
+
+The run length can be changed with CONNECTION_BENCH_SECONDS.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data.database import Database
+
+BENCH_SECONDS = float(os.environ.get('CONNECTION_BENCH_SECONDS', 3))
+HISTORY_WORKOUTS = 10
+SAMPLES_PER_WORKOUT = 1800
+WRITE_BATCH_SIZE = 10
+READER_THREADS = 2
+
+
+def _run_benchmark(profile: str) -> dict:
+    """Run concurrent ingest and history reads against a fresh database."""
+    temp_dir = tempfile.mkdtemp()
+    database = Database(os.path.join(temp_dir, f'bench_{profile}.db'), profile=profile)
+    base_time = datetime(2024, 1, 1, 6, 0, 0)
+    
+    try:
+        for w in range(HISTORY_WORKOUTS):
+            workout_id = database.start_workout(None, "bike")
+            start = base_time + timedelta(days=w)
+            database.add_workout_data_batch([
+                (workout_id, start + timedelta(seconds=s),
+                 {"instantaneous_power": 150 + s % 50, "heart_rate": 140, "total_distance": s * 8.0})
+                for s in range(SAMPLES_PER_WORKOUT)
+            ])
+            database.end_workout(workout_id, {})
+        
+        live_workout = database.start_workout(None, "bike")
+        stop = threading.Event()
+        results = {'writes': 0, 'write_failures': 0, 'reads': 0, 'read_failures': 0}
+        lock = threading.Lock()
+        
+        def writer():
+            second = 0
+            try:
+                while not stop.is_set():
+                    rows = []
+                    for _ in range(WRITE_BATCH_SIZE):
+                        rows.append((live_workout, base_time + timedelta(seconds=second), {"power": second % 300}))
+                        second += 1
+                    ok = database.add_workout_data_batch(rows)
+                    with lock:
+                        results['writes' if ok else 'write_failures'] += 1
+            finally:
+                database.connections.close_connection()
+        
+        def reader(offset):
+            index = offset
+            try:
+                while not stop.is_set():
+                    workout_id = index % HISTORY_WORKOUTS + 1
+                    points = database.get_workout_data(workout_id)
+                    ok = len(points) == SAMPLES_PER_WORKOUT and database.get_workouts(limit=20)
+                    with lock:
+                        results['reads' if ok else 'read_failures'] += 1
+                    index += 1
+            finally:
+                database.connections.close_connection()
+        
+        threads = [threading.Thread(target=writer)]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(READER_THREADS)]
+        for thread in threads:
+            thread.start()
+        time.sleep(BENCH_SECONDS)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        
+        results['samples_per_sec'] = results['writes'] * WRITE_BATCH_SIZE / BENCH_SECONDS
+        results['reads_per_sec'] = results['reads'] / BENCH_SECONDS
+        return results
+    finally:
+        database.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+@pytest.mark.slow
+class TestConnectionProfileBenchmark:
+    """Concurrent throughput of the rollback journal and the WAL presets."""
+    
+    @pytest.mark.parametrize('profile', ['rollback', 'ssd', 'sd_card'])
+    def test_concurrent_read_write(self, profile):
+        """Test ingest and history reads running side by side."""
+        results = _run_benchmark(profile)
+        print(f"\n{profile:>8}: {results['samples_per_sec']:8.0f} samples/s written "
+              f"({results['write_failures']} failed batches), "
+              f"{results['reads_per_sec']:6.1f} workouts/s read ({results['read_failures']} failed)")
+        
+        assert results['writes'] > 0
+        assert results['reads'] > 0
+        if profile != 'rollback':
+            assert results['write_failures'] == 0
+            assert results['read_failures'] == 0
+
+
+if __name__ == '__main__':
+    for name in ('rollback', 'ssd', 'sd_card'):
+        outcome = _run_benchmark(name)
+        print(f"{name:>8}: {outcome['samples_per_sec']:8.0f} samples/s, "
+              f"{outcome['reads_per_sec']:6.1f} workouts/s, "
+              f"failures w/r {outcome['write_failures']}/{outcome['read_failures']}")
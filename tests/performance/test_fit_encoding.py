@@ -0,0 +1,91 @@
+"""
+FIT record encoding benchmark.
+
+Encodes the records of 1 h, 4 h and 12 h workouts at 1 Hz twice: with one
+fit_tool RecordMessage per sample and FitFileBuilder, as the converter used
+to, and with the struct based record encoder. Prints the time of both paths,
+checks that they write the same bytes and that the encoder is faster.
+
+The durations can be changed with FIT_ENCODING_BENCH_HOURS (e.g. "1,2").
+"""
+
+import io
+import os
+import sys
+import time
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from fit_tool.fit_file_builder import FitFileBuilder
+from fit_tool.profile.messages.record_message import RecordMessage
+
+from src.fit.fit_record_encoder import write_fit_file
+
+BENCH_HOURS = [float(hours) for hours in os.environ.get('FIT_ENCODING_BENCH_HOURS', '1,4,12').split(',')]
+START_MS = 1714546800000
+
+
+def _columns(seconds: int) -> dict:
+    """Record columns of a bike workout with a dropped heart rate sample now and then."""
+    speeds = [(28.0 + (s % 40) * 0.1) / 3.6 for s in range(seconds)]
+    return {
+        'timestamp': [START_MS + s * 1000 for s in range(seconds)],
+        'heart_rate': [None if s % 600 == 0 else 120 + s % 50 for s in range(seconds)],
+        'cadence': [80 + s % 20 for s in range(seconds)],
+        'distance': [s * 8.1 for s in range(seconds)],
+        'speed': speeds,
+        'enhanced_speed': speeds,
+        'power': [140 + s % 90 for s in range(seconds)],
+    }
+
+
+def _encode_with_fit_tool(columns: dict) -> bytes:
+    """Encode the records as FitFileBuilder messages."""
+    builder = FitFileBuilder(auto_define=True)
+    names = list(columns)
+    for values in zip(*columns.values()):
+        record = RecordMessage()
+        for name, value in zip(names, values):
+            if value is not None:
+                setattr(record, name, value)
+        builder.add(record)
+    return builder.build().to_bytes()
+
+
+def _encode_with_record_encoder(columns: dict) -> bytes:
+    """Encode the records with the record encoder."""
+    buffer = io.BytesIO()
+    write_fit_file(buffer, b'', columns, b'')
+    return buffer.getvalue()
+
+
+@pytest.mark.slow
+class TestFitEncodingBenchmark:
+    """Record encoding time of the fit_tool and struct based paths."""
+
+    @pytest.mark.parametrize('hours', BENCH_HOURS)
+    def test_record_encoding(self, hours):
+        """Test that the record encoder writes the same file faster."""
+        columns = _columns(int(hours * 3600))
+
+        started = time.perf_counter()
+        expected = _encode_with_fit_tool(columns)
+        fit_tool_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        encoded = _encode_with_record_encoder(columns)
+        encoder_seconds = time.perf_counter() - started
+
+        print(f"\n{hours:>4g} h: fit_tool {fit_tool_seconds:6.2f}s, record encoder {encoder_seconds:6.3f}s "
+              f"({fit_tool_seconds / encoder_seconds:5.1f}x), {len(encoded) / 1024:.0f} KiB")
+
+        assert encoded == expected
+        assert encoder_seconds < fit_tool_seconds
+
+
+if __name__ == '__main__':
+    for duration in BENCH_HOURS:
+        TestFitEncodingBenchmark().test_record_encoding(duration)
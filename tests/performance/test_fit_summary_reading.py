@@ -0,0 +1,99 @@
+"""
+FIT summary reading benchmark.
+
+Reads the metadata of 1 h and 4 h bike workouts at 1 Hz twice: with
+FITAnalyzer.analyze_fit_file, which decodes every message with fit_tool, and
+with the summary reader, which steps over the record messages. Prints the time
+of both paths, checks that they agree and that the summary reader is at least
+10 times faster.
+
+The durations can be changed with FIT_SUMMARY_BENCH_HOURS (e.g. "1,2").
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from fit_tool.fit_file_builder import FitFileBuilder
+from fit_tool.profile.messages.activity_message import ActivityMessage
+from fit_tool.profile.messages.file_id_message import FileIdMessage
+from fit_tool.profile.messages.session_message import SessionMessage
+from fit_tool.profile.profile_type import FileType, Manufacturer, Sport
+
+from src.fit.fit_analyzer import FITAnalyzer
+from src.fit.fit_record_encoder import write_fit_file
+from src.fit.fit_summary import read_fit_summary
+
+BENCH_HOURS = [float(hours) for hours in os.environ.get('FIT_SUMMARY_BENCH_HOURS', '1,4').split(',')]
+START_MS = 1714546800000
+MIN_SPEEDUP = 10
+
+
+def _build(builder_messages) -> bytes:
+    """Encode a few messages without the file header and CRC."""
+    builder = FitFileBuilder(auto_define=True)
+    builder.add_all(builder_messages)
+    data = builder.build().to_bytes()
+    return data[data[0]:-2]
+
+
+def _write_workout(path: str, seconds: int) -> None:
+    """Write a bike workout with one record per second."""
+    file_id = FileIdMessage()
+    file_id.type = FileType.ACTIVITY
+    file_id.manufacturer = Manufacturer.DEVELOPMENT.value
+    file_id.time_created = START_MS
+
+    session = SessionMessage()
+    session.timestamp = START_MS + seconds * 1000
+    session.start_time = START_MS
+    session.total_elapsed_time = seconds
+    session.sport = Sport.CYCLING
+    activity = ActivityMessage()
+    activity.timestamp = START_MS + seconds * 1000
+
+    columns = {
+        'timestamp': [START_MS + s * 1000 for s in range(seconds)],
+        'heart_rate': [120 + s % 50 for s in range(seconds)],
+        'cadence': [80 + s % 20 for s in range(seconds)],
+        'distance': [s * 8.1 for s in range(seconds)],
+        'power': [140 + s % 90 for s in range(seconds)],
+    }
+    with open(path, 'wb') as f:
+        write_fit_file(f, _build([file_id]), columns, _build([session, activity]))
+
+
+@pytest.mark.slow
+class TestFitSummaryBenchmark:
+    """Metadata extraction time of the full decode and the summary reader."""
+
+    @pytest.mark.parametrize('hours', BENCH_HOURS)
+    def test_summary_reading(self, hours):
+        """Test that the summary reader gets the same metadata 10x faster."""
+        seconds = int(hours * 3600)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'workout.fit')
+            _write_workout(path, seconds)
+
+            started = time.perf_counter()
+            info = FITAnalyzer().analyze_fit_file(path)
+            analyzer_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            summary = read_fit_summary(path)
+            summary_seconds = time.perf_counter() - started
+
+        print(f"\n{hours:g} h ({seconds} records): analyzer {analyzer_seconds:.3f}s, "
+              f"summary reader {summary_seconds * 1000:.2f}ms "
+              f"({analyzer_seconds / summary_seconds:.0f}x)")
+
+        assert summary.record_count == info.message_counts['record_message'] == seconds
+        assert summary.duration_seconds == seconds
+        assert str(summary.sport) == info.sport_type
+        assert analyzer_seconds > summary_seconds * MIN_SPEEDUP
@@ -0,0 +1,153 @@
+"""
+Query plan benchmark for the hot database queries.
+
+Populates a database with many long workouts, asserts with EXPLAIN QUERY PLAN
+that none of the hot queries falls back to a full table scan or a temporary
+sort, and times opening a single workout.
+
+The dataset size can be raised with QUERY_PLAN_WORKOUTS and
+QUERY_PLAN_SAMPLES_PER_WORKOUT (e.g. 300 x 7200 for hundreds of two-hour
+workouts at 1 Hz).
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data.database import Database
+
+WORKOUT_COUNT = int(os.environ.get('QUERY_PLAN_WORKOUTS', 50))
+SAMPLES_PER_WORKOUT = int(os.environ.get('QUERY_PLAN_SAMPLES_PER_WORKOUT', 2000))
+
+# Maximum time to read one workout's samples back (seconds)
+OPEN_WORKOUT_BUDGET = 1.0
+
+HOT_QUERIES = {
+    'get_workout_data': (
+        "SELECT * FROM workout_data WHERE workout_id = ? ORDER BY timestamp ASC",
+        (1,)
+    ),
+    'delete_workout_data': (
+        "DELETE FROM workout_data WHERE workout_id = ?",
+        (1,)
+    ),
+    'get_workouts': (
+        "SELECT w.*, d.name as device_name, d.device_type FROM workouts w "
+        "LEFT JOIN devices d ON w.device_id = d.id "
+        "ORDER BY w.start_time DESC LIMIT ? OFFSET ?",
+        (10, 0)
+    ),
+    'get_workouts_by_avg_power': (
+        "SELECT w.*, d.name as device_name, d.device_type FROM workouts w "
+        "LEFT JOIN devices d ON w.device_id = d.id "
+        "ORDER BY w.avg_power DESC LIMIT ? OFFSET ?",
+        (10, 0)
+    ),
+    'search_workouts_next_page': (
+        "SELECT w.*, d.name as device_name, d.device_type FROM workouts w "
+        "LEFT JOIN devices d ON w.device_id = d.id "
+        "WHERE w.workout_type = ? AND (w.start_time < ? OR (w.start_time = ? AND w.id < ?)) "
+        "ORDER BY w.start_time DESC, w.id DESC LIMIT ?",
+        ('bike', '2024-01-02T06:00:00', '2024-01-02T06:00:00', 5, 51)
+    ),
+    'get_workout_rollups_window': (
+        "SELECT * FROM workout_rollups WHERE workout_id = ? AND resolution = ? "
+        "AND bucket_start >= ? AND bucket_start < ? ORDER BY bucket_start ASC",
+        (1, 30, '2024-01-01T06:00:00', '2024-01-01T07:00:00')
+    ),
+    'get_workout_data_window': (
+        "SELECT * FROM workout_data WHERE workout_id = ? "
+        "AND timestamp >= ? AND timestamp < ? ORDER BY timestamp ASC",
+        (1, '2024-01-01T06:00:00', '2024-01-01T06:10:00')
+    ),
+    'get_archive_blocks_window': (
+        "SELECT data FROM workout_archive_blocks WHERE workout_id = ? "
+        "AND first_timestamp < ? AND last_timestamp >= ? ORDER BY first_timestamp, block",
+        (1, '2024-01-01T06:10:00', '2024-01-01T06:00:00')
+    ),
+    'get_workouts_without_fit_files': (
+        "SELECT w.*, d.name as device_name, d.device_type FROM workouts w "
+        "LEFT JOIN devices d ON w.device_id = d.id "
+        "WHERE (w.fit_file_path IS NULL OR w.fit_file_path = '') "
+        "AND w.end_time IS NOT NULL ORDER BY w.start_time DESC",
+        ()
+    ),
+    'list_fit_files': (
+        "SELECT * FROM fit_files ORDER BY modified DESC, path DESC LIMIT ?",
+        (101,)
+    ),
+    'list_fit_files_next_page': (
+        "SELECT * FROM fit_files WHERE (modified, path) < (?, ?) "
+        "ORDER BY modified DESC, path DESC LIMIT ?",
+        (1714546800.0, '/fit_files/bike_20240501_070000.fit', 101)
+    ),
+    'get_fit_file_stats': (
+        "SELECT path, size, modified FROM fit_files WHERE directory = ?",
+        ('/fit_files',)
+    ),
+}
+
+
+@pytest.fixture(scope='module')
+def populated_database():
+    """Create a database with WORKOUT_COUNT workouts of SAMPLES_PER_WORKOUT samples."""
+    temp_dir = tempfile.mkdtemp()
+    database = Database(os.path.join(temp_dir, 'query_plans.db'))
+    device_id = database.add_device("00:11:22:33:44:55", "Benchmark Bike", "bike")
+    base_time = datetime(2024, 1, 1, 6, 0, 0)
+    
+    for w in range(WORKOUT_COUNT):
+        workout_id = database.start_workout(device_id, "bike")
+        start = base_time + timedelta(days=w)
+        database.add_workout_data_batch([
+            (workout_id, start + timedelta(seconds=s),
+             {"instantaneous_power": 150 + s % 50, "instantaneous_cadence": 85,
+              "heart_rate": 140, "total_distance": s * 8.0})
+            for s in range(SAMPLES_PER_WORKOUT)
+        ])
+        if w % 3:
+            database.end_workout(workout_id, {}, f"/tmp/workout_{workout_id}.fit")
+        else:
+            database.end_workout(workout_id, {})
+    
+    yield database
+    
+    database.close()
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+@pytest.mark.slow
+class TestHotQueryPlans:
+    """EXPLAIN QUERY PLAN checks and timings for the hot queries."""
+    
+    @pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+    def test_no_full_scan(self, populated_database, name):
+        """Test that a hot query is served from an index."""
+        query, params = HOT_QUERIES[name]
+        cursor = populated_database._get_connection().cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        plan = [row['detail'] for row in cursor.fetchall()]
+        
+        for step in plan:
+            full_scan = step.startswith('SCAN') and 'USING' not in step
+            assert not full_scan, f"{name} scans a whole table: {plan}"
+            assert 'TEMP B-TREE' not in step, f"{name} sorts in a temporary table: {plan}"
+    
+    def test_open_workout_time(self, populated_database):
+        """Test that reading one workout doesn't grow with the table size."""
+        start = time.perf_counter()
+        points = populated_database.get_workout_data(WORKOUT_COUNT // 2)
+        elapsed = time.perf_counter() - start
+        
+        total_rows = WORKOUT_COUNT * SAMPLES_PER_WORKOUT
+        print(f"\nRead {len(points)} samples from {total_rows} rows in {elapsed * 1000:.1f} ms")
+        assert len(points) == SAMPLES_PER_WORKOUT
+        assert elapsed < OPEN_WORKOUT_BUDGET
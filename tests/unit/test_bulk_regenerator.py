@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Unit tests for parallel bulk FIT regeneration.
+"""
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.database import Database
+from src.fit.bulk_regenerator import CHECKPOINT_KEY, get_checkpoint, regenerate_fit_files
+from src.fit.fit_cache import FITCache
+
+
+class TestBulkRegenerator:
+    """Test cases for regenerate_fit_files and read-only database access."""
+
+    def setup_method(self):
+        """Create a database with a few finished bike workouts."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_regenerate.db')
+        self.output_dir = os.path.join(self.temp_dir, 'fit_files')
+        self.database = Database(self.db_path, migrate_in_background=False)
+
+        device_id = self.database.add_device("00:11:22:33:44:55", "Test Rogue Bike", "bike")
+        self.workout_ids = []
+        for index in range(3):
+            workout_id = self.database.start_workout(device_id, "bike")
+            start = datetime(2024, 5, 1, 7, 0) + timedelta(hours=index)
+            self.database.add_workout_data_batch([
+                (workout_id, start + timedelta(seconds=second),
+                 {'instant_power': 150 + second % 20, 'instant_cadence': 85, 'heart_rate': 130,
+                  'instant_speed': 28.0, 'total_distance': second * 8})
+                for second in range(120)
+            ])
+            self.database.end_workout(workout_id, summary={'total_distance': 960})
+            conn = self.database._get_connection()
+            conn.execute("UPDATE workouts SET start_time = ? WHERE id = ?", (start.isoformat(), workout_id))
+            conn.commit()
+            self.workout_ids.append(workout_id)
+
+    def teardown_method(self):
+        """Remove the database and generated files."""
+        self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_read_only_database_rejects_writes(self):
+        """Test that a read-only Database reads but cannot write."""
+        reader = Database(self.db_path, read_only=True)
+        try:
+            assert reader.get_workout(self.workout_ids[0]) is not None
+            assert reader.update_workout_fit_path(self.workout_ids[0], '/tmp/x.fit') is False
+        finally:
+            reader.close()
+
+    def test_regenerates_in_parallel(self):
+        """Test that every workout gets a FIT file and its path is recorded."""
+        stats = regenerate_fit_files(self.db_path, self.output_dir, workers=2)
+
+        assert stats['total'] == 3
+        assert stats['succeeded'] == 3
+        assert stats['failed'] == []
+        assert stats['workouts_per_second'] > 0
+        fit_cache = FITCache(self.database)
+        for workout_id in self.workout_ids:
+            workout = self.database.get_workout(workout_id)
+            fit_file_path = workout['fit_file_path']
+            assert fit_file_path and os.path.exists(fit_file_path)
+            assert fit_cache.lookup(fit_cache.key_for(workout, self.database.get_user_profile())) == fit_file_path
+        assert not [name for name in os.listdir(self.output_dir) if name.endswith('.tmp')]
+        assert get_checkpoint(self.database) is None
+
+    def test_resumes_from_checkpoint(self):
+        """Test that an interrupted run only converts the workouts it had left."""
+        self.database.set_config(CHECKPOINT_KEY, {
+            'total': 3, 'succeeded': 2, 'failed': [], 'pending': [self.workout_ids[1]],
+            'started_at': datetime.now().isoformat()
+        })
+
+        stats = regenerate_fit_files(self.db_path, self.output_dir, workers=2)
+
+        assert stats['resumed'] is True
+        assert stats['completed'] == 3
+        assert stats['succeeded'] == 3
+        assert self.database.get_workout(self.workout_ids[1])['fit_file_path']
+        assert not self.database.get_workout(self.workout_ids[0])['fit_file_path']
+
+    def test_only_missing_skips_converted_workouts(self):
+        """Test that only_missing leaves workouts with a FIT file alone."""
+        self.database.update_workout_fit_path(self.workout_ids[0], '/fit_files/existing.fit')
+
+        stats = regenerate_fit_files(self.db_path, self.output_dir, only_missing=True, workers=1)
+
+        assert stats['total'] == 2
+        assert self.database.get_workout(self.workout_ids[0])['fit_file_path'] == '/fit_files/existing.fit'
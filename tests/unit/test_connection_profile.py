@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the database connection profiles.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.connection_profile import CONNECTION_PROFILES, get_connection_profile
+from src.data.database import Database
+
+
+class TestConnectionProfile:
+    """Test cases for ConnectionProfile and its use by Database."""
+    
+    def setup_method(self):
+        """Set up a temporary database path."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_profile.db')
+    
+    def teardown_method(self):
+        """Clean up test fixtures after each test method."""
+        if hasattr(self, 'database'):
+            self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _pragma(self, name):
+        return self.database._get_connection().execute(f"PRAGMA {name}").fetchone()[0]
+    
+    def test_default_profile_uses_wal(self):
+        """Test that new connections get the tuned PRAGMAs."""
+        self.database = Database(self.db_path)
+        
+        assert self.database.connection_profile.name == 'ssd'
+        assert self._pragma('journal_mode') == 'wal'
+        assert self._pragma('synchronous') == 1  # NORMAL
+        assert self._pragma('temp_store') == 2  # MEMORY
+        assert self._pragma('busy_timeout') == 5000
+        assert self._pragma('cache_size') == -64000
+    
+    def test_named_presets(self):
+        """Test selecting a preset by name."""
+        self.database = Database(self.db_path, profile='sd_card')
+        assert self._pragma('cache_size') == CONNECTION_PROFILES['sd_card'].cache_size
+        assert self._pragma('wal_autocheckpoint') == 4000
+    
+    def test_rollback_profile(self):
+        """Test that the rollback preset keeps the old journal."""
+        self.database = Database(self.db_path, profile='rollback')
+        assert self._pragma('journal_mode') == 'delete'
+    
+    def test_overrides_and_unknown_profile(self):
+        """Test overriding preset fields and rejecting unknown names."""
+        profile = get_connection_profile('ssd', mmap_size=0)
+        assert profile.mmap_size == 0
+        assert profile.cache_size == CONNECTION_PROFILES['ssd'].cache_size
+        
+        with pytest.raises(ValueError):
+            get_connection_profile('floppy')
+    
+    def test_checkpoint_if_due(self):
+        """Test that passive checkpoints run at most once per interval."""
+        profile = get_connection_profile('ssd', checkpoint_interval_seconds=10.0)
+        self.database = Database(self.db_path, profile=profile)
+        connections = self.database.connections
+        
+        with patch('src.data.database.time.monotonic', return_value=connections._last_checkpoint + 5):
+            assert connections.checkpoint_if_due() is False
+        with patch('src.data.database.time.monotonic', return_value=connections._last_checkpoint + 11):
+            assert connections.checkpoint_if_due() is True
+            assert connections.checkpoint_if_due() is False
+    
+    def test_no_checkpoint_without_wal(self):
+        """Test that the rollback journal never checkpoints."""
+        self.database = Database(self.db_path, profile='rollback')
+        assert self.database.connections.checkpoint_if_due() is False
@@ -21,6 +21,10 @@ from datetime import datetime, timezone, timedelta
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from src.data.database import Database, ThreadLocalConnection
+from src.data.ingest_writer import IngestWriter
+from src.data.workout_archive import decode_archive, split_blocks
+from src.data.workout_data_schema import SAMPLE_COLUMN_NAMES
+from tests.unit.test_workout_archive import legacy_archive
 
 
 class TestDatabase:
@@ -716,4 +720,809 @@ class TestDatabase:
         # Verify data integrity
         data_points = self.database.get_workout_data(workout_id)
         assert len(data_points) == 1, "Should have one data point"
-        assert data_points[0]["data"] == large_data, "Large data should be preserved"
\ No newline at end of file
+        assert data_points[0]["data"] == large_data, "Large data should be preserved"
+
+class TestWriteBehindIngest:
+    """Test cases for the write-behind ingest path of Database.add_workout_data."""
+    
+    def setup_method(self):
+        """Set up a database with write-behind enabled."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_write_behind.db')
+        self.database = Database(self.db_path, write_behind=True, batch_size=10, max_latency_ms=50)
+        
+        device_id = self.database.add_device("00:11:22:33:44:55", "Test Rogue Bike", "bike")
+        self.workout_id = self.database.start_workout(device_id, "bike")
+    
+    def teardown_method(self):
+        """Clean up test fixtures after each test method."""
+        self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _count_rows(self):
+        """Count persisted rows using an independent connection."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM workout_data").fetchone()[0]
+        finally:
+            conn.close()
+    
+    def test_samples_are_queued_and_flushed(self):
+        """Test that queued samples are committed by flush_workout_data."""
+        base_time = datetime.now(timezone.utc)
+        for i in range(5):
+            assert self.database.add_workout_data(self.workout_id, base_time + timedelta(seconds=i), {"power": i})
+        
+        assert self.database.flush_workout_data(timeout=5) is True
+        assert self._count_rows() == 5
+    
+    def test_batch_size_triggers_commit(self):
+        """Test that a full batch is committed without an explicit flush."""
+        base_time = datetime.now(timezone.utc)
+        for i in range(10):
+            self.database.add_workout_data(self.workout_id, base_time + timedelta(seconds=i), {"power": i})
+        
+        deadline = time.time() + 5
+        while self._count_rows() < 10 and time.time() < deadline:
+            time.sleep(0.01)
+        
+        assert self._count_rows() == 10
+        assert self.database.ingest_writer.get_stats()['batches_written'] >= 1
+    
+    def test_max_latency_triggers_commit(self):
+        """Test that a partial batch is committed once the latency bound expires."""
+        self.database.add_workout_data(self.workout_id, datetime.now(timezone.utc), {"power": 150})
+        
+        deadline = time.time() + 5
+        while self._count_rows() < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        
+        assert self._count_rows() == 1
+    
+    def test_reads_see_queued_samples(self):
+        """Test that reads flush pending samples first and preserve order."""
+        base_time = datetime.now(timezone.utc)
+        for i in range(25):
+            self.database.add_workout_data(self.workout_id, base_time + timedelta(seconds=i), {"sequence": i})
+        
+        data_points = self.database.get_workout_data(self.workout_id)
+        
+        assert [point["data"]["sequence"] for point in data_points] == list(range(25))
+
+    def test_reads_flush_only_for_pending_workout(self):
+        """Test that reading a workout without queued samples doesn't wait on the writer."""
+        device_id = self.database.add_device("66:77:88:99:AA:BB", "Test Rogue Rower", "rower")
+        other_workout_id = self.database.start_workout(device_id, "rower")
+        release = threading.Event()
+        write_batch = self.database.add_workout_data_batch
+
+        with patch.object(self.database, 'add_workout_data_batch',
+                          side_effect=lambda rows: release.wait(5) and write_batch(rows)):
+            self.database.add_workout_data(self.workout_id, datetime.now(timezone.utc), {"power": 150})
+            assert self.database.ingest_writer.has_pending(self.workout_id)
+            assert not self.database.ingest_writer.has_pending(other_workout_id)
+
+            with patch.object(self.database, 'flush_workout_data') as mock_flush:
+                assert list(self.database.iter_workout_data(other_workout_id)) == []
+                assert self.database.get_workout_data_version(other_workout_id) == 0
+            mock_flush.assert_not_called()
+
+            # The workout being written waits a bounded time for its samples
+            with patch('src.data.database.READ_FLUSH_TIMEOUT_SECONDS', 0.05):
+                started = time.monotonic()
+                self.database.finalize_rollups(self.workout_id)
+                assert time.monotonic() - started < 2
+            release.set()
+            assert self.database.flush_workout_data(timeout=5) is True
+
+        assert not self.database.ingest_writer.has_pending(self.workout_id)
+
+    def test_failed_batch_is_retried(self):
+        """Test that a batch whose commit fails is retried and written."""
+        write_batch = self.database.add_workout_data_batch
+        results = iter([False])
+        base_time = datetime.now(timezone.utc)
+        
+        with patch('src.data.ingest_writer.RETRY_BACKOFF_SECONDS', 0.001), \
+                patch.object(self.database, 'add_workout_data_batch',
+                             side_effect=lambda rows: next(results, None) is not False and write_batch(rows)):
+            for i in range(5):
+                self.database.add_workout_data(self.workout_id, base_time + timedelta(seconds=i), {"power": i})
+            assert self.database.flush_workout_data(timeout=5) is True
+        
+        assert self._count_rows() == 5
+        assert self.database.ingest_writer.get_stats()['batch_retries'] == 1
+    
+    def test_failed_samples_stay_queued_until_written(self):
+        """Test that samples that cannot be written are reported by flush and retried."""
+        write_batch = self.database.add_workout_data_batch
+        broken = threading.Event()
+        broken.set()
+        base_time = datetime.now(timezone.utc)
+        
+        with patch('src.data.ingest_writer.RETRY_BACKOFF_SECONDS', 0.001), \
+                patch.object(self.database, 'add_workout_data_batch',
+                             side_effect=lambda rows: not broken.is_set() and write_batch(rows)):
+            for i in range(5):
+                self.database.add_workout_data(self.workout_id, base_time + timedelta(seconds=i), {"power": i})
+            assert self.database.flush_workout_data(timeout=5) is False
+            assert self.database.ingest_writer.get_stats()['samples_pending_retry'] == 5
+            assert self._count_rows() == 0
+            
+            broken.clear()
+            assert self.database.flush_workout_data(timeout=5) is True
+        
+        assert self._count_rows() == 5
+        assert self.database.ingest_writer.get_stats()['samples_pending_retry'] == 0
+
+    def test_failed_samples_retried_on_timer(self):
+        """Test that failed samples are retried without a new sample or flush."""
+        write_batch = self.database.add_workout_data_batch
+        broken = threading.Event()
+        broken.set()
+        base_time = datetime.now(timezone.utc)
+
+        with patch('src.data.ingest_writer.RETRY_BACKOFF_SECONDS', 0.001), \
+                patch('src.data.ingest_writer.RETRY_INTERVAL_SECONDS', 0.05), \
+                patch.object(self.database, 'add_workout_data_batch',
+                             side_effect=lambda rows: not broken.is_set() and write_batch(rows)):
+            for i in range(3):
+                self.database.add_workout_data(self.workout_id, base_time + timedelta(seconds=i), {"power": i})
+            assert self.database.flush_workout_data(timeout=5) is False
+
+            broken.clear()
+            deadline = time.time() + 5
+            while self._count_rows() < 3 and time.time() < deadline:
+                time.sleep(0.01)
+
+        assert self._count_rows() == 3
+        assert self.database.ingest_writer.get_stats()['samples_pending_retry'] == 0
+
+    def test_flush_times_out_on_full_queue(self):
+        """Test that flush gives up when the queue stays full for the whole timeout."""
+        release = threading.Event()
+        database = Mock()
+        database.add_workout_data_batch.side_effect = lambda rows: release.wait(5)
+        writer = IngestWriter(database, batch_size=1, max_queue_size=1)
+        base_time = datetime.now(timezone.utc)
+        try:
+            # The writer blocks on the first sample, the second fills the queue
+            writer.submit(self.workout_id, base_time, {"power": 1})
+            deadline = time.time() + 5
+            while database.add_workout_data_batch.call_count == 0 and time.time() < deadline:
+                time.sleep(0.01)
+            writer.submit(self.workout_id, base_time + timedelta(seconds=1), {"power": 2})
+            
+            started = time.monotonic()
+            assert writer.flush(timeout=0.2) is False
+            assert time.monotonic() - started < 2
+        finally:
+            release.set()
+            writer.stop()
+        
+        assert writer.get_stats()['samples_written'] == 2
+    
+    def test_add_workout_data_batch_single_transaction(self):
+        """Test that add_workout_data_batch writes all rows."""
+        base_time = datetime.now(timezone.utc)
+        rows = [(self.workout_id, base_time + timedelta(seconds=i), {"power": i}) for i in range(20)]
+        
+        assert self.database.add_workout_data_batch(rows) is True
+        assert self._count_rows() == 20
+
+
+class TestTypedSampleColumns:
+    """Test cases for the typed workout_data columns and the legacy JSON migration."""
+    
+    def setup_method(self):
+        """Set up a temporary database path."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_typed_columns.db')
+    
+    def teardown_method(self):
+        """Clean up test fixtures after each test method."""
+        if hasattr(self, 'database'):
+            self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _create_legacy_database(self, samples):
+        """Create a database with the old JSON-only workout_data table."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE workouts (id INTEGER PRIMARY KEY AUTOINCREMENT, device_id INTEGER, "
+                     "start_time TEXT, end_time TEXT, duration INTEGER, workout_type TEXT, summary TEXT, "
+                     "fit_file_path TEXT, uploaded_to_garmin INTEGER DEFAULT 0)")
+        conn.execute("CREATE TABLE workout_data (id INTEGER PRIMARY KEY AUTOINCREMENT, workout_id INTEGER, "
+                     "timestamp TEXT, data TEXT)")
+        conn.execute("INSERT INTO workouts (start_time, workout_type, summary) VALUES (?, 'bike', '{}')",
+                     (datetime.now().isoformat(),))
+        base_time = datetime(2024, 1, 1, 12, 0, 0)
+        for i, sample in enumerate(samples):
+            conn.execute("INSERT INTO workout_data (workout_id, timestamp, data) VALUES (1, ?, ?)",
+                         ((base_time + timedelta(seconds=i)).isoformat(), sample))
+        conn.commit()
+        conn.close()
+    
+    def test_samples_stored_in_typed_columns(self):
+        """Test that canonical metrics land in columns and the rest in extras."""
+        self.database = Database(self.db_path)
+        workout_id = self.database.start_workout(None, "bike")
+        sample = {"instantaneous_power": 150, "instantaneous_speed": 25.5, "heart_rate": 140,
+                  "total_distance": 1000.0, "device_note": "ok"}
+        assert self.database.add_workout_data(workout_id, datetime.now(), sample)
+        
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute("SELECT power, speed, heart_rate, distance, cadence, extras, data "
+                           "FROM workout_data").fetchone()
+        conn.close()
+        assert row[:5] == (150.0, 25.5, 140, 1000.0, None)
+        assert row[5] == '{"device_note": "ok"}'
+        assert row[6] is None
+        
+        data = self.database.get_workout_data(workout_id)[0]["data"]
+        assert data == sample
+        assert isinstance(data["instantaneous_power"], int)
+        assert isinstance(data["total_distance"], float)
+    
+    def test_non_numeric_metric_kept_in_extras(self):
+        """Test that values that don't fit a typed column still round-trip."""
+        self.database = Database(self.db_path)
+        workout_id = self.database.start_workout(None, "bike")
+        sample = {"power": "n/a", "heart_rate": True, "cadence": 80, "instant_cadence": 81}
+        self.database.add_workout_data(workout_id, datetime.now(), sample)
+        
+        assert self.database.get_workout_data(workout_id)[0]["data"] == sample
+    
+    def test_optimized_read_uses_columns(self):
+        """Test the FIT conversion read across the metric aliases."""
+        self.database = Database(self.db_path)
+        workout_id = self.database.start_workout(None, "bike")
+        self.database.add_workout_data(workout_id, datetime.now(),
+                                       {"instant_power": 200.7, "instant_cadence": 90, "stroke_rate": 24.0})
+        
+        point = self.database.get_workout_data_optimized(workout_id)[0]
+        assert point["instantaneous_power"] == 200
+        assert point["instantaneous_cadence"] == 90
+        assert point["stroke_rate"] == 24
+        assert point["heart_rate"] == 0
+    
+    def test_legacy_rows_migrated_in_chunks(self):
+        """Test that the legacy migration converts rows in resumable chunks."""
+        samples = ['{"instantaneous_power": %d, "heart_rate": 120, "extra": [1, 2]}' % i for i in range(5)]
+        self._create_legacy_database(samples)
+        self.database = Database(self.db_path, migrate_in_background=False)
+        
+        # Legacy rows are readable before the migration runs
+        assert self.database.get_workout_data_optimized(1)[3]["instantaneous_power"] == 3
+        
+        assert self.database.migrate_legacy_workout_data(chunk_size=2, max_chunks=1) == 2
+        assert self.database.get_config('workout_data_migration_last_id') == 2
+        assert not self.database.get_config('workout_data_migration_complete', False)
+        
+        # Resume from the checkpoint
+        assert self.database.migrate_legacy_workout_data(chunk_size=2) == 3
+        assert self.database.get_config('workout_data_migration_complete') is True
+        
+        conn = sqlite3.connect(self.db_path)
+        assert conn.execute("SELECT COUNT(*) FROM workout_data WHERE data IS NOT NULL").fetchone()[0] == 0
+        conn.close()
+        
+        points = self.database.get_workout_data(1)
+        assert [p["data"] for p in points] == [
+            {"instantaneous_power": i, "heart_rate": 120, "extra": [1, 2]} for i in range(5)
+        ]
+    
+    def test_background_migration(self):
+        """Test that opening a legacy database converts it in the background."""
+        self._create_legacy_database(['{"power": 100}', 'not json'])
+        self.database = Database(self.db_path)
+        
+        for _ in range(100):
+            if self.database.get_config('workout_data_migration_complete', False):
+                break
+            time.sleep(0.05)
+        
+        assert self.database.get_config('workout_data_migration_complete') is True
+        data = [p["data"] for p in self.database.get_workout_data(1)]
+        assert data == [{"power": 100}, {}]
+
+
+class TestStreamingWorkoutData:
+    """Test cases for streaming workout data reads."""
+    
+    def setup_method(self):
+        """Set up a database with one workout of samples."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_streaming.db')
+        self.database = Database(self.db_path)
+        self.workout_id = self.database.start_workout(None, "bike")
+        self.base_time = datetime(2024, 1, 1, 12, 0, 0)
+        rows = [(self.workout_id, self.base_time + timedelta(seconds=i),
+                 {"instantaneous_power": 100 + i, "heart_rate": 130, "note": "x"})
+                for i in range(10)]
+        self.database.add_workout_data_batch(rows)
+    
+    def teardown_method(self):
+        """Clean up test fixtures after each test method."""
+        self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_iter_matches_get_workout_data(self):
+        """Test that streaming full samples gives the same points as the list read."""
+        points = list(self.database.iter_workout_data(self.workout_id, chunk_size=3))
+        assert points == self.database.get_workout_data(self.workout_id)
+        assert [p["data"]["instantaneous_power"] for p in points] == list(range(100, 110))
+    
+    def test_iter_selected_fields(self):
+        """Test that only the requested columns are returned."""
+        points = list(self.database.iter_workout_data(self.workout_id, fields=["power", "cadence"],
+                                                      chunk_size=4))
+        assert len(points) == 10
+        assert points[0] == {"timestamp": self.base_time, "power": 100.0, "cadence": None}
+        assert points[-1]["power"] == 109.0
+    
+    def test_iter_fetches_in_chunks(self):
+        """Test that rows are pulled from the cursor lazily."""
+        iterator = self.database.iter_workout_data(self.workout_id, fields=["power"], chunk_size=2)
+        assert next(iterator)["power"] == 100.0
+        assert [p["power"] for p in iterator] == [float(v) for v in range(101, 110)]
+    
+    def test_iter_unknown_field(self):
+        """Test that unknown column names are rejected up front."""
+        with pytest.raises(ValueError):
+            self.database.iter_workout_data(self.workout_id, fields=["power", "watts"])
+    
+    def test_iter_legacy_row_fields(self):
+        """Test that rows not migrated yet are decoded from their JSON blob."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO workout_data (workout_id, timestamp, data) VALUES (?, ?, ?)",
+                     (self.workout_id, (self.base_time + timedelta(seconds=30)).isoformat(),
+                      '{"instant_power": 250, "heart_rate": 150}'))
+        conn.commit()
+        conn.close()
+        
+        last = list(self.database.iter_workout_data(self.workout_id, fields=["power", "heart_rate"]))[-1]
+        assert last == {"timestamp": self.base_time + timedelta(seconds=30), "power": 250, "heart_rate": 150}
+    
+    def test_iter_flushes_write_behind(self):
+        """Test that queued samples are visible to a streaming read."""
+        self.database.close()
+        self.database = Database(self.db_path, write_behind=True)
+        self.database.add_workout_data(self.workout_id, self.base_time + timedelta(seconds=40), {"power": 5})
+        
+        points = list(self.database.iter_workout_data(self.workout_id, fields=["power"]))
+        assert points[-1]["power"] == 5
+
+
+class TestWorkoutArchiving:
+    """Test cases for archiving finished workouts."""
+    
+    def setup_method(self):
+        """Set up a database with one finished workout."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_archive.db')
+        self.database = Database(self.db_path)
+        self.workout_id = self.database.start_workout(None, "bike")
+        self.base_time = datetime(2024, 1, 1, 12, 0, 0)
+        rows = [(self.workout_id, self.base_time + timedelta(seconds=i),
+                 {"instantaneous_power": 100 + i, "instantaneous_speed": 25.5, "heart_rate": 130,
+                  "total_distance": i * 7.1, "note": "x"})
+                for i in range(50)]
+        self.database.add_workout_data_batch(rows)
+    
+    def teardown_method(self):
+        """Clean up test fixtures after each test method."""
+        self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _count_rows(self, table):
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        conn.close()
+        return count
+    
+    def test_archive_replaces_rows(self):
+        """Test that archiving keeps every sample readable and drops the rows."""
+        self.database.end_workout(self.workout_id)
+        before = self.database.get_workout_data(self.workout_id)
+        optimized = self.database.get_workout_data_optimized(self.workout_id)
+        
+        assert self.database.archive_workout(self.workout_id) is True
+        
+        assert self._count_rows("workout_data") == 0
+        assert self._count_rows("workout_archive") == 1
+        assert self.database.get_workout_data(self.workout_id) == before
+        assert self.database.get_workout_data_optimized(self.workout_id) == optimized
+        points = list(self.database.iter_workout_data(self.workout_id, fields=["power"]))
+        assert [p["power"] for p in points] == [float(100 + i) for i in range(50)]
+    
+    def test_active_workout_not_archived(self):
+        """Test that samples of a running workout stay as rows."""
+        assert self.database.archive_workout(self.workout_id) is False
+        assert self._count_rows("workout_data") == 50
+    
+    def test_late_samples_merged(self):
+        """Test that samples added after archiving are read and re-archived."""
+        self.database.end_workout(self.workout_id)
+        self.database.archive_workout(self.workout_id)
+        self.database.add_workout_data(self.workout_id, self.base_time + timedelta(seconds=25, milliseconds=500),
+                                       {"power": 1})
+        
+        points = self.database.get_workout_data(self.workout_id)
+        assert len(points) == 51
+        assert points[26]["data"] == {"power": 1}
+        
+        assert self.database.archive_workout(self.workout_id) is True
+        assert self._count_rows("workout_data") == 0
+        assert self.database.get_workout_data(self.workout_id) == points
+    
+    def test_archive_blocks_window_read(self):
+        """Test that a time window only decodes the blocks that cover it."""
+        self.database.end_workout(self.workout_id)
+        with patch('src.data.database.split_blocks', side_effect=lambda rows: split_blocks(rows, 10)):
+            assert self.database.archive_workout(self.workout_id) is True
+        assert self._count_rows("workout_archive_blocks") == 5
+        
+        with patch('src.data.database.decode_archive', wraps=decode_archive) as decode:
+            points = list(self.database.iter_workout_data(
+                self.workout_id, fields=["power"], start=self.base_time + timedelta(seconds=15),
+                end=self.base_time + timedelta(seconds=25)))
+        
+        assert decode.call_count == 2
+        assert decode.call_args.args[1] == ["power"]
+        assert [p["power"] for p in points] == [float(100 + i) for i in range(15, 25)]
+        assert len(self.database.get_workout_data(self.workout_id)) == 50
+    
+    def test_legacy_archive_split_into_blocks(self):
+        """Test that a version 1 archive is read and then converted to blocks."""
+        self.database.end_workout(self.workout_id)
+        before = self.database.get_workout_data(self.workout_id)
+        conn = self.database._get_connection()
+        rows = [self.database._row_to_archive_row(row) for row in conn.execute(
+            f"SELECT id, timestamp, {', '.join(SAMPLE_COLUMN_NAMES)}, field_flags, extras, data "
+            "FROM workout_data ORDER BY timestamp")]
+        conn.execute("INSERT INTO workout_archive (workout_id, sample_count, format_version, data) "
+                     "VALUES (?, ?, 1, ?)", (self.workout_id, len(rows), legacy_archive(rows)))
+        conn.execute("DELETE FROM workout_data")
+        conn.commit()
+        
+        assert self.database.get_workout_data(self.workout_id) == before
+        assert self.database.convert_legacy_archives() is True
+        assert self._count_rows("workout_archive_blocks") == 1
+        assert self.database.get_workout_data(self.workout_id) == before
+    
+    def test_delete_removes_archive(self):
+        """Test that deleting a workout deletes its archive."""
+        self.database.end_workout(self.workout_id)
+        self.database.archive_workout(self.workout_id)
+        
+        assert self.database.delete_workout(self.workout_id) is True
+        assert self._count_rows("workout_archive") == 0
+        assert self._count_rows("workout_archive_blocks") == 0
+        assert self.database.get_workout_data(self.workout_id) == []
+    
+    def test_archive_finished_workouts(self):
+        """Test archiving every finished workout with sample rows."""
+        self.database.end_workout(self.workout_id)
+        active_id = self.database.start_workout(None, "rower")
+        self.database.add_workout_data(active_id, datetime.now(), {"stroke_rate": 24})
+        
+        assert self.database.archive_finished_workouts() == 1
+        assert self._count_rows("workout_data") == 1
+
+
+class TestWorkoutSummaryColumns:
+    """Test cases for the denormalized workout summary columns."""
+    
+    def setup_method(self):
+        """Set up a temporary database."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_summary_columns.db')
+        self.database = Database(self.db_path)
+    
+    def teardown_method(self):
+        """Clean up test fixtures after each test method."""
+        self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_end_workout_fills_summary_columns(self):
+        """Test that end_workout copies the key summary metrics into columns."""
+        workout_id = self.database.start_workout(None, "bike")
+        self.database.end_workout(workout_id, summary={"avg_power": 175.5, "max_power": 420,
+                                                       "normalized_power": 190.2, "avg_cadence": 88})
+        
+        workout = self.database.get_workout(workout_id)
+        assert workout["avg_power"] == 175.5
+        assert workout["max_power"] == 420.0
+        assert workout["normalized_power"] == 190.2
+        assert workout["total_distance"] is None
+        assert workout["summary"]["avg_cadence"] == 88
+    
+    def test_get_workouts_sorted_by_summary_column(self):
+        """Test sorting the history by a summary metric."""
+        for power in [150, None, 210, 180]:
+            workout_id = self.database.start_workout(None, "bike")
+            self.database.end_workout(workout_id, summary={"avg_power": power} if power else {})
+        
+        workouts = self.database.get_workouts(limit=10, sort_by="avg_power")
+        assert [w["avg_power"] for w in workouts] == [210.0, 180.0, 150.0, None]
+        
+        workouts = self.database.get_workouts(limit=2, sort_by="avg_power", descending=False)
+        assert [w["avg_power"] for w in workouts] == [None, 150.0]
+    
+    def test_get_workouts_rejects_unknown_sort(self):
+        """Test that only whitelisted columns can be used for sorting."""
+        with pytest.raises(ValueError):
+            self.database.get_workouts(sort_by="summary; DROP TABLE workouts")
+
+
+class TestWorkoutSearch:
+    """Test cases for the filtered, keyset-paginated workout search."""
+    
+    def setup_method(self):
+        """Set up a database with workouts of both types, some sharing a start time."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_search.db')
+        self.database = Database(self.db_path)
+        self.bike_id = self.database.add_device("00:11:22:33:44:55", "Bike", "bike")
+        
+        conn = self.database._get_connection()
+        base_time = datetime(2024, 1, 1, 6, 0, 0)
+        for i in range(12):
+            # Pairs of workouts start at the same second to exercise the id tie-break
+            start = (base_time + timedelta(days=i // 2)).isoformat()
+            workout_type = "bike" if i % 3 else "rower"
+            conn.execute(
+                "INSERT INTO workouts (device_id, start_time, end_time, duration, workout_type, summary, "
+                "total_distance) VALUES (?, ?, ?, ?, ?, '{}', ?)",
+                (self.bike_id if workout_type == "bike" else None, start, start, 600 * i, workout_type, 1000.0 * i)
+            )
+        conn.commit()
+    
+    def teardown_method(self):
+        """Clean up test fixtures after each test method."""
+        self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _all_pages(self, **kwargs):
+        ids, token, pages = [], None, 0
+        while True:
+            workouts, token = self.database.search_workouts(page_token=token, **kwargs)
+            ids += [w["id"] for w in workouts]
+            pages += 1
+            if not token:
+                return ids, pages
+    
+    def test_pages_cover_every_workout_once(self):
+        """Test that walking the page tokens returns each workout once, newest first."""
+        ids, pages = self._all_pages(limit=5)
+        assert pages == 3
+        assert ids == sorted(range(1, 13), key=lambda i: ((i - 1) // 2, i), reverse=True)
+    
+    def test_filters(self):
+        """Test that each filter is applied."""
+        workouts, token = self.database.search_workouts(workout_type="rower")
+        assert token is None
+        assert {w["workout_type"] for w in workouts} == {"rower"}
+        assert len(workouts) == 4
+        
+        workouts, _ = self.database.search_workouts(device_id=self.bike_id, min_duration=3000)
+        assert sorted(w["id"] for w in workouts) == [6, 8, 9, 11, 12]
+        
+        workouts, _ = self.database.search_workouts(min_distance=10000)
+        assert sorted(w["id"] for w in workouts) == [11, 12]
+        
+        workouts, _ = self.database.search_workouts(start_after="2024-01-02", start_before=datetime(2024, 1, 3, 6))
+        assert sorted(w["id"] for w in workouts) == [3, 4, 5, 6]
+        assert workouts[0]["device_name"] in ("Bike", "Unknown Device")
+    
+    def test_page_token_stable_when_workouts_are_added(self):
+        """Test that a newer workout does not shift the following pages."""
+        first_page, token = self.database.search_workouts(limit=4)
+        self.database.start_workout(None, "bike")
+        second_page, _ = self.database.search_workouts(limit=4, page_token=token)
+        
+        assert not {w["id"] for w in first_page} & {w["id"] for w in second_page}
+        assert second_page[0]["id"] == 8
+    
+    def test_invalid_page_token(self):
+        """Test that a malformed token is rejected."""
+        with pytest.raises(ValueError):
+            self.database.search_workouts(page_token="not-a-token")
+    
+    def test_list_apis_build_the_same_entries(self):
+        """Test that the three workout list APIs return identical entries."""
+        listed = {w["id"]: w for w in self.database.get_workouts(limit=20)}
+        searched, token = self.database.search_workouts(limit=20)
+        searched = {w["id"]: w for w in searched}
+        without_fit = {w["id"]: w for w in self.database.get_workouts_without_fit_files()}
+        
+        assert len(listed) == len(without_fit) == 12
+        assert token is None
+        assert listed == searched == without_fit
+        assert listed[1]["device_name"] == "Unknown Device"
+        assert listed[1]["summary"] == {}
+    
+    def test_iter_workouts(self):
+        """Test iterating over every matching workout across pages."""
+        workouts = list(self.database.iter_workouts(page_size=3, workout_type="bike"))
+        assert len(workouts) == 8
+
+
+class TestWorkoutRollups:
+    """Test cases for the per-bucket rollups of workout samples."""
+    
+    def setup_method(self):
+        """Set up a database with a 20 minute workout at 1 Hz."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_rollups.db')
+        self.database = Database(self.db_path)
+        self.workout_id = self.database.start_workout(None, "bike")
+        self.base_time = datetime(2024, 1, 1, 12, 0, 0)
+        self.rows = [(self.workout_id, self.base_time + timedelta(seconds=i),
+                      {"instantaneous_power": 100 + i % 7, "heart_rate": 120 + i // 60})
+                     for i in range(1200)]
+        # Written in batches the way the ingest writer would
+        for start in range(0, len(self.rows), 64):
+            self.database.add_workout_data_batch(self.rows[start:start + 64])
+    
+    def teardown_method(self):
+        """Clean up test fixtures after each test method."""
+        self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_live_rollups_match_rebuild(self):
+        """Test that incremental rollups equal rollups rebuilt from the samples."""
+        self.database.end_workout(self.workout_id)
+        assert self.database.finalize_rollups(self.workout_id) is True
+        live = {r: self.database.get_workout_rollups(self.workout_id, r) for r in (5, 30, 300)}
+        
+        assert self.database.rebuild_rollups(self.workout_id) is True
+        for resolution, buckets in live.items():
+            assert buckets == self.database.get_workout_rollups(self.workout_id, resolution)
+        
+        assert len(live[5]) == 240
+        assert len(live[300]) == 4
+        assert sum(bucket["sample_count"] for bucket in live[30]) == 1200
+        first = live[300][0]
+        assert first["timestamp"] == self.base_time
+        assert first["power"]["min"] == 100 and first["power"]["max"] == 106
+        assert first["heart_rate"]["count"] == 300
+        assert first["cadence"]["count"] == 0 and first["cadence"]["mean"] is None
+    
+    def test_closed_buckets_written_while_live(self):
+        """Test that completed buckets are readable before the workout ends."""
+        buckets = self.database.get_workout_rollups(self.workout_id, 30)
+        assert len(buckets) == 39
+        assert self.database.get_workout_rollups(self.workout_id, 30)[-1]["sample_count"] == 30
+    
+    def test_time_window(self):
+        """Test reading only the buckets of a time window."""
+        self.database.end_workout(self.workout_id)
+        self.database.finalize_rollups(self.workout_id)
+        start = self.base_time + timedelta(seconds=62)
+        end = self.base_time + timedelta(seconds=120)
+        
+        buckets = self.database.get_workout_rollups(self.workout_id, 30, start=start, end=end)
+        assert [b["timestamp"] for b in buckets] == [self.base_time + timedelta(seconds=60),
+                                                     self.base_time + timedelta(seconds=90)]
+        
+        points = list(self.database.iter_workout_data(self.workout_id, fields=["power"], start=start, end=end))
+        assert len(points) == 58
+        assert points[0]["timestamp"] == start
+        
+        # The same window is served from an archived workout
+        self.database.archive_workout(self.workout_id)
+        archived = list(self.database.iter_workout_data(self.workout_id, fields=["power"], start=start, end=end))
+        assert archived == points
+    
+    def test_restarted_builder_rebuilds_at_end(self):
+        """Test that rollups are rebuilt when the live builder missed samples."""
+        reopened = Database(self.db_path)
+        extra = [(self.workout_id, self.base_time + timedelta(seconds=1200 + i), {"instantaneous_power": 500})
+                 for i in range(10)]
+        reopened.add_workout_data_batch(extra)
+        reopened.end_workout(self.workout_id)
+        assert reopened.finalize_rollups(self.workout_id) is True
+        
+        buckets = reopened.get_workout_rollups(self.workout_id, 300)
+        assert sum(bucket["sample_count"] for bucket in buckets) == 1210
+        assert buckets[-1]["power"]["max"] == 500
+        reopened.close()
+    
+    def test_end_workout_leaves_rollups_to_caller(self):
+        """Test that ending a workout doesn't finalize or rebuild its rollups."""
+        with patch.object(self.database, 'rebuild_rollups') as mock_rebuild:
+            assert self.database.end_workout(self.workout_id) is True
+        mock_rebuild.assert_not_called()
+        assert self.workout_id in self.database._rollup_builders
+        
+        assert self.database.finalize_rollups(self.workout_id) is True
+        assert self.workout_id not in self.database._rollup_builders
+        buckets = self.database.get_workout_rollups(self.workout_id, 300)
+        assert sum(bucket["sample_count"] for bucket in buckets) == 1200
+    
+    def test_idle_builder_dropped(self):
+        """Test that the builder of a workout abandoned without end_workout is dropped."""
+        other_workout_id = self.database.start_workout(None, "rower")
+        later = self.base_time + timedelta(hours=1)
+        with patch('src.data.database.ROLLUP_BUILDER_IDLE_SECONDS', 0):
+            time.sleep(0.01)
+            self.database.add_workout_data_batch([(other_workout_id, later, {"instantaneous_power": 200})])
+        
+        assert self.workout_id not in self.database._rollup_builders
+        assert self.workout_id not in self.database._rollup_last_sample
+        # Its open buckets were written when it was dropped
+        buckets = self.database.get_workout_rollups(self.workout_id, 300)
+        assert sum(bucket["sample_count"] for bucket in buckets) == 1200
+    
+    def test_backfill_on_first_read(self):
+        """Test that a finished workout without rollups gets them on first read."""
+        self.database.end_workout(self.workout_id)
+        self.database.finalize_rollups(self.workout_id)
+        conn = self.database._get_connection()
+        conn.execute("DELETE FROM workout_rollups")
+        conn.commit()
+        
+        buckets = self.database.get_workout_rollups(self.workout_id, 300)
+        assert sum(bucket["sample_count"] for bucket in buckets) == 1200
+    
+    def test_delete_workout_removes_rollups(self):
+        """Test that deleting a workout drops its rollups."""
+        self.database.end_workout(self.workout_id)
+        self.database.delete_workout(self.workout_id)
+        
+        conn = sqlite3.connect(self.db_path)
+        assert conn.execute("SELECT COUNT(*) FROM workout_rollups").fetchone()[0] == 0
+        conn.close()
+
+
+class TestChangeVersions:
+    """Test cases for the workout row versions and table change counters."""
+    
+    def setup_method(self):
+        """Set up a database with one finished workout."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_versions.db')
+        self.database = Database(self.db_path)
+        self.workout_id = self.database.start_workout(None, "bike")
+        self.database.end_workout(self.workout_id, summary={"avg_power": 150})
+    
+    def teardown_method(self):
+        """Clean up test fixtures after each test method."""
+        self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_update_bumps_row_version(self):
+        """Test that every update of a workout gets a new row version."""
+        before = self.database.get_workout_version(self.workout_id)
+        assert before["end_time"] is not None
+        assert before["modified_at"] is not None
+        
+        self.database.update_workout_fit_path(self.workout_id, "bike_20240101_120000.fit")
+        after = self.database.get_workout_version(self.workout_id)
+        assert after["row_version"] == before["row_version"] + 1
+        assert self.database.get_workout_version(9999) is None
+    
+    def test_samples_do_not_change_versions(self):
+        """Test that writing samples leaves the workout versions alone."""
+        versions = self.database.get_table_versions()
+        row_version = self.database.get_workout_version(self.workout_id)["row_version"]
+        
+        self.database.add_workout_data(self.workout_id, datetime.now(), {"instantaneous_power": 150})
+        self.database.flush_workout_data()
+        assert self.database.get_table_versions() == versions
+        assert self.database.get_workout_version(self.workout_id)["row_version"] == row_version
+    
+    def test_table_versions_count_every_change(self):
+        """Test that inserts, updates and deletes of workouts and devices are counted."""
+        versions = self.database.get_table_versions()
+        
+        workout_id = self.database.start_workout(None, "rower")
+        inserted = self.database.get_table_versions()
+        assert inserted["workouts"] > versions["workouts"]
+        
+        self.database.delete_workout(workout_id)
+        assert self.database.get_table_versions()["workouts"] > inserted["workouts"]
+        
+        self.database.add_device("AA:BB:CC:DD:EE:FF", "Echo Bike", "bike")
+        assert self.database.get_table_versions()["devices"] > versions["devices"]
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Unit tests for chart series downsampling.
+"""
+
+import os
+import sys
+import math
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.utils.downsampling import downsample_series, lttb_indices
+
+
+def make_series(count=4000):
+    """A smooth power curve with one short sprint and a steadily rising heart rate."""
+    timestamps = list(range(count))
+    powers = [150 + 20 * math.sin(i / 50.0) for i in range(count)]
+    for i in range(count * 5 // 8, count * 5 // 8 + 4):
+        powers[i] = 900.0
+    heart_rates = [120.0 + i / 100.0 for i in range(count)]
+    return timestamps, {'powers': powers, 'heart_rates': heart_rates}
+
+
+class TestDownsampleSeries:
+    """Test cases for downsample_series()."""
+
+    @pytest.mark.parametrize('method', ['lttb', 'min-max', 'average'])
+    def test_returns_at_most_max_points(self, method):
+        """Test that every series is reduced and kept aligned."""
+        timestamps, series = make_series()
+        reduced_timestamps, reduced = downsample_series(timestamps, series, 500, method)
+
+        assert len(reduced_timestamps) <= 500
+        assert all(len(values) == len(reduced_timestamps) for values in reduced.values())
+        assert reduced_timestamps == sorted(reduced_timestamps)
+
+    @pytest.mark.parametrize('method', ['lttb', 'min-max'])
+    def test_keeps_peaks(self, method):
+        """Test that a short sprint is still visible after downsampling."""
+        timestamps, series = make_series()
+        _, reduced = downsample_series(timestamps, series, 200, method)
+        assert max(reduced['powers']) == 900.0
+
+    def test_average(self):
+        """Test that bucket means preserve the overall mean."""
+        timestamps = list(range(1000))
+        values = [float(i % 10) for i in range(1000)]
+        reduced_timestamps, reduced = downsample_series(timestamps, {'v': values}, 100, 'average')
+
+        assert reduced_timestamps[:2] == [0, 10]
+        assert reduced['v'] == [4.5] * 100
+
+    def test_short_series_unchanged(self):
+        """Test that a series that already fits is returned as is."""
+        timestamps, series = make_series(50)
+        reduced_timestamps, reduced = downsample_series(timestamps, series, 100)
+        assert reduced_timestamps == timestamps
+        assert reduced == series
+
+    def test_invalid_arguments(self):
+        """Test that bad methods and sizes are rejected."""
+        timestamps, series = make_series(10)
+        with pytest.raises(ValueError):
+            downsample_series(timestamps, series, 5, 'median')
+        with pytest.raises(ValueError):
+            downsample_series(timestamps, series, 2)
+
+
+class TestLttbIndices:
+    """Test cases for lttb_indices()."""
+
+    def test_keeps_endpoints(self):
+        """Test that the first and last samples are always kept."""
+        _, series = make_series(1000)
+        indices = lttb_indices(list(series.values()), 50)
+
+        assert len(indices) == 50
+        assert indices[0] == 0 and indices[-1] == 999
+        assert indices == sorted(set(indices))
+
+    def test_flat_series(self):
+        """Test that flat input is spread evenly."""
+        indices = lttb_indices([[1.0] * 100], 10)
+        assert len(indices) == 10
+        assert indices[0] == 0 and indices[-1] == 99
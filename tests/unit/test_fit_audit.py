@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the FIT directory audit.
+"""
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.fit.fit_audit import (
+    CACHE_FILE_NAME, MODE_ANALYZE, MODE_BOTH, MODE_SUMMARY, audit_fit_directory, audit_fit_file,
+    run_in_subprocess
+)
+
+FIT_FILES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../fit_files'))
+SAMPLE_FILES = ['bike_20250514_203943.fit', 'bike_20250817_102300.fit', 'bike_20250817_111828.fit']
+
+
+class TestFITAudit:
+    """Test cases for audit_fit_directory and its sidecar cache."""
+
+    def setup_method(self):
+        """Copy a few small FIT files into a temporary directory."""
+        self.temp_dir = tempfile.mkdtemp()
+        for name in SAMPLE_FILES:
+            shutil.copy(os.path.join(FIT_FILES_DIR, name), self.temp_dir)
+        self.paths = [os.path.join(self.temp_dir, name) for name in SAMPLE_FILES]
+
+    def teardown_method(self):
+        """Remove the directory and its cache."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def cached_paths(self):
+        """Paths held in the sidecar cache."""
+        with sqlite3.connect(os.path.join(self.temp_dir, CACHE_FILE_NAME)) as conn:
+            return sorted(row[0] for row in conn.execute("SELECT path FROM fit_audit"))
+
+    def test_audit_fit_file(self):
+        """Test that one decode gives both the analysis and the validation."""
+        result = audit_fit_file(self.paths[0])
+
+        assert result['error'] is None
+        assert result['size'] == os.path.getsize(self.paths[0])
+        assert len(result['sha256']) == 64
+        assert result['analysis']['message_counts']['file_id_message'] == 1
+        assert result['validation']['message_counts'] == result['analysis']['message_counts']
+
+    def test_rerun_only_audits_new_or_changed_files(self):
+        """Test that unchanged files come from the cache on the next run."""
+        report = audit_fit_directory(self.temp_dir, workers=1)
+        assert report['total_files'] == 3
+        assert report['audited'] == 3
+        assert report['cached'] == 0
+        assert report['failed'] == []
+        assert report['valid'] + report['invalid'] == 3
+        assert report['message_counts']['record_message'] > 0
+        assert self.cached_paths() == sorted(self.paths)
+
+        report = audit_fit_directory(self.temp_dir, workers=1)
+        assert report['audited'] == 0
+        assert report['cached'] == 3
+        assert report['files_per_second'] > 0
+
+        # A new modification time alone is resolved by the content hash
+        os.utime(self.paths[0], ns=(1, 1))
+        assert audit_fit_directory(self.temp_dir, workers=1)['audited'] == 0
+
+        shutil.copy(os.path.join(FIT_FILES_DIR, 'bike_20250817_102311.fit'), self.paths[1])
+        assert audit_fit_directory(self.temp_dir, workers=1)['audited'] == 1
+
+    def test_removed_and_unreadable_files(self):
+        """Test that gone files leave the cache and broken files are reported."""
+        audit_fit_directory(self.temp_dir, workers=1)
+        os.remove(self.paths[2])
+        broken_path = os.path.join(self.temp_dir, 'broken.fit')
+        with open(broken_path, 'wb') as f:
+            f.write(b'not a fit file')
+
+        report = audit_fit_directory(self.temp_dir, workers=1)
+
+        assert report['total_files'] == 3
+        assert report['failed'] == [broken_path]
+        assert self.paths[2] not in self.cached_paths()
+
+    def test_mode_change_audits_again(self):
+        """Test that results missing for the requested mode are produced."""
+        report = audit_fit_directory(self.temp_dir, mode=MODE_ANALYZE, workers=1)
+        assert 'valid' not in report
+        assert 'sports' in report
+
+        report = audit_fit_directory(self.temp_dir, mode=MODE_BOTH, workers=1)
+        assert report['audited'] == 3
+        assert 'valid' in report
+
+        with pytest.raises(ValueError):
+            audit_fit_directory(self.temp_dir, mode='unknown')
+
+    def test_summary_mode(self):
+        """Test that the summary mode agrees with the analysis without decoding records."""
+        analyzed = audit_fit_directory(self.temp_dir, mode=MODE_ANALYZE, workers=1)
+        report = audit_fit_directory(self.temp_dir, mode=MODE_SUMMARY, workers=1)
+
+        assert report['audited'] == 3
+        assert report['sports'] == analyzed['sports']
+        assert report['record_count'] == analyzed['message_counts']['record_message']
+        assert all(f['summary'] and f['analysis'] is None for f in report['files'])
+        assert audit_fit_directory(self.temp_dir, mode=MODE_SUMMARY, workers=1)['cached'] == 3
+
+    def test_parallel_audit(self):
+        """Test that a process pool gives the same results as a serial run."""
+        serial = audit_fit_directory(self.temp_dir, workers=1,
+                                     cache_path=os.path.join(self.temp_dir, 'serial.sqlite'))
+        parallel = audit_fit_directory(self.temp_dir, workers=2)
+
+        assert parallel['audited'] == 3
+        assert [f['sha256'] for f in parallel['files']] == [f['sha256'] for f in serial['files']]
+        assert [f['validation']['is_valid'] for f in parallel['files']] == \
+            [f['validation']['is_valid'] for f in serial['files']]
+
+    def test_run_in_subprocess(self):
+        """Test that an audit run through the command line reports progress and its report."""
+        progress = []
+        report = run_in_subprocess(self.temp_dir, mode=MODE_SUMMARY, workers=2,
+                                   progress=lambda done, total: progress.append((done, total)))
+
+        assert report['total_files'] == 3
+        assert report['audited'] == 3
+        assert len(report['files']) == 3
+        assert progress[0] == (0, 3)
+        assert progress[-1] == (3, 3)
+
+        with pytest.raises(ValueError):
+            run_in_subprocess(self.temp_dir, mode='unknown')
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the FIT conversion cache.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.database import Database
+from src.fit import fit_converter
+from src.fit.fit_cache import FITCache, conversion_key
+from src.fit.fit_processor import FITProcessor
+
+
+class TestFITCache:
+    """Test cases for FITCache and its use by FITProcessor."""
+
+    def setup_method(self):
+        """Create a database with one finished bike workout."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_fit_cache.db')
+        self.output_dir = os.path.join(self.temp_dir, 'fit_files')
+        self.database = Database(self.db_path, migrate_in_background=False)
+
+        device_id = self.database.add_device("00:11:22:33:44:55", "Test Rogue Bike", "bike")
+        self.workout_id = self.database.start_workout(device_id, "bike")
+        self.start = datetime(2024, 5, 1, 7, 0)
+        self.add_samples(0, 120)
+        self.database.end_workout(self.workout_id, summary={'total_distance': 960, 'avg_power': 160})
+        conn = self.database._get_connection()
+        conn.execute("UPDATE workouts SET start_time = ? WHERE id = ?", (self.start.isoformat(), self.workout_id))
+        conn.commit()
+
+        self.processor = FITProcessor(self.db_path, self.output_dir)
+        self.profile = {'ftp': 250, 'max_heart_rate': 185, 'name': 'Rider'}
+
+    def teardown_method(self):
+        """Remove the database and generated files."""
+        self.processor.database.close()
+        self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def add_samples(self, first, last):
+        """Add one sample per second in [first, last)."""
+        self.database.add_workout_data_batch([
+            (self.workout_id, self.start + timedelta(seconds=second),
+             {'instant_power': 150 + second % 20, 'instant_cadence': 85, 'heart_rate': 130,
+              'instant_speed': 28.0, 'total_distance': second * 8})
+            for second in range(first, last)
+        ])
+
+    def convert(self, profile=None):
+        """Process the workout, counting the conversions actually run."""
+        with patch.object(self.processor.fit_converter, 'convert_workout',
+                          wraps=self.processor.fit_converter.convert_workout) as convert:
+            path = self.processor.process_workout(self.workout_id, user_profile=profile or self.profile)
+        return path, convert.call_count
+
+    def test_repeat_conversion_uses_cached_file(self):
+        """Test that converting unchanged inputs again returns the existing file."""
+        path, conversions = self.convert()
+        assert path and os.path.exists(path)
+        assert conversions == 1
+
+        cached_path, conversions = self.convert()
+        assert cached_path == path
+        assert conversions == 0
+        assert self.database.get_workout(self.workout_id)['fit_file_path'] == path
+
+    def test_changed_inputs_convert_again(self):
+        """Test that new samples and relevant profile changes miss the cache."""
+        self.convert()
+
+        assert self.convert(dict(self.profile, name='Someone else'))[1] == 0
+        assert self.convert(dict(self.profile, ftp=300))[1] == 1
+
+        self.add_samples(120, 130)
+        assert self.convert(dict(self.profile, ftp=300))[1] == 1
+
+    def test_converter_version_invalidates_its_workout_type(self, monkeypatch):
+        """Test that only a version bump for the workout's own type rebuilds it."""
+        self.convert()
+
+        monkeypatch.setitem(fit_converter.CONVERTER_VERSIONS, 'rower', 2)
+        assert self.convert()[1] == 0
+
+        monkeypatch.setitem(fit_converter.CONVERTER_VERSIONS, 'bike', 2)
+        assert self.convert()[1] == 1
+
+    def test_missing_or_changed_file_is_not_used(self):
+        """Test that an entry whose file is gone or changed is dropped."""
+        path, _ = self.convert()
+        fit_cache = FITCache(self.database)
+        cache_key = fit_cache.key_for(self.database.get_workout(self.workout_id), self.profile)
+        assert fit_cache.lookup(cache_key) == path
+
+        with open(path, 'ab') as fit_file:
+            fit_file.write(b'\0')
+        assert fit_cache.lookup(cache_key) is None
+        assert self.database.get_fit_cache_entry(cache_key) is None
+
+        assert self.convert()[1] == 1
+        os.remove(path)
+        assert self.convert()[1] == 1
+
+    def test_same_size_change_is_not_used(self):
+        """Test that a file rewritten with the same size fails the checksum."""
+        path, _ = self.convert()
+        cache_key = self.processor.last_cache_key
+        assert self.database.get_fit_cache_entry(cache_key)['checksum']
+
+        with open(path, 'r+b') as fit_file:
+            fit_file.seek(20)
+            byte = fit_file.read(1)
+            fit_file.seek(20)
+            fit_file.write(bytes([byte[0] ^ 0xFF]))
+        assert FITCache(self.database).lookup(cache_key) is None
+        assert self.convert()[1] == 1
+
+    def test_data_version_follows_sample_writes(self):
+        """Test that rewriting a sample changes the data version and archiving does not."""
+        version = self.database.get_workout_data_version(self.workout_id)
+        conn = self.database._get_connection()
+        conn.execute("UPDATE workout_data SET power = power + 1 WHERE id = "
+                     "(SELECT MAX(id) FROM workout_data WHERE workout_id = ?)", (self.workout_id,))
+        conn.commit()
+        updated = self.database.get_workout_data_version(self.workout_id)
+        assert updated != version
+
+        assert self.database.archive_workout(self.workout_id)
+        assert self.database.get_workout_data_version(self.workout_id) == updated
+
+    def test_conversion_key_ignores_fit_file_path(self):
+        """Test that recording the FIT file path does not change the key."""
+        workout = self.database.get_workout(self.workout_id)
+        key = conversion_key(workout, 120, self.profile)
+
+        assert conversion_key(dict(workout, fit_file_path='/fit_files/x.fit', row_version=9), 120, self.profile) == key
+        assert conversion_key(workout, 121, self.profile) != key
+        assert conversion_key(dict(workout, summary={'total_distance': 961, 'avg_power': 160}),
+                              120, self.profile) != key
+
+    def test_deleting_workout_removes_entries(self):
+        """Test that cache entries go with their workout."""
+        self.convert()
+        cache_key = self.processor.last_cache_key
+        assert self.database.get_fit_cache_entry(cache_key)
+
+        assert self.database.delete_workout(self.workout_id)
+        assert self.database.get_fit_cache_entry(cache_key) is None
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the FIT file catalog.
+"""
+
+import hashlib
+import os
+import sys
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.database import Database
+from src.fit.fit_catalog import FITCatalog, FITCatalogReconciler
+from src.fit.fit_processor import FITProcessor
+
+FIT_FILES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../fit_files'))
+SAMPLE_FILES = ['bike_20250514_203943.fit', 'bike_20250817_102300.fit', 'bike_20250817_111828.fit']
+
+
+class TestFITCatalog:
+    """Test cases for FITCatalog, its reconciler and the catalog queries."""
+
+    def setup_method(self):
+        """Create a database and a directory with a few small FIT files."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.fit_dir = os.path.join(self.temp_dir, 'fit_files')
+        os.makedirs(self.fit_dir)
+        for i, name in enumerate(SAMPLE_FILES):
+            path = os.path.join(self.fit_dir, name)
+            shutil.copy(os.path.join(FIT_FILES_DIR, name), path)
+            os.utime(path, (1714546800 + i, 1714546800 + i))
+        self.paths = [os.path.join(self.fit_dir, name) for name in SAMPLE_FILES]
+
+        self.database = Database(os.path.join(self.temp_dir, 'test_fit_catalog.db'), migrate_in_background=False)
+        self.catalog = FITCatalog(self.database)
+
+    def teardown_method(self):
+        """Remove the database and files."""
+        self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def totals(self):
+        """Running FIT file totals."""
+        return self.database.get_storage_totals()['fit_files']
+
+    def test_reconcile_tracks_out_of_band_changes(self):
+        """Test that new, changed and removed files are picked up."""
+        stats = self.catalog.reconcile(self.fit_dir)
+        assert stats['added'] == 3
+        assert self.totals() == {'item_count': 3,
+                                 'total_bytes': sum(os.path.getsize(path) for path in self.paths)}
+
+        entry = self.database.get_fit_file(self.paths[0])
+        with open(self.paths[0], 'rb') as f:
+            assert entry['checksum'] == hashlib.sha256(f.read()).hexdigest()
+        assert entry['sport'] == 2
+        assert entry['start_time'].startswith('2025-05-14')
+        assert entry['record_count'] > 0
+
+        assert self.catalog.reconcile(self.fit_dir)['unchanged'] == 3
+
+        shutil.copy(os.path.join(FIT_FILES_DIR, 'bike_20250817_102311.fit'), self.paths[1])
+        os.remove(self.paths[2])
+        stats = self.catalog.reconcile(self.fit_dir)
+        assert (stats['updated'], stats['removed'], stats['unchanged']) == (1, 1, 1)
+        assert self.database.get_fit_file(self.paths[1])['size'] == os.path.getsize(self.paths[1])
+        assert self.database.get_fit_file(self.paths[2]) is None
+        assert self.totals() == {'item_count': 2,
+                                 'total_bytes': sum(os.path.getsize(path) for path in self.paths[:2])}
+
+    def test_unreadable_summary_is_still_cataloged(self):
+        """Test that a file the summary reader rejects keeps its size and checksum."""
+        path = os.path.join(self.fit_dir, 'broken.fit')
+        with open(path, 'wb') as f:
+            f.write(b'not a fit file')
+
+        assert self.catalog.add(path)
+        entry = self.database.get_fit_file(path)
+        assert entry['size'] == 14
+        assert entry['sport'] is None
+
+        assert self.catalog.remove(path)
+        assert self.database.get_fit_file(path) is None
+
+    def test_list_pages(self):
+        """Test that keyset pages cover every file once, newest first."""
+        self.catalog.reconcile(self.fit_dir)
+
+        first, token = self.database.list_fit_files(limit=2)
+        assert [entry['filename'] for entry in first] == SAMPLE_FILES[::-1][:2]
+        second, token_after = self.database.list_fit_files(limit=2, page_token=token)
+        assert [entry['filename'] for entry in second] == SAMPLE_FILES[:1]
+        assert token_after is None
+
+        with pytest.raises(ValueError):
+            self.database.list_fit_files(page_token='not-a-token')
+
+    def test_conversion_catalogs_file(self):
+        """Test that converting a workout catalogs its file with the workout ID."""
+        device_id = self.database.add_device("00:11:22:33:44:55", "Test Rogue Bike", "bike")
+        workout_id = self.database.start_workout(device_id, "bike")
+        start = datetime(2024, 5, 1, 7, 0)
+        self.database.add_workout_data_batch([
+            (workout_id, start + timedelta(seconds=second),
+             {'instant_power': 150, 'instant_cadence': 85, 'heart_rate': 130,
+              'instant_speed': 28.0, 'total_distance': second * 8})
+            for second in range(120)
+        ])
+        self.database.end_workout(workout_id, summary={'total_distance': 960})
+        assert self.database.get_storage_totals()['workouts']['item_count'] == 1
+
+        processor = FITProcessor(self.database.db_path, self.fit_dir)
+        try:
+            path = processor.process_workout(workout_id)
+        finally:
+            processor.database.close()
+
+        entry = self.database.get_fit_file(path)
+        assert entry['workout_id'] == workout_id
+        assert entry['size'] == os.path.getsize(path)
+
+        # A later reconciliation keeps the workout of an unchanged file
+        self.catalog.reconcile(self.fit_dir)
+        assert self.database.get_fit_file(path)['workout_id'] == workout_id
+
+        assert self.database.delete_workout(workout_id)
+        assert self.database.get_fit_file(path)['workout_id'] is None
+        assert self.database.get_storage_totals()['workouts']['item_count'] == 0
+
+    def test_reconciler_thread(self):
+        """Test that the background reconciler catalogs the directory on start."""
+        reconciler = FITCatalogReconciler(self.catalog, self.fit_dir, interval=60)
+        reconciler.start()
+        try:
+            deadline = time.monotonic() + 10
+            while reconciler.last_stats is None and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            reconciler.stop()
+
+        assert reconciler.last_stats['added'] == 3
+        assert not reconciler.is_running
+        assert self.totals()['item_count'] == 3
@@ -61,6 +61,7 @@ class TestFITConverter:
         with patch('src.fit.fit_converter.FitFileBuilder') as mock_builder:
             mock_instance = Mock()
             mock_builder.return_value = mock_instance
+            self.fit_converter.use_record_encoder = False
             mock_fit_file = Mock()
             mock_instance.build.return_value = mock_fit_file
             
@@ -81,6 +82,7 @@ class TestFITConverter:
         with patch('src.fit.fit_converter.FitFileBuilder') as mock_builder:
             mock_instance = Mock()
             mock_builder.return_value = mock_instance
+            self.fit_converter.use_record_encoder = False
             mock_fit_file = Mock()
             mock_instance.build.return_value = mock_fit_file
             
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the struct based FIT record encoder.
+"""
+
+import io
+import os
+import sys
+import random
+import shutil
+import tempfile
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from fit_tool.fit_file import FitFile
+from fit_tool.fit_file_builder import FitFileBuilder
+from fit_tool.profile.messages.record_message import RecordMessage
+from fit_tool.utils.crc import crc16 as fit_tool_crc16
+
+from src.fit.fit_converter import FITConverter
+from src.fit.fit_record_encoder import RecordEncoder, crc16, crc16_combine, write_fit_file
+
+
+def _build_with_fit_tool(columns):
+    """Encode record columns the way the converter did before the encoder."""
+    builder = FitFileBuilder(auto_define=True)
+    names = list(columns)
+    for values in zip(*columns.values()):
+        record = RecordMessage()
+        for name, value in zip(names, values):
+            if value is not None:
+                setattr(record, name, value)
+        builder.add(record)
+    return builder.build().to_bytes()
+
+
+def _write(columns):
+    buffer = io.BytesIO()
+    written = write_fit_file(buffer, b'', columns, b'')
+    assert written == len(buffer.getvalue())
+    return buffer.getvalue()
+
+
+class TestFitRecordEncoder:
+    """Test cases for RecordEncoder and write_fit_file."""
+
+    def setup_method(self):
+        self.columns = {
+            'timestamp': [1714546800000 + s * 1000 for s in range(120)],
+            'heart_rate': [130 + s % 20 for s in range(120)],
+            'cadence': [85 for _ in range(120)],
+            'distance': [s * 8.333 for s in range(120)],
+            'speed': [30.0 / 3.6 for _ in range(120)],
+            'enhanced_speed': [30.0 / 3.6 for _ in range(120)],
+            'power': [150 + s % 40 for s in range(120)],
+        }
+
+    def test_crc_matches_fit_tool(self):
+        """Test that the table CRC equals fit_tool's nibble CRC, also when chained."""
+        data = bytes(random.Random(7).randrange(256) for _ in range(4096))
+        assert crc16(data) == fit_tool_crc16(data)
+        assert crc16(data[2048:], crc16(data[:2048])) == fit_tool_crc16(data)
+
+    def test_crc_combine(self):
+        """Test that combining the CRCs of two blocks gives the CRC of both."""
+        data = bytes(random.Random(3).randrange(256) for _ in range(5000))
+        for split in (0, 1, 12, 4999):
+            assert crc16_combine(crc16(data[:split]), crc16(data[split:]), len(data) - split) == crc16(data)
+
+    def test_continued_encoding_skips_definition(self):
+        """Test that records encoded in pieces equal the records encoded at once."""
+        first = {name: values[:50] for name, values in self.columns.items()}
+        second = {name: values[50:] for name, values in self.columns.items()}
+
+        head = RecordEncoder(first)
+        rest = RecordEncoder(second, previous_mask=head.last_mask)
+
+        assert rest.definition_count == 0
+        assert head.encode() + rest.encode() == RecordEncoder(self.columns).encode()
+        assert head.size + rest.size == RecordEncoder(self.columns).size
+
+    def test_single_definition_for_complete_samples(self):
+        """Test that complete samples share one definition and match fit_tool byte for byte."""
+        encoder = RecordEncoder(self.columns)
+        assert encoder.definition_count == 1
+        assert _write(self.columns) == _build_with_fit_tool(self.columns)
+
+    def test_gaps_match_fit_tool(self):
+        """Test that samples missing fields encode as fit_tool encodes them."""
+        self.columns['power'][5] = None
+        self.columns['heart_rate'][40:60] = [None] * 20
+        self.columns['cadence'] = [None] * 120
+
+        encoder = RecordEncoder(self.columns)
+        assert encoder.definition_count == 5
+        assert _write(self.columns) == _build_with_fit_tool(self.columns)
+
+    def test_decodes_to_same_values(self):
+        """Test that fit_tool reads back the values that were encoded."""
+        decoded = FitFile.from_bytes(_write(self.columns))
+        records = [r.message for r in decoded.records if isinstance(r.message, RecordMessage)]
+
+        assert len(records) == 120
+        assert records[10].timestamp == self.columns['timestamp'][10]
+        assert records[10].power == 160
+        assert records[10].distance == pytest.approx(83.33, abs=0.01)
+        assert records[10].speed == pytest.approx(30.0 / 3.6, abs=0.001)
+
+    def test_rejects_mismatched_columns(self):
+        """Test that columns of different lengths and unknown fields are refused."""
+        self.columns['power'] = self.columns['power'][:10]
+        with pytest.raises(ValueError):
+            RecordEncoder(self.columns)
+        with pytest.raises(ValueError):
+            RecordEncoder({'timestamp': [1714546800000], 'altitude': [12.0]})
+
+
+class TestConverterRecordPaths:
+    """Test that the converter writes the same file on both record paths."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        start = datetime(2024, 5, 1, 7, 0, 0, 250000, tzinfo=timezone.utc)
+        self.workout = {
+            "workout_type": "bike",
+            "total_duration": 300.0,
+            "total_distance": 2500.0,
+            "avg_power": 160,
+            "data_series": {
+                "absolute_timestamps": [(start + timedelta(seconds=s)).isoformat() for s in range(300)],
+                "powers": [None if s % 11 == 0 else 150 + s % 30 for s in range(300)],
+                "heart_rates": [140 for _ in range(300)],
+                "cadences": [88 for _ in range(300)],
+                "speeds": [30.0 + s % 5 for s in range(300)],
+                "distances": [s * 8.3 for s in range(300)]
+            }
+        }
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _convert(self, use_record_encoder):
+        converter = FITConverter(os.path.join(self.temp_dir, str(use_record_encoder)),
+                                 use_record_encoder=use_record_encoder)
+        workout = dict(self.workout, data_series=dict(self.workout['data_series']))
+        fit_file_path = converter.convert_workout(workout)
+        assert fit_file_path is not None
+        with open(fit_file_path, 'rb') as f:
+            return f.read()
+
+    def test_record_encoder_matches_fit_tool_path(self):
+        """Test that the fast path output is byte-identical to the fit_tool path."""
+        assert self._convert(True) == self._convert(False)
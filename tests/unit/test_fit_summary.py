@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the FIT summary reader.
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from fit_tool.fit_file import FitFile
+from fit_tool.fit_file_builder import FitFileBuilder
+from fit_tool.profile.messages.activity_message import ActivityMessage
+from fit_tool.profile.messages.event_message import EventMessage
+from fit_tool.profile.messages.file_id_message import FileIdMessage
+from fit_tool.profile.messages.record_message import RecordMessage
+from fit_tool.profile.messages.session_message import SessionMessage
+from fit_tool.profile.profile_type import FileType, Manufacturer, Sport, SubSport
+
+from src.fit.fit_summary import read_fit_summary, read_fit_summary_bytes
+
+FIT_FILES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../fit_files'))
+SAMPLE_FILES = sorted(name for name in os.listdir(FIT_FILES_DIR) if name.endswith('.fit'))
+START_MS = 1714546800000
+
+
+def build_activity(records=120):
+    """Build a small cycling activity with fit_tool."""
+    file_id = FileIdMessage()
+    file_id.type = FileType.ACTIVITY
+    file_id.manufacturer = Manufacturer.DEVELOPMENT.value
+    file_id.product = 7
+    file_id.serial_number = 123456
+    file_id.time_created = START_MS
+
+    messages = [file_id]
+    for second in range(records):
+        record = RecordMessage()
+        record.timestamp = START_MS + second * 1000
+        record.power = 150 + second % 20
+        record.heart_rate = 130
+        messages.append(record)
+        if second == records // 2:
+            event = EventMessage()
+            event.timestamp = record.timestamp
+            messages.append(event)
+
+    session = SessionMessage()
+    session.timestamp = START_MS + records * 1000
+    session.start_time = START_MS
+    session.total_elapsed_time = records
+    session.total_timer_time = records - 5
+    session.total_distance = 960.5
+    session.total_calories = 42
+    session.sport = Sport.CYCLING
+    session.sub_sport = SubSport.INDOOR_CYCLING
+    session.avg_power = 159
+    session.max_power = 169
+    session.avg_heart_rate = 130
+    session.enhanced_avg_speed = 7.5
+    activity = ActivityMessage()
+    activity.timestamp = START_MS + records * 1000
+    activity.num_sessions = 1
+
+    builder = FitFileBuilder(auto_define=True)
+    builder.add_all(messages + [session, activity])
+    return builder.build().to_bytes()
+
+
+class TestFITSummary:
+    """Test cases for read_fit_summary."""
+
+    def test_reads_summary_fields(self):
+        """Test that the summary messages are decoded and scaled."""
+        summary = read_fit_summary_bytes(build_activity(), 'activity.fit')
+
+        assert summary.file_path == 'activity.fit'
+        assert summary.file_type == FileType.ACTIVITY.value
+        assert summary.manufacturer == Manufacturer.DEVELOPMENT.value
+        assert summary.product == 7
+        assert summary.serial_number == 123456
+        assert summary.time_created == datetime.fromtimestamp(START_MS / 1000, timezone.utc)
+        assert summary.sport == Sport.CYCLING.value
+        assert summary.sub_sport == SubSport.INDOOR_CYCLING.value
+        assert summary.start_time == datetime.fromtimestamp(START_MS / 1000, timezone.utc)
+        assert summary.end_time == datetime.fromtimestamp(START_MS / 1000 + 120, timezone.utc)
+        assert summary.duration_seconds == 120
+        assert summary.total_timer_time == 115
+        assert summary.total_distance == pytest.approx(960.5)
+        assert summary.total_calories == 42
+        assert summary.avg_power == 159
+        assert summary.max_power == 169
+        assert summary.avg_speed == pytest.approx(7.5)
+        # Fields the session does not carry
+        assert summary.max_speed is None
+        assert summary.avg_cadence is None
+        assert summary.session_count == 1
+        assert summary.record_count == 120
+        # file_id, records, event, session and activity
+        assert summary.message_count == 124
+
+    @pytest.mark.parametrize('name', SAMPLE_FILES)
+    def test_matches_full_decode(self, name):
+        """Test that the repository's FIT files summarize as fit_tool decodes them."""
+        path = os.path.join(FIT_FILES_DIR, name)
+        summary = read_fit_summary(path)
+        messages = [record.message for record in FitFile.from_file(path).records if not record.is_definition]
+        sessions = [message for message in messages if message.NAME == 'session']
+
+        assert summary.file_size_bytes == os.path.getsize(path)
+        assert summary.message_count == len(messages)
+        assert summary.record_count == sum(1 for message in messages if message.NAME == 'record')
+        assert summary.session_count == len(sessions)
+        if sessions:
+            session = sessions[0]
+            assert summary.sport == session.sport
+            assert summary.total_elapsed_time == pytest.approx(session.total_elapsed_time)
+            assert summary.total_distance == pytest.approx(session.total_distance)
+            assert summary.avg_power == session.avg_power
+            assert summary.start_time.timestamp() * 1000 == pytest.approx(session.start_time)
+
+    def test_to_dict_is_json_friendly(self):
+        """Test that the dictionary form serializes and carries the duration."""
+        summary = read_fit_summary_bytes(build_activity()).to_dict()
+
+        assert summary['start_time'] == '2024-05-01T07:00:00+00:00'
+        assert summary['duration_seconds'] == 120
+        json.dumps(summary)
+
+    def test_malformed_data(self):
+        """Test that non-FIT and truncated data raise ValueError."""
+        data = build_activity()
+
+        with pytest.raises(ValueError):
+            read_fit_summary_bytes(b'not a fit file')
+        with pytest.raises(ValueError):
+            read_fit_summary_bytes(data[:len(data) // 2])
+
+        # Data size cutting a message in two
+        truncated = bytearray(data)
+        truncated[4:8] = (len(data) - 20).to_bytes(4, 'little')
+        with pytest.raises(ValueError):
+            read_fit_summary_bytes(bytes(truncated))
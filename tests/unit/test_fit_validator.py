@@ -7,11 +7,50 @@ import os
 import tempfile
 import logging
 from unittest.mock import Mock, patch, MagicMock
+from fit_tool.fit_file_builder import FitFileBuilder
+from fit_tool.profile.messages.activity_message import ActivityMessage
+from fit_tool.profile.messages.device_info_message import DeviceInfoMessage
+from fit_tool.profile.messages.file_id_message import FileIdMessage
+from fit_tool.profile.messages.record_message import RecordMessage
+from fit_tool.profile.messages.session_message import SessionMessage
+from fit_tool.profile.profile_type import FileType, Manufacturer, Sport
+
+from src.fit.fit_record_encoder import iter_record_views
 from src.fit.fit_validator import (
     FITValidator, ValidationSeverity, ValidationIssue, ValidationResult,
-    validate_fit_file, print_validation_report
+    data_messages, validate_fit_bytes, validate_fit_file, validate_fit_messages, print_validation_report
 )
 
+def build_activity_messages(start_ms, records=20):
+    """Build the messages of a small activity with one out of order and one out of range record"""
+    file_id = FileIdMessage()
+    file_id.type = FileType.ACTIVITY
+    file_id.manufacturer = Manufacturer.DEVELOPMENT.value
+    file_id.product = 1
+    file_id.time_created = start_ms
+    
+    device_info = DeviceInfoMessage()
+    device_info.timestamp = start_ms
+    device_info.manufacturer = Manufacturer.DEVELOPMENT.value
+    
+    messages = [file_id, device_info]
+    for second in range(records):
+        record = RecordMessage()
+        record.timestamp = start_ms + (second if second != 5 else 2) * 1000
+        record.power = 2500 if second == 7 else 150
+        record.heart_rate = 130
+        messages.append(record)
+    
+    session = SessionMessage()
+    session.timestamp = start_ms + records * 1000
+    session.start_time = start_ms
+    session.total_elapsed_time = records
+    session.sport = Sport.CYCLING
+    activity = ActivityMessage()
+    activity.timestamp = start_ms + records * 1000
+    activity.type = 0
+    return messages + [session, activity]
+
 # Configure logging for tests
 logging.basicConfig(level=logging.DEBUG)
 
@@ -219,6 +258,77 @@ class TestFITValidator:
         warning_messages = [i.message for i in warning_issues]
         assert any("DeviceInfoMessage" in msg for msg in warning_messages)
 
+    def test_single_pass_matches_separate_checks(self):
+        """Test that the single pass finds the same issues as the separate checks"""
+        messages = build_activity_messages(1234567890000)
+        message_counts = {}
+        for message in messages:
+            key = f"{message.NAME}_message"
+            message_counts[key] = message_counts.get(key, 0) + 1
+        
+        expected = (self.validator._validate_message_completeness(message_counts)
+                    + self.validator._validate_messages(messages)
+                    + self.validator._validate_message_sequence(messages)
+                    + self.validator._validate_field_ranges(messages)
+                    + self.validator._validate_timestamps(messages)
+                    + self.validator._validate_garmin_compatibility(messages))
+        issues, counts, total = self.validator._validate_single_pass(iter(messages))
+        
+        assert counts == message_counts
+        assert total == len(messages)
+        assert [(i.severity, i.message) for i in issues] == [(i.severity, i.message) for i in expected]
+        assert any("not in ascending order at position 5" in i.message for i in issues)
+        assert any(i.field_name == 'power' and i.actual_value == 2500 for i in issues)
+    
+    def test_validate_fit_bytes(self):
+        """Test validation of an encoded FIT file held in memory"""
+        builder = FitFileBuilder(auto_define=True)
+        builder.add_all(build_activity_messages(1234567890000))
+        data = builder.build().to_bytes()
+        
+        result = validate_fit_bytes(data)
+        
+        assert result.is_valid
+        assert result.file_size_bytes == len(data)
+        assert result.message_counts['record_message'] == 20
+        assert result.message_counts['file_id_message'] == 1
+        
+        with tempfile.NamedTemporaryFile(suffix='.fit', delete=False) as tmp_file:
+            tmp_file.write(data)
+            tmp_path = tmp_file.name
+        try:
+            from_disk = self.validator.validate_fit_file(tmp_path)
+        finally:
+            os.unlink(tmp_path)
+        assert [i.message for i in from_disk.issues] == [i.message for i in result.issues]
+    
+    def test_validate_fit_bytes_unparsable(self):
+        """Test that bytes that are not a FIT file fail validation"""
+        result = self.validator.validate_fit_bytes(b"not a fit file")
+        
+        assert not result.is_valid
+        assert "Failed to parse" in result.issues[0].message
+    
+    def test_validate_messages_with_record_views(self):
+        """Test validation of builder messages around records kept as columns"""
+        messages = build_activity_messages(1234567890000, records=0)
+        builder = FitFileBuilder(auto_define=True)
+        builder.add_all(messages[:2])
+        columns = {
+            'timestamp': [1234567890000 + second * 1000 for second in range(30)],
+            'power': [150] * 29 + [None],
+            'heart_rate': [None] * 30,
+            'speed': [8.0] * 30
+        }
+        
+        result = validate_fit_messages(
+            list(data_messages(builder.records)) + list(iter_record_views(columns)) + messages[2:])
+        
+        assert result.is_valid
+        assert result.total_messages == 34
+        assert result.message_counts['record_message'] == 30
+        assert not any("No power or heart rate" in i.message for i in result.issues)
+
 class TestValidationUtilities:
     """Test utility functions"""
     
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the background job queue.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.database import Database
+from src.data.job_queue import (
+    JobQueue, JOB_PROGRESS, JOB_COMPLETED, JOB_FAILED_EVENT, JOB_SUCCEEDED, JOB_FAILED, JOB_QUEUED
+)
+
+
+class TestJobQueue:
+    """Test cases for JobQueue and the Database job methods."""
+
+    def setup_method(self):
+        """Set up a job queue on a temporary database."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.database = Database(os.path.join(self.temp_dir, 'test_jobs.db'))
+        self.queue = JobQueue(self.database)
+        self.events = []
+        self.finished = threading.Event()
+        self.queue.register_callback(self._record_event)
+
+    def teardown_method(self):
+        """Stop the workers and remove the database."""
+        self.queue.stop()
+        self.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _record_event(self, event, job):
+        self.events.append((event, job))
+        if event in (JOB_COMPLETED, JOB_FAILED_EVENT):
+            self.finished.set()
+
+    def test_job_runs_in_background(self):
+        """Test that a submitted job runs on a worker and records its result."""
+        def handler(job, report):
+            report(0.5, 'Halfway')
+            return {'answer': job['params']['value'] * 2}
+
+        self.queue.register_handler('double', handler)
+        job_id = self.queue.submit('double', params={'value': 21})
+
+        job = self.queue.wait(job_id, timeout=5)
+        assert job['status'] == JOB_SUCCEEDED
+        assert job['result'] == {'answer': 42}
+        assert job['progress'] == 1.0
+        assert job['attempts'] == 1
+        assert job['started_at'] and job['finished_at']
+
+        assert self.finished.wait(5)
+        events = [event for event, _ in self.events]
+        assert events == [JOB_PROGRESS, JOB_COMPLETED]
+        assert self.events[0][1]['message'] == 'Halfway'
+
+    def test_failed_job_records_error(self):
+        """Test that an exception in the handler fails the job."""
+        def handler(job, report):
+            raise RuntimeError('no samples')
+
+        self.queue.register_handler('broken', handler)
+        job = self.queue.wait(self.queue.submit('broken', workout_id=7), timeout=5)
+
+        assert job['status'] == JOB_FAILED
+        assert job['error'] == 'no samples'
+        assert self.finished.wait(5)
+        assert self.events[-1][0] == JOB_FAILED_EVENT
+
+    def test_pending_job_reused_for_workout(self):
+        """Test that resubmitting for a workout returns the unfinished job."""
+        release = threading.Event()
+        self.queue.register_handler('slow', lambda job, report: release.wait(5) and {})
+
+        first = self.queue.submit('slow', workout_id=3)
+        assert self.queue.submit('slow', workout_id=3) == first
+        assert self.queue.submit('slow', workout_id=4) != first
+
+        release.set()
+        assert self.queue.wait(first, timeout=5)['status'] == JOB_SUCCEEDED
+        assert self.queue.submit('slow', workout_id=3) != first
+
+    def test_unknown_kind_is_rejected(self):
+        """Test that jobs without a handler are not queued."""
+        assert self.queue.submit('missing') is None
+
+    def test_interrupted_jobs_resume_on_start(self):
+        """Test that a job left running by a previous process is run again."""
+        job_id = self.database.create_job('resume', workout_id=1)
+        claimed = self.database.claim_next_job(['resume'])
+        assert claimed['id'] == job_id
+        assert self.database.claim_next_job(['resume']) is None
+
+        self.queue.register_handler('resume', lambda job, report: {'attempt': job['attempts']})
+        self.queue.start()
+
+        job = self.queue.wait(job_id, timeout=5)
+        assert job['status'] == JOB_SUCCEEDED
+        assert job['result'] == {'attempt': 2}
+
+    def test_running_jobs_of_live_workers_are_left_alone(self):
+        """Test that start only re-queues jobs whose worker is gone."""
+        live_id = self.database.create_job('resume', workout_id=1)
+        self.database.claim_next_job(['resume'], 'other-host:1234:aaaa')
+        stale_id = self.database.create_job('resume', workout_id=2)
+        self.database.claim_next_job(['resume'], 'other-host:1234:bbbb')
+        self.database.heartbeat_jobs('other-host:1234:aaaa')
+        conn = self.database._get_connection()
+        conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 3600, stale_id))
+        conn.commit()
+
+        self.queue.register_handler('resume', lambda job, report: {'attempt': job['attempts']})
+        self.queue.start()
+
+        assert self.queue.wait(stale_id, timeout=5)['result'] == {'attempt': 2}
+        live = self.database.get_job(live_id)
+        assert live['status'] == 'running'
+        assert live['worker_id'] == 'other-host:1234:aaaa'
+
+    def test_jobs_of_exited_local_process_are_requeued(self):
+        """Test that a fresh heartbeat does not keep a job of an exited process."""
+        self.queue.register_handler('resume', lambda job, report: None)
+        job_id = self.database.create_job('resume')
+        self.database.claim_next_job(['resume'], f'{self.queue.worker_id.split(":")[0]}:999999999:cccc')
+
+        assert self.queue.requeue_abandoned_jobs() == 1
+        job = self.database.get_job(job_id)
+        assert job['status'] == JOB_QUEUED
+        assert job['worker_id'] is None
+
+    def test_claim_records_worker(self):
+        """Test that workers claim jobs under their ID and keep them alive."""
+        release = threading.Event()
+        self.queue.register_handler('slow', lambda job, report: release.wait(5) and None)
+        job_id = self.queue.submit('slow')
+        deadline = time.monotonic() + 5
+        while self.database.get_job(job_id)['status'] != 'running' and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        job = self.database.get_job(job_id)
+        assert job['worker_id'] == self.queue.worker_id
+        assert job['heartbeat_at'] <= time.time()
+        assert self.queue.requeue_abandoned_jobs() == 0
+
+        release.set()
+        assert self.queue.wait(job_id, timeout=5)['status'] == JOB_SUCCEEDED
+
+    def test_job_taken_over_keeps_new_owner(self):
+        """Test that a worker whose job was claimed by another records and announces nothing."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def handler(job, report):
+            started.set()
+            release.wait(5)
+            report(0.5, 'Late')
+            return {'stale': True}
+
+        self.queue.register_handler('slow', handler)
+        job_id = self.queue.submit('slow')
+        assert started.wait(5)
+
+        # Requeued behind this worker's back and claimed by another one
+        conn = self.database._get_connection()
+        conn.execute("UPDATE jobs SET status = 'queued', worker_id = NULL WHERE id = ?", (job_id,))
+        conn.commit()
+        assert self.database.claim_next_job(['slow'], 'other-host:1234:dddd')['id'] == job_id
+
+        with patch.object(self.database, 'finish_job', wraps=self.database.finish_job) as finish_job:
+            release.set()
+            deadline = time.monotonic() + 5
+            while not finish_job.call_count and time.monotonic() < deadline:
+                time.sleep(0.01)
+        time.sleep(0.05)
+
+        job = self.database.get_job(job_id)
+        assert job['status'] == 'running'
+        assert job['worker_id'] == 'other-host:1234:dddd'
+        assert job['result'] is None and job['message'] is None
+        assert self.events == []
+
+        assert self.database.finish_job(job_id, 'other-host:1234:dddd', result={'fresh': True})
+        assert self.database.get_job(job_id)['result'] == {'fresh': True}
+
+    def test_claim_respects_kinds(self):
+        """Test that workers only claim jobs they have handlers for."""
+        job_id = self.database.create_job('other')
+        assert self.database.claim_next_job(['fit_file']) is None
+        assert self.database.get_job(job_id)['status'] == JOB_QUEUED
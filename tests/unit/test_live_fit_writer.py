@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the live FIT writer and partial file recovery.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from fit_tool.fit_file import FitFile
+from fit_tool.profile.messages.record_message import RecordMessage
+from fit_tool.profile.messages.session_message import SessionMessage
+
+from src.fit.fit_converter import FITConverter
+from src.fit.fit_record_encoder import crc16
+from src.fit.live_fit_writer import LiveFitWriter, recover_partial_fit_file
+
+START = datetime(2024, 5, 1, 7, 0, 0)
+
+
+def _sample(second):
+    return {'instant_power': 150 + second % 30, 'instant_cadence': 85, 'heart_rate': 130 + second % 10,
+            'instant_speed': 28.8, 'total_distance': second * 8}
+
+
+class TestLiveFitWriter:
+    """Test cases for LiveFitWriter and recover_partial_fit_file."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.converter = FITConverter(self.temp_dir)
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, samples, flush_samples=10):
+        writer = LiveFitWriter(self.converter, 'bike', START, flush_samples=flush_samples)
+        assert writer.open()
+        for second in range(samples):
+            writer.add_sample(START + timedelta(seconds=second), _sample(second))
+        return writer
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        # The trailing CRC makes the CRC of the whole file zero
+        assert crc16(data) == 0
+        messages = [record.message for record in FitFile.from_bytes(data).records]
+        return [m for m in messages if isinstance(m, RecordMessage)], messages
+
+    def test_finish_writes_complete_file(self):
+        """Test that finishing appends the closing messages and renames the file."""
+        writer = self._write(45)
+        assert os.path.exists(writer.partial_path)
+
+        path = writer.finish({'total_distance': 352, 'avg_power': 165, 'max_power': 179},
+                             end_time=START + timedelta(seconds=45))
+
+        assert path == os.path.join(self.temp_dir, 'bike_20240501_070000.fit')
+        assert not os.path.exists(writer.partial_path)
+        records, messages = self._read(path)
+        assert len(records) == 45
+        assert records[44].power == 150 + 44 % 30
+        assert records[44].distance == pytest.approx(352.0)
+        session = [m for m in messages if isinstance(m, SessionMessage)][0]
+        assert session.avg_power == 165
+        assert session.total_elapsed_time == pytest.approx(45.0)
+
+    def test_chunks_do_not_repeat_definitions(self):
+        """Test that the chunk size does not change the file."""
+        paths = []
+        for flush_samples, name in ((7, 'chunked'), (1000, 'whole')):
+            self.converter = FITConverter(os.path.join(self.temp_dir, name))
+            writer = self._write(40, flush_samples=flush_samples)
+            paths.append(writer.finish({}, end_time=START + timedelta(seconds=40)))
+
+        with open(paths[0], 'rb') as chunked, open(paths[1], 'rb') as whole:
+            assert chunked.read() == whole.read()
+
+    def test_recover_torn_partial_file(self):
+        """Test that a partial file cut mid-record is finished with the flushed records."""
+        writer = self._write(25)
+        writer.abort()
+        with open(writer.partial_path, 'ab') as f:
+            f.write(b'\x00\x01\x02')
+
+        path = recover_partial_fit_file(writer.partial_path, self.converter)
+
+        assert path == writer.path
+        assert not os.path.exists(writer.partial_path)
+        records, messages = self._read(path)
+        assert len(records) == 20
+        session = [m for m in messages if isinstance(m, SessionMessage)][0]
+        assert session.max_power == max(150 + s % 30 for s in range(20))
+        assert session.total_distance == pytest.approx(19 * 8)
+
+    def test_recover_without_records(self):
+        """Test that a partial file without records is not recovered."""
+        writer = self._write(5)
+        writer.abort()
+        assert recover_partial_fit_file(writer.partial_path, self.converter) is None
+        assert os.path.exists(writer.partial_path)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the live event publisher.
+"""
+
+import os
+import sys
+import json
+import threading
+from datetime import datetime
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.live_publisher import LivePublisher, encode_event, normalize_live_sample
+
+
+def parse_frame(frame):
+    """Split an SSE frame into its event name and decoded payload."""
+    fields = dict(line.split(': ', 1) for line in frame.decode('utf-8').strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+class TestLivePublisher:
+    """Test cases for LivePublisher and Subscription."""
+    
+    def setup_method(self):
+        """Set up a publisher with small queues."""
+        self.publisher = LivePublisher(queue_size=4)
+    
+    def test_frame_encoded_once_for_all_subscribers(self):
+        """Test that every subscriber receives the same frame bytes."""
+        first = self.publisher.subscribe()
+        second = self.publisher.subscribe()
+        
+        assert self.publisher.publish('sample', {'power': 150}) == 2
+        frame = first.get(timeout=0)
+        assert frame is second.get(timeout=0)
+        assert parse_frame(frame) == ('sample', {'power': 150})
+        assert frame.startswith(b'id: 1\n')
+    
+    def test_full_queue_drops_oldest(self):
+        """Test that a slow subscriber keeps only the newest frames."""
+        subscription = self.publisher.subscribe()
+        for power in range(10):
+            self.publisher.publish('sample', {'power': power})
+        
+        received = []
+        while (frame := subscription.get(timeout=0)) is not None:
+            received.append(parse_frame(frame)[1]['power'])
+        assert received == [6, 7, 8, 9]
+        assert subscription.dropped == 6
+    
+    def test_retained_state_replayed_to_new_subscribers(self):
+        """Test that late subscribers start from the retained state, not the last delta."""
+        self.publisher.publish('summary', {'avg_power': 150, 'max_power': 200},
+                               retain={'avg_power': 150, 'max_power': 200})
+        self.publisher.publish('summary', {'avg_power': 155},
+                               retain={'avg_power': 155, 'max_power': 200})
+        
+        subscription = self.publisher.subscribe()
+        assert parse_frame(subscription.get(timeout=0)) == ('summary', {'avg_power': 155, 'max_power': 200})
+        assert subscription.get(timeout=0) is None
+        
+        self.publisher.forget('summary')
+        assert self.publisher.subscribe().get(timeout=0) is None
+    
+    def test_no_subscribers(self):
+        """Test that publishing without subscribers is a no-op apart from retaining."""
+        assert self.publisher.publish('sample', {'power': 1}) == 0
+        assert self.publisher.subscriber_count == 0
+    
+    def test_close_wakes_reader(self):
+        """Test that closing a subscription ends a blocked get()."""
+        subscription = self.publisher.subscribe()
+        results = []
+        reader = threading.Thread(target=lambda: results.append(subscription.get(timeout=5)))
+        reader.start()
+        subscription.close()
+        reader.join(timeout=2)
+        
+        assert not reader.is_alive()
+        assert results == [None]
+        assert self.publisher.subscriber_count == 0
+        assert self.publisher.publish('sample', {'power': 1}) == 0
+
+
+class TestNormalizeLiveSample:
+    """Test cases for normalize_live_sample."""
+    
+    def test_derived_keys(self):
+        """Test that the dashboard keys are filled in from device-specific ones."""
+        data = {'instantaneous_power': 180, 'instantaneous_cadence': 90}
+        sample = normalize_live_sample(data, 'bike', 7)
+        
+        assert sample['power'] == 180
+        assert sample['instant_power'] == 180
+        assert sample['cadence'] == 90
+        assert sample['device_type'] == 'bike'
+        assert sample['workout_id'] == 7
+        assert 'power' not in data
+    
+    def test_rower_cadence_and_existing_keys(self):
+        """Test that existing keys win and stroke rate stands in for cadence."""
+        sample = normalize_live_sample({'power': 120, 'stroke_rate': 28, 'device_type': 'rower'}, 'bike')
+        
+        assert sample['power'] == 120
+        assert sample['cadence'] == 28
+        assert sample['device_type'] == 'rower'
+        assert 'workout_id' not in sample
+
+
+def test_encode_event_serializes_unknown_types():
+    """Test that payload values JSON cannot encode are sent as strings."""
+    frame = encode_event('status', {'when': datetime(2024, 1, 1, 12, 0)})
+    assert parse_frame(frame) == ('status', {'when': '2024-01-01 12:00:00'})
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the schema migrations module.
+
+Tests version tracking, ordered application of pending steps, idempotent
+re-runs and upgrading a database created by an older version.
+"""
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.database import Database
+from src.data.migrations import MIGRATIONS, Migration, apply_migrations, get_schema_version
+
+
+class TestMigrations:
+    """Test cases for apply_migrations and get_schema_version."""
+    
+    def setup_method(self):
+        """Set up a temporary database path."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test_migrations.db')
+    
+    def teardown_method(self):
+        """Clean up test fixtures after each test method."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _index_names(self, conn):
+        """Get the names of all explicitly created indexes."""
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+        return {row[0] for row in rows}
+    
+    def test_new_database_is_at_latest_version(self):
+        """Test that a new database has every migration applied."""
+        database = Database(self.db_path)
+        database.close()
+        
+        conn = sqlite3.connect(self.db_path)
+        assert get_schema_version(conn) == MIGRATIONS[-1].version
+        versions = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+        assert versions == [m.version for m in MIGRATIONS]
+        assert {'idx_workout_data_workout_timestamp', 'idx_workouts_start_time',
+                'idx_workouts_without_fit'} <= self._index_names(conn)
+        conn.close()
+    
+    def test_unversioned_database_is_upgraded(self):
+        """Test upgrading a database created before schema versioning."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE workouts (id INTEGER PRIMARY KEY AUTOINCREMENT, device_id INTEGER, "
+                     "start_time TEXT, end_time TEXT, duration INTEGER, workout_type TEXT, summary TEXT, "
+                     "fit_file_path TEXT, uploaded_to_garmin INTEGER DEFAULT 0)")
+        conn.execute("CREATE TABLE workout_data (id INTEGER PRIMARY KEY AUTOINCREMENT, workout_id INTEGER, "
+                     "timestamp TEXT, data TEXT)")
+        conn.commit()
+        assert get_schema_version(conn) == 0
+        
+        assert apply_migrations(conn) == MIGRATIONS[-1].version
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(workout_data)")}
+        assert {'power', 'heart_rate', 'field_flags', 'extras', 'data'} <= columns
+        conn.close()
+    
+    def test_summary_columns_backfilled(self):
+        """Test that existing workout summaries are copied into the summary columns."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE workouts (id INTEGER PRIMARY KEY AUTOINCREMENT, device_id INTEGER, "
+                     "start_time TEXT, end_time TEXT, duration INTEGER, workout_type TEXT, summary TEXT, "
+                     "fit_file_path TEXT, uploaded_to_garmin INTEGER DEFAULT 0)")
+        conn.execute("CREATE TABLE workout_data (id INTEGER PRIMARY KEY AUTOINCREMENT, workout_id INTEGER, "
+                     "timestamp TEXT, data TEXT)")
+        conn.execute("INSERT INTO workouts (summary) VALUES (?)",
+                     ('{"avg_power": 180, "total_distance": 12.5, "avg_cadence": 85}',))
+        conn.execute("INSERT INTO workouts (summary) VALUES ('not json')")
+        conn.commit()
+        
+        apply_migrations(conn)
+        
+        rows = conn.execute("SELECT avg_power, total_distance, max_power FROM workouts ORDER BY id").fetchall()
+        assert rows == [(180.0, 12.5, None), (None, None, None)]
+        assert {'idx_workouts_avg_power', 'idx_workouts_duration'} <= self._index_names(conn)
+        conn.close()
+    
+    def test_only_pending_steps_run(self):
+        """Test that applied steps are skipped and new steps run in version order."""
+        conn = sqlite3.connect(self.db_path)
+        calls = []
+        steps = [
+            Migration(2, "second", lambda cursor: calls.append(2)),
+            Migration(1, "first", lambda cursor: calls.append(1)),
+        ]
+        
+        assert apply_migrations(conn, steps) == 2
+        assert calls == [1, 2]
+        
+        steps.append(Migration(3, "third", lambda cursor: calls.append(3)))
+        assert apply_migrations(conn, steps) == 3
+        assert calls == [1, 2, 3]
+        conn.close()
+    
+    def test_failed_step_is_not_recorded(self):
+        """Test that a failing step raises and leaves the version unchanged."""
+        conn = sqlite3.connect(self.db_path)
+        
+        def broken(cursor):
+            cursor.execute("CREATE INDEX idx_missing ON no_such_table (id)")
+        
+        with pytest.raises(sqlite3.Error):
+            apply_migrations(conn, [Migration(1, "ok", lambda cursor: None), Migration(2, "broken", broken)])
+        
+        assert get_schema_version(conn) == 1
+        conn.close()
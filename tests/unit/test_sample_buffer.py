@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the array-backed live sample buffer.
+"""
+
+import os
+import sys
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.sample_buffer import SampleBuffer, SampleBufferView
+
+
+class TestSampleBuffer:
+    """Test cases for SampleBuffer and SampleBufferView."""
+    
+    def setup_method(self):
+        """Set up an empty buffer."""
+        self.buffer = SampleBuffer()
+        self.start = datetime(2024, 1, 1, 12, 0, 0)
+    
+    def test_samples_round_trip(self):
+        """Test that typed metrics come back with their original keys and types."""
+        sample = {'instantaneous_power': 150, 'heart_rate': 140, 'instant_cadence': 85.5,
+                  'instantaneous_speed': 25.37, 'total_distance': 1234.5}
+        self.buffer.append(sample, self.start, monotonic=100.0)
+        
+        restored = self.buffer[0]
+        timestamp = restored.pop('timestamp')
+        assert restored == sample
+        assert isinstance(restored['instantaneous_power'], int)
+        assert timestamp == self.start
+    
+    def test_untyped_keys_are_dropped(self):
+        """Test that only the canonical metrics are buffered."""
+        self.buffer.append({'power': 100, 'device_type': 'bike', 'note': 'x'}, self.start)
+        sample = self.buffer.latest()
+        assert sample['power'] == 100
+        assert 'device_type' not in sample
+        assert 'note' not in sample
+    
+    def test_monotonic_timestamps(self):
+        """Test that timestamps never go backwards and map onto the wall clock anchor."""
+        self.buffer.append({'power': 1}, self.start, monotonic=10.0)
+        self.buffer.append({'power': 2}, monotonic=12.5)
+        self.buffer.append({'power': 3}, monotonic=11.0)  # clock went backwards
+        
+        assert list(self.buffer.monotonic_times()) == [10.0, 12.5, 12.5]
+        assert self.buffer[1]['timestamp'] == self.start + timedelta(seconds=2.5)
+    
+    def test_columns_and_missing_values(self):
+        """Test column access, negative slicing and NaN for missing values."""
+        for i in range(5):
+            sample = {'power': 100 + i}
+            if i % 2 == 0:
+                sample['heart_rate'] = 120 + i
+            self.buffer.append(sample, self.start)
+        
+        assert list(self.buffer.column('power', -2)) == [103.0, 104.0]
+        heart_rates = self.buffer.column('heart_rate')
+        assert heart_rates[0] == 120.0
+        assert math.isnan(heart_rates[1])
+        assert 'heart_rate' not in self.buffer[1]
+    
+    def test_view_is_read_only_and_live(self):
+        """Test that a view reflects later appends but can't modify the buffer."""
+        view = self.buffer.view()
+        assert isinstance(view, SampleBufferView)
+        assert len(view) == 0
+        
+        self.buffer.append({'power': 200}, self.start)
+        assert len(view) == 1
+        assert view[-1]['power'] == 200
+        assert not hasattr(view, 'append')
+        assert not hasattr(view, 'clear')
+    
+    def test_max_samples_trims_oldest(self):
+        """Test that a bounded buffer keeps only recent samples."""
+        buffer = SampleBuffer(max_samples=100)
+        for i in range(1000):
+            buffer.append({'power': i}, self.start)
+        
+        assert 100 <= len(buffer) < 125
+        assert buffer.latest()['power'] == 999
+        assert buffer[0]['power'] == 1000 - len(buffer)
+    
+    def test_memory_per_sample(self):
+        """Test that a sample costs tens of bytes, not a dictionary."""
+        for i in range(10000):
+            self.buffer.append({'instantaneous_power': i % 400, 'heart_rate': 140,
+                                'instantaneous_cadence': 85, 'instantaneous_speed': 30.25,
+                                'total_distance': i * 8.4, 'total_energy': i // 10}, self.start)
+        
+        assert self.buffer.nbytes / len(self.buffer) < 100
+    
+    def test_too_many_columns(self):
+        """Test that column sets too wide for the field flags are rejected."""
+        columns = [(f'c{i}', 'f', (f'c{i}',)) for i in range(11)]
+        with pytest.raises(ValueError):
+            SampleBuffer(columns)
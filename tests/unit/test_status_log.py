@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the sequence-numbered status log.
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.status_log import StatusLog, merge_patch
+
+
+def apply_patch(target, patch):
+    """Apply a JSON Merge Patch the way a client does."""
+    result = dict(target)
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        elif isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = apply_patch(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+class TestMergePatch:
+    """Test cases for merge_patch."""
+    
+    def test_nested_changes_only(self):
+        """Test that only changed keys are sent, recursively."""
+        old = {'device_status': 'connected', 'latest_data': {'power': 150, 'cadence': 80}}
+        new = {'device_status': 'connected', 'latest_data': {'power': 155, 'cadence': 80}}
+        assert merge_patch(old, new) == {'latest_data': {'power': 155}}
+    
+    def test_added_and_removed_keys(self):
+        """Test that removed keys are sent as null and the patch round-trips."""
+        old = {'device_name': 'Echo Bike', 'latest_data': {'power': 150}}
+        new = {'device_name': 'Echo Rower', 'workout_active': True}
+        patch = merge_patch(old, new)
+        
+        assert patch == {'device_name': 'Echo Rower', 'workout_active': True, 'latest_data': None}
+        assert apply_patch(old, patch) == new
+    
+    def test_no_changes(self):
+        """Test that equal objects give an empty patch."""
+        assert merge_patch({'a': {'b': 1}}, {'a': {'b': 1}}) == {}
+
+
+class TestStatusLog:
+    """Test cases for StatusLog."""
+    
+    def setup_method(self):
+        """Set up a log with a short history."""
+        self.log = StatusLog(history=3)
+    
+    def test_unchanged_status_keeps_sequence(self):
+        """Test that recording an equal status does not create a version."""
+        seq = self.log.record({'device_status': 'connected'})
+        assert self.log.record({'device_status': 'connected'}) == seq
+        assert self.log.changes_since(seq) == (seq, None, False)
+    
+    def test_delta_since_older_version(self):
+        """Test that a client gets the combined changes since its version."""
+        first = self.log.record({'device_status': 'connected', 'workout_active': False})
+        self.log.record({'device_status': 'connected', 'workout_active': True})
+        latest = self.log.record({'device_status': 'connected', 'workout_active': True,
+                                  'latest_data': {'power': 150}})
+        
+        seq, changes, reset = self.log.changes_since(first)
+        assert (seq, reset) == (latest, False)
+        assert changes == {'workout_active': True, 'latest_data': {'power': 150}}
+    
+    def test_unknown_version_gets_full_status(self):
+        """Test that versions that left the log (or never existed) get a reset."""
+        first = self.log.record({'n': 0})
+        for n in range(1, 4):
+            self.log.record({'n': n})
+        
+        assert self.log.changes_since(first) == (first + 3, {'n': 3}, True)
+        assert self.log.changes_since(first + 100)[2] is True
+        assert self.log.changes_since(-1)[2] is True
+    
+    def test_sequence_survives_restart(self):
+        """Test that a new log numbers its versions after an older log's."""
+        seq = self.log.record({'n': 1})
+        time.sleep(0.01)
+        assert StatusLog().record({'n': 1}) > seq
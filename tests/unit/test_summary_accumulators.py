@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the streaming summary accumulators.
+
+The accumulators must give the same values as recomputing each statistic
+over the full list of samples.
+"""
+
+import os
+import sys
+import random
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.summary_accumulators import RunningStats, StreamingOutlierMean, NormalizedPower
+from src.data.data_processor import DataProcessor
+
+
+def reference_filtered_mean(values, sigma=2.0, min_samples=4):
+    """Outlier-filtered mean computed the way WorkoutManager used to."""
+    mean = sum(values) / len(values)
+    if len(values) <= min_samples:
+        return mean
+    std_dev = (sum((x - mean) ** 2 for x in values) / len(values)) ** 0.5
+    kept = [x for x in values if abs(x - mean) <= sigma * std_dev]
+    return sum(kept) / len(kept) if kept else mean
+
+
+class TestRunningStats:
+    """Test cases for RunningStats."""
+    
+    def test_empty(self):
+        """Test an accumulator with no values."""
+        stats = RunningStats()
+        assert stats.count == 0
+        assert stats.mean is None
+        assert stats.max is None
+        assert stats.variance == 0.0
+    
+    def test_matches_full_recomputation(self):
+        """Test mean, max and population variance against a full pass."""
+        rng = random.Random(42)
+        stats = RunningStats()
+        values = []
+        for _ in range(1000):
+            value = rng.uniform(0, 400)
+            values.append(value)
+            stats.add(value)
+        
+        mean = sum(values) / len(values)
+        variance = sum((x - mean) ** 2 for x in values) / len(values)
+        assert stats.count == 1000
+        assert stats.mean == pytest.approx(mean)
+        assert stats.max == max(values)
+        assert stats.variance == pytest.approx(variance)
+        assert stats.std_dev == pytest.approx(variance ** 0.5)
+
+
+class TestStreamingOutlierMean:
+    """Test cases for StreamingOutlierMean."""
+    
+    def test_small_sample_is_plain_mean(self):
+        """Test that the filter is not applied to four or fewer values."""
+        accumulator = StreamingOutlierMean()
+        for value in [25.0, 26.0, 24.0, 100.0]:
+            accumulator.add(value)
+        assert accumulator.filtered_stats() == (pytest.approx(43.75), 4)
+    
+    def test_outlier_removed(self):
+        """Test that a single outlier is left out of the mean."""
+        accumulator = StreamingOutlierMean()
+        for value in [25.0, 26.0, 24.0, 25.5, 100.0, 26.5, 24.5]:
+            accumulator.add(value)
+        mean, kept = accumulator.filtered_stats()
+        assert kept == 6
+        assert mean == pytest.approx(25.25)
+    
+    def test_identical_values(self):
+        """Test a zero standard deviation keeps every value."""
+        accumulator = StreamingOutlierMean()
+        for _ in range(10):
+            accumulator.add(30.0)
+        assert accumulator.filtered_stats() == (pytest.approx(30.0), 10)
+    
+    def test_matches_reference_after_every_sample(self):
+        """Test against the full recomputation for speeds on the 0.01 km/h grid."""
+        rng = random.Random(7)
+        accumulator = StreamingOutlierMean()
+        values = []
+        for i in range(500):
+            if i % 50 == 49:
+                value = round(rng.uniform(60, 120), 2)  # sensor glitch
+            else:
+                value = round(rng.gauss(28, 3), 2)
+            value = max(value, 0.01)
+            values.append(value)
+            accumulator.add(value)
+            assert accumulator.mean == pytest.approx(reference_filtered_mean(values))
+
+
+class TestNormalizedPower:
+    """Test cases for NormalizedPower."""
+    
+    def test_needs_full_window(self):
+        """Test that normalized power is 0 until 30 samples were added."""
+        accumulator = NormalizedPower()
+        for _ in range(29):
+            accumulator.add(200)
+        assert accumulator.value == 0
+        accumulator.add(200)
+        assert accumulator.value == pytest.approx(200.0)
+    
+    def test_matches_data_processor(self):
+        """Test against DataProcessor's full recomputation."""
+        rng = random.Random(3)
+        powers = [max(0, rng.gauss(180, 60)) for _ in range(600)]
+        accumulator = NormalizedPower()
+        for power in powers:
+            accumulator.add(power)
+        
+        expected = DataProcessor()._calculate_normalized_power(powers)
+        assert accumulator.value == pytest.approx(expected, abs=0.05)
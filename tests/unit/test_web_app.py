@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the web API: Web BLE batch ingest, conditional workout list
+requests and status deltas.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.web import app as web_app
+from src.data.status_log import StatusLog
+from src.data.workout_manager import WorkoutManager
+
+
+def sample(seq, t=None, **data):
+    """Build a Web BLE batch item."""
+    return {'seq': seq, 't': seq * 1000 if t is None else t, 'data': data or {'instant_power': 150 + seq}}
+
+
+class TestWebApp:
+    """Test cases for the Flask routes, on a temporary database."""
+
+    def setup_method(self):
+        """Point the app at a workout manager on a temporary database."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.workout_manager = WorkoutManager(os.path.join(self.temp_dir, 'test_web_app.db'), write_behind=False)
+        self.patches = [
+            patch.object(web_app, 'workout_manager', self.workout_manager),
+            patch.object(web_app, 'status_log', StatusLog()),
+            patch.dict(web_app.web_ble_state, {
+                'active': True,
+                'device': {'id': 'web-ble-test', 'name': 'Test Rogue Bike'},
+                'workout_id': None,
+                'last_data': None,
+                'last_seen_ts': None,
+                'last_seq': None,
+                'last_sample_time': None
+            })
+        ]
+        for active_patch in self.patches:
+            active_patch.start()
+        web_app.app.config['TESTING'] = True
+        self.client = web_app.app.test_client()
+
+    def teardown_method(self):
+        """Restore the app and remove the database."""
+        for active_patch in reversed(self.patches):
+            active_patch.stop()
+        self.workout_manager.job_queue.stop()
+        self.workout_manager.database.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def ingest(self, items, sent_at=None):
+        """Post a Web BLE batch and return the decoded response."""
+        payload = {'samples': items}
+        if sent_at is not None:
+            payload['sent_at'] = sent_at
+        response = self.client.post('/api/webble/ingest/batch', json=payload)
+        assert response.status_code == 200
+        return response.get_json()
+
+    def stored_samples(self):
+        """Samples stored for the Web BLE workout."""
+        return self.workout_manager.database.get_workout_data(self.workout_manager.active_workout_id)
+
+    @staticmethod
+    def statuses(body):
+        """Map each reported seq to its status."""
+        return {result['seq']: result['status'] for result in body['results']}
+
+    def test_resent_batch_is_reported_as_duplicate(self):
+        """Test that resending a stored batch stores nothing twice."""
+        batch = [sample(1), sample(2), sample(3)]
+        first = self.ingest(batch, sent_at=3000)
+        assert first['success'] is True
+        assert first['last_seq'] == 3
+        assert first['summary'] == {'stored': 3, 'duplicate': 0, 'invalid': 0, 'failed': 0}
+
+        again = self.ingest(batch, sent_at=3000)
+        assert again['success'] is True
+        assert again['last_seq'] == 3
+        assert self.statuses(again) == {1: 'duplicate', 2: 'duplicate', 3: 'duplicate'}
+        assert len(self.stored_samples()) == 3
+
+    def test_out_of_order_seqs_are_stored_in_order(self):
+        """Test that a batch is stored by seq and older seqs of a later batch are duplicates."""
+        body = self.ingest([sample(5), sample(3), sample(4), sample(4)], sent_at=5000)
+        assert self.statuses(body) == {3: 'stored', 4: 'stored', 5: 'stored'}
+        assert body['summary']['stored'] == 3
+
+        body = self.ingest([sample(6), sample(2)], sent_at=6000)
+        assert self.statuses(body) == {2: 'duplicate', 6: 'stored'}
+        assert body['last_seq'] == 6
+
+        points = self.stored_samples()
+        assert [point['data']['instant_power'] for point in points] == [153, 154, 155, 156]
+        timestamps = [point['timestamp'] for point in points]
+        assert timestamps == sorted(timestamps)
+
+    def test_invalid_and_unnumbered_items(self):
+        """Test that malformed items are counted and never stored."""
+        body = self.ingest([
+            sample(1),
+            {'seq': 2, 't': 2000, 'data': 'not an object'},
+            {'seq': 3, 't': True, 'data': {'instant_power': 150}},
+            {'t': 4000, 'data': {'instant_power': 150}},
+            {'seq': '5', 't': 5000, 'data': {'instant_power': 150}},
+            'garbage'
+        ])
+        assert self.statuses(body) == {1: 'stored', 2: 'invalid', 3: 'invalid'}
+        assert body['summary'] == {'stored': 1, 'duplicate': 0, 'invalid': 5, 'failed': 0}
+        assert len(self.stored_samples()) == 1
+
+    def test_seq_sent_invalid_and_valid_is_invalid(self):
+        """Test that a seq sent both malformed and well-formed is reported as invalid."""
+        body = self.ingest([{'seq': 1, 't': 1000, 'data': None}, sample(1), sample(2),
+                            sample(3), {'seq': 3, 't': 'late', 'data': {}}])
+        assert self.statuses(body) == {1: 'invalid', 2: 'stored', 3: 'invalid'}
+        assert len(self.stored_samples()) == 1
+
+    def test_failed_store_can_be_resent(self):
+        """Test that a batch that fails to store is reported failed and accepted again."""
+        self.ingest([sample(1)])
+        with patch.object(self.workout_manager, 'add_data_points', return_value=False):
+            body = self.ingest([sample(2), sample(3)])
+        assert body['success'] is False
+        assert body['last_seq'] == 1
+        assert self.statuses(body) == {2: 'failed', 3: 'failed'}
+
+        body = self.ingest([sample(2), sample(3)])
+        assert body['success'] is True
+        assert self.statuses(body) == {2: 'stored', 3: 'stored'}
+        assert len(self.stored_samples()) == 3
+
+    def test_inactive_session_is_rejected(self):
+        """Test that batches are refused without a Web BLE session."""
+        web_app.web_ble_state['active'] = False
+        body = self.ingest([sample(1)])
+        assert body['success'] is False
+        assert self.workout_manager.active_workout_id is None
+
+    def test_workouts_not_modified(self):
+        """Test that the workout list answers If-None-Match with 304 until a workout changes."""
+        response = self.client.get('/api/workouts')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'no-cache'
+
+        cached = self.client.get('/api/workouts', headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.headers['ETag'] == etag
+        assert cached.data == b''
+
+        # Another query string is another representation
+        assert self.client.get('/api/workouts?limit=5', headers={'If-None-Match': etag}).status_code == 200
+
+        self.workout_manager.database.start_workout(None, 'bike')
+        changed = self.client.get('/api/workouts', headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != etag
+        assert len(changed.get_json()['workouts']) == 1
+
+    def test_status_since(self):
+        """Test that ?since= answers 204 when unchanged, a patch after a change, or a reset."""
+        full = self.client.get('/api/status').get_json()
+        seq = full['seq']
+
+        unchanged = self.client.get(f'/api/status?since={seq}')
+        assert unchanged.status_code == 204
+        assert unchanged.headers['X-Status-Seq'] == str(seq)
+
+        web_app.web_ble_state['last_seen_ts'] = 1234.5
+        delta = self.client.get(f'/api/status?since={seq}').get_json()
+        assert delta['seq'] > seq
+        assert delta['reset'] is False
+        assert delta['changes'] == {'web_ble': {'last_seen_ts': 1234.5}}
+
+        reset = self.client.get('/api/status?since=1').get_json()
+        assert reset['reset'] is True
+        assert reset['seq'] == delta['seq']
+        assert reset['changes']['web_ble']['last_seen_ts'] == 1234.5
+        assert 'device_status' in reset['changes']
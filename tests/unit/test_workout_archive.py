@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the compressed workout sample archive format.
+"""
+
+import os
+import sys
+import zlib
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.workout_archive import (
+    ARCHIVE_MAGIC, LEGACY_ARCHIVE_VERSION, encode_archive, decode_archive, split_blocks,
+    _encode_column, _timestamp_offsets, _write_bytes, _write_deltas, _write_varint
+)
+from src.data.workout_data_schema import SAMPLE_COLUMNS, SAMPLE_COLUMN_NAMES
+
+
+def _row(row_id, timestamp, extras=None, field_flags=0, **values):
+    """Build an archive row with every typed column."""
+    row = {name: values.get(name) for name in SAMPLE_COLUMN_NAMES}
+    row.update({'id': row_id, 'timestamp': timestamp.isoformat(),
+                'field_flags': field_flags, 'extras': extras})
+    return row
+
+
+def legacy_archive(rows):
+    """Pack rows the way version 1 archives were written: one blob compressed as a whole."""
+    payload = bytearray()
+    _write_varint(payload, len(rows))
+    base, offsets = _timestamp_offsets([row['timestamp'] for row in rows])
+    _write_bytes(payload, base.encode('utf-8'))
+    _write_deltas(payload, offsets)
+    _write_deltas(payload, [row['id'] for row in rows])
+    for row in rows:
+        _write_varint(payload, row['field_flags'] or 0)
+    _write_varint(payload, len(SAMPLE_COLUMNS))
+    for name, _, _ in SAMPLE_COLUMNS:
+        _write_bytes(payload, name.encode('utf-8'))
+        _encode_column(payload, [row[name] for row in rows])
+    extras = [(index, row['extras']) for index, row in enumerate(rows) if row['extras']]
+    _write_varint(payload, len(extras))
+    previous = 0
+    for index, extras_json in extras:
+        _write_varint(payload, index - previous)
+        _write_bytes(payload, extras_json.encode('utf-8'))
+        previous = index
+    return ARCHIVE_MAGIC + bytes([LEGACY_ARCHIVE_VERSION]) + zlib.compress(bytes(payload))
+
+
+class TestWorkoutArchive:
+    """Test cases for encode_archive and decode_archive."""
+    
+    def setup_method(self):
+        """Set up a start time."""
+        self.start = datetime(2024, 1, 1, 12, 0, 0)
+    
+    def _round_trip(self, rows):
+        decoded = list(decode_archive(encode_archive(rows)))
+        for row in decoded:
+            assert row.pop('data') is None
+        return decoded
+    
+    def test_round_trip_values(self):
+        """Test that ints, decimals, raw doubles and gaps are restored exactly."""
+        rows = [
+            _row(1, self.start, power=150.0, heart_rate=140, speed=25.37, distance=0.1 + 0.2),
+            _row(2, self.start + timedelta(seconds=1), power=152.5, speed=26.01,
+                 extras='{"note": "x"}', field_flags=5),
+            _row(5, self.start + timedelta(seconds=2, microseconds=250000), power=-3.0,
+                 heart_rate=139, distance=1e300),
+        ]
+        
+        decoded = self._round_trip(rows)
+        assert decoded == rows
+        assert isinstance(decoded[0]['heart_rate'], int)
+        assert isinstance(decoded[0]['power'], float)
+    
+    def test_timezone_aware_timestamps(self):
+        """Test that aware timestamps keep their offset."""
+        start = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        rows = [_row(i + 1, start + timedelta(seconds=i), power=float(i)) for i in range(3)]
+        assert self._round_trip(rows) == rows
+    
+    def test_mixed_timestamps_rejected(self):
+        """Test that timestamps that can't be rebuilt exactly are refused."""
+        rows = [_row(1, self.start, power=1.0),
+                _row(2, datetime(2024, 1, 1, 12, 0, 1, tzinfo=timezone.utc), power=2.0)]
+        with pytest.raises(ValueError):
+            encode_archive(rows)
+    
+    def test_empty_archive(self):
+        """Test an archive without samples."""
+        assert list(decode_archive(encode_archive([]))) == []
+    
+    def test_archive_is_compact(self):
+        """Test that a steady hour of samples packs into a few bytes each."""
+        rows = [_row(i + 1, self.start + timedelta(seconds=i), power=float(150 + i % 7),
+                     cadence=80.0, speed=25.0 + (i % 10) / 100, heart_rate=130 + i % 3,
+                     distance=i * 6.95, elapsed_time=float(i), field_flags=4)
+                for i in range(3600)]
+        blob = encode_archive(rows)
+        
+        assert len(blob) < 3600 * 4
+        assert self._round_trip(rows) == rows
+    
+    def test_requested_fields_only(self):
+        """Test that reading two columns decompresses only those and the timestamps."""
+        rows = [_row(i + 1, self.start + timedelta(seconds=i), power=float(150 + i), cadence=80.0,
+                     heart_rate=130, speed=25.5, extras='{"note": "x"}' if i == 3 else None)
+                for i in range(100)]
+        blob = encode_archive(rows)
+        
+        with patch('src.data.workout_archive.zlib.decompress', wraps=zlib.decompress) as decompress:
+            decoded = list(decode_archive(blob, fields=['power', 'elapsed_time']))
+        
+        assert decompress.call_count == 2
+        assert decoded == [{'timestamp': row['timestamp'], 'power': row['power'],
+                            'elapsed_time': None, 'data': None} for row in rows]
+    
+    def test_split_blocks(self):
+        """Test that blocks keep the read order and their size limit."""
+        rows = [_row(i + 1, self.start + timedelta(seconds=i), power=float(i)) for i in range(25)]
+        blocks = split_blocks(rows, 10)
+        
+        assert [len(block) for block in blocks] == [10, 10, 5]
+        assert [row for block in blocks for row in self._round_trip(block)] == rows
+    
+    def test_legacy_archive(self):
+        """Test that version 1 archives are still decoded."""
+        rows = [_row(i + 1, self.start + timedelta(seconds=i), power=float(i), heart_rate=120,
+                     extras='{"note": "x"}' if i == 1 else None)
+                for i in range(5)]
+        blob = legacy_archive(rows)
+        
+        decoded = list(decode_archive(blob))
+        for row in decoded:
+            assert row.pop('data') is None
+        assert decoded == rows
+        assert [row['heart_rate'] for row in decode_archive(blob, fields=['heart_rate'])] == [120] * 5
+    
+    def test_invalid_blobs(self):
+        """Test that foreign and corrupt blobs raise ValueError."""
+        with pytest.raises(ValueError):
+            decode_archive(b'not an archive')
+        with pytest.raises(ValueError):
+            decode_archive(b'RGA\x01' + b'garbage')
+        with pytest.raises(ValueError):
+            decode_archive(b'RGA\x01' + zlib.compress(b'\x05'))
+        with pytest.raises(ValueError):
+            decode_archive(b'RGA\x09')
+        blob = encode_archive([_row(1, self.start, power=1.0)])
+        with pytest.raises(ValueError):
+            decode_archive(blob[:-3])
@@ -8,6 +8,8 @@ Tests workout session lifecycle, data validation, metric calculations, and datab
 import pytest
 import tempfile
 import os
+import json
+import shutil
 import sys
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime, timedelta
@@ -15,8 +17,9 @@ from datetime import datetime, timedelta
 # Add the project root to the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from src.data.workout_manager import WorkoutManager
+from src.data.workout_manager import WorkoutManager, END_FLUSH_TIMEOUT_SECONDS, JOB_FLUSH_ATTEMPTS
 from src.data.database import Database
+from src.fit.fit_converter import FITConverter
 
 
 class TestWorkoutManager:
@@ -178,6 +181,140 @@ class TestWorkoutManager:
         assert len(self.workout_manager.data_points) == 0
         assert len(self.workout_manager.summary_metrics) == 0
     
+    def test_end_workout_flushes_queued_samples(self):
+        """Test that ending a workout forces queued samples to disk."""
+        with patch.object(self.workout_manager.database, 'start_workout', return_value=123):
+            self.workout_manager.start_workout(1, "bike")
+        
+        with patch.object(self.workout_manager.database, 'flush_workout_data', return_value=True) as mock_flush:
+            with patch.object(self.workout_manager.database, 'end_workout', return_value=True), \
+                    patch.object(self.workout_manager.job_queue, 'submit', return_value=9):
+                self.workout_manager.end_workout()
+        
+        mock_flush.assert_called_once_with(END_FLUSH_TIMEOUT_SECONDS)
+    
+    def test_end_workout_archives_samples_in_background(self):
+        """Test that rollups and archiving run in the FIT job after ending, not while ending."""
+        with patch.object(self.workout_manager.database, 'start_workout', return_value=123):
+            self.workout_manager.start_workout(1, "bike")
+        
+        calls = []
+        with patch.object(self.workout_manager.database, 'end_workout', return_value=True), \
+                patch.object(self.workout_manager.database, 'finalize_rollups',
+                             side_effect=lambda workout_id: calls.append('rollups') or True), \
+                patch.object(self.workout_manager.database, 'archive_workout',
+                             side_effect=lambda workout_id: calls.append('archive') or True) as mock_archive, \
+                patch.object(self.workout_manager.job_queue, 'submit', return_value=9):
+            self.workout_manager.end_workout()
+            mock_archive.assert_not_called()
+            assert calls == []
+            
+            with patch('src.fit.fit_processor.FITProcessor') as mock_fit_processor:
+                mock_fit_processor.return_value.process_workout.side_effect = \
+                    lambda *args, **kwargs: calls.append('convert') or '/fit_files/ride.fit'
+                self.workout_manager._run_fit_job({'id': 9, 'workout_id': 123, 'params': {}}, Mock())
+        
+        mock_archive.assert_called_once_with(123)
+        assert calls == ['rollups', 'convert', 'archive']
+    
+    def test_end_workout_queues_fit_job(self):
+        """Test that ending a workout queues the FIT file instead of building it."""
+        with patch.object(self.workout_manager.database, 'start_workout', return_value=123):
+            self.workout_manager.start_workout(1, "bike")
+        
+        statuses = []
+        self.workout_manager.register_status_callback(lambda status, data: statuses.append((status, data)))
+        
+        with patch.object(self.workout_manager.database, 'end_workout', return_value=True), \
+                patch.object(self.workout_manager.database, 'archive_workout', return_value=True), \
+                patch.object(self.workout_manager.job_queue, 'submit', return_value=9) as mock_submit, \
+                patch('src.fit.fit_processor.FITProcessor') as mock_fit_processor:
+            result = self.workout_manager.end_workout()
+        
+        assert result is True
+        mock_submit.assert_called_once_with('fit_file', 123)
+        mock_fit_processor.assert_not_called()
+        assert self.workout_manager.last_fit_job_id == 9
+        assert statuses[-1][0] == 'workout_ended'
+        assert statuses[-1][1]['fit_job_id'] == 9
+    
+    def test_end_workout_finishes_live_fit_file(self):
+        """Test that with a live FIT file ending closes it instead of queueing a job."""
+        fit_dir = tempfile.mkdtemp()
+        try:
+            self.workout_manager.live_fit = True
+            self.workout_manager.fit_converter = FITConverter(output_dir=fit_dir)
+            workout_id = self.workout_manager.start_workout(1, "bike")
+            assert self.workout_manager.live_fit_writer.is_open
+            
+            for second in range(3):
+                assert self.workout_manager.add_data_point({'instant_power': 150 + second, 'heart_rate': 130})
+            
+            with patch.object(self.workout_manager.job_queue, 'submit') as mock_submit:
+                assert self.workout_manager.end_workout() is True
+            
+            # Only the samples are left to archive
+            mock_submit.assert_called_once_with('workout_archive', workout_id)
+            assert self.workout_manager.last_fit_job_id is None
+            fit_file_path = self.workout_manager.get_workout(workout_id)['fit_file_path']
+            assert fit_file_path and os.path.dirname(fit_file_path) == fit_dir
+            assert os.path.exists(fit_file_path)
+            assert not [name for name in os.listdir(fit_dir) if name.endswith('.partial')]
+        finally:
+            shutil.rmtree(fit_dir, ignore_errors=True)
+    
+    def test_fit_job_fails_without_fit_file(self):
+        """Test that the FIT job handler fails the job when no file is created."""
+        job = {'id': 1, 'workout_id': 123, 'params': {}}
+        with patch('src.fit.fit_processor.FITProcessor') as mock_fit_processor:
+            mock_fit_processor.return_value.process_workout.return_value = None
+            with pytest.raises(RuntimeError):
+                self.workout_manager._run_fit_job(job, Mock())
+        
+            mock_fit_processor.return_value.process_workout.return_value = '/fit_files/ride.fit'
+            result = self.workout_manager._run_fit_job(job, Mock())
+        
+        assert result == {'fit_file_path': '/fit_files/ride.fit', 'fit_file_name': 'ride.fit'}
+
+    def test_jobs_fail_while_samples_are_unwritten(self):
+        """Test that FIT and archive jobs re-flush first and don't read a partial workout."""
+        job = {'id': 1, 'workout_id': 123, 'params': {}}
+        with patch.object(self.workout_manager.database, 'flush_workout_data', return_value=False) as mock_flush, \
+                patch.object(self.workout_manager.database, 'archive_workout') as mock_archive, \
+                patch('src.fit.fit_processor.FITProcessor') as mock_fit_processor:
+            with pytest.raises(RuntimeError):
+                self.workout_manager._run_fit_job(job, Mock())
+            with pytest.raises(RuntimeError):
+                self.workout_manager._run_archive_job(job, Mock())
+
+        assert mock_flush.call_count == 2 * JOB_FLUSH_ATTEMPTS
+        mock_fit_processor.return_value.process_workout.assert_not_called()
+        mock_archive.assert_not_called()
+
+    def test_audit_job_reports_progress_and_report(self):
+        """Test that the audit job runs the directory audit and returns its report."""
+        def fake_run_in_subprocess(directory, mode, workers, progress):
+            progress(1, 2)
+            progress(2, 2)
+            return {'directory': directory, 'mode': mode, 'total_files': 2, 'files': [{}, {}]}
+        
+        with patch.object(self.workout_manager.job_queue, 'submit', return_value=7) as mock_submit:
+            assert self.workout_manager.audit_fit_files(mode='summary', workers=2) == 7
+        mock_submit.assert_called_once_with(
+            'fit_audit', params={'mode': 'summary', 'workers': 2, 'include_files': False})
+        
+        report = Mock()
+        job = {'id': 7, 'workout_id': None, 'params': mock_submit.call_args.kwargs['params']}
+        with patch('src.fit.fit_audit.run_in_subprocess', side_effect=fake_run_in_subprocess):
+            result = self.workout_manager._run_fit_audit_job(job, report)
+            assert os.path.basename(result['directory']) == 'fit_files'
+            assert result['mode'] == 'summary'
+            assert 'files' not in result
+            report.assert_called_with(1.0, '2/2 files')
+            
+            job['params']['include_files'] = True
+            assert len(self.workout_manager._run_fit_audit_job(job, Mock())['files']) == 2
+    
     def test_end_workout_no_active(self):
         """Test ending workout when none is active."""
         result = self.workout_manager.end_workout()
@@ -244,6 +381,44 @@ class TestWorkoutManager:
         
         assert result is False
     
+    def test_add_data_points_batch(self):
+        """Test adding a batch of data points in one transaction."""
+        workout_id = self.workout_manager.database.start_workout(1, "bike")
+        self.workout_manager.active_workout_id = workout_id
+        self.workout_manager.workout_type = "bike"
+        self.workout_manager.workout_start_time = datetime.now() - timedelta(seconds=10)
+        
+        now = datetime.now()
+        samples = [
+            (now - timedelta(seconds=2), {'instant_power': 100, 'heart_rate': 120}),
+            (now - timedelta(seconds=1), {'instant_power': 200, 'heart_rate': 130}),
+        ]
+        
+        with patch.object(self.workout_manager.database, 'add_workout_data_batch',
+                          wraps=self.workout_manager.database.add_workout_data_batch) as batch:
+            result = self.workout_manager.add_data_points(samples)
+        
+        assert result is True
+        batch.assert_called_once()
+        assert len(self.workout_manager.database.get_workout_data(workout_id)) == 2
+        assert len(self.workout_manager.data_points) == 2
+        assert self.workout_manager.data_points[0]['timestamp'] == samples[0][0]
+        assert self.workout_manager.summary_metrics['max_power'] == 200
+    
+    def test_add_data_points_database_error(self):
+        """Test a failed batch leaves the live state untouched so it can be resent."""
+        with patch.object(self.workout_manager.database, 'start_workout', return_value=123):
+            self.workout_manager.start_workout(1, "bike")
+        
+        samples = [(datetime.now(), {'instant_power': 150})]
+        
+        with patch.object(self.workout_manager.database, 'add_workout_data_batch', return_value=False):
+            result = self.workout_manager.add_data_points(samples)
+        
+        assert result is False
+        assert len(self.workout_manager.data_points) == 0
+        assert self.workout_manager.summary_metrics.get('max_power', 0) == 0
+    
     def test_update_bike_metrics_power(self):
         """Test updating bike metrics with power data."""
         # Start a bike workout
@@ -409,6 +584,22 @@ class TestWorkoutManager:
         
         assert self.workout_manager.summary_metrics['total_strokes'] == 150
     
+    def test_running_averages_reset_between_workouts(self):
+        """Test that a new workout doesn't inherit the previous workout's averages."""
+        with patch.object(self.workout_manager.database, 'start_workout', return_value=123):
+            self.workout_manager.start_workout(1, "bike")
+        for power in [100, 200, 300]:
+            self.workout_manager._update_bike_metrics({'instant_power': power, 'heart_rate': 150})
+        assert self.workout_manager.summary_metrics['avg_power'] == 200
+        
+        with patch.object(self.workout_manager.database, 'start_workout', return_value=124):
+            self.workout_manager.active_workout_id = None
+            self.workout_manager.start_workout(1, "bike")
+        self.workout_manager._update_bike_metrics({'instant_power': 50, 'heart_rate': 120})
+        
+        assert self.workout_manager.summary_metrics['avg_power'] == 50
+        assert self.workout_manager.summary_metrics['avg_heart_rate'] == 120
+    
     def test_get_workout_summary_metrics_active_workout(self):
         """Test getting summary metrics for active workout."""
         # Start a workout
@@ -640,6 +831,31 @@ class TestWorkoutManager:
         assert self.workout_manager.summary_metrics['avg_power'] == 150.79
         assert self.workout_manager.summary_metrics['avg_heart_rate'] == 140.57
         assert self.workout_manager.summary_metrics['max_power'] == 200  # Not an average, not rounded
+    
+    def test_live_stream_events(self):
+        """Test that samples, summary deltas and workout state are streamed."""
+        subscription = self.workout_manager.live_publisher.subscribe()
+        workout_id = self.workout_manager.start_workout(1, 'bike')
+        
+        def events():
+            received = []
+            while (frame := subscription.get(timeout=0)) is not None:
+                fields = dict(line.split(': ', 1) for line in frame.decode().strip().split('\n'))
+                received.append((fields['event'], json.loads(fields['data'])))
+            return received
+        
+        assert events() == [('status', {'workout_active': True, 'workout_id': workout_id, 'workout_type': 'bike'})]
+        
+        self.workout_manager.add_data_point({'instantaneous_power': 150})
+        (sample_event, sample), (summary_event, summary) = events()
+        assert sample_event == 'sample' and sample['power'] == 150 and sample['workout_id'] == workout_id
+        assert summary_event == 'summary' and summary['avg_power'] == 150
+        
+        # Only the metrics that changed are sent again
+        self.workout_manager.add_data_point({'instantaneous_power': 150})
+        summary_events = [data for event, data in events() if event == 'summary']
+        assert all('avg_power' not in data for data in summary_events)
+        subscription.close()
 
 
 if __name__ == '__main__':
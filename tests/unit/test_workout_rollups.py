@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the workout rollup aggregation.
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.data.workout_rollups import (
+    RollupBuilder, ROLLUP_METRICS, ROLLUP_COLUMN_NAMES, bucket_start, choose_resolution
+)
+
+
+def metrics(power, heart_rate=None):
+    """Metric values in ROLLUP_METRICS order with only power and heart rate set."""
+    values = [None] * len(ROLLUP_METRICS)
+    values[ROLLUP_METRICS.index('power')] = power
+    values[ROLLUP_METRICS.index('heart_rate')] = heart_rate
+    return values
+
+
+def stats(row, metric):
+    """Get (min, max, mean, count) of a metric from a rollup row."""
+    offset = 3 + ROLLUP_COLUMN_NAMES.index(f"{metric}_min")
+    return row[offset:offset + 4]
+
+
+class TestBucketStart:
+    """Test cases for bucket alignment."""
+
+    def test_aligned_to_resolution(self):
+        """Test that buckets start on whole multiples of the resolution."""
+        timestamp = datetime(2024, 1, 1, 6, 7, 38, 250000)
+        assert bucket_start(timestamp, 5) == datetime(2024, 1, 1, 6, 7, 35)
+        assert bucket_start(timestamp, 30) == datetime(2024, 1, 1, 6, 7, 30)
+        assert bucket_start(timestamp, 300) == datetime(2024, 1, 1, 6, 5)
+
+    def test_keeps_timezone(self):
+        """Test that aware timestamps give aware bucket starts."""
+        timestamp = datetime(2024, 1, 1, 6, 7, 38, tzinfo=timezone.utc)
+        assert bucket_start(timestamp, 30) == datetime(2024, 1, 1, 6, 7, 30, tzinfo=timezone.utc)
+
+
+class TestChooseResolution:
+    """Test cases for picking a resolution from a chart window."""
+
+    def test_short_window_uses_samples(self):
+        assert choose_resolution(600, 1000) is None
+
+    def test_picks_finest_fitting_resolution(self):
+        assert choose_resolution(3600, 1000) == 5
+        assert choose_resolution(4 * 3600, 1000) == 30
+        assert choose_resolution(4 * 3600, 100) == 300
+
+    def test_falls_back_to_coarsest(self):
+        assert choose_resolution(48 * 3600, 100) == 300
+
+
+class TestRollupBuilder:
+    """Test cases for RollupBuilder."""
+
+    def test_closes_buckets_in_order(self):
+        """Test that a bucket is emitted once a later sample leaves it."""
+        builder = RollupBuilder(resolutions=(5,))
+        base = datetime(2024, 1, 1, 6, 0, 0)
+
+        closed = []
+        for second, power in enumerate([100, 200, 150, 120, 130, 300]):
+            closed += builder.add(base + timedelta(seconds=second), metrics(power))
+
+        assert len(closed) == 1
+        resolution, start, sample_count = closed[0][:3]
+        assert (resolution, start, sample_count) == (5, base.isoformat(), 5)
+        assert stats(closed[0], 'power') == (100, 200, 140.0, 5)
+        assert stats(closed[0], 'heart_rate') == (None, None, None, 0)
+
+        remaining = builder.flush()
+        assert stats(remaining[0], 'power') == (300, 300, 300.0, 1)
+        assert builder.flush() == []
+
+    def test_missing_values_are_not_counted(self):
+        """Test that a metric's count only includes samples that had it."""
+        builder = RollupBuilder(resolutions=(30,))
+        base = datetime(2024, 1, 1, 6, 0, 0)
+        builder.add(base, metrics(100, 120))
+        builder.add(base + timedelta(seconds=1), metrics(110))
+
+        row = builder.flush()[0]
+        assert row[2] == 2
+        assert stats(row, 'heart_rate') == (120, 120, 120.0, 1)
+
+    def test_all_resolutions(self):
+        """Test that every resolution gets a bucket."""
+        builder = RollupBuilder()
+        builder.add(datetime(2024, 1, 1, 6, 0, 0), metrics(100))
+        assert sorted(row[0] for row in builder.flush()) == [5, 30, 300]